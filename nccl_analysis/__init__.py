@@ -0,0 +1,13 @@
+"""
+Analysis library for the CS244C NCCL tuning experiments.
+
+Parsers and text reports are pure Python; plotting lives in
+`nccl_analysis.plotting` and is only imported by the code paths that draw.
+Command-line entry point: `nccl-analysis` (see `nccl_analysis.cli`).
+"""
+
+from .parsing import NcclResults, NcclRow, format_size, load_times, read_results
+
+__version__ = "0.1.0"
+
+__all__ = ["NcclResults", "NcclRow", "format_size", "load_times", "read_results"]
@@ -0,0 +1,142 @@
+"""
+Aggregate repeated nccl-tests runs into per-size statistics.
+
+A run is one table of one file: a "Collective test starting" block, or, in the
+multi-process logs where every rank prints its own table into the same block
+(phase1-baseline/a100-8gpu/results/*.out), the k-th occurrence of each size within
+the block. Files of the same ResultKey (iteration_<n>/ repeats) pool their runs.
+
+Before the statistics are taken, whole runs that sit far from the others are
+dropped. A run's offset is the median over sizes of log(value / per-size median of
+all runs), so one slow repetition (a noisy neighbour, a throttled GPU) stands out
+even if every single size is within noise. Runs whose offset differs from the
+median offset by more than `k` scaled MADs, and by at least `min_dev` (5%), are
+rejected. Sizes measured by fewer than three runs do not count, and a run is only
+judged when most of its sizes count, so a run that alone covers a size range is never
+dropped. Fewer than three runs are never filtered.
+
+Pure Python (statistics), so the text-only `compare` subcommand stays fast.
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from .parsing import NcclResults, format_size
+
+COLUMNS = ("oop_time_us", "oop_algbw", "oop_busbw", "ip_time_us", "ip_algbw", "ip_busbw")
+RunId = tuple[str, int, int]  # (path, block, repeat within the block)
+
+
+@dataclass
+class SizeStats:
+    size: int
+    n: int
+    mean: float
+    median: float
+    stdev: float  # sample stdev, 0.0 for a single run
+    min: float
+    max: float
+
+
+@dataclass
+class Aggregate:
+    label: str
+    column: str
+    stats: list[SizeStats] = field(default_factory=list)
+    runs: list[RunId] = field(default_factory=list)
+    rejected: list[RunId] = field(default_factory=list)
+
+    def by_size(self) -> dict[int, SizeStats]:
+        return {s.size: s for s in self.stats}
+
+
+def run_samples(results: Iterable[NcclResults], column: str = "oop_algbw") -> dict[RunId, dict[int, float]]:
+    """{run: {size: value}} for every run of every file; non-positive values are dropped."""
+    if column not in COLUMNS:
+        raise ValueError(f"unknown column {column!r} (expected one of {COLUMNS})")
+    runs: dict[RunId, dict[int, float]] = defaultdict(dict)
+    for res in results:
+        seen: dict[tuple[int, int], int] = defaultdict(int)
+        for r in res.rows:
+            repeat = seen[(r.run, r.size)]
+            seen[(r.run, r.size)] += 1
+            value = getattr(r, column)
+            if value > 0 and not math.isnan(value):
+                runs[(res.path, r.run, repeat)][r.size] = value
+    return {run: sizes for run, sizes in runs.items() if sizes}
+
+
+def reject_outlier_runs(runs: dict[RunId, dict[int, float]], k: float = 3.5,
+                        min_dev: float = 0.05) -> tuple[list[RunId], list[RunId]]:
+    """(kept, rejected) runs by the offset rule in the module docstring; k <= 0 keeps every run."""
+    ids = sorted(runs)
+    if k <= 0 or len(ids) < 3:
+        return ids, []
+    by_size: dict[int, list[float]] = defaultdict(list)
+    for sizes in runs.values():
+        for size, value in sizes.items():
+            by_size[size].append(math.log(value))
+    centre = {size: statistics.median(v) for size, v in by_size.items() if len(v) >= 3}
+    offsets = {}
+    for run in ids:
+        devs = [math.log(v) - centre[s] for s, v in runs[run].items() if s in centre]
+        # Only judge runs mostly made of shared sizes: a run that alone covers a size range is kept.
+        if devs and 2 * len(devs) >= len(runs[run]):
+            offsets[run] = statistics.median(devs)
+    if len(offsets) < 3:
+        return ids, []
+    mid = statistics.median(offsets.values())
+    mad = 1.4826 * statistics.median(abs(o - mid) for o in offsets.values())
+    limit = max(k * mad, min_dev)
+    rejected = [run for run in ids if run in offsets and abs(offsets[run] - mid) > limit]
+    return [run for run in ids if run not in rejected], rejected
+
+
+def size_stats(runs: dict[RunId, dict[int, float]], keep: Iterable[RunId]) -> list[SizeStats]:
+    by_size: dict[int, list[float]] = defaultdict(list)
+    for run in keep:
+        for size, value in runs[run].items():
+            by_size[size].append(value)
+    return [SizeStats(size, len(v), statistics.fmean(v), statistics.median(v),
+                      statistics.stdev(v) if len(v) > 1 else 0.0, min(v), max(v))
+            for size, v in sorted(by_size.items())]
+
+
+def aggregate_results(results: Iterable[NcclResults], column: str = "oop_algbw", label: str = "",
+                      k: float = 3.5) -> Aggregate:
+    """One Aggregate over every run of the given files."""
+    results = list(results)
+    runs = run_samples(results, column)
+    kept, rejected = reject_outlier_runs(runs, k)
+    return Aggregate(label or ", ".join(r.path for r in results), column, size_stats(runs, kept), kept, rejected)
+
+
+def aggregate(files, column: str = "oop_algbw", k: float = 3.5) -> dict:
+    """{ResultKey: Aggregate} for catalog.discover output, pooling files of the same key."""
+    by_key = defaultdict(list)
+    for f in files:
+        by_key[f.key].append(f.results)
+    out = {}
+    for key in sorted(by_key, key=lambda k_: (k_.group, k_.config)):
+        platform, n_gpus, contention = key.group
+        label = f"{platform} {n_gpus}gpu {contention} {key.config}"
+        out[key] = aggregate_results(by_key[key], column, label, k)
+    return out
+
+
+def print_aggregates(aggs: Iterable[Aggregate]) -> None:
+    for agg in aggs:
+        files = len({run[0] for run in agg.runs + agg.rejected})
+        print(f"\n{agg.label}: {len(agg.runs)} runs from {files} files, {agg.column}")
+        for run in agg.rejected:
+            print(f"  rejected outlier run: {run[0]} block {run[1]} repeat {run[2]}")
+        print(f"  {'size':>10} {'n':>3} {'mean':>10} {'median':>10} {'stdev':>9} {'cv%':>6} {'min':>10} {'max':>10}")
+        for s in agg.stats:
+            cv = 100 * s.stdev / s.mean if s.mean else 0.0
+            print(f"  {format_size(s.size):>10} {s.n:>3} {s.mean:>10.2f} {s.median:>10.2f} {s.stdev:>9.2f} "
+                  f"{cv:>6.1f} {s.min:>10.2f} {s.max:>10.2f}")
@@ -0,0 +1,509 @@
+"""
+Contextual bandit policies for picking an NCCL algorithm/protocol per collective.
+
+The phase4 plugin keeps a separate epsilon-greedy table per (collType, size band,
+nNodes, nRanks). Each band therefore learns from scratch, and GPU contention is
+invisible to it. The policies here instead fit one linear model per arm over a
+context vector:
+
+- log2 message size, encoded as overlapping piecewise-linear "hat" features every two
+  octaves, so a reward at 1 MB also informs 512 KB and 2 MB;
+- log2 rank count, recent iteration-time trend, GPU utilization of co-running work
+  (0..1) and a compute/communication overlap flag, each also multiplied by the scaled
+  log size so their effect can change with message size.
+
+Rewards are -log(latency), so each arm's model is a log-latency curve. LinUCB plays the
+arm with the highest upper confidence bound. Linear Thompson sampling draws a parameter
+vector per arm and context. The state is an (arms, d, d) precision matrix plus an
+(arms, d) vector however many rewards have been seen, and an optional discount forgets
+old rewards so a policy can follow drift. `select` and `update` take whole batches,
+the way the plugin ingests its reward log.
+
+`export_policy` writes the greedy choice in the example tuner's CSV format
+(phase4-tuner/workload_aware_8gpu.conf). `replay` evaluates policies offline against
+Phase 1-3 measurements.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+from .catalog import ResultFile
+from .parsing import format_size, load_times
+
+CTX_FIELDS = ("log2_bytes", "n_ranks", "trend", "util", "overlap")
+SIZE_KNOTS = np.arange(0.0, 33.0, 2.0)  # log2 bytes, 1 B .. 4 GB
+N_FEATURES = len(SIZE_KNOTS) + 8
+# Nominal utilization of the phase2 stress kernel at each contention level.
+UTIL_LEVELS = {"none": 0.0, "low": 1 / 3, "medium": 2 / 3, "high": 1.0}
+# Size bands of rl_bandit_tuner_plugin.c's sizeBand().
+PLUGIN_BANDS = np.array([1 << 10, 16 << 10, 256 << 10, 1 << 20, 8 << 20])
+# iteration_proxy.py defaults: 2**20 float32 elements on 8 ranks.
+PROXY_BYTES = 4 << 20
+PROXY_RANKS = 8
+MAX_BYTES = 4294967295
+
+
+def make_contexts(n_bytes, n_ranks, trend=0.0, util=0.0, overlap=0.0) -> np.ndarray:
+    """(N, len(CTX_FIELDS)) raw context rows; arguments broadcast against each other."""
+    log_bytes = np.log2(np.maximum(np.asarray(n_bytes, dtype=float), 1.0))
+    cols = np.broadcast_arrays(log_bytes, n_ranks, trend, util, overlap)
+    return np.column_stack([np.asarray(c, dtype=float).ravel() for c in cols])
+
+
+def featurize(ctx: np.ndarray) -> np.ndarray:
+    """(N, N_FEATURES) feature matrix for raw context rows."""
+    ctx = np.atleast_2d(np.asarray(ctx, dtype=float))
+    x = np.clip(ctx[:, 0], SIZE_KNOTS[0], SIZE_KNOTS[-1])
+    width = SIZE_KNOTS[1] - SIZE_KNOTS[0]
+    hats = np.maximum(0.0, 1.0 - np.abs(x[:, None] - SIZE_KNOTS[None, :]) / width)
+    extra = np.column_stack([np.log2(np.maximum(ctx[:, 1], 1.0)), ctx[:, 2], ctx[:, 3], ctx[:, 4]])
+    return np.hstack([hats, extra, extra * (x / SIZE_KNOTS[-1])[:, None]])
+
+
+def iteration_trend(times, window: int = 8) -> np.ndarray:
+    """Trend feature per iteration: least-squares change of log time over the previous `window` iterations.
+
+    Entry i only uses iterations before i (what a tuner has seen when it decides), is 0
+    until two are available, and is clipped to [-1, 1].
+    """
+    y = np.log(np.maximum(np.asarray(times, dtype=float), 1e-9))
+    trend = np.zeros(len(y))
+    for i in range(2, len(y)):
+        seg = y[max(0, i - window):i]
+        xc = np.arange(len(seg)) - (len(seg) - 1) / 2
+        trend[i] = float(xc @ seg / (xc @ xc)) * (len(seg) - 1)
+    return np.clip(trend, -1.0, 1.0)
+
+
+def split_config(config: str) -> tuple[str, str]:
+    """("ring", "LL128") from "ring/LL128"; "auto" parts stay "auto"."""
+    if config == "auto":
+        return "auto", "auto"
+    algo, _, proto = config.partition("/")
+    return algo, proto or "auto"
+
+
+class LinearBandit:
+    """Per-arm ridge regression of reward on featurize(context); subclasses define the score."""
+
+    kind = "linear"
+
+    def __init__(self, arms, reg: float = 1.0, discount: float = 1.0, seed=None):
+        self.arms = list(arms)
+        self.reg = reg
+        self.discount = discount
+        k, d = len(self.arms), N_FEATURES
+        self.A = np.repeat(reg * np.eye(d)[None], k, axis=0)
+        self.b = np.zeros((k, d))
+        self.counts = np.zeros(k)
+        self.rng = np.random.default_rng(seed)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self.A_inv = np.linalg.inv(self.A)
+        self.theta = np.einsum("kde,ke->kd", self.A_inv, self.b)
+
+    def expected(self, ctx) -> np.ndarray:
+        """(N, arms) predicted reward (-log latency)."""
+        return featurize(ctx) @ self.theta.T
+
+    def scores(self, X: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _argmax(scores: np.ndarray, available) -> np.ndarray:
+        if available is not None:
+            scores = np.where(available, scores, -np.inf)
+        return np.argmax(scores, axis=1)
+
+    def select(self, ctx, available=None) -> np.ndarray:
+        """Arm index per context row; `available` (N, arms) masks arms that cannot be played."""
+        return self._argmax(self.scores(featurize(ctx)), available)
+
+    def greedy(self, ctx, available=None) -> np.ndarray:
+        return self._argmax(self.expected(ctx), available)
+
+    def update(self, ctx, arms, rewards) -> None:
+        """Add a batch of (context, arm, reward) observations.
+
+        With discount g < 1 the j-th of n new rewards is weighted g**(n-1-j) and the old
+        statistics (minus the ridge prior) by g**n, exactly as n sequential updates.
+        """
+        X = featurize(ctx)
+        arms = np.asarray(arms, dtype=int)
+        rewards = np.asarray(rewards, dtype=float)
+        n = len(rewards)
+        if n == 0:
+            return
+        w = self.discount ** np.arange(n - 1, -1, -1, dtype=float)
+        onehot = (arms[:, None] == np.arange(len(self.arms))[None, :]) * w[:, None]
+        decay = self.discount ** n
+        prior = self.reg * np.eye(N_FEATURES)
+        self.A = prior + decay * (self.A - prior) + np.einsum("nk,nd,ne->kde", onehot, X, X)
+        self.b = decay * self.b + np.einsum("nk,nd,n->kd", onehot, X, rewards)
+        self.counts = decay * self.counts + onehot.sum(axis=0)
+        self._refresh()
+
+    def params(self) -> dict:
+        return {}
+
+    def save(self, path: str) -> None:
+        np.savez(path, kind=self.kind, arms=np.array(self.arms), A=self.A, b=self.b, counts=self.counts,
+                 reg=self.reg, discount=self.discount, **self.params())
+
+
+class LinUCB(LinearBandit):
+    kind = "linucb"
+
+    def __init__(self, arms, alpha: float = 0.5, **kwargs):
+        self.alpha = alpha
+        super().__init__(arms, **kwargs)
+
+    def scores(self, X: np.ndarray) -> np.ndarray:
+        width = np.einsum("nd,kde,ne->nk", X, self.A_inv, X)
+        return X @ self.theta.T + self.alpha * np.sqrt(np.maximum(width, 0.0))
+
+    def params(self) -> dict:
+        return {"alpha": self.alpha}
+
+
+class LinearThompson(LinearBandit):
+    kind = "thompson"
+
+    def __init__(self, arms, scale: float = 0.2, **kwargs):
+        self.scale = scale
+        super().__init__(arms, **kwargs)
+
+    def _refresh(self) -> None:
+        super()._refresh()
+        self.chol = np.linalg.cholesky(self.A_inv)
+
+    def scores(self, X: np.ndarray) -> np.ndarray:
+        z = self.rng.standard_normal((len(X), len(self.arms), N_FEATURES))
+        return X @ self.theta.T + self.scale * np.einsum("nd,kde,nke->nk", X, self.chol, z)
+
+    def params(self) -> dict:
+        return {"scale": self.scale}
+
+
+POLICIES = {"linucb": LinUCB, "thompson": LinearThompson}
+
+
+def load_policy(path: str, seed=None) -> LinearBandit:
+    with np.load(path) as data:
+        cls = POLICIES[str(data["kind"])]
+        extra = {name: float(data[name]) for name in ("alpha", "scale") if name in data}
+        policy = cls([str(a) for a in data["arms"]], reg=float(data["reg"]),
+                     discount=float(data["discount"]), seed=seed, **extra)
+        policy.A, policy.b, policy.counts = data["A"], data["b"], data["counts"]
+    policy._refresh()
+    return policy
+
+
+class KeyedEpsilonGreedy:
+    """The phase4 plugin's policy: untried arms first, then epsilon-greedy on mean latency per (size band, ranks)."""
+
+    kind = "egreedy"
+
+    def __init__(self, arms, epsilon: float = 0.1, seed=None):
+        self.arms = list(arms)
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+        self.table: dict[tuple[int, int], np.ndarray] = {}  # key -> (2, arms): counts, latency sums
+
+    def _keys(self, ctx) -> list[tuple[int, int]]:
+        ctx = np.atleast_2d(ctx)
+        bands = np.searchsorted(PLUGIN_BANDS, 2 ** ctx[:, 0], side="right")
+        return list(zip(bands.tolist(), ctx[:, 1].astype(int).tolist()))
+
+    def select(self, ctx, available=None) -> np.ndarray:
+        keys = self._keys(ctx)
+        k = len(self.arms)
+        available = np.ones((len(keys), k), dtype=bool) if available is None else np.asarray(available)
+        choice = np.empty(len(keys), dtype=int)
+        for i, key in enumerate(keys):
+            counts, sums = self.table.get(key, np.zeros((2, k)))
+            ok = np.nonzero(available[i])[0]
+            untried = ok[counts[ok] == 0]
+            if len(untried):
+                choice[i] = untried[0]
+            elif self.rng.random() < self.epsilon:
+                choice[i] = self.rng.choice(ok)
+            else:
+                choice[i] = ok[np.argmin(sums[ok] / counts[ok])]
+        return choice
+
+    def update(self, ctx, arms, rewards) -> None:
+        for key, arm, r in zip(self._keys(ctx), np.asarray(arms, dtype=int), np.asarray(rewards, dtype=float)):
+            stats = self.table.setdefault(key, np.zeros((2, len(self.arms))))
+            stats[0, arm] += 1
+            stats[1, arm] += np.exp(-r)
+
+
+class FixedArm:
+    """Always the same config (e.g. AUTO); falls back to the first available arm."""
+
+    def __init__(self, arms, arm: str):
+        self.arms = list(arms)
+        self.kind = arm
+        self.index = self.arms.index(arm)
+
+    def select(self, ctx, available=None) -> np.ndarray:
+        n = len(np.atleast_2d(ctx))
+        if available is None:
+            return np.full(n, self.index)
+        return np.where(available[:, self.index], self.index, np.argmax(available, axis=1))
+
+    def update(self, ctx, arms, rewards) -> None:
+        pass
+
+
+# Offline evaluation
+
+
+@dataclass
+class ReplayTable:
+    """Measured latencies (us) per context and arm: samples[m, k, :count[m, k]], NaN-padded."""
+
+    ctx: np.ndarray          # (M, len(CTX_FIELDS))
+    arms: list[str]
+    samples: np.ndarray      # (M, K, R)
+    labels: list[str]        # (M,) "<platform> <n>gpu <condition>"
+    platforms: list[str]     # (M,)
+
+    @property
+    def count(self) -> np.ndarray:
+        return np.sum(~np.isnan(self.samples), axis=2)
+
+    @property
+    def available(self) -> np.ndarray:
+        return self.count > 0
+
+    @property
+    def mean(self) -> np.ndarray:
+        """(M, K) mean latency; inf for arms without measurements."""
+        count = self.count
+        return np.where(count > 0, np.nansum(self.samples, axis=2) / np.maximum(count, 1), np.inf)
+
+    def subset(self, rows=None, arms: list[str] | None = None) -> "ReplayTable":
+        rows = np.arange(len(self.ctx)) if rows is None else np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.nonzero(rows)[0]
+        cols = [self.arms.index(a) for a in arms] if arms else list(range(len(self.arms)))
+        return ReplayTable(self.ctx[rows], [self.arms[c] for c in cols], self.samples[rows][:, cols],
+                           [self.labels[i] for i in rows], [self.platforms[i] for i in rows])
+
+
+def _table(rows: list[tuple[list[float], str, str, dict[str, list[float]]]]) -> ReplayTable:
+    arms = sorted({a for *_, by_arm in rows for a in by_arm}, key=lambda a: (a != "auto", a))
+    depth = max((len(v) for *_, by_arm in rows for v in by_arm.values()), default=1)
+    samples = np.full((len(rows), len(arms), depth), np.nan)
+    for m, (_, _, _, by_arm) in enumerate(rows):
+        for a, vals in by_arm.items():
+            samples[m, arms.index(a), :len(vals)] = vals
+    ctx = np.array([r[0] for r in rows], dtype=float).reshape(-1, len(CTX_FIELDS))
+    return ReplayTable(ctx, arms, samples, [r[1] for r in rows], [r[2] for r in rows])
+
+
+def table_from_results(files: list[ResultFile]) -> ReplayTable:
+    """One context per (platform, GPU count, contention, size) from nccl-tests runs; arms are the configs."""
+    points: dict[tuple, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+    for f in files:
+        for r in f.results.rows:
+            if r.oop_time_us > 0:
+                points[(*f.key.group, r.size)][f.key.config].append(r.oop_time_us)
+    rows = []
+    for (platform, n_gpus, contention, size), by_arm in sorted(points.items()):
+        util = UTIL_LEVELS.get(contention, 0.5)
+        rows.append(([np.log2(max(size, 1)), n_gpus, 0.0, util, 0.0],
+                     f"{platform} {n_gpus}gpu {contention}", platform, dict(by_arm)))
+    return _table(rows)
+
+
+_PROXY_RE = re.compile(r"iteration_times_(\w+)\.txt$")
+
+
+def table_from_iterations(roots, window: int = 8) -> ReplayTable:
+    """One context per iteration of Phase 3 proxy runs (iteration_times_<cfg>.txt, ms).
+
+    Configs map to arms as the nccl-tests directories do ("simple" -> "auto/Simple").
+    The trend feature comes from the across-config mean log time of earlier iterations.
+    """
+    from .catalog import parse_config
+
+    by_dir: dict[str, dict[str, list[float]]] = defaultdict(dict)
+    for root in roots:
+        walk = [(os.path.dirname(root), [], [os.path.basename(root)])] if os.path.isfile(root) else os.walk(root)
+        for dirpath, _, filenames in walk:
+            for name in sorted(filenames):
+                m = _PROXY_RE.search(name)
+                if m:
+                    algo, proto = parse_config(m.group(1))
+                    arm = "auto" if algo == proto == "auto" else f"{algo}/{proto}"
+                    times = load_times(os.path.join(dirpath, name))
+                    if times:
+                        by_dir[dirpath][arm] = times
+    rows = []
+    for dirpath, by_arm in sorted(by_dir.items()):
+        path = dirpath.lower()
+        platform = next((p.upper() for p in ("a100", "h100", "l40s", "v100") if p in path), "unknown")
+        m = re.search(r"(\d+)gpu", path)
+        n_ranks = int(m.group(1)) if m else PROXY_RANKS
+        n = min(len(v) for v in by_arm.values())
+        mean_log = np.mean([np.log(v[:n]) for v in by_arm.values()], axis=0)
+        trend = iteration_trend(np.exp(mean_log), window)
+        for i in range(n):
+            rows.append(([np.log2(PROXY_BYTES), n_ranks, trend[i], 0.0, 0.0], f"{platform} {n_ranks}gpu proxy",
+                         platform, {a: [v[i] * 1e3] for a, v in by_arm.items()}))
+    return _table(rows)
+
+
+def merge_tables(*tables: ReplayTable) -> ReplayTable:
+    tables = [t for t in tables if len(t.ctx)]
+    if not tables:
+        return _table([])
+    rows = []
+    for t in tables:
+        for m in range(len(t.ctx)):
+            by_arm = {a: t.samples[m, k][~np.isnan(t.samples[m, k])].tolist() for k, a in enumerate(t.arms)}
+            rows.append((t.ctx[m].tolist(), t.labels[m], t.platforms[m], {a: v for a, v in by_arm.items() if v}))
+    return _table(rows)
+
+
+@dataclass
+class ReplayResult:
+    name: str
+    slowdown: np.ndarray    # (T,) mean latency of the chosen arm / best arm's - 1
+    hit: np.ndarray         # (T,) chose the best arm
+
+    @property
+    def mean_slowdown(self) -> float:
+        return float(np.mean(self.slowdown))
+
+    @property
+    def final_slowdown(self) -> float:
+        return float(np.mean(self.slowdown[-max(1, len(self.slowdown) // 4):]))
+
+    @property
+    def hit_rate(self) -> float:
+        return float(np.mean(self.hit))
+
+
+def replay(policy, table: ReplayTable, name: str, steps: int = 5000, batch: int = 16, seed: int = 0) -> ReplayResult:
+    """Feed uniformly drawn contexts to `policy` in batches, rewarding it with a measured latency of its choice.
+
+    Rewards arrive after each batch, like the plugin reading its reward log. Contexts
+    with fewer than two measured arms carry no decision and are skipped. Regret is
+    measured against the arm with the best mean latency, so replicate noise in the
+    reward does not leak into the score.
+    """
+    rng = np.random.default_rng(seed)
+    available = table.available
+    count = table.count
+    mean = table.mean
+    best = mean.min(axis=1)
+    pool = np.nonzero(available.sum(axis=1) >= 2)[0]
+    slowdown, hit = np.zeros(steps), np.zeros(steps, dtype=bool)
+    if not len(pool):
+        return ReplayResult(name, slowdown[:0], hit[:0])
+    for start in range(0, steps, batch):
+        m = rng.choice(pool, size=min(batch, steps - start))
+        choice = policy.select(table.ctx[m], available[m])
+        rep = (rng.random(len(m)) * count[m, choice]).astype(int)
+        latency = table.samples[m, choice, rep]
+        policy.update(table.ctx[m], choice, -np.log(latency))
+        chosen = mean[m, choice]
+        slowdown[start:start + len(m)] = chosen / best[m] - 1.0
+        hit[start:start + len(m)] = chosen <= best[m]
+    return ReplayResult(name, slowdown, hit)
+
+
+def print_replay(platform: str, table: ReplayTable, results: list[ReplayResult]) -> None:
+    decisions = int(np.sum(table.available.sum(axis=1) >= 2))
+    print(f"\n{platform}: {decisions} contexts, arms {', '.join(table.arms)}")
+    header = f"{'policy':<10} {'mean slowdown':>14} {'last 25%':>10} {'best arm':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.name:<10} {r.mean_slowdown:>14.2%} {r.final_slowdown:>10.2%} {r.hit_rate:>9.1%}")
+
+
+# Export
+
+
+def policy_rows(policy: LinearBandit, n_ranks: int, util: float = 0.0, overlap: bool = False,
+                trend: float = 0.0, arms: list[str] | None = None, per_octave: int = 4,
+                min_octaves: float = 1.0) -> list[tuple[int, int, str]]:
+    """Greedy arm as contiguous (min_bytes, max_bytes, arm) ranges covering 0 .. 4 GB.
+
+    The greedy arm is evaluated per_octave times per doubling. Ranges narrower than
+    min_octaves are absorbed by their wider neighbour (near-ties otherwise flip-flop
+    between arms), and boundaries sit at the geometric midpoint between grid points.
+    """
+    grid = np.arange(0.0, 32.0 + 1e-9, 1.0 / per_octave)
+    ctx = make_contexts(2 ** grid, n_ranks, trend, util, float(overlap))
+    allowed = None
+    if arms:
+        allowed = np.broadcast_to(np.isin(policy.arms, arms), (len(grid), len(policy.arms)))
+    choice = policy.greedy(ctx, allowed)
+    starts = [0] + [i for i in range(1, len(grid)) if choice[i] != choice[i - 1]]
+    runs = [[choice[a], a, b] for a, b in zip(starts, starts[1:] + [len(grid)])]
+    while len(runs) > 1:
+        widths = [b - a for _, a, b in runs]
+        i = int(np.argmin(widths))
+        if widths[i] >= min_octaves * per_octave:
+            break
+        left = widths[i - 1] if i > 0 else -1
+        right = widths[i + 1] if i + 1 < len(runs) else -1
+        j = i - 1 if left >= right else i + 1
+        runs[j][1], runs[j][2] = min(runs[i][1], runs[j][1]), max(runs[i][2], runs[j][2])
+        del runs[i]
+        # The absorbed run may have separated two runs of the same arm.
+        merged = [runs[0]]
+        for run in runs[1:]:
+            if run[0] == merged[-1][0]:
+                merged[-1][2] = run[2]
+            else:
+                merged.append(run)
+        runs = merged
+    rows = []
+    for k, (arm, a, b) in enumerate(runs):
+        lo = 0 if k == 0 else int(round(2 ** (0.5 * (grid[a - 1] + grid[a]))))
+        hi = MAX_BYTES if k == len(runs) - 1 else int(round(2 ** (0.5 * (grid[b - 1] + grid[b])))) - 1
+        rows.append((lo, hi, policy.arms[arm]))
+    return rows
+
+
+def export_policy(policy: LinearBandit, n_ranks: int, n_nodes: int = 1, coll: str = "allreduce", **kwargs) -> list[str]:
+    """Tuner CSV lines (collective_type,min_bytes,max_bytes,algorithm,protocol,channels,nNodes,nRanks,numPipeOps,regBuff).
+
+    An "auto" algorithm or protocol is written as -1, which leaves that choice to NCCL.
+    """
+    lines = []
+    for lo, hi, arm in policy_rows(policy, n_ranks, **kwargs):
+        algo, proto = split_config(arm)
+        algo = "-1" if algo == "auto" else algo.lower()
+        proto = "-1" if proto == "auto" else proto.lower()
+        lines.append(f"{coll},{lo},{hi},{algo},{proto},-1,{n_nodes},{n_ranks},-1,-1")
+    return lines
+
+
+def write_policy(path: str, lines: list[str], comment: str) -> None:
+    with open(path, "w") as f:
+        for c in comment.splitlines():
+            f.write(f"# {c}\n")
+        f.write("# Format: collective_type,min_bytes,max_bytes,algorithm,protocol,channels,nNodes,nRanks,numPipeOps,regBuff\n")
+        f.write("# -1 = use NCCL default or match any\n\n")
+        for line in lines:
+            f.write(line + "\n")
+
+
+def describe_rows(rows: list[tuple[int, int, str]]) -> str:
+    return "\n".join(f"  {format_size(lo):>10} .. {format_size(hi) if hi < MAX_BYTES else 'max':>10}  {arm}"
+                     for lo, hi, arm in rows)
@@ -0,0 +1,162 @@
+"""
+Discover nccl-tests result files across the phase directories and label each with
+the experiment it came from, using the file header (GPU model, rank count) plus
+the naming conventions of the runners:
+
+- phase1-baseline/a100-8gpu/results/{baseline_auto,ll128_forced,tree_forced,...}.out
+- phase1-baseline/nvidial40s_<n>gpu_results/{ring,tree,auto_ll128,iteration_1,...}/<timestamp>.txt
+- phase2-contention/a100-8gpu-new/results/results_8gpu_allreduce[_<algo>]_contended_<level or profile>.txt
+- phase2-contention/l40s-4gpu/contention_results/<algo>/<algo>_<level>/results_...txt
+- phase2-contention/l40s-2gpu/iteration_<n>/contention_results/results_..._contended_<level>.txt
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+
+from .contention import profile_label
+from .parsing import NcclResults, is_nccl_results, read_results
+
+ALGOS = ("ring", "tree", "collnetdirect", "collnetchain", "nvls", "nvlstree", "pat")
+PROTOS = {"ll": "LL", "ll128": "LL128", "simple": "Simple"}
+CONTENTION_LEVELS = ("low", "medium", "high")
+
+_TOKEN_RE = re.compile(r"[/\\_\-.]+")
+_ITERATION_RE = re.compile(r"iteration_(\d+)")
+
+
+@dataclass(frozen=True)
+class ResultKey:
+    """What a results file measured. algo/proto are "auto" unless forced."""
+
+    platform: str
+    n_gpus: int
+    contention: str = "none"
+    algo: str = "auto"
+    proto: str = "auto"
+
+    @property
+    def config(self) -> str:
+        """Short algo/proto label, e.g. "tree/Simple", "auto/LL128", "auto"."""
+        if self.algo == "auto" and self.proto == "auto":
+            return "auto"
+        return f"{self.algo}/{self.proto}"
+
+    @property
+    def group(self) -> tuple[str, int, str]:
+        """(platform, n_gpus, contention): configs sharing a group are directly comparable."""
+        return (self.platform, self.n_gpus, self.contention)
+
+
+@dataclass
+class ResultFile:
+    path: str
+    key: ResultKey
+    iteration: int  # repeat index from iteration_<n>/ directories, 0 if none
+    results: NcclResults
+
+
+def _platform_from_devices(devices: list[str]) -> str:
+    name = devices[0].replace("NVIDIA", "").strip()
+    return name.split("-")[0].split()[0].upper() if name else ""
+
+
+def parse_config(name: str) -> tuple[str, str]:
+    """(algo, proto) from a runner directory/config name such as "ring_ll128", "auto_simple", "tree"."""
+    tokens = _TOKEN_RE.split(name.lower())
+    algo = next((t for t in reversed(tokens) if t in ALGOS), "auto")
+    proto = next((PROTOS[t] for t in reversed(tokens) if t in PROTOS), "auto")
+    return algo, proto
+
+
+def config_dirname(key: ResultKey) -> str:
+    """Inverse of parse_config, in run_nccl_farmshare.sh's layout: "auto", "ring", "auto_ll128"."""
+    if key.proto == "auto":
+        return key.algo
+    return f"{key.algo}_{key.proto.lower()}"
+
+
+def config_env(key: ResultKey) -> dict[str, str]:
+    """NCCL_ALGO / NCCL_PROTO settings that reproduce key's forced config."""
+    env = {}
+    if key.algo != "auto":
+        env["NCCL_ALGO"] = key.algo
+    if key.proto != "auto":
+        env["NCCL_PROTO"] = key.proto.lower()
+    return env
+
+
+def describe(path: str, results: NcclResults | None = None) -> tuple[ResultKey, int]:
+    """Infer (ResultKey, iteration) for one results file from its header and path."""
+    results = results if results is not None else read_results(path)
+    meta = results.meta
+    rel = os.path.normpath(path).lower()
+    tokens = _TOKEN_RE.split(rel)
+    leaf_tokens = _TOKEN_RE.split(os.path.splitext(os.path.basename(rel))[0])
+    # Directory names like "auto_ll128_high" carry the config; keep the last few components.
+    tail = "/".join(rel.split(os.sep)[-4:])
+    tail_tokens = _TOKEN_RE.split(tail)
+
+    devices = meta.get("devices") or []
+    platform = _platform_from_devices(devices) if devices else ""
+    if not platform:
+        for tok in tokens:
+            m = re.match(r"(?:nvidia)?(a100|h100|l40s|v100)", tok)
+            if m:
+                platform = m.group(1).upper()
+                break
+    n_gpus = len(devices) or meta.get("nGpus", 0) * meta.get("nThread", 1)
+    if not n_gpus:
+        for tok in tokens:
+            m = re.match(r"(\d+)gpu", tok)
+            if m:
+                n_gpus = int(m.group(1))
+                break
+
+    algo, proto = parse_config(tail)
+
+    contention = "none"
+    if meta.get("contention_profile"):
+        # Per-GPU duty-cycle profile written by the runner: "duty100", or "duty-nnnhnnnn" if mixed.
+        contention = profile_label(meta["contention_profile"])
+    elif "contended" in leaf_tokens or "contention" in tokens:
+        contention = next((t for t in reversed(tail_tokens) if t in CONTENTION_LEVELS), "unspecified")
+
+    m = _ITERATION_RE.search(rel.replace("\\", "/"))
+    iteration = int(m.group(1)) if m else 0
+    return ResultKey(platform or "unknown", int(n_gpus), contention, algo, proto), iteration
+
+
+def _load(path: str) -> ResultFile | None:
+    if not is_nccl_results(path):
+        return None
+    results = read_results(path)
+    if not results.rows:
+        return None
+    key, iteration = describe(path, results)
+    return ResultFile(path=path, key=key, iteration=iteration, results=results)
+
+
+def discover(roots, pattern_exts=(".txt", ".out"), jobs: int = 1) -> list[ResultFile]:
+    """Walk roots and return every nccl-tests results file with its inferred key.
+
+    With jobs > 1 the files are parsed in a process pool; the order is the same.
+    """
+    paths = []
+    for root in roots:
+        paths += [root] if os.path.isfile(root) else [
+            os.path.join(dirpath, name)
+            for dirpath, dirnames, filenames in sorted(os.walk(root))
+            for name in sorted(filenames)
+            if name.endswith(pattern_exts)
+        ]
+    if jobs > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+            loaded = list(pool.map(_load, paths, chunksize=max(1, len(paths) // (4 * jobs))))
+    else:
+        loaded = [_load(path) for path in paths]
+    return [f for f in loaded if f is not None]
@@ -0,0 +1,946 @@
+"""
+`nccl-analysis` command-line entry point.
+
+Subcommands import their implementation lazily so the text-only ones
+(parse, summarize, transitions, compare, iteration-stats, interference, soak-report, trace,
+profile-summary, mem-report, gpu-samples, aggregate, tuner-abi and scaling without --plot) never load
+matplotlib or numpy and start in a fraction of a second.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+
+def _cmd_parse(args) -> int:
+    import csv
+    import json
+    from dataclasses import asdict
+
+    from .parsing import read_results
+
+    writer = None
+    for path in args.files:
+        res = read_results(path)
+        if args.meta:
+            print(json.dumps({"path": path, **res.meta}))
+            continue
+        for row in res.rows:
+            rec = {"file": path, **asdict(row)}
+            if args.json:
+                print(json.dumps(rec))
+                continue
+            if writer is None:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(rec))
+                writer.writeheader()
+            writer.writerow(rec)
+    return 0
+
+
+def _cmd_summarize(args) -> int:
+    from .parsing import parse_bw_columns
+    from .summary import print_summary
+
+    status = 0
+    for path in args.files:
+        sizes, oop_bw, ip_bw = parse_bw_columns(path)
+        print(f"\n{path}")
+        if not sizes:
+            print("Error: No data found in file")
+            status = 1
+            continue
+        print_summary(sizes, oop_bw, ip_bw)
+    return status
+
+
+def _cmd_transitions(args) -> int:
+    from .transitions import print_report, transition_data
+
+    data = transition_data(args.file)
+    if not data:
+        print("No data found in file")
+        return 1
+    print_report(data, threshold_pct=args.threshold)
+    return 0
+
+
+def _cmd_crossovers(args) -> int:
+    from .catalog import discover
+    from .crossover import find_crossovers, print_table
+
+    files = discover(args.roots)
+    if not files:
+        print("No nccl-tests results found.")
+        return 1
+    crossovers, fits = find_crossovers(files, z=args.z, max_segments=args.max_segments,
+                                       include_insignificant=args.all)
+    if args.csv:
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["platform", "n_gpus", "contention", "faster_below", "faster_above",
+                         "crossover_bytes", "low_bytes", "high_bytes", "significant"])
+        for c in crossovers:
+            writer.writerow([*c.group, c.faster_below, c.faster_above,
+                             round(c.size), round(c.lo), round(c.hi), c.significant])
+        return 0
+    print_table(crossovers, fits if args.verbose else None)
+    return 0
+
+
+def _cmd_refine_plan(args) -> int:
+    from .catalog import config_dirname, discover
+    from .refine import find_intervals, median_curves, plan_probes, print_intervals
+
+    files = discover(args.roots)
+    if not files:
+        print("No nccl-tests results found.")
+        return 1
+    intervals = find_intervals(median_curves(files), min_gap=args.min_gap)
+    print_intervals(intervals, args.resolution)
+    probes = plan_probes(intervals, resolution=args.resolution, points=args.points)
+    print(f"\nNext round: {len(probes)} runs")
+    for probe in probes:
+        env = " ".join(f"{k}={v}" for k, v in probe.env.items())
+        platform, n_gpus, contention = probe.key.group
+        print(f"  [{platform} {n_gpus}gpu {contention} -> {config_dirname(probe.key)}] "
+              f"{env + ' ' if env else ''}all_reduce_perf {' '.join(probe.args())} -g {n_gpus}")
+    return 0
+
+
+def _cmd_fit_model(args) -> int:
+    from .catalog import discover
+    from .model import candidates, fit_models, load_models, predict_matrix, print_table, save_models
+    from .parsing import format_size
+
+    if args.load:
+        models = load_models(args.load)
+    else:
+        files = discover(args.roots)
+        if not files:
+            print("No nccl-tests results found.")
+            return 1
+        models = fit_models(files, min_size=args.min_size, max_size=args.max_size)
+    if args.platform:
+        models = [m for m in models if m.platform == args.platform.upper()]
+    print_table(models)
+    if args.save:
+        save_models(models, args.save)
+        print(f"\nSaved {len(models)} models to {args.save}")
+    if args.predict:
+        by_group: dict = {}
+        for m in models:
+            by_group.setdefault((m.platform, m.contention), []).append(m)
+        for (platform, contention), group in sorted(by_group.items()):
+            skipped = sorted({m.config for m in group if not m.predicts(args.ranks)} -
+                             {m.config for m in group if m.predicts(args.ranks)})
+            group = [m for m in group if m.predicts(args.ranks)]
+            if skipped:
+                print(f"\n{platform} x{args.ranks}, contention={contention}: no prediction for "
+                      f"{', '.join(skipped)} (no rank model, not measured at {args.ranks} ranks)")
+            if not group:
+                continue
+            pred = predict_matrix(group, args.predict, args.ranks)
+            keep = candidates(group, args.predict, args.ranks, margin=args.margin)
+            print(f"\nPredicted time (us), {platform} x{args.ranks}, contention={contention} "
+                  f"(* = within {args.margin:.0%} of best)")
+            print(f"{'config':<14}" + "".join(f"{format_size(s):>12}" for s in args.predict))
+            for i, m in enumerate(group):
+                print(f"{m.config:<14}" + "".join(
+                    f"{pred[i, j]:>11.1f}{'*' if keep[i, j] else ' '}" for j in range(len(args.predict))))
+    return 0
+
+
+def _cmd_simulate(args) -> int:
+    import time
+
+    from .catalog import discover
+    from .simulator import CostParams, System, calibrate, load_system, print_best, simulate, size_grid
+
+    shapes = [tuple(int(v) for v in shape.lower().split("x")) for shape in args.shape]
+    g0, n0 = shapes[0]
+    nic_bw = args.nic_gbps / 8 if args.nic_gbps else None
+    if args.topo:
+        base = load_system(args.topo, args.graph, gpus_per_node=g0, nodes=n0, nic_bw=nic_bw, name=args.name)
+    else:
+        base = System(args.name or "system", g0, n0, intra_bw=args.intra_bw, nic_bw=nic_bw or 12.5,
+                      nchannels=args.channels, channel_bw=args.channel_bw, intra_link=args.intra_link)
+
+    params = CostParams.from_json(args.params) if args.params else CostParams()
+    if args.calibrate:
+        files = [f for f in discover(args.calibrate)
+                 if f.key.n_gpus == base.n_ranks and f.key.contention == "none"]
+        if not files:
+            print(f"No uncontended {base.n_ranks}-GPU results to calibrate against.")
+            return 1
+        params, report = calibrate(base, files, params)
+        print(f"Calibrated on {len(files)} files, {report.get('points', 0)} points"
+              + (f", rms relative error {report['rms_rel_err']:.2f}" if "rms_rel_err" in report else ""))
+        for proto, err in report.get("per_proto_rms_rel_err", {}).items():
+            print(f"  {proto:<7} {report['per_proto_points'][proto]:>4} points  rms rel err {err:.2f}  "
+                  f"efficiency {params.efficiency[proto]:.3f}  base {params.base_us[proto]:.1f} us")
+    if args.save_params:
+        params.to_json(args.save_params)
+        print(f"Saved cost parameters to {args.save_params}")
+
+    systems = [base.scaled(gpus_per_node=g, nodes=n) for g, n in shapes]
+    sizes = args.sizes or size_grid(8, 128 << 20)
+    start = time.perf_counter()
+    times = simulate(systems, sizes, params)
+    elapsed = time.perf_counter() - start
+    print_best(systems, sizes, times)
+    print(f"\nEvaluated {times.size} (system, algo, proto, size) points in {elapsed * 1e3:.2f} ms")
+    return 0
+
+
+def _cmd_topo(args) -> int:
+    from .topo_index import TopoIndex
+
+    index = TopoIndex.load(args.file) if args.file.endswith(".bin") else TopoIndex.from_xml(args.file)
+    if args.fingerprint:
+        print(index.fingerprint)
+        return 0
+    if args.pair:
+        i, j = args.pair
+        print(f"GPU {i} <-> GPU {j}: {index.path_type(i, j)}, {index.bandwidth(i, j):.1f} GB/s, {index.hop_count(i, j)} hops")
+    else:
+        index.print_summary()
+    if args.save:
+        index.save(args.save)
+        print(f"Saved index to {args.save}")
+    return 0
+
+
+def _cmd_bandit_eval(args) -> int:
+    import numpy as np
+
+    from .bandit import (POLICIES, FixedArm, KeyedEpsilonGreedy, describe_rows, export_policy, merge_tables,
+                         policy_rows, print_replay, replay, table_from_iterations, table_from_results,
+                         write_policy)
+    from .catalog import discover
+
+    table = merge_tables(table_from_results(discover(args.roots)), table_from_iterations(args.roots))
+    if not len(table.ctx):
+        print("No nccl-tests or iteration-proxy results found.")
+        return 1
+    if args.arms:
+        table = table.subset(arms=[a for a in args.arms if a in table.arms])
+    platforms = sorted(set(table.platforms))
+    if args.platform:
+        platforms = [p for p in platforms if p == args.platform.upper()]
+    for flag, value in (("--export", args.export), ("--save-state", args.save_state)):
+        if value and len(platforms) != 1:
+            print(f"{flag} needs a single platform (found {', '.join(platforms) or 'none'}); use --platform.")
+            return 1
+
+    trained = None
+    for platform in platforms:
+        sub = table.subset(np.array(table.platforms) == platform)
+        results = []
+        for name in args.policies:
+            if name == "linucb":
+                policy = POLICIES[name](sub.arms, alpha=args.alpha, discount=args.discount, seed=args.seed)
+            elif name == "thompson":
+                policy = POLICIES[name](sub.arms, scale=args.scale, discount=args.discount, seed=args.seed)
+            elif name == "egreedy":
+                policy = KeyedEpsilonGreedy(sub.arms, epsilon=args.epsilon, seed=args.seed)
+            elif name in sub.arms:
+                policy = FixedArm(sub.arms, name)
+            else:
+                continue
+            results.append(replay(policy, sub, name, steps=args.steps, batch=args.batch, seed=args.seed))
+            if trained is None and name in POLICIES:
+                trained = policy
+        print_replay(platform, sub, results)
+
+    if trained is not None and args.save_state:
+        trained.save(args.save_state)
+        print(f"\nSaved {trained.kind} state to {args.save_state}")
+    if args.export:
+        if trained is None:
+            print("--export needs a linucb or thompson policy in --policies.")
+            return 1
+        kwargs = dict(util=args.util, overlap=args.overlap, arms=args.export_arms)
+        print(f"\nGreedy {trained.kind} policy for {args.export_ranks} ranks, util={args.util}, overlap={args.overlap}:")
+        print(describe_rows(policy_rows(trained, args.export_ranks, **kwargs)))
+        lines = export_policy(trained, args.export_ranks, n_nodes=args.export_nodes, **kwargs)
+        write_policy(args.export, lines, f"{trained.kind} policy trained offline on {platforms[0]} results\n"
+                     f"(nccl-analysis bandit-eval; util={args.util}, overlap={int(args.overlap)})")
+        print(f"Wrote {len(lines)} rules to {args.export}")
+    return 0
+
+
+def _cmd_tuner_abi(args) -> int:
+    import json
+    from dataclasses import asdict
+    from pathlib import Path
+
+    from .tuner_abi import DEFAULT_CACHE_DIR, check, fingerprint, load_cached, parse_header, print_abi
+
+    cache_dir = Path(args.cache_dir) if args.cache_dir else DEFAULT_CACHE_DIR
+    runtime = None if args.cached else fingerprint(cache_dir, refresh=args.refresh)
+    if runtime is None:
+        # No NCCL here (e.g. a laptop): fall back to a fingerprint cached from the GPU image.
+        runtime = load_cached(cache_dir, args.nccl_version)
+    if runtime is None:
+        print(f"No NCCL library found and no cached fingerprint in {cache_dir}.", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(asdict(runtime), indent=1))
+    else:
+        print_abi(runtime)
+    if not args.check:
+        return 0
+    plugin = parse_header(Path(args.check).read_text(errors="replace"), args.check)
+    problems = check(plugin, runtime)
+    if problems:
+        print(f"\nTuner ABI mismatch between {args.check} and NCCL {runtime.nccl_version or '(unknown version)'}:",
+              file=sys.stderr)
+        for problem in problems:
+            print(f"  - {problem}", file=sys.stderr)
+        return 1
+    print(f"\n{args.check}: {plugin.plugin_symbol} is compatible")
+    return 0
+
+
+def _cmd_tuner_snapshot(args) -> int:
+    from .tuner_state import HEADER, merge_snapshots, print_snapshot, read_rewards, read_snapshot, write_snapshot
+
+    arm = tuple(args.arm.lower().split("/")) if args.arm else None
+    snaps = []
+    for path in args.inputs:
+        with open(path) as f:
+            first = f.readline()
+        if first.startswith(HEADER):
+            snaps.append(read_snapshot(path))
+            continue
+        snap, skipped = read_rewards(path, arm)
+        if skipped:
+            print(f"{path}: skipped {skipped} rewards without an arm (use --arm for forced-config logs)")
+        snaps.append(snap)
+    merged = merge_snapshots(snaps, halflife_s=args.halflife, min_count=args.min_count)
+    print_snapshot(merged)
+    if args.out:
+        write_snapshot(merged, args.out)
+        lines = sum(len(arms) for arms in merged.values())
+        print(f"\nWrote {lines} arm records for {len(merged)} keys to {args.out}")
+    return 0
+
+
+def _cmd_compare(args) -> int:
+    from .compare import bw_by_size, print_comparison
+
+    print_comparison(bw_by_size(args.auto), bw_by_size(args.ll128), bw_by_size(args.simple))
+    return 0
+
+
+def _cmd_plot(args) -> int:
+    if args.multi:
+        from .plotting import find_txt_files, plot_multi_aggregates, plot_multi_bandwidth, plot_multi_latency
+
+        folder_files = find_txt_files(args.roots)
+        if not folder_files:
+            print("No .txt files found in provided folders.")
+            return 1
+        output_dir = args.output_dir or "multi_graphs"
+        if args.aggregate:
+            plot_multi_aggregates(folder_files, output_dir, args.arch, band=args.band)
+        else:
+            plot_multi_bandwidth(folder_files, output_dir, args.arch)
+            plot_multi_latency(folder_files, output_dir, args.arch)
+        return 0
+
+    from . import render
+    return render.run(args)
+
+
+def _cmd_iteration_stats(args) -> int:
+    from .iteration import load_summaries, print_table
+
+    print(f"Reading iteration times from {args.results_dir}")
+    summaries = load_summaries(args.results_dir, args.configs)
+    if not summaries:
+        print("No iteration-time files found; run run_modal.py first.")
+        return 1
+    print_table(summaries, args.configs)
+    return 0
+
+
+def _cmd_interference(args) -> int:
+    from .interference import load_results, print_table
+
+    results = load_results(args.inputs)
+    if not results:
+        print("No interference_*.json results found; run iteration_proxy.py --interference first.")
+        return 1
+    if args.csv:
+        import csv
+        rows = [r.row() for r in results]
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return 0
+    print_table(results)
+    return 0
+
+
+def _cmd_eval_report(args) -> int:
+    from .evaluation import RunLog, print_report, report_rows
+
+    records = [r for path in args.logs for r in RunLog(path).records]
+    rows = report_rows(records, level=args.level)
+    if not rows:
+        print("No successful runs found; run phase5-evaluation/evaluate.py first.")
+        return 1
+    if args.csv:
+        import csv
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return 0
+    print_report(rows, level=args.level)
+    return 0
+
+
+def _cmd_soak_report(args) -> int:
+    import json
+    from pathlib import Path
+
+    from .parsing import load_times
+    from .soak import SoakMonitor, from_times, print_summary
+    from .trace import TraceReader, is_trace
+
+    path = Path(args.input)
+    if path.suffix == ".json":
+        summary = json.loads(path.read_text())
+    elif is_trace(path):
+        # Traces carry real timestamps, so time-based stall periods come out right.
+        monitor = SoakMonitor(window=args.window, warmup=args.warmup)
+        with TraceReader(path) as reader:
+            rank = None
+            for r in reader.records():
+                rank = r.rank if rank is None else rank
+                if r.rank == rank:
+                    monitor.add(r.iter_ms, r.t_s)
+        if not monitor.iterations:
+            print(f"No records in {path}.")
+            return 1
+        summary = monitor.summary()
+    else:
+        # A plain iteration_times file: replay it through the same detectors.
+        times = load_times(path)
+        if not times:
+            print(f"No iteration times in {path}.")
+            return 1
+        summary = from_times(times, window=args.window, warmup=args.warmup).summary()
+    if args.json:
+        print(json.dumps(summary, indent=1))
+        return 0
+    print_summary(summary, max_windows=args.max_windows)
+    return 0
+
+
+def _cmd_trace(args) -> int:
+    import csv
+
+    from .iteration import summarize
+    from .trace import FIELDS, TraceReader, watch
+
+    if args.follow:
+        from .soak import SoakMonitor, print_summary
+
+        monitor = watch(args.input, SoakMonitor(window=args.window), on_update=lambda m: print(m.status(), flush=True),
+                        every_s=args.interval, idle_s=args.idle)
+        print_summary(monitor.summary(), max_windows=0)
+        return 0 if monitor.iterations else 1
+
+    with TraceReader(args.input) as reader:
+        if args.csv:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(FIELDS)
+            writer.writerows(reader.records())
+            return 0
+        meta = {k: v for k, v in reader.meta.items() if k not in ("fields", "record")}
+        for key in sorted(meta):
+            print(f"{key}: {meta[key]}")
+        by_rank: dict[int, list] = {}
+        for r in reader.records():
+            by_rank.setdefault(r.rank, []).append(r)
+    if not by_rank:
+        print("No records yet.")
+        return 1
+    print(f"\n{'rank':>4} {'phase':<8} {'n':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}")
+    for rank in sorted(by_rank):
+        for phase in ("iter_ms", "compute_ms", "comm_ms"):
+            st = summarize([getattr(r, phase) for r in by_rank[rank]])
+            print(f"{rank:>4} {phase[:-3]:<8} {int(st['n']):>7} {st['mean']:>8.3f} {st['p50']:>8.3f} "
+                  f"{st['p95']:>8.3f} {st['max']:>8.3f}")
+    return 0
+
+
+def _cmd_profile_summary(args) -> int:
+    from .profiling import kernel_table, load_breakdowns, print_breakdowns
+
+    steps = load_breakdowns(args.inputs)
+    if not steps:
+        print("No trace_*.json found; run iteration_proxy.py with --profile-dir first.")
+        return 1
+    if args.csv:
+        import csv
+        rows = kernel_table(steps) if args.kernels else [s.row() for s in steps]
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return 0
+    print_breakdowns(steps, top=args.top)
+    return 0
+
+
+def _cmd_mem_report(args) -> int:
+    from .memory import load_reports, print_reports
+
+    reports = load_reports(args.inputs, skip_frac=args.skip_frac, segments=args.segments,
+                           min_growth_mb=args.min_growth_mb)
+    if not reports:
+        print("No memory CSVs found; run iteration_proxy.py with --mem-out first.")
+        return 2
+    print_reports(reports)
+    leaking = [f"{r.label}: {', '.join(r.leaks)}" for r in reports if r.leaks]
+    print("\nLeak check: " + ("; ".join(leaking) if leaking else "no monotonic growth"))
+    return 1 if leaking and args.fail_on_leak else 0
+
+
+def _cmd_gpu_samples(args) -> int:
+    from .gpu_sampler import attribute, load_samples, print_attribution, print_sample_summary
+
+    samples = load_samples(args.input)
+    if args.gpu is not None:
+        samples = [s for s in samples if s.gpu == args.gpu]
+    if not samples:
+        print(f"No samples in {args.input}.")
+        return 1
+    if not args.trace:
+        print_sample_summary(samples)
+        return 0
+
+    from .trace import TraceReader
+
+    with TraceReader(args.trace) as reader:
+        records = list(reader.records())
+    rank = args.rank if args.rank is not None else (records[0].rank if records else 0)
+    stats = attribute(samples, [r for r in records if r.rank == rank])
+    if args.csv:
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["iteration", "compute_samples", "comm_samples",
+                         *(f"compute_{m}" for m in stats[0].compute), *(f"comm_{m}" for m in stats[0].comm)]
+                        if stats else ["iteration"])
+        for st in stats:
+            writer.writerow([st.iteration, st.compute_n, st.comm_n, *st.compute.values(), *st.comm.values()])
+        return 0
+    print_sample_summary(samples)
+    print(f"\nPer-phase means over {len(stats)} iterations of rank {rank} from {args.trace}:")
+    print_attribution(stats)
+    return 0
+
+
+def _cmd_aggregate(args) -> int:
+    from .aggregate import aggregate, print_aggregates
+    from .catalog import discover
+
+    files = discover(args.roots)
+    if args.contention:
+        files = [f for f in files if f.key.contention == args.contention]
+    if not files:
+        print("No nccl-tests results found.")
+        return 1
+    aggs = aggregate(files, args.column, k=args.reject)
+    if args.csv:
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["platform", "n_gpus", "contention", "config", "size_bytes", "runs", "mean", "median",
+                         "stdev", "min", "max", "rejected_runs"])
+        for key, agg in aggs.items():
+            for s in agg.stats:
+                writer.writerow([*key.group, key.config, s.size, s.n, s.mean, s.median, s.stdev, s.min, s.max,
+                                 len(agg.rejected)])
+    else:
+        print_aggregates(aggs.values())
+    if args.plot:
+        from .plotting import plot_aggregates
+
+        groups: dict[str, list] = {}
+        for key, agg in aggs.items():
+            platform, n_gpus, contention = key.group
+            groups.setdefault(f"{platform} {n_gpus}gpu {contention}", []).append(agg)
+        plot_aggregates(groups, args.plot, band=args.band)
+        print(f"Wrote {args.plot}", file=sys.stderr if args.csv else sys.stdout)
+    return 0
+
+
+def _cmd_slowdown(args) -> int:
+    from .catalog import discover
+    from .slowdown import missing_baselines, plot_heatmaps, print_summary, slowdown_matrix
+
+    files = discover(args.roots, jobs=args.jobs)
+    m = slowdown_matrix(files)
+    if not m.platforms:
+        print("No contended results with a matching uncontended baseline found"
+              + ("; pass the Phase 1 trees as roots too." if missing_baselines(files) else "."))
+        return 1
+    if args.csv:
+        import csv
+        writer = csv.DictWriter(sys.stdout, fieldnames=["platform", "config", "contention", "size_bytes",
+                                                        "baseline_us", "slowdown"])
+        writer.writeheader()
+        writer.writerows(m.rows())
+    else:
+        print(f"{len(files)} results files: {len(m.platforms)} platforms x {len(m.configs)} configs x "
+              f"{len(m.levels)} contention levels x {len(m.sizes)} sizes")
+        print_summary(m)
+        missing = missing_baselines(files)
+        if missing:
+            print("\nNo uncontended baseline for: " + ", ".join(
+                f"{k.platform} {k.n_gpus}gpu {k.config} {k.contention}" for k in missing))
+    log = sys.stderr if args.csv else sys.stdout
+    if args.save:
+        m.save(args.save)
+        print(f"Wrote {args.save}", file=log)
+    if args.plot:
+        plot_heatmaps(m, args.plot)
+        print(f"Wrote {args.plot}", file=log)
+    return 0
+
+
+# gpu_util.METRICS, repeated so the parser does not import numpy.
+_GPU_UTIL_PANELS = ("sm_util", "mem_util", "memory_used_mib", "power_w", "sm_clock_mhz", "mem_clock_mhz")
+
+
+def _gpu_util_panels(value: str) -> list[str]:
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [n for n in names if n not in _GPU_UTIL_PANELS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"unknown panel {', '.join(unknown) or repr(value)} "
+                                         f"(choose from {', '.join(_GPU_UTIL_PANELS)})")
+    return names
+
+
+def _cmd_gpu_util(args) -> int:
+    from pathlib import Path
+
+    from .gpu_util import load_log, plot_log, print_logs
+
+    paths = []
+    for item in args.inputs:
+        p = Path(item)
+        paths += sorted(p.glob("*.csv")) if p.is_dir() else [p]
+    logs = [log for log in (load_log(p, cache=not args.no_cache) for p in paths) if len(log.t_s)]
+    if not logs:
+        print("No utilization samples found.")
+        return 1
+    print_logs(logs)
+    if args.plot:
+        for log in logs:
+            out = Path(args.plot)
+            if len(logs) > 1:
+                out = out.with_name(f"{out.stem}_{Path(log.path).stem}{out.suffix}")
+            plot_log(log, out, metrics=args.metrics, points=args.points, method=args.method)
+            print(f"Wrote {out}")
+    return 0
+
+
+def _cmd_scaling(args) -> int:
+    from .scaling import load_runs, plot_curves, print_curves
+
+    runs = load_runs(args.inputs)
+    if not runs:
+        print("No scaling_*.json results found; run iteration_proxy.py --scaling first.")
+        return 1
+    if args.csv:
+        import csv
+        rows = [row for run in runs for row in run.rows()]
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        print_curves(runs)
+    if args.plot:
+        plot_curves(runs, args.plot)
+        print(f"Wrote {args.plot}", file=sys.stderr if args.csv else sys.stdout)
+    return 0
+
+
+def _cmd_iteration_compare(args) -> int:
+    from .regression import gate, load_comparisons, print_comparisons
+
+    try:
+        comparisons = load_comparisons(args.baseline, args.candidates, skip=args.skip, metrics=args.metrics,
+                                       level=args.level, n_boot=args.boot, n_perm=args.boot, seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    if not comparisons:
+        print("Nothing to compare: no matching iteration-time files.")
+        return 2
+    regressed = gate(comparisons, [m for m in args.gate if m in args.metrics], args.threshold, args.alpha)
+    if args.json:
+        import json
+        from dataclasses import asdict
+        print(json.dumps({"regressed": regressed, "comparisons": [asdict(c) for c in comparisons]}, indent=1))
+    else:
+        print_comparisons(comparisons, args.threshold, args.alpha, args.level)
+        failed = [c.label for c in comparisons if c.regressed]
+        print(f"\nGate ({', '.join(args.gate)}; > {args.threshold * 100:.1f}% slower at Holm-adjusted p < {args.alpha}): "
+              + (f"FAIL ({', '.join(failed)})" if failed else "pass"))
+    return 1 if regressed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nccl-analysis", description="Analysis tools for the NCCL tuning experiments.")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+    sub.required = True
+
+    p = sub.add_parser("parse", help="Dump nccl-tests rows as CSV/JSON")
+    p.add_argument("files", nargs="+", help="nccl-tests output files")
+    p.add_argument("--json", action="store_true", help="One JSON object per row instead of CSV")
+    p.add_argument("--meta", action="store_true", help="Print header metadata (GPUs, NCCL version, sweep) only")
+    p.set_defaults(func=_cmd_parse)
+
+    p = sub.add_parser("summarize", help="Peak / small / large message bandwidth summary")
+    p.add_argument("files", nargs="+", help="nccl-tests output files")
+    p.set_defaults(func=_cmd_summarize)
+
+    p = sub.add_parser("transitions", help="Adjacent-size bandwidth jumps and performance regions")
+    p.add_argument("file", help="nccl-tests output file")
+    p.add_argument("--threshold", type=float, default=20, help="Percent change flagged as a transition (default: 20)")
+    p.set_defaults(func=_cmd_transitions)
+
+    p = sub.add_parser("crossovers", help="Piecewise-fit crossover sizes between forced algo/proto runs (needs numpy)")
+    p.add_argument("roots", nargs="+", help="Results files or directories to search")
+    p.add_argument("--z", type=float, default=1.96, help="Width of the uncertainty band in standard errors (default: 1.96)")
+    p.add_argument("--max-segments", type=int, default=4, help="Maximum piecewise segments per curve (default: 4)")
+    p.add_argument("--all", action="store_true", help="Also list crossings that stay within noise")
+    p.add_argument("--csv", action="store_true", help="CSV output with sizes in bytes")
+    p.add_argument("-v", "--verbose", action="store_true", help="Also print each fitted curve's change points")
+    p.set_defaults(func=_cmd_crossovers)
+
+    p = sub.add_parser("refine-plan", help="Crossover/change-point intervals and the next -b/-e/-i runs to narrow them")
+    p.add_argument("roots", nargs="+", help="Results files or directories to search")
+    p.add_argument("--resolution", type=float, default=0.05, help="Target interval width as a fraction of its size (default: 0.05)")
+    p.add_argument("--points", type=int, default=3, help="Sizes per refinement run (default: 3)")
+    p.add_argument("--min-gap", type=float, default=0.03, help="Ignore crossings smaller than this log-latency gap (default: 0.03)")
+    p.set_defaults(func=_cmd_refine_plan)
+
+    from .parsing import parse_size
+    p = sub.add_parser("fit-model", help="Alpha-beta latency models per platform/contention/algo/proto (needs numpy)")
+    p.add_argument("roots", nargs="*", help="Results files or directories to fit")
+    p.add_argument("--min-size", type=parse_size, default=0, help="Ignore smaller messages (e.g. 1K)")
+    p.add_argument("--max-size", type=parse_size, default=1 << 62, help="Ignore larger messages (e.g. 128M)")
+    p.add_argument("--platform", help="Only models for this platform (e.g. L40S)")
+    p.add_argument("--save", help="Write fitted models to this JSON file")
+    p.add_argument("--load", help="Use models from a JSON file instead of fitting")
+    p.add_argument("--predict", nargs="+", type=parse_size, help="Sizes to predict (e.g. 64K 4M 128M)")
+    p.add_argument("--ranks", type=int, default=8, help="Rank count for --predict (default: 8)")
+    p.add_argument("--margin", type=float, default=0.25, help="Mark configs within this fraction of the best (default: 0.25)")
+    p.set_defaults(func=_cmd_fit_model)
+
+    p = sub.add_parser("simulate", help="Ring/tree/split-tree x LL/LL128/Simple cost model from topology dumps (needs numpy)")
+    p.add_argument("--topo", help="NCCL topology dump (nccl_topo.xml)")
+    p.add_argument("--graph", help="NCCL graph dump (nccl_graph.xml)")
+    p.add_argument("--shape", nargs="+", default=["8x1"], help="GPUs-per-node x nodes to simulate (default: 8x1)")
+    p.add_argument("--nic-gbps", type=float, help="Override NIC speed in Gb/s (e.g. 200 for HDR InfiniBand)")
+    p.add_argument("--name", help="Label for the system")
+    p.add_argument("--intra-bw", type=float, default=24.0, help="Without --topo: per-GPU intra-node GB/s (default: 24, PCIe Gen4 x16)")
+    p.add_argument("--intra-link", default="PCI", choices=["PCI", "NVL"], help="Without --topo: intra-node link type")
+    p.add_argument("--channels", type=int, default=4, help="Without --topo: NCCL channels (default: 4)")
+    p.add_argument("--channel-bw", type=float, default=24.0, help="Without --topo: per-channel GB/s cap (default: 24)")
+    p.add_argument("--calibrate", nargs="+", metavar="ROOT", help="Fit per-protocol costs to results measured on the first --shape")
+    p.add_argument("--params", help="Load cost parameters from JSON")
+    p.add_argument("--save-params", help="Write (calibrated) cost parameters to JSON")
+    p.add_argument("--sizes", nargs="+", type=parse_size, help="Message sizes (default: 8 .. 128M, factor 2)")
+    p.set_defaults(func=_cmd_simulate)
+
+    p = sub.add_parser("topo", help="Topology index: path types, bottleneck bandwidth, hops, fingerprint (needs numpy)")
+    p.add_argument("file", help="NCCL topology dump (.xml) or saved index (.bin)")
+    p.add_argument("--save", help="Write the binary index here")
+    p.add_argument("--pair", nargs=2, type=int, metavar=("I", "J"), help="Query one GPU pair (positions ordered by CUDA device)")
+    p.add_argument("--fingerprint", action="store_true", help="Print only the topology fingerprint")
+    p.set_defaults(func=_cmd_topo)
+
+    p = sub.add_parser("bandit-eval", help="Offline replay of contextual bandit tuner policies; export as tuner CSV (needs numpy)")
+    p.add_argument("roots", nargs="+", help="nccl-tests results and/or Phase 3 results directories")
+    p.add_argument("--policies", nargs="+", default=["linucb", "thompson", "egreedy", "auto"],
+                   help="linucb, thompson, egreedy (the phase4 plugin) and/or fixed configs such as auto")
+    p.add_argument("--arms", nargs="+", help="Restrict the arms (configs) the policies may choose")
+    p.add_argument("--platform", help="Only evaluate this platform (e.g. L40S)")
+    p.add_argument("--steps", type=int, default=5000, help="Decisions per replay (default: 5000)")
+    p.add_argument("--batch", type=int, default=16, help="Decisions between reward ingestions (default: 16)")
+    p.add_argument("--alpha", type=float, default=0.5, help="LinUCB confidence width (default: 0.5)")
+    p.add_argument("--scale", type=float, default=0.2, help="Thompson posterior scale (default: 0.2)")
+    p.add_argument("--epsilon", type=float, default=0.1, help="egreedy exploration rate (default: 0.1, as NCCL_TUNER_EPS)")
+    p.add_argument("--discount", type=float, default=1.0, help="Per-reward forgetting factor for linucb/thompson (default: 1, none)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--save-state", help="Save the first contextual policy's state (.npz)")
+    p.add_argument("--export", help="Write the first contextual policy's greedy choices as a tuner CSV")
+    p.add_argument("--export-ranks", type=int, default=8, help="nRanks for --export (default: 8)")
+    p.add_argument("--export-nodes", type=int, default=1, help="nNodes for --export (default: 1)")
+    p.add_argument("--export-arms", nargs="+", help="Only export these arms (e.g. drop auto)")
+    p.add_argument("--util", type=float, default=0.0, help="GPU utilization context for --export, 0..1 (default: 0)")
+    p.add_argument("--overlap", action="store_true", help="Export the policy for overlapped compute/communication")
+    p.set_defaults(func=_cmd_bandit_eval)
+
+    p = sub.add_parser("tuner-abi", help="NCCL tuner plugin ABI fingerprint (cached per NCCL version), optionally checked against a tuner.h")
+    p.add_argument("--check", metavar="TUNER_H", help="Exit 1 with the mismatches if this plugin header does not fit")
+    p.add_argument("--cache-dir",
+                   help="Fingerprint cache (default: $NCCL_ABI_CACHE or ~/.cache/nccl-analysis/tuner_abi)")
+    p.add_argument("--cached", action="store_true", help="Only read the cache, even if NCCL is installed here")
+    p.add_argument("--nccl-version", default="", help="Cached fingerprint to use (default: the newest)")
+    p.add_argument("--refresh", action="store_true", help="Fingerprint the installed NCCL again")
+    p.add_argument("--json", action="store_true", help="Print the fingerprint as JSON")
+    p.set_defaults(func=_cmd_tuner_abi)
+
+    p = sub.add_parser("tuner-snapshot", help="Compact RL tuner reward logs / snapshots into one warm-start snapshot (needs numpy)")
+    p.add_argument("inputs", nargs="+", help="Reward logs and/or existing snapshots")
+    p.add_argument("--out", help="Write the merged snapshot here (NCCL_TUNER_SNAPSHOT_FILE)")
+    p.add_argument("--arm", help="algo/proto for reward lines that do not name one, e.g. tree/simple")
+    p.add_argument("--halflife", type=float, default=7 * 24 * 3600.0,
+                   help="Seconds after which an input's counts are halved; 0 disables decay (default: 7 days)")
+    p.add_argument("--min-count", type=float, default=0.0, help="Drop arms whose decayed count falls below this")
+    p.set_defaults(func=_cmd_tuner_snapshot)
+
+    p = sub.add_parser("compare", help="AUTO vs forced LL128 vs forced Simple bandwidth table")
+    p.add_argument("--auto", default="baseline_auto.out", help="AUTO run (default: baseline_auto.out)")
+    p.add_argument("--ll128", default="ll128_forced.out", help="NCCL_PROTO=LL128 run (default: ll128_forced.out)")
+    p.add_argument("--simple", default="simple_forced.out", help="NCCL_PROTO=Simple run (default: simple_forced.out)")
+    p.set_defaults(func=_cmd_compare)
+
+    from .render import add_arguments as add_render_arguments
+    p = sub.add_parser("plot", help="Batch/incremental bandwidth + latency figures (or --multi folder comparison)")
+    add_render_arguments(p)
+    p.add_argument("--multi", action="store_true", help="One bandwidth and one latency plot comparing the given folders")
+    p.set_defaults(func=_cmd_plot)
+
+    p = sub.add_parser("iteration-stats", help="Phase 3 iteration-time summary per NCCL config")
+    p.add_argument("--results-dir", default="results", help="Directory with iteration_times_<config>.txt (default: results)")
+    p.add_argument("--configs", nargs="+", default=["auto", "simple", "ll128"], help="Configs to report")
+    p.set_defaults(func=_cmd_iteration_stats)
+
+    metrics = ["mean", "p50", "p90", "p95"]
+    p = sub.add_parser("iteration-compare",
+                       help="Bootstrap CIs and permutation tests of iteration times vs a baseline; exit 1 on regression")
+    p.add_argument("baseline", help="Baseline iteration_times file, or a results directory")
+    p.add_argument("candidates", nargs="+", help="Candidate files, or directories (matched to the baseline by config)")
+    p.add_argument("--skip", type=int, default=0, help="Drop the first N iterations of every run (warm-up)")
+    p.add_argument("--metrics", nargs="+", choices=metrics, default=metrics, help="Metrics to report (default: all)")
+    p.add_argument("--gate", nargs="+", choices=metrics, default=["mean", "p95"], help="Metrics that can fail the gate (default: mean p95)")
+    p.add_argument("--threshold", type=float, default=0.03, help="Relative slowdown that counts as a regression (default: 0.03)")
+    p.add_argument("--alpha", type=float, default=0.05, help="Significance level after Holm adjustment (default: 0.05)")
+    p.add_argument("--level", type=float, default=0.95, help="Confidence level of the intervals (default: 0.95)")
+    p.add_argument("--boot", type=int, default=5000, help="Bootstrap resamples and permutations (default: 5000)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", action="store_true", help="Machine-readable output")
+    p.set_defaults(func=_cmd_iteration_compare)
+
+    p = sub.add_parser("interference", help="Compute slowdown from concurrent all-reduces per algo/proto")
+    p.add_argument("inputs", nargs="+", help="interference_*.json files or directories containing them")
+    p.add_argument("--csv", action="store_true", help="CSV instead of a table")
+    p.set_defaults(func=_cmd_interference)
+
+    p = sub.add_parser("soak-report", help="Drift, distribution shifts and periodic stalls of a soak run")
+    p.add_argument("input", help="Summary JSON from iteration_proxy.py --duration, or an iteration_times file to replay")
+    p.add_argument("--window", type=int, default=100, help="Iterations per window when replaying times (default: 100)")
+    p.add_argument("--warmup", type=int, default=20, help="Iterations before stall detection starts (default: 20)")
+    p.add_argument("--max-windows", type=int, default=20, help="Window rows to print; 0 for none (default: 20)")
+    p.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    p.set_defaults(func=_cmd_soak_report)
+
+    p = sub.add_parser("trace", help="Inspect or tail a binary iteration trace (iteration_proxy.py --trace)")
+    p.add_argument("input", help="Trace file")
+    p.add_argument("--csv", action="store_true", help="Dump the records as CSV")
+    p.add_argument("--follow", action="store_true", help="Keep reading as the trace grows and print rolling stats")
+    p.add_argument("--interval", type=float, default=10, help="Seconds between status lines with --follow (default: 10)")
+    p.add_argument("--idle", type=float, default=0,
+                   help="Stop following after this many seconds without new records (default: 0, until Ctrl-C)")
+    p.add_argument("--window", type=int, default=100, help="Iterations per rolling window (default: 100)")
+    p.set_defaults(func=_cmd_trace)
+
+    p = sub.add_parser("profile-summary", help="NCCL vs GEMM kernel time and overlap from sampled profiler traces")
+    p.add_argument("inputs", nargs="+", help="trace_*.json files from iteration_proxy.py --profile-dir, or that directory")
+    p.add_argument("--top", type=int, default=10, help="Kernels to list (default: 10)")
+    p.add_argument("--csv", action="store_true", help="Per-iteration rows as CSV")
+    p.add_argument("--kernels", action="store_true", help="With --csv: per-kernel totals instead")
+    p.set_defaults(func=_cmd_profile_summary)
+
+    p = sub.add_parser("mem-report", help="Per-iteration memory trends, leak check and allocator events of proxy runs")
+    p.add_argument("inputs", nargs="+",
+                   help="--mem-out CSVs, or results directories (memory_<cfg>.csv paired with iteration_times_<cfg>)")
+    p.add_argument("--skip-frac", type=float, default=0.1, help="Leading fraction of samples ignored (default: 0.1)")
+    p.add_argument("--segments", type=int, default=8, help="Segments whose minima must not decrease (default: 8)")
+    p.add_argument("--min-growth-mb", type=float, default=1.0, help="Smallest growth flagged as a leak (default: 1 MB)")
+    p.add_argument("--fail-on-leak", action="store_true", help="Exit 1 if any run leaks (2 if nothing was found)")
+    p.set_defaults(func=_cmd_mem_report)
+
+    p = sub.add_parser("gpu-samples", help="NVML counters from iteration_proxy.py --gpu-samples, split by iteration phase")
+    p.add_argument("input", help="--gpu-samples CSV")
+    p.add_argument("--trace", help="The run's --trace file: average the counters over compute and all-reduce phases")
+    p.add_argument("--rank", type=int, help="Trace rank to join with (default: the first record's)")
+    p.add_argument("--gpu", type=int, help="Only this GPU's samples (default: all, pooled)")
+    p.add_argument("--csv", action="store_true", help="With --trace: per-iteration rows as CSV")
+    p.set_defaults(func=_cmd_gpu_samples)
+
+    p = sub.add_parser("aggregate", help="Per-size mean/median/stdev/min/max over repeated runs, outlier runs dropped")
+    p.add_argument("roots", nargs="+", help="Directories (searched recursively) or results files")
+    p.add_argument("--column", default="oop_algbw",
+                   choices=("oop_time_us", "oop_algbw", "oop_busbw", "ip_time_us", "ip_algbw", "ip_busbw"),
+                   help="nccl-tests column (default: oop_algbw)")
+    p.add_argument("--contention", help="Only this contention level (none, low, ...)")
+    p.add_argument("--reject", type=float, default=3.5,
+                   help="Drop runs offset by more than this many scaled MADs (default: 3.5; 0 keeps all)")
+    p.add_argument("--csv", action="store_true", help="CSV instead of tables")
+    p.add_argument("--plot", help="Median curves with error bands, one panel per platform/GPUs/contention")
+    p.add_argument("--band", choices=("stdev", "minmax"), default="stdev", help="Error band (default: stdev)")
+    p.set_defaults(func=_cmd_aggregate)
+
+    p = sub.add_parser("slowdown", help="Contended vs uncontended time per platform, config, level and size")
+    p.add_argument("roots", nargs="+",
+                   help="Phase 2 result trees plus the Phase 1 trees holding their uncontended baselines")
+    p.add_argument("--csv", action="store_true", help="Every (platform, config, level, size) cell as CSV")
+    p.add_argument("--plot", help="Write config x size heatmaps per platform and level to this image")
+    p.add_argument("--save", help="Write the slowdown tensor and its axes to this .npz")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Parser processes (default: all CPUs)")
+    p.set_defaults(func=_cmd_slowdown)
+
+    p = sub.add_parser("gpu-util", help="Per-GPU summary and downsampled plot of nvidia-smi utilization logs")
+    p.add_argument("inputs", nargs="+", help="Utilization CSVs or directories containing them")
+    p.add_argument("--plot", help="Write a plot to this image (one per log, suffixed, for several logs)")
+    p.add_argument("--metrics", type=_gpu_util_panels, default=["sm_util", "memory_used_mib"],
+                   help=f"Comma-separated panels: {', '.join(_GPU_UTIL_PANELS)} (default: sm_util,memory_used_mib)")
+    p.add_argument("--points", type=int, default=2000, help="Points drawn per GPU and panel (default: 2000)")
+    p.add_argument("--method", choices=("lttb", "minmax"), default="lttb",
+                   help="Downsampling: lttb keeps the shape, minmax keeps every spike (default: lttb)")
+    p.add_argument("--no-cache", action="store_true", help="Re-parse instead of using or writing <log>.npz")
+    p.set_defaults(func=_cmd_gpu_util)
+
+    p = sub.add_parser("scaling", help="Iteration time and all-reduce bandwidth vs rank count from one --scaling launch")
+    p.add_argument("inputs", nargs="+", help="scaling_*.json files or directories containing them")
+    p.add_argument("--csv", action="store_true", help="CSV instead of a table")
+    p.add_argument("--plot", help="Also write the curves to this image (needs matplotlib)")
+    p.set_defaults(func=_cmd_scaling)
+
+    p = sub.add_parser("eval-report", help="Phase 5 default vs oracle vs tuner report with confidence intervals")
+    p.add_argument("logs", nargs="+", help="eval_runs.jsonl run logs from phase5-evaluation/evaluate.py")
+    p.add_argument("--level", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    p.add_argument("--csv", action="store_true", help="CSV instead of a table")
+    p.set_defaults(func=_cmd_eval_report)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Side-by-side comparison of AUTO vs forced-protocol nccl-tests runs."""
+
+from __future__ import annotations
+
+from .aggregate import SizeStats, aggregate_results
+from .parsing import read_results
+
+
+def bw_by_size(path) -> dict[int, SizeStats]:
+    """Out-of-place algbw statistics per size over the runs concatenated in one file, outlier runs dropped.
+
+    The comparison uses the median: the best run alone overstates what a config delivers.
+    """
+    return aggregate_results([read_results(path)], "oop_algbw").by_size()
+
+
+def format_size(bytes_val):
+    """Format bytes to human-readable."""
+    if bytes_val < 1024*1024:
+        return f"{bytes_val/1024:.0f}KB"
+    elif bytes_val < 1024*1024*1024:
+        return f"{bytes_val/(1024*1024):.0f}MB"
+    else:
+        return f"{bytes_val/(1024*1024*1024):.1f}GB"
+
+
+def print_comparison(baseline: dict[int, SizeStats], ll128: dict[int, SizeStats],
+                     simple: dict[int, SizeStats]) -> None:
+    spread = {name: {s: f"{st.median:.2f} ±{st.stdev:.2f}" for s, st in stats.items()}
+              for name, stats in (("auto", baseline), ("ll128", ll128), ("simple", simple))}
+    baseline, ll128, simple = ({s: st.median for s, st in stats.items()} for stats in (baseline, ll128, simple))
+    print("\n" + "="*90)
+    print("NCCL PROTOCOL COMPARISON - EXPLICIT PERFORMANCE DIFFERENCES")
+    print("="*90 + "\n")
+
+    all_sizes = sorted(set(baseline) | set(ll128) | set(simple))
+
+    print("Median out-of-place algbw over the runs in each file, ± sample stdev (GB/s)\n")
+    print(f"{'Size':<12} {'Auto':<18} {'LL128':<18} {'Simple':<18} {'Best Protocol':<20}")
+    print("-" * 90)
+
+    for size in all_sizes:
+        auto_bw = baseline.get(size, 0)
+        ll128_bw = ll128.get(size, 0)
+        simple_bw = simple.get(size, 0)
+        best = max([
+            (auto_bw, "Auto"),
+            (ll128_bw, "LL128"),
+            (simple_bw, "Simple")
+        ])
+        cells = [spread[name].get(size, "-") for name in ("auto", "ll128", "simple")]
+        print(f"{format_size(size):<12} {cells[0]:<18} {cells[1]:<18} {cells[2]:<18} {best[1]:<20}")
+
+    print("\n" + "="*90)
+    print("KEY INSIGHTS")
+    print("="*90 + "\n")
+
+    small_sizes = [s for s in all_sizes if s < 8*1024*1024]
+    if small_sizes:
+        print("📊 SMALL MESSAGES (< 8MB):")
+        for size in small_sizes:
+            ll128_bw = ll128.get(size, 0)
+            simple_bw = simple.get(size, 0)
+            if simple_bw > 0 and ll128_bw > 0:
+                ll128_advantage = ((ll128_bw - simple_bw) / simple_bw) * 100
+                if ll128_advantage > 10:
+                    print(f"  • {format_size(size)}: LL128 is {ll128_advantage:.0f}% FASTER than Simple")
+                    print(f"    ({ll128_bw:.0f} GB/s vs {simple_bw:.0f} GB/s)")
+
+    print()
+
+    large_sizes = [s for s in all_sizes if s >= 32*1024*1024]
+    if large_sizes:
+        print("📊 LARGE MESSAGES (>= 32MB):")
+        for size in large_sizes:
+            ll128_bw = ll128.get(size, 0)
+            simple_bw = simple.get(size, 0)
+            if simple_bw > 0 and ll128_bw > 0:
+                simple_advantage = ((simple_bw - ll128_bw) / ll128_bw) * 100
+                if simple_advantage > 10:
+                    print(f"  • {format_size(size)}: Simple is {simple_advantage:.0f}% FASTER than LL128")
+                    print(f"    ({simple_bw:.0f} GB/s vs {ll128_bw:.0f} GB/s)")
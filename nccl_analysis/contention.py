@@ -0,0 +1,226 @@
+"""
+Per-GPU contention profiles for the Phase 2 stress runs.
+
+A profile gives every GPU its own stress level, so a run can contend a single rank
+instead of all of them. A level is none, low, medium, high, or a target utilization
+such as "70%". Specs accepted by parse_profile, for 8 GPUs:
+
+- "high"                        every GPU at one level (the original runs)
+- "3:high"                      GPU 3 at high, the rest idle
+- "*:low,3:90%"                 GPU 3 at 90% utilization, every other GPU at low
+- "none,none,none,high,none,none,none,none"   one level per GPU
+
+Result files carry the profile as a "# contention_profile: ..." comment line ahead
+of the nccl-tests output; parsing.parse_nccl_lines reads it back into
+meta["contention_profile"] and catalog.describe labels the file with
+profile_label(): "duty33", "duty67" or "duty100" for uniform low, medium and high,
+since these runs hold a duty-cycle target rather than the fixed matrix-size/sleep
+levels of the older "low"/"medium"/"high" result files.
+
+StressGroup runs one duty-cycle controller (stress.py) per contended GPU. The
+controllers start together, the group waits until every one reports a stable load
+instead of sleeping a fixed time, and they are stopped together: every process gets
+SIGTERM before any is waited on, and stragglers are killed after one shared timeout.
+Each controller's period log gives the utilization achieved during a measurement.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Mapping, Optional, Sequence
+
+from .stress import LEVEL_TARGETS, load_log, window_utilization
+
+LEVELS = ("none", "low", "medium", "high")
+PROFILE_LINE = "# contention_profile:"
+_PERCENT_RE = re.compile(r"^(\d+(?:\.\d+)?)%$")
+
+
+def _level(name: str, spec: str) -> str:
+    level = name.strip().lower()
+    m = _PERCENT_RE.match(level)
+    if m and 0 <= float(m.group(1)) <= 100:
+        pct = float(m.group(1))
+        return "none" if pct == 0 else f"{pct:g}%"
+    if level not in LEVELS:
+        raise ValueError(f"unknown contention level {name!r} in profile {spec!r} "
+                         f"(expected one of {LEVELS} or a percentage)")
+    return level
+
+
+def target_util(level: str) -> float:
+    """Target utilization (0..1) of a profile level."""
+    m = _PERCENT_RE.match(level)
+    return float(m.group(1)) / 100 if m else LEVEL_TARGETS[level]
+
+
+def parse_profile(spec: str, n_gpus: int) -> tuple[str, ...]:
+    """Per-GPU levels for a profile spec (see the module docstring)."""
+    parts = [p for p in spec.replace(" ", "").split(",") if p]
+    if not parts:
+        raise ValueError("empty contention profile")
+    if all(":" not in p for p in parts):
+        if len(parts) == 1:
+            return (_level(parts[0], spec),) * n_gpus
+        if len(parts) != n_gpus:
+            raise ValueError(f"profile {spec!r} lists {len(parts)} levels for {n_gpus} GPUs")
+        return tuple(_level(p, spec) for p in parts)
+    levels = ["none"] * n_gpus
+    assigned: dict[int, str] = {}
+    for part in parts:
+        gpu, sep, name = part.partition(":")
+        if not sep:
+            raise ValueError(f"profile {spec!r} mixes per-GPU lists and gpu:level entries")
+        if gpu == "*":
+            levels = [_level(name, spec)] * n_gpus
+            continue
+        try:
+            idx = int(gpu)
+        except ValueError:
+            raise ValueError(f"bad GPU index {gpu!r} in profile {spec!r}") from None
+        if not 0 <= idx < n_gpus:
+            raise ValueError(f"GPU {idx} out of range for {n_gpus} GPUs in profile {spec!r}")
+        assigned[idx] = _level(name, spec)
+    for idx, level in assigned.items():
+        levels[idx] = level
+    return tuple(levels)
+
+
+def profile_label(levels: Sequence[str]) -> str:
+    """File-name label: the duty-cycle target of a uniform profile ("duty100", "duty33",
+    "duty70"), otherwise "duty-" plus one letter per GPU ("duty-nnnhnnnn"), or one code
+    per GPU joined by "-" when the profile has percentages ("duty-n-n-n-90-l-l-l-l").
+
+    The "duty" prefix keeps these runs apart from the fixed matrix-size/sleep levels
+    of the older results, which are labelled plainly "low", "medium" and "high".
+    """
+    if len(set(levels)) == 1:
+        if levels[0] == "none":
+            return "none"
+        pct = levels[0][:-1] if levels[0].endswith("%") else f"{target_util(levels[0]) * 100:.0f}"
+        return f"duty{pct.replace('.', 'p')}"
+    codes = [level[:-1].replace(".", "p") if level.endswith("%") else level[0] for level in levels]
+    return "duty-" + ("-" if any(len(c) > 1 or c.isdigit() for c in codes) else "").join(codes)
+
+
+def contended_gpus(levels: Sequence[str]) -> list[int]:
+    return [gpu for gpu, level in enumerate(levels) if level != "none"]
+
+
+def profile_header(levels: Sequence[str], **extra: str) -> str:
+    """Comment lines to put ahead of nccl-tests output; extra items become "# key: value" lines."""
+    lines = [f"{PROFILE_LINE} {','.join(levels)}"]
+    lines += [f"# {key}: {value}" for key, value in extra.items()]
+    return "\n".join(lines) + "\n"
+
+
+def stop_stress(procs: Sequence[subprocess.Popen], timeout: float = 5.0) -> None:
+    """Terminate every process, then wait on all of them against one deadline and kill the rest."""
+    for p in procs:
+        if p.poll() is None:
+            p.terminate()
+    deadline = time.monotonic() + timeout
+    for p in procs:
+        try:
+            p.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+
+
+class StressGroup:
+    """Duty-cycle stress controllers (`python -m nccl_analysis.stress`), one per contended GPU.
+
+    backend "gpu" drives `stress_bin serve`; "cpu" runs busy loops instead (no GPU
+    needed), and then CUDA_VISIBLE_DEVICES only labels the processes.
+    """
+
+    def __init__(self, levels: Sequence[str], backend: str = "gpu", stress_bin: str = "",
+                 env: Optional[Mapping[str, str]] = None, work_dir=None, period_s: float = 0.1,
+                 size: int = 4096):
+        if backend == "gpu" and not stress_bin and contended_gpus(levels):
+            raise ValueError("the gpu backend needs stress_bin (gpu_stress_benchmark built with serve mode)")
+        self.levels = tuple(levels)
+        self.backend = backend
+        self.stress_bin = stress_bin
+        self.env = dict(os.environ if env is None else env)
+        self.work_dir = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix="stress_"))
+        self.period_s = period_s
+        self.size = size
+        self.procs: dict[int, subprocess.Popen] = {}
+
+    def _path(self, gpu: int, suffix: str) -> Path:
+        return self.work_dir / f"stress_gpu{gpu}.{suffix}"
+
+    def start(self) -> "StressGroup":
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        # The controllers import nccl_analysis from this checkout even if it is not installed.
+        pythonpath = os.pathsep.join(p for p in (str(Path(__file__).resolve().parents[1]),
+                                                 self.env.get("PYTHONPATH", "")) if p)
+        try:
+            for gpu in contended_gpus(self.levels):
+                self._path(gpu, "ready").unlink(missing_ok=True)
+                cmd = [sys.executable, "-m", "nccl_analysis.stress", "--backend", self.backend,
+                       "--target", f"{target_util(self.levels[gpu]) * 100:g}", "--period", str(self.period_s),
+                       "--ready-file", str(self._path(gpu, "ready")), "--log", str(self._path(gpu, "csv"))]
+                if self.backend == "gpu":
+                    cmd += ["--stress-bin", self.stress_bin, "--size", str(self.size)]
+                self.procs[gpu] = subprocess.Popen(
+                    cmd, env={**self.env, "CUDA_VISIBLE_DEVICES": str(gpu), "PYTHONPATH": pythonpath},
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            self.stop()
+            raise
+        return self
+
+    def wait_ready(self, timeout: float = 60.0, poll_s: float = 0.05) -> dict[int, dict]:
+        """Block until every controller reports a stable load; {gpu: ready info}.
+
+        RuntimeError if a controller exits or `timeout` passes first.
+        """
+        deadline = time.monotonic() + timeout
+        pending = set(self.procs)
+        ready: dict[int, dict] = {}
+        while pending:
+            for gpu in sorted(pending):
+                path = self._path(gpu, "ready")
+                if path.is_file():
+                    ready[gpu] = json.loads(path.read_text())
+                    pending.discard(gpu)
+                elif self.procs[gpu].poll() is not None:
+                    raise RuntimeError(f"stress controller for GPU {gpu} exited with {self.procs[gpu].returncode}")
+            if pending and time.monotonic() > deadline:
+                raise RuntimeError(f"stress on GPUs {sorted(pending)} not stable after {timeout:.0f}s")
+            if pending:
+                time.sleep(poll_s)
+        return ready
+
+    def utilization(self, t0: float, t1: float) -> dict[int, dict[str, float]]:
+        """Achieved utilization per GPU between wall-clock times t0 and t1 (stress.window_utilization)."""
+        out = {}
+        for gpu in self.procs:
+            path = self._path(gpu, "csv")
+            out[gpu] = window_utilization(load_log(path) if path.is_file() else [], t0, t1)
+        return out
+
+    def stop(self, timeout: float = 5.0) -> None:
+        stop_stress(list(self.procs.values()), timeout)
+
+    def __enter__(self) -> "StressGroup":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def utilization_line(levels: Sequence[str], util: Mapping[int, Mapping[str, float]]) -> str:
+    """Achieved utilization per GPU in profile order ("-" for idle GPUs), e.g. "-,-,-,98.7,-,-,-,-"."""
+    return ",".join(f"{util[g]['mean'] * 100:.1f}" if g in util and util[g]["n"] else "-"
+                    for g in range(len(levels)))
@@ -0,0 +1,239 @@
+"""
+Crossover detection between forced algorithm/protocol runs.
+
+`find_transitions` flags any >20% jump between adjacent sizes, which with factor-2
+sweeps mostly catches normal bandwidth ramp-up. Here each (config) latency curve is
+instead fitted with a piecewise-linear model in log2(size)/log(time) space (segmented
+least squares; the number of segments is picked by BIC, so breakpoints are the
+change points of the curve). Crossovers are the sign changes of the difference between
+two fitted curves, found on a shared log-size grid for every comparable pair at once.
+The uncertainty band around each crossover is the size range over which the two fits
+are within z standard errors of each other.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+from .aggregate import reject_outlier_runs, run_samples
+from .catalog import ResultFile, ResultKey
+
+GRID_POINTS = 2048
+
+
+@dataclass
+class SegmentFit:
+    """Piecewise-linear fit in (log2 bytes, log time).
+
+    Segment k is a least-squares line over samples knots_x[2k]..knots_x[2k+1]; between
+    segments the model interpolates linearly, so the curve is continuous and evaluates
+    with a single np.interp.
+    """
+
+    knots_x: np.ndarray
+    knots_y: np.ndarray
+    breakpoints: np.ndarray  # change points (log2 bytes), midway between adjacent segments
+    sigma: float             # residual std (log time)
+
+    @property
+    def x_min(self) -> float:
+        return float(self.knots_x[0])
+
+    @property
+    def x_max(self) -> float:
+        return float(self.knots_x[-1])
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        y = np.interp(x, self.knots_x, self.knots_y)
+        return np.where((x >= self.x_min) & (x <= self.x_max), y, np.nan)
+
+
+def curve_samples(files: list[ResultFile], column: str = "oop_time_us"):
+    """Pool the runs of repeated files, outlier runs dropped (aggregate.reject_outlier_runs):
+    (log2 sizes, median log time, standard error of that median)."""
+    runs = run_samples([f.results for f in files], column)
+    kept, _ = reject_outlier_runs(runs)
+    by_size: dict[int, list[float]] = defaultdict(list)
+    for run in kept:
+        for size, t in runs[run].items():
+            by_size[size].append(np.log(t))
+    sizes = np.array(sorted(by_size), dtype=float)
+    med = np.array([np.median(by_size[int(s)]) for s in sizes])
+    # 1.2533 * s / sqrt(n): asymptotic standard error of a sample median.
+    se = np.array([1.2533 * np.std(v, ddof=1) / np.sqrt(len(v)) if len(v) > 1 else np.nan
+                   for v in (by_size[int(s)] for s in sizes)])
+    return np.log2(sizes), med, se
+
+
+def _segment_sse(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """sse[i, j] = residual SSE of a least-squares line through points i..j-1 (inf if < 2 points)."""
+    z = np.zeros(1)
+    cx, cy = np.concatenate([z, np.cumsum(x)]), np.concatenate([z, np.cumsum(y)])
+    cxx, cxy, cyy = (np.concatenate([z, np.cumsum(v)]) for v in (x * x, x * y, y * y))
+    i, j = np.meshgrid(np.arange(len(x) + 1), np.arange(len(x) + 1), indexing="ij")
+    n = (j - i).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sx, sy = cx[j] - cx[i], cy[j] - cy[i]
+        sxx = (cxx[j] - cxx[i]) - sx * sx / n
+        sxy = (cxy[j] - cxy[i]) - sx * sy / n
+        syy = (cyy[j] - cyy[i]) - sy * sy / n
+        sse = np.where(sxx > 1e-12, syy - sxy * sxy / sxx, syy)
+    return np.where(n >= 2, np.maximum(sse, 0.0), np.inf)
+
+
+def fit_segments(x, y, max_segments: int = 4, min_points: int = 3) -> SegmentFit:
+    """Segmented least squares (dynamic programming) with the segment count chosen by BIC."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    sse = _segment_sse(x, y)
+    sse[(np.arange(n + 1)[None, :] - np.arange(n + 1)[:, None]) < min_points] = np.inf
+
+    k_max = max(1, min(max_segments, n // min_points))
+    cost = np.full((k_max + 1, n + 1), np.inf)
+    back = np.zeros((k_max + 1, n + 1), dtype=int)
+    cost[0, 0] = 0.0
+    for k in range(1, k_max + 1):
+        # cost[k, j] = min_i cost[k-1, i] + sse[i, j]
+        total = cost[k - 1][:, None] + sse
+        back[k] = np.argmin(total, axis=0)
+        cost[k] = total[back[k], np.arange(n + 1)]
+
+    # 3 parameters per segment (slope, intercept, start); tiny floor keeps log finite on exact fits.
+    bic = [n * np.log(max(cost[k, n], 1e-12) / n) + 3 * k * np.log(n) if np.isfinite(cost[k, n]) else np.inf
+           for k in range(1, k_max + 1)]
+    k_best = int(np.argmin(bic)) + 1
+
+    bounds = [n]
+    for k in range(k_best, 0, -1):
+        bounds.append(back[k, bounds[-1]])
+    bounds = bounds[::-1]
+
+    knots_x, knots_y = [], []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        slope, icpt = np.polyfit(x[a:b], y[a:b], 1)
+        knots_x += [x[a], x[b - 1]]
+        knots_y += [slope * x[a] + icpt, slope * x[b - 1] + icpt]
+    breaks = np.array([0.5 * (x[i - 1] + x[i]) for i in bounds[1:-1]])
+    dof = n - 2 * k_best
+    sigma = float(np.sqrt(cost[k_best, n] / dof)) if dof > 0 else 0.0
+    return SegmentFit(np.array(knots_x), np.array(knots_y), breaks, sigma)
+
+
+@dataclass
+class Crossover:
+    group: tuple[str, int, str]
+    faster_below: str
+    faster_above: str
+    size: float    # bytes
+    lo: float      # bytes; lower edge of the uncertainty band
+    hi: float      # bytes; upper edge of the uncertainty band
+    significant: bool  # both curves differ by > z*sigma on each side of the band
+
+
+def fit_curves(files: list[ResultFile], max_segments: int = 4) -> dict[ResultKey, tuple[SegmentFit, float]]:
+    """Fit every distinct ResultKey; returns {key: (fit, sigma)} with sigma covering replicate noise too."""
+    by_key: dict[ResultKey, list[ResultFile]] = defaultdict(list)
+    for f in files:
+        by_key[f.key].append(f)
+    fits = {}
+    for key, group in by_key.items():
+        x, y, rep_se = curve_samples(group)
+        if len(x) < 4:
+            continue
+        fit = fit_segments(x, y, max_segments=max_segments)
+        rep = float(np.nanmedian(rep_se)) if np.isfinite(rep_se).any() else 0.0
+        fits[key] = (fit, max(fit.sigma, rep))
+    return fits
+
+
+def find_crossovers(files: list[ResultFile], z: float = 1.96, max_segments: int = 4,
+                    include_insignificant: bool = False) -> tuple[list[Crossover], dict]:
+    """Crossovers between every pair of configs sharing (platform, n_gpus, contention)."""
+    fits = fit_curves(files, max_segments=max_segments)
+    keys = list(fits)
+    if not keys:
+        return [], fits
+    lo_x = min(f.x_min for f, _ in fits.values())
+    hi_x = max(f.x_max for f, _ in fits.values())
+    grid = np.linspace(lo_x, hi_x, GRID_POINTS)
+    curves = np.vstack([fits[k][0](grid) for k in keys])           # (n_keys, grid)
+    sigmas = np.array([fits[k][1] for k in keys])
+
+    ia, ib = [], []
+    for a in range(len(keys)):
+        for b in range(a + 1, len(keys)):
+            if keys[a].group == keys[b].group:
+                ia.append(a)
+                ib.append(b)
+    if not ia:
+        return [], fits
+    ia, ib = np.array(ia), np.array(ib)
+
+    diff = curves[ia] - curves[ib]                                  # (n_pairs, grid); <0 => a faster
+    tol = z * np.hypot(sigmas[ia], sigmas[ib])[:, None]
+    sign = np.sign(diff)
+    cross_p, cross_i = np.nonzero(sign[:, :-1] * sign[:, 1:] < 0)
+    d0, d1 = diff[cross_p, cross_i], diff[cross_p, cross_i + 1]
+    root_x = grid[cross_i] + d0 / (d0 - d1) * (grid[cross_i + 1] - grid[cross_i])
+    inside = np.abs(diff) <= tol                                    # indistinguishable region
+    valid = ~np.isnan(diff)
+
+    out: list[Crossover] = []
+    last_band: dict[int, int] = {}
+    for p, i, rx in zip(cross_p, cross_i, root_x):
+        # Grow the band outward from the root while the curves stay within tolerance.
+        left, right = i, i + 1
+        while left > 0 and valid[p, left - 1] and inside[p, left]:
+            left -= 1
+        while right < GRID_POINTS - 1 and valid[p, right + 1] and inside[p, right]:
+            right += 1
+        # Several noisy sign changes inside one band are a single crossover.
+        if last_band.get(p, -1) >= left:
+            continue
+        last_band[p] = right
+        below, above = (keys[ia[p]], keys[ib[p]]) if diff[p, left] < 0 else (keys[ib[p]], keys[ia[p]])
+        significant = bool(not inside[p, left] and not inside[p, right]
+                           and np.sign(diff[p, left]) != np.sign(diff[p, right]))
+        if not significant and not include_insignificant:
+            continue
+        out.append(Crossover(
+            group=keys[ia[p]].group,
+            faster_below=below.config,
+            faster_above=above.config,
+            size=float(2 ** rx),
+            lo=float(2 ** grid[left]),
+            hi=float(2 ** grid[right]),
+            significant=significant,
+        ))
+    out.sort(key=lambda c: (c.group, c.faster_below, c.faster_above, c.size))
+    return out, fits
+
+
+def print_table(crossovers: list[Crossover], fits: dict | None = None) -> None:
+    from .parsing import format_size
+
+    if fits:
+        print("\nFitted curves (change points in bytes):")
+        for key in sorted(fits, key=lambda k: (k.group, k.config)):
+            fit, sigma = fits[key]
+            bps = ", ".join(format_size(2 ** b) for b in fit.breakpoints) or "-"
+            platform, n_gpus, contention = key.group
+            print(f"  {platform:<6} {n_gpus:>2} GPU  {contention:<11} {key.config:<14} sigma={sigma:.3f}  breaks: {bps}")
+
+    print("\nCrossovers (faster_below -> faster_above):")
+    header = (f"{'platform':<8} {'gpus':>4} {'contention':<11} {'faster below':<14} {'faster above':<14} "
+              f"{'crossover':>10} {'low':>10} {'high':>10}")
+    print(header)
+    print("-" * len(header))
+    if not crossovers:
+        print("(none)")
+    for c in crossovers:
+        platform, n_gpus, contention = c.group
+        flag = "" if c.significant else "  (within noise)"
+        print(f"{platform:<8} {n_gpus:>4} {contention:<11} {c.faster_below:<14} {c.faster_above:<14} "
+              f"{format_size(c.size):>10} {format_size(c.lo):>10} {format_size(c.hi):>10}{flag}")
@@ -0,0 +1,276 @@
+"""
+Phase 5 evaluation: NCCL default (AUTO) vs an oracle vs the phase4 tuner plugin.
+
+The oracle is derived from measurements already in the tree. For the Phase 3 proxy
+workload it is the forced config with the lowest mean iteration time. Everywhere
+else it is the forced algo/proto with the lowest nccl-tests time at the closest
+measured (rank count, contention level, size).
+
+`schedule` interleaves the arms. Every repetition visits all cells in a fresh order,
+and each cell rotates which arm runs first. Slow drift (thermal, neighbours on the
+node) then lands on all arms alike instead of on whichever arm ran last. Runs go to an
+append-only JSONL log, so an interrupted evaluation resumes where it stopped.
+
+The report treats the repetition as the sample. Each arm's per-repetition mean
+iteration time, median all-reduce latency and bus bandwidth get bootstrap confidence
+intervals. Speedups over the default are resampled in pairs, since both runs of a
+pair came from the same repetition.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .bandit import PROXY_BYTES, split_config
+from .catalog import CONTENTION_LEVELS, ResultKey, config_env, discover, parse_config
+from .parsing import format_size, load_times
+from .stats import bootstrap_ci, ratio_ci
+
+ARMS = ("default", "oracle", "tuner")
+# iteration_proxy.py's default --compute-mul, i.e. the Phase 3 workload.
+PROXY_COMPUTE_MUL = 4096
+
+_PROXY_RE = re.compile(r"iteration_times_(\w+)\.txt$")
+
+
+@dataclass(frozen=True)
+class Cell:
+    """One workload: all-reduce size, compute matmul size, co-running stress level, ranks."""
+
+    size_bytes: int
+    compute_mul: int = PROXY_COMPUTE_MUL
+    contention: str = "none"
+    world_size: int = 8
+
+    @property
+    def label(self) -> str:
+        return f"{format_size(self.size_bytes)} mm{self.compute_mul} {self.contention} x{self.world_size}"
+
+
+def workload_matrix(sizes, compute_muls, contentions, world_sizes) -> list[Cell]:
+    return [Cell(s, m, c, w) for w in world_sizes for c in contentions for m in compute_muls for s in sizes]
+
+
+# Oracle
+
+
+@dataclass(frozen=True)
+class OracleChoice:
+    config: str     # "tree/Simple", "auto/LL128", ...
+    mean: float     # of the source measurement: us (nccl-tests) or ms (iteration time)
+    source: str     # where the choice came from, e.g. "A100 8gpu none @ 4.0MB (nccl-tests)"
+
+    @property
+    def env(self) -> dict[str, str]:
+        algo, proto = split_config(self.config)
+        return config_env(ResultKey("", 0, algo=algo, proto=proto))
+
+
+class Oracle:
+    """Best forced config per cell from Phase 1-3 measurements."""
+
+    def __init__(self, curves: dict[tuple[str, int, str, int], dict[str, float]],
+                 iteration: dict[tuple[str, int], dict[str, float]]):
+        self.curves = curves          # (platform, n_gpus, contention, size) -> config -> mean us
+        self.iteration = iteration    # (platform, n_ranks) -> config -> mean ms
+
+    @property
+    def platforms(self) -> list[str]:
+        return sorted({k[0] for k in self.curves} | {k[0] for k in self.iteration})
+
+    def choose(self, cell: Cell, platform: str) -> Optional[OracleChoice]:
+        proxy = self.iteration.get((platform, cell.world_size))
+        if (proxy and cell.size_bytes == PROXY_BYTES and cell.compute_mul == PROXY_COMPUTE_MUL
+                and cell.contention == "none"):
+            best = min(proxy, key=proxy.get)
+            return OracleChoice(best, proxy[best], f"{platform} {cell.world_size}gpu proxy (iteration time)")
+        groups = {k[:3] for k in self.curves if k[0] == platform}
+        if not groups:
+            return None
+        n_gpus = min({g[1] for g in groups}, key=lambda n: (abs(math.log2(n / cell.world_size)), n))
+        levels = {g[2] for g in groups if g[1] == n_gpus}
+        level = cell.contention if cell.contention in levels else ("none" if "none" in levels else min(levels))
+        sizes = [k[3] for k in self.curves if k[:3] == (platform, n_gpus, level)]
+        size = min(sizes, key=lambda s: abs(math.log2(max(s, 1) / cell.size_bytes)))
+        means = self.curves[(platform, n_gpus, level, size)]
+        best = min(means, key=means.get)
+        return OracleChoice(best, means[best], f"{platform} {n_gpus}gpu {level} @ {format_size(size)} (nccl-tests)")
+
+
+def derive_oracle(roots) -> Oracle:
+    """Collect forced-config means from nccl-tests outputs and Phase 3 iteration times under roots."""
+    samples: dict[tuple, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+    for f in discover(roots):
+        if f.key.config == "auto":
+            continue
+        for r in f.results.rows:
+            if r.oop_time_us > 0:
+                samples[(*f.key.group, r.size)][f.key.config].append(r.oop_time_us)
+    curves = {k: {c: float(np.mean(v)) for c, v in by.items()} for k, by in samples.items()}
+
+    iteration: dict[tuple[str, int], dict[str, float]] = defaultdict(dict)
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                m = _PROXY_RE.search(name)
+                if not m:
+                    continue
+                algo, proto = parse_config(m.group(1))
+                times = load_times(os.path.join(dirpath, name))
+                if (algo, proto) == ("auto", "auto") or not times:
+                    continue
+                path = dirpath.lower()
+                platform = next((p.upper() for p in ("a100", "h100", "l40s", "v100") if p in path), "unknown")
+                n = re.search(r"(\d+)gpu", path)
+                iteration[(platform, int(n.group(1)) if n else 8)][f"{algo}/{proto}"] = float(np.mean(times))
+    return Oracle(curves, dict(iteration))
+
+
+# Runs
+
+
+def schedule(cells: list[Cell], arms=ARMS, reps: int = 5, seed: int = 0) -> list[tuple[int, Cell, str]]:
+    """(rep, cell, arm) in run order: cells shuffled per repetition, arm order rotated per (rep, cell)."""
+    rng = np.random.default_rng(seed)
+    order = []
+    for rep in range(reps):
+        for i in rng.permutation(len(cells)):
+            shift = (rep + int(i)) % len(arms)
+            order.extend((rep, cells[i], arm) for arm in (list(arms[shift:]) + list(arms[:shift])))
+    return order
+
+
+@dataclass
+class RunRecord:
+    cell: Cell
+    arm: str
+    rep: int
+    env: dict[str, str]
+    times_ms: list[float]
+    comm_ms: list[float]
+    started: float = field(default_factory=time.time)
+    error: str = ""
+    note: str = ""      # e.g. where the oracle's choice came from
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.times_ms) and not self.error
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, line: str) -> "RunRecord":
+        rec = json.loads(line)
+        return cls(**{**rec, "cell": Cell(**rec["cell"])})
+
+
+class RunLog:
+    """Append-only JSONL of RunRecords; (rep, cell, arm) already logged successfully are not rerun."""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = Path(path) if path else None
+        self.records: list[RunRecord] = []
+        if self.path and self.path.is_file():
+            self.records = [RunRecord.from_json(l) for l in self.path.read_text().splitlines() if l.strip()]
+
+    def done(self, rep: int, cell: Cell, arm: str) -> bool:
+        return any(r.ok and (r.rep, r.cell, r.arm) == (rep, cell, arm) for r in self.records)
+
+    def add(self, record: RunRecord) -> None:
+        self.records.append(record)
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(record.to_json() + "\n")
+
+
+# Report
+
+
+def busbw_gbps(size_bytes: int, ms: float, n_ranks: int) -> float:
+    """All-reduce bus bandwidth as nccl-tests reports it."""
+    factor = 2 * (n_ranks - 1) / n_ranks if n_ranks > 1 else 1.0
+    return size_bytes / (ms * 1e-3) / 1e9 * factor
+
+
+def rep_metrics(records: list[RunRecord]) -> dict[str, dict[int, float]]:
+    """Per repetition: mean iteration ms, median all-reduce ms, and bus bandwidth at the mean all-reduce time."""
+    out: dict[str, dict[int, float]] = {"iter_ms": {}, "latency_ms": {}, "busbw": {}}
+    for r in records:
+        if not r.ok:
+            continue
+        out["iter_ms"][r.rep] = float(np.mean(r.times_ms))
+        if r.comm_ms:
+            out["latency_ms"][r.rep] = float(np.median(r.comm_ms))
+            out["busbw"][r.rep] = busbw_gbps(r.cell.size_bytes, float(np.mean(r.comm_ms)), r.cell.world_size)
+    return out
+
+
+def report_rows(records: list[RunRecord], level: float = 0.95, n_boot: int = 2000) -> list[dict]:
+    """One row per (cell, arm) with estimates, CIs and the paired speedup over the default arm."""
+    by_cell: dict[Cell, dict[str, list[RunRecord]]] = defaultdict(lambda: defaultdict(list))
+    for r in records:
+        by_cell[r.cell][r.arm].append(r)
+    rows = []
+    levels = ("none", *CONTENTION_LEVELS)
+    order = lambda c: (c.world_size, levels.index(c.contention) if c.contention in levels else len(levels),
+                       c.compute_mul, c.size_bytes)
+    for cell in sorted(by_cell, key=order):
+        metrics = {arm: rep_metrics(rs) for arm, rs in by_cell[cell].items()}
+        base = metrics.get("default", {}).get("iter_ms", {})
+        for arm in sorted(metrics, key=lambda a: ARMS.index(a) if a in ARMS else len(ARMS)):
+            m = metrics[arm]
+            if not m["iter_ms"]:
+                continue
+            last = by_cell[cell][arm][-1]
+            row = {"cell": cell.label, "arm": arm, "reps": len(m["iter_ms"]),
+                   "failed": sum(not r.ok for r in by_cell[cell][arm]),
+                   "env": " ".join(f"{k}={v}" for k, v in sorted(last.env.items()) if k in ("NCCL_ALGO", "NCCL_PROTO")),
+                   "note": last.note}
+            for name in ("iter_ms", "latency_ms", "busbw"):
+                row[name], row[f"{name}_lo"], row[f"{name}_hi"] = bootstrap_ci(
+                    list(m[name].values()), n_boot=n_boot, level=level)
+            paired = sorted(set(base) & set(m["iter_ms"]))
+            # Speedup > 1: this arm's iterations are faster than the default's.
+            row["speedup"], row["speedup_lo"], row["speedup_hi"] = ratio_ci(
+                [base[i] for i in paired], [m["iter_ms"][i] for i in paired], paired=True, n_boot=n_boot, level=level)
+            rows.append(row)
+    return rows
+
+
+def print_report(rows: list[dict], level: float = 0.95) -> None:
+    pct = int(round(level * 100))
+    header = (f"{'cell':<28} {'arm':<8} {'reps':>4} {'iteration ms':>22} {'speedup vs default':>22} "
+              f"{'all-reduce ms':>22} {'busbw GB/s':>22}")
+    print(f"Estimates with {pct}% bootstrap CIs over repetitions\n")
+    print(header)
+    print("-" * len(header))
+
+    def ci(row, name, fmt):
+        if math.isnan(row[name]):
+            return f"{'-':>22}"
+        return f"{format(row[name], fmt):>8} [{format(row[name + '_lo'], fmt)}, {format(row[name + '_hi'], fmt)}]".rjust(22)
+
+    last = None
+    for row in rows:
+        cell = row["cell"] if row["cell"] != last else ""
+        last = row["cell"]
+        failed = f"  ({row['failed']} failed)" if row["failed"] else ""
+        print(f"{cell:<28} {row['arm']:<8} {row['reps']:>4} {ci(row, 'iter_ms', '.2f')} {ci(row, 'speedup', '.3f')} "
+              f"{ci(row, 'latency_ms', '.3f')} {ci(row, 'busbw', '.1f')}{failed}")
+    oracle = [r for r in rows if r["arm"] == "oracle"]
+    if oracle:
+        print("\nOracle settings:")
+        for row in oracle:
+            print(f"  {row['cell']:<28} {row['env'] or '(none)':<36} {row['note']}")
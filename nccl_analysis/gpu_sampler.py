@@ -0,0 +1,358 @@
+"""
+High-frequency GPU counter sampling aligned with Phase 3 iteration records.
+
+check_gpu_utilization.sh polls nvidia-smi once a second, which cannot attribute a
+10 ms iteration to compute or communication. GpuSampler reads NVML counters from a
+background thread every `interval_s` (sub-10 ms) into a preallocated ring buffer:
+
+    t, gpu, sm_util, mem_util, sm_clock_mhz, mem_clock_mhz, power_w
+
+`t` is time.perf_counter(), the clock iteration_proxy.py times its iterations and
+trace records with; write_csv() stores it relative to the proxy's start, like the
+trace's t_s. When the buffer is full the oldest samples are overwritten, so memory
+stays fixed however long the run.
+
+NVML's utilization rates are averaged by the driver over its own sample period
+(tens to hundreds of ms depending on the GPU), so consecutive fast reads of sm_util
+and mem_util can repeat; clocks and power are read as they are at that instant.
+
+Backends:
+
+- NvmlBackend: pynvml (`pip install nvidia-ml-py`, imported lazily);
+- ReplayBackend: plays back recorded CSVs (the sampler's own output or nvidia-smi
+  logs such as gpu_utilization_log_high.csv) against the wall clock, so the sampler
+  and attribute() can be exercised without a GPU.
+
+attribute() joins samples with trace records: every iteration is split into its
+compute phase [end - iter_ms, end - comm_ms] and all-reduce phase [end - comm_ms,
+end], and the samples inside each are averaged.
+"""
+
+from __future__ import annotations
+
+import csv
+import math
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+METRICS = ("sm_util", "mem_util", "sm_clock_mhz", "mem_clock_mhz", "power_w")
+FIELDS = ("t_s", "gpu", *METRICS)
+_NAN = float("nan")
+
+
+class Sample(NamedTuple):
+    t_s: float
+    gpu: int
+    sm_util: float
+    mem_util: float
+    sm_clock_mhz: float
+    mem_clock_mhz: float
+    power_w: float
+
+
+class NvmlBackend:
+    """Live NVML counters for the given device indices (NVML numbering, not CUDA_VISIBLE_DEVICES)."""
+
+    def __init__(self, gpus: Optional[Sequence[int]] = None):
+        import pynvml
+
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self.gpus = list(gpus) if gpus is not None else list(range(pynvml.nvmlDeviceGetCount()))
+        self._handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in self.gpus]
+
+    def read(self, slot: int) -> tuple[float, ...]:
+        nv, h = self._nvml, self._handles[slot]
+        rates = nv.nvmlDeviceGetUtilizationRates(h)
+        return (float(rates.gpu), float(rates.memory),
+                float(nv.nvmlDeviceGetClockInfo(h, nv.NVML_CLOCK_SM)),
+                float(nv.nvmlDeviceGetClockInfo(h, nv.NVML_CLOCK_MEM)),
+                nv.nvmlDeviceGetPowerUsage(h) / 1000.0)
+
+    def close(self) -> None:
+        self._nvml.nvmlShutdown()
+
+
+# Column names accepted by ReplayBackend and gpu_util: the sampler's own CSV,
+# check_gpu_utilization.sh logs and `nvidia-smi --query-gpu=... --format=csv` headers.
+COLUMN_ALIASES = {
+    "t_s": ("t_s", "timestamp"),
+    "gpu": ("gpu", "index"),
+    "sm_util": ("sm_util", "gpu_utilization", "utilization.gpu"),
+    "mem_util": ("mem_util", "memory_utilization", "utilization.memory"),
+    "sm_clock_mhz": ("sm_clock_mhz", "clocks.sm", "clocks.current.sm"),
+    "mem_clock_mhz": ("mem_clock_mhz", "clocks.mem", "clocks.current.memory"),
+    "power_w": ("power_w", "power.draw"),
+    "memory_used_mib": ("memory_used_mib", "memory_used", "memory.used"),
+}
+
+
+def column_index(header: list[str], field: str) -> Optional[int]:
+    """Index of `field` (a COLUMN_ALIASES key) in a CSV header, ignoring case and " [unit]" suffixes."""
+    names = [h.strip().split(" [")[0].lower() for h in header]
+    return next((names.index(a) for a in COLUMN_ALIASES[field] if a in names), None)
+
+
+def _number(text: str) -> float:
+    try:
+        return float(text.strip())
+    except ValueError:
+        return _NAN
+
+
+def _timestamp(text: str) -> float:
+    """Seconds from a numeric timestamp or nvidia-smi's "2026/01/31 12:00:00.123"."""
+    t = _number(text)
+    if t == t:
+        return t
+    try:
+        return datetime.strptime(text.strip(), "%Y/%m/%d %H:%M:%S.%f").timestamp()
+    except ValueError:
+        return _NAN
+
+
+def load_recording(path, relative: bool = True) -> dict[int, list[tuple[float, ...]]]:
+    """{gpu: [(t, *METRICS)]} from a recorded CSV, t relative to the first row unless not `relative`.
+
+    Without a GPU column, rows that share a timestamp are consecutive GPUs, as
+    nvidia-smi prints them.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        cols = {name: column_index(header, name) for name in FIELDS}
+        if cols["t_s"] is None:
+            raise ValueError(f"{path}: no t_s or timestamp column")
+        out: dict[int, list[tuple[float, ...]]] = {}
+        t0, prev_t, order = None, None, 0
+        for row in reader:
+            if not row:
+                continue
+            t = _timestamp(row[cols["t_s"]])
+            if t != t:
+                continue
+            t0 = (t if relative else 0.0) if t0 is None else t0
+            order = order + 1 if t == prev_t else 0
+            prev_t = t
+            gpu = int(_number(row[cols["gpu"]])) if cols["gpu"] is not None else order
+            values = tuple(_number(row[cols[m]]) if cols[m] is not None else _NAN for m in METRICS)
+            out.setdefault(gpu, []).append((t - t0, *values))
+    return out
+
+
+class ReplayBackend:
+    """Recorded counters replayed against the clock (`speed` x real time), looping at the end."""
+
+    def __init__(self, path, gpus: Optional[Sequence[int]] = None, speed: float = 1.0, clock=time.perf_counter):
+        self._rec = load_recording(path)
+        self.gpus = list(gpus) if gpus is not None else sorted(self._rec)
+        missing = [g for g in self.gpus if g not in self._rec]
+        if missing:
+            raise ValueError(f"{path} has no samples for GPUs {missing} (has {sorted(self._rec)})")
+        self._speed = speed
+        self._clock = clock
+        self._start = clock()
+        self._pos = [0] * len(self.gpus)
+
+    def read(self, slot: int) -> tuple[float, ...]:
+        rows = self._rec[self.gpus[slot]]
+        span = rows[-1][0]
+        t = (self._clock() - self._start) * self._speed
+        if span > 0:
+            t %= span
+        # Last recorded row at or before t; replay time only moves forward until it wraps.
+        i = self._pos[slot]
+        if i >= len(rows) or rows[i][0] > t:
+            i = 0
+        while i + 1 < len(rows) and rows[i + 1][0] <= t:
+            i += 1
+        self._pos[slot] = i
+        return rows[i][1:]
+
+    def close(self) -> None:
+        pass
+
+
+class GpuSampler:
+    """Background thread reading backend counters every interval_s into a ring buffer."""
+
+    def __init__(self, backend, interval_s: float = 0.005, capacity: int = 1 << 18, clock=time.perf_counter):
+        self.backend = backend
+        self.interval_s = interval_s
+        self.capacity = capacity
+        self._clock = clock
+        self._width = len(FIELDS)
+        self._buf = array("d", bytes(8 * self._width * capacity))
+        self._next = 0        # samples written so far; slot = _next % capacity
+        self.missed = 0       # ticks skipped because a read overran the interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return min(self._next, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """Samples overwritten because the buffer was full."""
+        return max(0, self._next - self.capacity)
+
+    def _put(self, t: float, gpu: int, values: tuple[float, ...]) -> None:
+        off = (self._next % self.capacity) * self._width
+        self._buf[off] = t
+        self._buf[off + 1] = gpu
+        self._buf[off + 2:off + self._width] = array("d", values)
+        self._next += 1
+
+    def sample_once(self) -> None:
+        for slot, gpu in enumerate(self.backend.gpus):
+            values = self.backend.read(slot)
+            self._put(self._clock(), gpu, values)
+
+    def _run(self) -> None:
+        next_t = self._clock()
+        while not self._stop.is_set():
+            self.sample_once()
+            next_t += self.interval_s
+            now = self._clock()
+            if now > next_t:
+                skipped = int((now - next_t) / self.interval_s) + 1
+                self.missed += skipped
+                next_t += skipped * self.interval_s
+            self._stop.wait(next_t - now if next_t > now else 0)
+
+    def start(self) -> "GpuSampler":
+        self._thread = threading.Thread(target=self._run, name="gpu-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.backend.close()
+
+    def samples(self, origin: float = 0.0) -> list[Sample]:
+        """Buffered samples, oldest first, with t_s relative to `origin`."""
+        n = len(self)
+        first = self._next - n
+        out = []
+        for k in range(first, self._next):
+            off = (k % self.capacity) * self._width
+            row = self._buf[off:off + self._width]
+            out.append(Sample(row[0] - origin, int(row[1]), *row[2:]))
+        return out
+
+    def write_csv(self, path, origin: float = 0.0) -> int:
+        rows = self.samples(origin)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for s in rows:
+                writer.writerow([f"{s.t_s:.6f}", s.gpu, *(f"{v:.3f}" if v == v else "" for v in s[2:])])
+        return len(rows)
+
+
+def load_samples(path) -> list[Sample]:
+    """Samples from a GpuSampler.write_csv file (t_s relative to the proxy's start)."""
+    rec = load_recording(path, relative=False)
+    return sorted((Sample(t, gpu, *values) for gpu, rows in rec.items() for t, *values in rows),
+                  key=lambda s: (s.t_s, s.gpu))
+
+
+@dataclass
+class PhaseStats:
+    iteration: int
+    compute_n: int
+    comm_n: int
+    compute: dict[str, float]   # metric -> mean over samples in the compute phase
+    comm: dict[str, float]
+
+
+def _mean(values: list[float]) -> float:
+    values = [v for v in values if v == v]
+    return sum(values) / len(values) if values else _NAN
+
+
+def attribute(samples: Iterable[Sample], records: Iterable, gpu: Optional[int] = None) -> list[PhaseStats]:
+    """Mean counters per iteration phase; records need t_s (iteration end), iter_ms, comm_ms and iteration.
+
+    Samples and records must share the clock origin (the proxy's start). `gpu`
+    restricts the samples to one device; by default they are pooled.
+    """
+    pts = sorted((s for s in samples if gpu is None or s.gpu == gpu), key=lambda s: s.t_s)
+    times = [s.t_s for s in pts]
+    out = []
+    for r in records:
+        end = r.t_s
+        split = end - r.comm_ms / 1000
+        begin = end - r.iter_ms / 1000
+        phases = []
+        for lo, hi in ((begin, split), (split, end)):
+            a, b = _bisect(times, lo), _bisect(times, hi)
+            phases.append(pts[a:b])
+        out.append(PhaseStats(
+            r.iteration, len(phases[0]), len(phases[1]),
+            {m: _mean([getattr(s, m) for s in phases[0]]) for m in METRICS},
+            {m: _mean([getattr(s, m) for s in phases[1]]) for m in METRICS}))
+    return out
+
+
+def _bisect(times: list[float], t: float) -> int:
+    lo, hi = 0, len(times)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if times[mid] < t:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def summarize_phases(stats: list[PhaseStats]) -> dict[str, dict[str, float]]:
+    """Per phase, the mean of each metric over iterations that had samples in that phase."""
+    out = {}
+    for phase in ("compute", "comm"):
+        covered = [getattr(s, phase) for s in stats if getattr(s, f"{phase}_n")]
+        out[phase] = {m: _mean([c[m] for c in covered]) for m in METRICS}
+        out[phase]["iterations"] = len(covered)
+    return out
+
+
+def print_sample_summary(samples: list[Sample]) -> None:
+    by_gpu: dict[int, list[Sample]] = {}
+    for s in samples:
+        by_gpu.setdefault(s.gpu, []).append(s)
+    print(f"{'gpu':>3} {'samples':>8} {'interval':>9} " + " ".join(f"{m:>13}" for m in METRICS))
+    for gpu in sorted(by_gpu):
+        rows = by_gpu[gpu]
+        gaps = [b.t_s - a.t_s for a, b in zip(rows, rows[1:])]
+        interval = f"{sorted(gaps)[len(gaps) // 2] * 1000:>7.2f}ms" if gaps else f"{'-':>9}"
+        means = [_mean([getattr(s, m) for s in rows]) for m in METRICS]
+        print(f"{gpu:>3} {len(rows):>8} {interval} " + " ".join(
+            f"{v:>13.1f}" if not math.isnan(v) else f"{'-':>13}" for v in means))
+
+
+def print_attribution(stats: list[PhaseStats]) -> None:
+    summary = summarize_phases(stats)
+    print(f"\n{'phase':<8} {'iters':>6} " + " ".join(f"{m:>13}" for m in METRICS))
+    for phase in ("compute", "comm"):
+        row = summary[phase]
+        print(f"{phase:<8} {row['iterations']:>6} " + " ".join(
+            f"{row[m]:>13.1f}" if not math.isnan(row[m]) else f"{'-':>13}" for m in METRICS))
+    uncovered = sum(1 for s in stats if not s.compute_n or not s.comm_n)
+    if uncovered:
+        print(f"({uncovered} of {len(stats)} iterations had a phase without samples; "
+              f"sample faster or use longer iterations)")
+
+
+def open_backend(replay: str = "", gpus: Optional[Sequence[int]] = None, speed: float = 1.0):
+    """ReplayBackend for a recorded CSV, else NVML for `gpus` (default: every device)."""
+    if replay:
+        return ReplayBackend(Path(replay), gpus, speed)
+    return NvmlBackend(gpus)
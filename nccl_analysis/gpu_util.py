@@ -0,0 +1,259 @@
+"""
+Fast loading and plotting of long, multi-GPU utilization logs (needs numpy).
+
+Logs come from check_gpu_utilization.sh (`timestamp,gpu_utilization,memory_used`,
+one row per GPU per poll), from `nvidia-smi --query-gpu=timestamp,index,... --format=csv`
+(with units and whitespace padding) or from `iteration_proxy.py --gpu-samples`.
+load_log splits the whole file in one call and converts each column with numpy:
+padding, "%"/"MiB"/"W" units and nvidia-smi's "YYYY/MM/DD HH:MM:SS.fff" timestamps are
+handled per column, not per row. Without an index column, rows sharing a timestamp
+are consecutive GPUs, as nvidia-smi prints them.
+
+The parsed columns are cached next to the log as `<log>.npz` (float32 metrics,
+float64 seconds, int16 GPU index) and reused while the log's size and mtime match.
+
+Plots never draw every sample: each GPU's series is reduced to `points` samples by
+largest-triangle-three-buckets (lttb, keeps the visual shape) or per-bucket min/max
+(minmax, keeps every spike), so million-sample logs render in seconds.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from .gpu_sampler import column_index
+
+METRICS = ("sm_util", "mem_util", "memory_used_mib", "power_w", "sm_clock_mhz", "mem_clock_mhz")
+LABELS = {
+    "sm_util": "GPU utilization (%)",
+    "mem_util": "Memory utilization (%)",
+    "memory_used_mib": "Memory used (MiB)",
+    "power_w": "Power (W)",
+    "sm_clock_mhz": "SM clock (MHz)",
+    "mem_clock_mhz": "Memory clock (MHz)",
+}
+_CACHE_VERSION = 2  # 2: nvidia-smi timestamps read as local time
+
+
+@dataclass
+class UtilLog:
+    path: str
+    t_s: np.ndarray                  # seconds since the first sample
+    gpu: np.ndarray                  # GPU index per sample
+    columns: dict[str, np.ndarray] = field(default_factory=dict)  # metric -> values (NaN if missing)
+    start: float = 0.0               # absolute time of the first sample (epoch seconds), if known
+
+    @property
+    def gpus(self) -> list[int]:
+        return sorted(int(g) for g in np.unique(self.gpu))
+
+    def series(self, metric: str, gpu: int) -> tuple[np.ndarray, np.ndarray]:
+        mask = self.gpu == gpu
+        return self.t_s[mask], self.columns[metric][mask]
+
+
+def _to_float(col: np.ndarray) -> np.ndarray:
+    """Strip padding and a trailing unit ("100 %", " 1215 MiB"), then convert in one call."""
+    col = np.char.partition(np.char.strip(col), " ")[:, 0]
+    # "[N/A]", "[Not Supported]" and empty cells become NaN.
+    col[np.char.startswith(col, "[") | (col == "")] = "nan"
+    return col.astype(np.float64)
+
+
+def _to_seconds(col: np.ndarray) -> np.ndarray:
+    # Every GPU of one poll shares its timestamp: convert each run of equal cells once.
+    starts = np.ones(len(col), dtype=bool)
+    starts[1:] = col[1:] != col[:-1]
+    heads = np.char.strip(col[starts])
+    try:
+        seconds = heads.astype(np.float64)
+    except ValueError:
+        iso = np.char.replace(np.char.replace(heads, "/", "-"), " ", "T")
+        seconds = _local_epoch(iso.astype("datetime64[us]").astype(np.int64) / 1e6)
+    return seconds[np.cumsum(starts) - 1]
+
+
+def _local_epoch(wall: np.ndarray) -> np.ndarray:
+    """nvidia-smi wall-clock times (read as if UTC) to epoch seconds in local time.
+
+    Same convention as gpu_sampler._timestamp (datetime.timestamp() of the naive time),
+    so both kinds of log line up. The UTC offset is looked up once per hour of samples.
+    """
+    hours, inverse = np.unique(np.floor(wall / 3600), return_inverse=True)
+    epoch = datetime(1970, 1, 1)
+    offsets = np.array([(epoch + timedelta(hours=h)).timestamp() - h * 3600 for h in hours.tolist()])
+    return wall + offsets[inverse]
+
+
+def _gpu_by_order(t: np.ndarray) -> np.ndarray:
+    """Position of each row within its run of equal timestamps."""
+    idx = np.arange(len(t))
+    starts = np.ones(len(t), dtype=bool)
+    starts[1:] = t[1:] != t[:-1]
+    return idx - np.maximum.accumulate(np.where(starts, idx, 0))
+
+
+def parse_log(path) -> UtilLog:
+    text = Path(path).read_text()
+    header_line, _, body = text.partition("\n")
+    header = next(csv.reader([header_line]))
+    ncols = len(header)
+    t_col = column_index(header, "t_s")
+    if t_col is None:
+        raise ValueError(f"{path}: no timestamp column in {header}")
+    # Drop blank or torn lines (a log read while nvidia-smi is still writing it).
+    lines = [line for line in body.split("\n") if line.count(",") == ncols - 1]
+    if not lines:
+        return UtilLog(str(path), np.zeros(0), np.zeros(0, dtype=np.int16),
+                       {m: np.zeros(0, dtype=np.float32) for m in METRICS})
+    cells = np.array(",".join(lines).split(","), dtype=str).reshape(len(lines), ncols)
+
+    t = _to_seconds(cells[:, t_col])
+    g_col = column_index(header, "gpu")
+    gpu = _to_float(cells[:, g_col]).astype(np.int16) if g_col is not None else _gpu_by_order(t).astype(np.int16)
+    columns = {}
+    for metric in METRICS:
+        i = column_index(header, metric)
+        columns[metric] = (_to_float(cells[:, i]) if i is not None else np.full(len(t), np.nan)).astype(np.float32)
+    start = float(t.min())
+    return UtilLog(str(path), t - start, gpu, columns, start)
+
+
+def _cache_path(path: Path) -> Path:
+    return path.with_name(path.name + ".npz")
+
+
+def load_log(path, cache: bool = True) -> UtilLog:
+    """parse_log, through the `<log>.npz` cache unless `cache` is False."""
+    path = Path(path)
+    st = path.stat()
+    stamp = np.array([_CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+    cpath = _cache_path(path)
+    if cache and cpath.is_file():
+        try:
+            with np.load(cpath) as z:
+                if np.array_equal(z["stamp"], stamp):
+                    return UtilLog(str(path), z["t_s"], z["gpu"], {m: z[m] for m in METRICS}, float(z["start"]))
+        except (OSError, KeyError, ValueError):
+            pass
+    log = parse_log(path)
+    if cache:
+        try:
+            with open(cpath, "wb") as f:
+                np.savez(f, stamp=stamp, t_s=log.t_s, gpu=log.gpu, start=log.start, **log.columns)
+        except OSError:
+            pass  # read-only results directory: just parse next time
+    return log
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the largest-triangle-three-buckets downsample of (x, y) to n_out points."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket (the last point for the final bucket).
+        cx, cy = (x[nlo:nhi].mean(), y[nlo:nhi].mean()) if nhi > nlo else (x[-1], y[-1])
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum (about n_out points, in order)."""
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    view = padded.reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + np.nanargmin(view, axis=1)
+    hi = base + np.nanargmax(view, axis=1)
+    return np.unique(np.concatenate([lo, hi, [0, n - 1]]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> tuple[np.ndarray, np.ndarray]:
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    idx = lttb(x, y, n_out) if method == "lttb" else minmax(y, n_out)
+    return x[idx], y[idx]
+
+
+def summarize_log(log: UtilLog) -> list[dict[str, float | int | str]]:
+    rows = []
+    for gpu in log.gpus:
+        mask = log.gpu == gpu
+        t = log.t_s[mask]
+        row: dict[str, float | int | str] = {"log": os.path.basename(log.path), "gpu": gpu, "samples": int(mask.sum()),
+                                             "duration_s": float(t.max() - t.min()) if len(t) else 0.0}
+        util = log.columns["sm_util"][mask]
+        util = util[~np.isnan(util)]
+        for name, q in (("util_mean", None), ("util_p50", 50), ("util_p95", 95)):
+            row[name] = (float(util.mean()) if q is None else float(np.percentile(util, q))) if len(util) else np.nan
+        mem = log.columns["memory_used_mib"][mask]
+        row["mem_max_mib"] = float(np.nanmax(mem)) if np.isfinite(mem).any() else np.nan
+        power = log.columns["power_w"][mask]
+        row["power_mean_w"] = float(np.nanmean(power)) if np.isfinite(power).any() else np.nan
+        rows.append(row)
+    return rows
+
+
+def _cell(value: float, width: int, fmt: str) -> str:
+    return f"{'-':>{width}}" if np.isnan(value) else f"{value:>{width}{fmt}}"
+
+
+def print_logs(logs: list[UtilLog]) -> None:
+    header = (f"{'gpu':>3} {'samples':>9} {'seconds':>9} {'util mean':>9} {'p50':>6} {'p95':>6} "
+              f"{'mem max MiB':>11} {'power W':>8}")
+    for log in logs:
+        print(f"\n{log.path}")
+        print(header)
+        for r in summarize_log(log):
+            print(f"{r['gpu']:>3} {r['samples']:>9} {r['duration_s']:>9.1f} {_cell(r['util_mean'], 9, '.1f')} "
+                  f"{_cell(r['util_p50'], 6, '.1f')} {_cell(r['util_p95'], 6, '.1f')} "
+                  f"{_cell(r['mem_max_mib'], 11, '.0f')} {_cell(r['power_mean_w'], 8, '.1f')}")
+
+
+def plot_log(log: UtilLog, out, metrics=("sm_util", "memory_used_mib"), points: int = 2000,
+             method: str = "lttb", gpus=None, title: str = "") -> None:
+    """One panel per metric (metrics with no data are skipped), one line per GPU, no markers."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    metrics = [m for m in metrics if np.isfinite(log.columns[m]).any()]
+    if not metrics:
+        raise ValueError(f"{log.path}: none of the requested metrics has data")
+    gpus = log.gpus if gpus is None else gpus
+    fig, axes = plt.subplots(len(metrics), 1, figsize=(11, 3.2 * len(metrics)), sharex=True, squeeze=False)
+    for ax, metric in zip(axes[:, 0], metrics):
+        for gpu in gpus:
+            x, y = downsample(*log.series(metric, gpu), points, method)
+            ax.plot(x, y, linewidth=0.8, label=f"GPU {gpu}")
+        ax.set_ylabel(LABELS[metric])
+        ax.grid(True, alpha=0.3)
+    axes[0, 0].legend(fontsize=8, ncol=min(len(gpus), 8), loc="upper right")
+    axes[-1, 0].set_xlabel("Time since first sample (s)")
+    n = len(log.t_s)
+    fig.suptitle(title or f"{os.path.basename(log.path)} ({n} samples, {method} to {points} points per GPU)")
+    fig.tight_layout()
+    fig.savefig(out, dpi=150)
+    plt.close(fig)
+
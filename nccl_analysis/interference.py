@@ -0,0 +1,114 @@
+"""
+Compute-communication interference from `iteration_proxy.py --interference` runs.
+
+Each run measures one (algo, proto) pair in three conditions: the matmul window
+alone, the same window with a stream of all-reduces on a second CUDA stream, and the
+all-reduces alone. The slowdown ratios show what a protocol costs the compute
+that runs next to it. A bandwidth-optimal protocol that occupies more SMs can lose
+overall if compute slows down by more than communication speeds up.
+"""
+
+from __future__ import annotations
+
+import json
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class InterferenceResult:
+    path: str
+    algo: str
+    proto: str
+    world_size: int
+    size_bytes: int
+    compute_mul: int
+    matmuls: int
+    compute_alone_ms: list[float]
+    comm_alone_ms: list[float]
+    overlap_compute_ms: list[float]
+    overlap_comm_ms: list[float]
+
+    @property
+    def config(self) -> str:
+        return f"{self.algo}/{self.proto}".lower()
+
+    def _median_ratio(self, num: list[float], den: list[float]) -> float:
+        return statistics.median(n / d for n, d in zip(num, den))
+
+    @property
+    def compute_slowdown(self) -> float:
+        """Median overlapped / alone time of the compute window (1.0 = no interference)."""
+        return self._median_ratio(self.overlap_compute_ms, self.compute_alone_ms)
+
+    @property
+    def comm_slowdown(self) -> float:
+        """Median overlapped / alone time per all-reduce."""
+        return self._median_ratio(self.overlap_comm_ms, self.comm_alone_ms)
+
+    def tflops(self, window_ms: float) -> float:
+        return 2 * self.compute_mul ** 3 * self.matmuls / (window_ms * 1e-3) / 1e12
+
+    def busbw_gbps(self, op_ms: float) -> float:
+        """All-reduce bus bandwidth as nccl-tests reports it."""
+        n = self.world_size
+        return self.size_bytes / (op_ms * 1e-3) / 1e9 * (2 * (n - 1) / n if n > 1 else 1.0)
+
+    def row(self) -> dict[str, float | str | int]:
+        compute_alone = statistics.median(self.compute_alone_ms)
+        overlap_compute = statistics.median(self.overlap_compute_ms)
+        comm_alone = statistics.median(self.comm_alone_ms)
+        overlap_comm = statistics.median(self.overlap_comm_ms)
+        return {
+            "config": self.config,
+            "size_bytes": self.size_bytes,
+            "world_size": self.world_size,
+            "reps": len(self.compute_alone_ms),
+            "compute_alone_tflops": self.tflops(compute_alone),
+            "overlap_tflops": self.tflops(overlap_compute),
+            "compute_slowdown": self.compute_slowdown,
+            "comm_alone_busbw": self.busbw_gbps(comm_alone),
+            "overlap_busbw": self.busbw_gbps(overlap_comm),
+            "comm_slowdown": self.comm_slowdown,
+        }
+
+
+def load_result(path: Path) -> InterferenceResult:
+    rec = json.loads(Path(path).read_text())
+    return InterferenceResult(
+        path=str(path),
+        algo=rec["algo"],
+        proto=rec["proto"],
+        world_size=int(rec["world_size"]),
+        size_bytes=int(rec["size_bytes"]),
+        compute_mul=int(rec["compute_mul"]),
+        matmuls=int(rec["matmuls"]),
+        compute_alone_ms=rec["compute_alone_ms"],
+        comm_alone_ms=rec["comm_alone_ms"],
+        overlap_compute_ms=rec["overlap_compute_ms"],
+        overlap_comm_ms=rec["overlap_comm_ms"],
+    )
+
+
+def load_results(inputs: list[str]) -> list[InterferenceResult]:
+    """Results from files, or every interference_*.json below the given directories."""
+    paths: list[Path] = []
+    for item in inputs:
+        p = Path(item)
+        paths.extend(sorted(p.rglob("interference_*.json")) if p.is_dir() else [p])
+    results = [load_result(p) for p in paths]
+    return [r for r in results if r.compute_alone_ms]
+
+
+def print_table(results: list[InterferenceResult]) -> None:
+    header = (f"{'config':<14} {'bytes':>10} {'ranks':>5} {'reps':>4} {'TFLOP/s':>8} {'+comm':>8} {'slowdown':>8} "
+              f"{'busbw':>8} {'+compute':>8} {'slowdown':>8}")
+    print(f"{'':<38}{'--- compute ---':^26} {'--- all-reduce (GB/s) ---':^26}")
+    print(header)
+    print("-" * len(header))
+    for r in sorted(results, key=lambda r: (r.size_bytes, r.world_size, r.compute_slowdown)):
+        row = r.row()
+        print(f"{row['config']:<14} {row['size_bytes']:>10} {row['world_size']:>5} {row['reps']:>4} "
+              f"{row['compute_alone_tflops']:>8.2f} {row['overlap_tflops']:>8.2f} {row['compute_slowdown']:>8.3f} "
+              f"{row['comm_alone_busbw']:>8.1f} {row['overlap_busbw']:>8.1f} {row['comm_slowdown']:>8.3f}")
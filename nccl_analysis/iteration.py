@@ -0,0 +1,75 @@
+"""Summary statistics for Phase 3 iteration-time results."""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+from .parsing import load_times
+
+CONFIGS = ["auto", "simple", "ll128"]
+
+
+def summarize(times: list[float]) -> dict[str, float]:
+    if not times:
+        return {}
+    times_sorted = sorted(times)
+    n = len(times_sorted)
+
+    def pct(p: float) -> float:
+        if n == 0:
+            return math.nan
+        idx = int(max(0, min(n - 1, round(p * (n - 1)))))
+        return times_sorted[idx]
+
+    mean = sum(times_sorted) / n
+    return {
+        "n": n,
+        "mean": mean,
+        "p50": pct(0.50),
+        "p90": pct(0.90),
+        "p95": pct(0.95),
+        "min": times_sorted[0],
+        "max": times_sorted[-1],
+    }
+
+
+def times_path(results_dir: Path, cfg: str) -> Path:
+    """results_dir/iteration_times_<cfg>.trace if the run left a binary trace, else the .txt file."""
+    trace = Path(results_dir) / f"iteration_times_{cfg}.trace"
+    return trace if trace.is_file() else Path(results_dir) / f"iteration_times_{cfg}.txt"
+
+
+def load_summaries(results_dir: Path, configs=CONFIGS, verbose: bool = True) -> dict[str, dict[str, float]]:
+    """Summaries for results_dir/iteration_times_<cfg>.{trace,txt}, skipping configs with no data."""
+    summaries: dict[str, dict[str, float]] = {}
+    for cfg in configs:
+        path = times_path(results_dir, cfg)
+        times = load_times(path)
+        if not times:
+            if verbose:
+                print(f"- {cfg}: no data at {path}")
+            continue
+        summaries[cfg] = summarize(times)
+    return summaries
+
+
+def print_table(summaries: dict[str, dict[str, float]], configs=CONFIGS) -> None:
+    print("\nSummary (ms per iteration):")
+    header = f"{'config':<8} {'n':>4} {'mean':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'min':>8} {'max':>8}"
+    print(header)
+    print("-" * len(header))
+    for cfg in configs:
+        s = summaries.get(cfg)
+        if not s:
+            continue
+        print(
+            f"{cfg:<8} "
+            f"{int(s['n']):>4} "
+            f"{s['mean']:>8.3f} "
+            f"{s['p50']:>8.3f} "
+            f"{s['p90']:>8.3f} "
+            f"{s['p95']:>8.3f} "
+            f"{s['min']:>8.3f} "
+            f"{s['max']:>8.3f}"
+        )
@@ -0,0 +1,273 @@
+"""
+Search over NCCL environment knobs for the lowest iteration time.
+
+Phase 3 compared three NCCL_PROTO settings; the space that matters also includes
+NCCL_ALGO, NCCL_MIN/MAX_NCHANNELS, NCCL_NTHREADS and NCCL_BUFFSIZE (~9k valid
+combinations), far too many to grid-sweep on 8x A100. The search runs brackets of
+successive halving: a batch of configs gets a short run of `min_iters` iterations, the
+best 1/eta are rerun with eta times the iterations, and so on up to `max_iters`.
+Bad configs are therefore discarded after a short run. Each bracket's batch is
+proposed by a Gaussian process over all completed runs (expected improvement on log
+mean iteration time), with a share of random configs as in BOHB.
+
+Every run is appended to a JSONL history tagged with the workload (GPU, rank count,
+tensor size, compute size). A later search on the same workload reuses those runs:
+they seed the GP, and configs already measured at a rung are not rerun.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from .iteration import summarize
+
+
+@dataclass(frozen=True)
+class Knob:
+    """One environment variable; None means "leave unset" (NCCL's own choice)."""
+
+    name: str
+    values: tuple
+    numeric: bool = False
+
+
+SPACE: tuple[Knob, ...] = (
+    Knob("NCCL_ALGO", (None, "Ring", "Tree")),
+    Knob("NCCL_PROTO", (None, "LL", "LL128", "Simple")),
+    Knob("NCCL_MIN_NCHANNELS", (None, 2, 4, 8, 16, 32), numeric=True),
+    Knob("NCCL_MAX_NCHANNELS", (None, 2, 4, 8, 16, 32), numeric=True),
+    Knob("NCCL_NTHREADS", (None, 64, 128, 256, 512), numeric=True),
+    Knob("NCCL_BUFFSIZE", (None, 1 << 20, 2 << 20, 4 << 20, 8 << 20, 16 << 20), numeric=True),
+)
+
+
+def valid(config: dict) -> bool:
+    lo, hi = config.get("NCCL_MIN_NCHANNELS"), config.get("NCCL_MAX_NCHANNELS")
+    return lo is None or hi is None or lo <= hi
+
+
+def config_key(config: dict) -> str:
+    """Canonical "NAME=value,..." string of the knobs that are set ("default" if none)."""
+    return ",".join(f"{k}={config[k]}" for k in sorted(config) if config[k] is not None) or "default"
+
+
+def config_env(config: dict) -> dict[str, str]:
+    return {k: str(v) for k, v in config.items() if v is not None}
+
+
+def all_configs(space: tuple[Knob, ...] = SPACE) -> list[dict]:
+    configs = [{}]
+    for knob in space:
+        configs = [{**c, knob.name: v} for c in configs for v in knob.values]
+    return [c for c in configs if valid(c)]
+
+
+def encode(configs: list[dict], space: tuple[Knob, ...] = SPACE) -> np.ndarray:
+    """GP inputs in [0, 1]: one-hot for categorical knobs; unset flag plus scaled log2 value for numeric ones."""
+    cols = []
+    for knob in space:
+        vals = [c.get(knob.name) for c in configs]
+        if knob.numeric:
+            logs = np.log2([v for v in knob.values if v is not None])
+            lo, span = logs.min(), max(float(np.ptp(logs)), 1.0)
+            cols.append([1.0 if v is None else 0.0 for v in vals])
+            cols.append([0.5 if v is None else (math.log2(v) - lo) / span for v in vals])
+        else:
+            for option in knob.values:
+                cols.append([1.0 if v == option else 0.0 for v in vals])
+    return np.array(cols, dtype=float).T.reshape(len(configs), -1)
+
+
+@dataclass
+class Trial:
+    """One proxy run of `iters` timed iterations; times_ms is empty if the run failed."""
+
+    config: dict
+    iters: int
+    times_ms: list[float]
+    workload: dict
+    started: float = field(default_factory=time.time)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.times_ms) and not self.error
+
+    @property
+    def key(self) -> str:
+        return config_key(self.config)
+
+    @property
+    def mean_ms(self) -> float:
+        return float(np.mean(self.times_ms)) if self.ok else math.inf
+
+    def summary(self) -> dict[str, float]:
+        return summarize(self.times_ms)
+
+
+class History:
+    """Append-only JSONL log of trials; only trials of the same workload are visible."""
+
+    def __init__(self, path: Optional[Path], workload: dict):
+        self.path = Path(path) if path else None
+        self.workload = workload
+        self.trials: list[Trial] = []
+        if self.path and self.path.is_file():
+            for line in self.path.read_text().splitlines():
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("workload") == workload:
+                    self.trials.append(Trial(**rec))
+
+    def add(self, trial: Trial) -> None:
+        self.trials.append(trial)
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(asdict(trial)) + "\n")
+
+    def lookup(self, config: dict, iters: int) -> Optional[Trial]:
+        """Longest earlier run of this config with at least `iters` iterations."""
+        key = config_key(config)
+        runs = [t for t in self.trials if t.key == key and t.iters >= iters]
+        return max(runs, key=lambda t: t.iters) if runs else None
+
+    def observations(self) -> tuple[list[dict], np.ndarray, np.ndarray]:
+        """(configs, log mean ms, iterations) from each config's longest run; failures score above the worst success."""
+        longest: dict[str, Trial] = {}
+        for t in self.trials:
+            if t.key not in longest or t.iters > longest[t.key].iters:
+                longest[t.key] = t
+        trials = list(longest.values())
+        ok = [math.log(t.mean_ms) for t in trials if t.ok]
+        penalty = (max(ok) + math.log(2.0)) if ok else 0.0
+        y = np.array([math.log(t.mean_ms) if t.ok else penalty for t in trials])
+        return [t.config for t in trials], y, np.array([t.iters for t in trials], dtype=float)
+
+
+def gp_posterior(X: np.ndarray, y: np.ndarray, Xs: np.ndarray, lengthscale: float = 0.6,
+                 noise: float = 0.05) -> tuple[np.ndarray, np.ndarray]:
+    """Posterior mean and std of a zero-mean (after centering) RBF Gaussian process."""
+    mean, scale = float(np.mean(y)), float(np.std(y)) or 1.0
+    z = (y - mean) / scale
+
+    def kernel(a, b):
+        d2 = np.sum(a * a, 1)[:, None] + np.sum(b * b, 1)[None, :] - 2 * a @ b.T
+        return np.exp(-0.5 * np.maximum(d2, 0.0) / lengthscale ** 2)
+
+    L = np.linalg.cholesky(kernel(X, X) + (noise / scale) ** 2 * np.eye(len(X)) + 1e-9 * np.eye(len(X)))
+    alpha = np.linalg.solve(L.T, np.linalg.solve(L, z))
+    Ks = kernel(X, Xs)
+    v = np.linalg.solve(L, Ks)
+    var = np.maximum(1.0 - np.sum(v * v, axis=0), 1e-12)
+    return mean + scale * (Ks.T @ alpha), scale * np.sqrt(var)
+
+
+def expected_improvement(mu: np.ndarray, sd: np.ndarray, best: float) -> np.ndarray:
+    """EI for minimisation."""
+    from math import erf, sqrt
+
+    z = (best - mu) / sd
+    cdf = 0.5 * (1.0 + np.vectorize(erf)(z / sqrt(2.0)))
+    pdf = np.exp(-0.5 * z * z) / sqrt(2 * math.pi)
+    return (best - mu) * cdf + sd * pdf
+
+
+def propose(history: History, n: int, rng: np.random.Generator, space: tuple[Knob, ...] = SPACE,
+            random_fraction: float = 1 / 3, min_observations: int = 4) -> list[dict]:
+    """n untried configs: the top expected improvements, plus a random share (all random until min_observations)."""
+    candidates = all_configs(space)
+    seen = {t.key for t in history.trials}
+    untried = [c for c in candidates if config_key(c) not in seen] or candidates
+    configs, y, _ = history.observations()
+    n_model = 0 if len(configs) < min_observations else n - int(round(n * random_fraction))
+    chosen: list[dict] = []
+    if n_model:
+        mu, sd = gp_posterior(encode(configs, space), y, encode(untried, space))
+        order = np.argsort(-expected_improvement(mu, sd, float(np.min(y))))
+        chosen = [untried[i] for i in order[:n_model]]
+    rest = [c for c in untried if c not in chosen]
+    picks = rng.choice(len(rest), size=min(n - len(chosen), len(rest)), replace=False) if rest else []
+    return chosen + [rest[i] for i in picks]
+
+
+def rungs(min_iters: int, max_iters: int, eta: int) -> list[int]:
+    budgets = [min_iters]
+    while budgets[-1] * eta < max_iters:
+        budgets.append(budgets[-1] * eta)
+    if budgets[-1] < max_iters:
+        budgets.append(max_iters)
+    return budgets
+
+
+Runner = Callable[[dict, int], Trial]
+
+
+def successive_halving(run: Runner, configs: list[dict], history: History, min_iters: int = 10,
+                       max_iters: int = 90, eta: int = 3, log: Callable[[str], None] = print) -> list[Trial]:
+    """Run configs at increasing budgets, keeping the best 1/eta each time; returns the last rung's trials."""
+    survivors = list(configs)
+    trials: list[Trial] = []
+    for budget in rungs(min_iters, max_iters, eta):
+        trials = []
+        for config in survivors:
+            trial = history.lookup(config, budget)
+            if trial is None:
+                trial = run(config, budget)
+                history.add(trial)
+                status = f"{trial.mean_ms:.2f} ms" if trial.ok else f"failed ({trial.error})"
+            else:
+                status = f"{trial.mean_ms:.2f} ms (history)" if trial.ok else "failed (history)"
+            log(f"  [{budget:>4} iters] {config_key(config):<70} {status}")
+            trials.append(trial)
+        trials.sort(key=lambda t: t.mean_ms)
+        keep = max(1, len(trials) // eta)
+        survivors = [t.config for t in trials[:keep] if t.ok]
+        if not survivors:
+            break
+    return trials
+
+
+def search(run: Runner, history: History, brackets: int = 3, per_bracket: int = 9, min_iters: int = 10,
+           max_iters: int = 90, eta: int = 3, seed: int = 0, log: Callable[[str], None] = print) -> Optional[Trial]:
+    """BO-proposed successive-halving brackets; returns the best trial run for max_iters iterations."""
+    rng = np.random.default_rng(seed)
+    if history.trials:
+        log(f"Warm start: {len(history.trials)} earlier runs of this workload")
+    # The default config gets one full-length run so the result can be compared with it.
+    if history.lookup({}, max_iters) is None:
+        history.add(run({}, max_iters))
+    for b in range(brackets):
+        configs = propose(history, per_bracket, rng)
+        log(f"Bracket {b + 1}/{brackets}: {len(configs)} configs")
+        successive_halving(run, configs, history, min_iters, max_iters, eta, log)
+    final = [t for t in history.trials if t.iters >= max_iters and t.ok]
+    return min(final, key=lambda t: t.mean_ms) if final else None
+
+
+def print_result(best: Trial, history: History, max_iters: int) -> None:
+    default = history.lookup({}, max_iters)
+    print(f"\nBest config ({best.iters} iterations): {config_key(best.config)}")
+    print("  env: " + (" ".join(f"{k}={v}" for k, v in config_env(best.config).items()) or "(none)"))
+    header = f"{'':<10} {'n':>4} {'mean':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'min':>8} {'max':>8}"
+    print(header)
+    print("-" * len(header))
+    for label, t in (("best", best), ("default", default)):
+        if t is None or not t.ok:
+            continue
+        s = t.summary()
+        print(f"{label:<10} {s['n']:>4} {s['mean']:>8.3f} {s['p50']:>8.3f} {s['p90']:>8.3f} "
+              f"{s['p95']:>8.3f} {s['min']:>8.3f} {s['max']:>8.3f}")
+    if default is not None and default.ok:
+        print(f"Speedup over default: {default.mean_ms / best.mean_ms:.3f}x")
+    runs = len(history.trials)
+    spent = sum(t.iters for t in history.trials)
+    print(f"History: {runs} runs, {spent} timed iterations")
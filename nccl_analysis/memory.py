@@ -0,0 +1,166 @@
+"""
+Per-iteration memory of the iteration proxy (`iteration_proxy.py --mem-out`) and a leak check.
+
+The proxy samples memory after each timed step, outside the timed region, and writes
+one CSV row per sample:
+
+- CUDA (PyTorch caching allocator): allocated, reserved, peak allocated since the
+  previous sample, allocations / frees / cudaMalloc calls / allocator retries since
+  the previous sample, free device memory, and device memory outside PyTorch's
+  allocator (CUDA context, NCCL buffers; total - free - reserved).
+- Host: RSS and peak RSS of the process.
+
+A metric leaks when, after the first `skip_frac` of the run, the minimum of every one
+of `segments` consecutive segments is at least the previous one's, and the last
+exceeds the first by `min_growth_mb` and by `min_growth_frac`. Segment minima ignore
+the per-step peaks of a healthy run and catch growth of the level memory returns to.
+"""
+
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .iteration import times_path
+from .parsing import load_times
+
+CUDA_FIELDS = ["allocated_mb", "reserved_mb", "peak_mb", "allocs", "frees", "cuda_mallocs", "alloc_retries",
+               "device_free_mb", "non_torch_mb"]
+HOST_FIELDS = ["rss_mb", "peak_rss_mb"]
+FIELDS = ["iteration", *CUDA_FIELDS, *HOST_FIELDS]
+# Peak columns only ever grow (or reset every step), so they are not checked for leaks.
+LEAK_METRICS = ("allocated_mb", "reserved_mb", "non_torch_mb", "rss_mb")
+
+
+@dataclass
+class Trend:
+    metric: str
+    start: float        # minimum of the first segment after skip
+    end: float          # minimum of the last segment
+    peak: float
+    slope_per_1k: float  # least-squares MB per 1000 iterations after skip
+    monotonic: bool
+    leak: bool
+
+    @property
+    def growth(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class MemoryReport:
+    path: str
+    label: str
+    n: int
+    trends: list[Trend] = field(default_factory=list)
+    allocs_per_iter: float = float("nan")
+    frees_per_iter: float = float("nan")
+    malloc_steps: int = 0
+    alloc_retries: int = 0
+    min_free_mb: float = float("nan")
+    non_torch_mb: float = float("nan")
+    times_path: str = ""
+    time_with_malloc: float = float("nan")   # mean iteration ms on samples with a cudaMalloc
+    time_without_malloc: float = float("nan")
+
+    @property
+    def leaks(self) -> list[str]:
+        return [t.metric for t in self.trends if t.leak]
+
+
+def load_memory(path) -> dict[str, list[float]]:
+    """Columns of a --mem-out CSV that have values (CUDA columns are absent on CPU runs)."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    cols: dict[str, list[float]] = {}
+    for name in FIELDS:
+        if rows and rows[0].get(name) not in (None, ""):
+            cols[name] = [float(r[name]) for r in rows]
+    return cols
+
+
+def _slope(xs: list[float], ys: list[float]) -> float:
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else 0.0
+
+
+def trend(metric: str, iterations: list[float], values: list[float], skip_frac: float = 0.1, segments: int = 8,
+          min_growth_mb: float = 1.0, min_growth_frac: float = 0.01) -> Trend:
+    start = int(len(values) * skip_frac)
+    xs, ys = iterations[start:], values[start:]
+    peak = max(values) if values else float("nan")
+    if len(ys) < 2 * segments:
+        first = min(ys) if ys else float("nan")
+        return Trend(metric, first, first, peak, float("nan"), False, False)
+    size = len(ys) / segments
+    minima = [min(ys[int(k * size):int((k + 1) * size)]) for k in range(segments)]
+    monotonic = all(b >= a for a, b in zip(minima, minima[1:])) and minima[-1] > minima[0]
+    growth = minima[-1] - minima[0]
+    leak = monotonic and growth >= min_growth_mb and growth >= min_growth_frac * abs(minima[0])
+    return Trend(metric, minima[0], minima[-1], peak, _slope(xs, ys) * 1000, monotonic, leak)
+
+
+def analyze(path, times: Optional[list[float]] = None, label: str = "", **kwargs) -> MemoryReport:
+    cols = load_memory(path)
+    its = cols.get("iteration", [])
+    report = MemoryReport(str(path), label or Path(path).stem, len(its))
+    for metric in LEAK_METRICS:
+        if metric in cols:
+            report.trends.append(trend(metric, its, cols[metric], **kwargs))
+    if "allocs" in cols and its:
+        # Counters are per sample; divide by the iterations each sample covers.
+        span = its[-1] - its[0] + (its[1] - its[0] if len(its) > 1 else 1)
+        report.allocs_per_iter = sum(cols["allocs"]) / span
+        report.frees_per_iter = sum(cols["frees"]) / span
+        report.malloc_steps = sum(1 for v in cols["cuda_mallocs"] if v > 0)
+        report.alloc_retries = int(sum(cols["alloc_retries"]))
+        report.min_free_mb = min(cols["device_free_mb"])
+        report.non_torch_mb = max(cols["non_torch_mb"])
+    if times and "cuda_mallocs" in cols:
+        with_m = [times[int(i)] for i, m in zip(its, cols["cuda_mallocs"]) if m > 0 and int(i) < len(times)]
+        without = [times[int(i)] for i, m in zip(its, cols["cuda_mallocs"]) if m == 0 and int(i) < len(times)]
+        if with_m:
+            report.time_with_malloc = sum(with_m) / len(with_m)
+        if without:
+            report.time_without_malloc = sum(without) / len(without)
+    return report
+
+
+def load_reports(inputs: list[str], **kwargs) -> list[MemoryReport]:
+    """Reports for memory CSVs; in a directory, memory_<cfg>.csv is paired with its iteration times."""
+    reports = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            for path in sorted(item.glob("memory_*.csv")):
+                cfg = path.stem[len("memory_"):]
+                tpath = times_path(item, cfg)
+                times = load_times(tpath)
+                report = analyze(path, times, label=cfg, **kwargs)
+                report.times_path = str(tpath) if times else ""
+                reports.append(report)
+        elif item.is_file():
+            reports.append(analyze(item, **kwargs))
+    return reports
+
+
+def print_reports(reports: list[MemoryReport]) -> None:
+    for r in reports:
+        print(f"\n{r.label}  ({r.n} samples from {r.path}"
+              + (f"; iteration times from {r.times_path})" if r.times_path else ")"))
+        header = f"  {'metric':<14} {'start':>10} {'end':>10} {'peak':>10} {'growth':>9} {'MB/1k it':>9}  verdict"
+        print(header)
+        for t in r.trends:
+            verdict = "LEAK" if t.leak else ("growing" if t.monotonic else "ok")
+            print(f"  {t.metric:<14} {t.start:>10.1f} {t.end:>10.1f} {t.peak:>10.1f} {t.growth:>+9.1f} "
+                  f"{t.slope_per_1k:>+9.2f}  {verdict}")
+        if r.allocs_per_iter == r.allocs_per_iter:
+            line = (f"  allocator: {r.allocs_per_iter:.1f} allocs / {r.frees_per_iter:.1f} frees per iteration, "
+                    f"cudaMalloc in {r.malloc_steps} of {r.n} samples, {r.alloc_retries} retries")
+            if r.time_with_malloc == r.time_with_malloc and r.time_without_malloc == r.time_without_malloc:
+                line += f" (iteration {r.time_with_malloc:.3f} ms with cudaMalloc vs {r.time_without_malloc:.3f} ms)"
+            print(line)
+            print(f"  device: min free {r.min_free_mb:.0f} MB; outside PyTorch's allocator (context, NCCL buffers) "
+                  f"up to {r.non_torch_mb:.0f} MB")
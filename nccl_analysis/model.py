@@ -0,0 +1,185 @@
+"""
+Alpha-beta latency models fitted to nccl-tests results.
+
+For each (platform, contention, algo, proto) the all-reduce time is modelled as
+
+    t(n, p) = alpha * g(p) + beta * n * h(p)
+
+where n is the message size in bytes, p the rank count, and g/h the per-algorithm
+step counts: ring takes 2(p-1) latency steps and moves 2(p-1)/p of the buffer per
+rank, tree takes 2*log2(p) steps and moves the whole buffer once down and once up
+(pipelined, so ~1x). Pooling runs at several GPU counts (2x and 4x L40S) is what lets
+the fit separate alpha/beta from the rank scaling; with a single p the model still
+predicts sizes, just not new p.
+
+AUTO (including proto-only forced configs such as auto/LL128) and unknown algorithms
+have no rank model: NCCL may pick a different algorithm at each p. They are fitted
+separately per GPU count, and predict only at the rank count they were measured at
+(NaN elsewhere, and never a candidate).
+
+The fit minimises squared relative error, so the small-message latency floor carries
+as much weight as the large-message bandwidth regime.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from .catalog import ResultFile
+
+
+def has_rank_model(algo: str) -> bool:
+    """Whether rank_terms knows how `algo` scales with the rank count."""
+    return algo in ("ring", "tree")
+
+
+def rank_terms(algo: str, n_ranks):
+    """(g(p), h(p)) latency-step and bandwidth multipliers; vectorized over n_ranks."""
+    p = np.asarray(n_ranks, dtype=float)
+    if algo == "ring":
+        return 2 * (p - 1), 2 * (p - 1) / p
+    if algo == "tree":
+        return 2 * np.log2(np.maximum(p, 2)), np.ones_like(p)
+    return np.ones_like(p), np.ones_like(p)
+
+
+@dataclass
+class AlphaBetaModel:
+    platform: str
+    contention: str
+    algo: str
+    proto: str
+    alpha_us: float          # per latency step
+    beta_us_per_byte: float  # per byte per unit h(p)
+    n_points: int
+    ranks: tuple[int, ...]   # rank counts the fit saw
+    rms_rel_err: float
+    max_rel_err: float
+    r2_log: float            # R^2 of log(time)
+
+    @property
+    def config(self) -> str:
+        return "auto" if self.algo == "auto" and self.proto == "auto" else f"{self.algo}/{self.proto}"
+
+    @property
+    def bandwidth_gbps(self) -> float:
+        """Asymptotic algorithm bandwidth 1/beta (GB/s)."""
+        return 1e-3 / self.beta_us_per_byte if self.beta_us_per_byte > 0 else float("inf")
+
+    def predicts(self, n_ranks: int) -> bool:
+        """Whether predict() is meaningful at n_ranks (see the module docstring)."""
+        return has_rank_model(self.algo) or int(n_ranks) in self.ranks
+
+    def predict(self, sizes, n_ranks) -> np.ndarray:
+        """Predicted time (us), NaN at rank counts the model cannot predict; sizes and
+        n_ranks broadcast against each other."""
+        g, h = rank_terms(self.algo, n_ranks)
+        t = self.alpha_us * g + self.beta_us_per_byte * np.asarray(sizes, dtype=float) * h
+        if has_rank_model(self.algo):
+            return t
+        return np.where(np.isin(np.asarray(n_ranks), self.ranks), t, np.nan)
+
+
+def _samples(files: list[ResultFile], min_size: int, max_size: int):
+    """Per (n_ranks, size) median out-of-place time over all files in the group."""
+    by_point: dict[tuple[int, int], list[float]] = defaultdict(list)
+    for f in files:
+        for r in f.results.rows:
+            if r.oop_time_us > 0 and min_size <= r.size <= max_size:
+                by_point[(f.key.n_gpus, r.size)].append(r.oop_time_us)
+    points = sorted(by_point)
+    p = np.array([pt[0] for pt in points], dtype=float)
+    n = np.array([pt[1] for pt in points], dtype=float)
+    t = np.array([np.median(by_point[pt]) for pt in points])
+    return p, n, t
+
+
+def fit_alpha_beta(algo: str, p: np.ndarray, n: np.ndarray, t: np.ndarray) -> tuple[float, float]:
+    """Non-negative (alpha, beta) minimising sum(((alpha*g + beta*n*h) - t) / t)^2."""
+    g, h = rank_terms(algo, p)
+    A = np.column_stack([g, n * h]) / t[:, None]
+    b = np.ones_like(t)
+    coef, *_ = np.linalg.lstsq(A, b, rcond=None)
+    if coef[0] < 0 or coef[1] < 0:
+        # Active-set fallback: the better of the two single-term fits.
+        cands = []
+        for col in (0, 1):
+            c = max(float(A[:, col] @ b / (A[:, col] @ A[:, col])), 0.0)
+            full = np.zeros(2)
+            full[col] = c
+            cands.append((float(np.sum((A @ full - b) ** 2)), full))
+        coef = min(cands, key=lambda x: x[0])[1]
+    return float(coef[0]), float(coef[1])
+
+
+def fit_models(files: list[ResultFile], min_size: int = 0, max_size: int = 1 << 62,
+               min_points: int = 4) -> list[AlphaBetaModel]:
+    """One AlphaBetaModel per (platform, contention, algo, proto), pooling all GPU counts
+    for ring and tree, and per GPU count as well for algorithms with no rank model."""
+    groups: dict[tuple[str, str, str, str, int], list[ResultFile]] = defaultdict(list)
+    for f in files:
+        n_gpus = 0 if has_rank_model(f.key.algo) else f.key.n_gpus
+        groups[(f.key.platform, f.key.contention, f.key.algo, f.key.proto, n_gpus)].append(f)
+    models = []
+    for (platform, contention, algo, proto, _), group in sorted(groups.items()):
+        p, n, t = _samples(group, min_size, max_size)
+        if len(t) < min_points:
+            continue
+        alpha, beta = fit_alpha_beta(algo, p, n, t)
+        g, h = rank_terms(algo, p)
+        pred = alpha * g + beta * n * h
+        rel = (pred - t) / t
+        log_t, log_pred = np.log(t), np.log(np.maximum(pred, 1e-12))
+        ss_tot = float(np.sum((log_t - log_t.mean()) ** 2))
+        r2 = 1.0 - float(np.sum((log_t - log_pred) ** 2)) / ss_tot if ss_tot > 0 else float("nan")
+        models.append(AlphaBetaModel(
+            platform, contention, algo, proto, alpha, beta, len(t), tuple(sorted({int(x) for x in p})),
+            float(np.sqrt(np.mean(rel ** 2))), float(np.max(np.abs(rel))), r2,
+        ))
+    return models
+
+
+def predict_matrix(models: list[AlphaBetaModel], sizes, n_ranks) -> np.ndarray:
+    """(len(models), len(sizes)) predicted times for one rank count."""
+    sizes = np.asarray(sizes, dtype=float)
+    return np.vstack([m.predict(sizes, n_ranks) for m in models]) if models else np.empty((0, len(sizes)))
+
+
+def candidates(models: list[AlphaBetaModel], sizes, n_ranks, margin: float = 0.25) -> np.ndarray:
+    """Boolean (models, sizes): True where a model is within `margin` of the best prediction.
+
+    Configs that are False at every size of interest are predicted never to win and can
+    be dropped from a sweep or a tuner policy. Models that cannot predict at n_ranks are
+    never candidates and do not set the best; check AlphaBetaModel.predicts() before
+    dropping one.
+    """
+    pred = predict_matrix(models, sizes, n_ranks)
+    if pred.size == 0 or np.isnan(pred).all():
+        return np.zeros(pred.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        return pred <= np.nanmin(pred, axis=0, keepdims=True) * (1.0 + margin)
+
+
+def save_models(models: list[AlphaBetaModel], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump([asdict(m) for m in models], f, indent=2)
+
+
+def load_models(path: str) -> list[AlphaBetaModel]:
+    with open(path) as f:
+        return [AlphaBetaModel(**{**d, "ranks": tuple(d["ranks"])}) for d in json.load(f)]
+
+
+def print_table(models: list[AlphaBetaModel]) -> None:
+    header = (f"{'platform':<8} {'contention':<11} {'config':<14} {'ranks':<8} {'n':>4} "
+              f"{'alpha(us)':>10} {'1/beta(GB/s)':>13} {'rms err':>8} {'max err':>8} {'R2(log)':>8}")
+    print(header)
+    print("-" * len(header))
+    for m in models:
+        ranks = ",".join(str(r) for r in m.ranks)
+        print(f"{m.platform:<8} {m.contention:<11} {m.config:<14} {ranks:<8} {m.n_points:>4} "
+              f"{m.alpha_us:>10.2f} {m.bandwidth_gbps:>13.2f} {m.rms_rel_err:>8.1%} {m.max_rel_err:>8.1%} {m.r2_log:>8.3f}")
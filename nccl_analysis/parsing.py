@@ -0,0 +1,217 @@
+"""
+Parsers for the raw outputs produced by the experiments.
+
+- nccl-tests (`all_reduce_perf`) stdout, as saved by the Phase 1/2 runners
+  (results_*.txt, the FarmShare timestamped .txt files and the skampere1 .out files).
+- Phase 3 iteration-time files (one float in ms per line).
+
+Everything here is pure Python so text-only tools start quickly; callers that
+want numpy arrays convert the returned lists themselves.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# A full nccl-tests data row:
+#   size count type redop root | time algbw busbw #wrong | time algbw busbw #wrong
+_MIN_ROW_FIELDS = 12
+# Some logs split a row in two when NCCL INFO output is interleaved:
+#   "     1048576        262144     float"
+#   "    sum      -1     4.56  229.85    0.00  ..."
+_SIZE_ONLY_RE = re.compile(r'^\s+(\d+)\s+\d+\s+float\s*$')
+_SPLIT_DATA_RE = re.compile(r'^\s+sum\s+-1\s+(\d+\.\d+)\s+(\d+\.\d+)')
+_HEADER_RE = re.compile(r'nThread\s+(\d+)\s+nGpus\s+(\d+)\s+minBytes\s+(\d+)\s+maxBytes\s+(\d+)\s+step:\s+(\d+)\((\w+)\)')
+_VERSION_RE = re.compile(r'nccl-tests version (\S+) nccl-headers=(\d+) nccl-library=(\d+)')
+_PROFILE_RE = re.compile(r'#\s*contention_profile:\s*(\S+)')
+_DEVICE_RE = re.compile(r'#\s+Rank\s+(\d+)\s+Group\s+\d+\s+Pid\s+\d+\s+on\s+(\S+)\s+device\s+(\d+)\s+\[[^\]]*\]\s+(.+?)\s*$')
+
+
+@dataclass
+class NcclRow:
+    """One message size from an nccl-tests table (times in us, bandwidths in GB/s)."""
+
+    size: int
+    oop_time_us: float
+    oop_algbw: float
+    oop_busbw: float = float("nan")
+    ip_time_us: float = float("nan")
+    ip_algbw: float = float("nan")
+    ip_busbw: float = float("nan")
+    run: int = 0  # index of the "Collective test starting" block this row came from
+
+
+@dataclass
+class NcclResults:
+    path: str
+    rows: list[NcclRow] = field(default_factory=list)
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def sizes(self) -> list[int]:
+        return [r.size for r in self.rows]
+
+    def column(self, name: str) -> list[float]:
+        return [getattr(r, name) for r in self.rows]
+
+
+def parse_nccl_lines(lines, path: str = "") -> NcclResults:
+    """Parse nccl-tests output lines into rows plus header metadata."""
+    res = NcclResults(path=path)
+    meta = res.meta
+    devices: list[str] = []
+    run = -1
+    pending_size = None
+
+    for line in lines:
+        if line.startswith('#'):
+            if 'Collective test starting' in line:
+                run += 1
+            m = _HEADER_RE.search(line)
+            if m:
+                meta.setdefault("nThread", int(m.group(1)))
+                meta.setdefault("nGpus", int(m.group(2)))
+                meta.setdefault("minBytes", int(m.group(3)))
+                meta.setdefault("maxBytes", int(m.group(4)))
+                meta.setdefault("step", int(m.group(5)))
+                meta.setdefault("step_kind", m.group(6))
+                continue
+            m = _VERSION_RE.search(line)
+            if m:
+                meta.setdefault("nccl_tests_version", m.group(1))
+                meta.setdefault("nccl_version", int(m.group(3)))
+                continue
+            m = _PROFILE_RE.match(line)
+            if m:
+                meta.setdefault("contention_profile", m.group(1).split(","))
+                continue
+            m = _DEVICE_RE.match(line)
+            if m:
+                meta.setdefault("host", m.group(2))
+                devices.append(m.group(4))
+            continue
+        if not line.strip():
+            continue
+        if line.startswith('NCCL version'):
+            meta.setdefault("nccl_version_string", line.split()[2])
+            continue
+
+        parts = line.split()
+        if len(parts) >= _MIN_ROW_FIELDS:
+            try:
+                res.rows.append(NcclRow(
+                    size=int(parts[0]),
+                    oop_time_us=float(parts[5]),
+                    oop_algbw=float(parts[6]),
+                    oop_busbw=float(parts[7]),
+                    ip_time_us=float(parts[9]),
+                    ip_algbw=float(parts[10]),
+                    ip_busbw=float(parts[11]),
+                    run=max(run, 0),
+                ))
+            except (ValueError, IndexError):
+                pass
+            pending_size = None
+            continue
+
+        m = _SIZE_ONLY_RE.match(line)
+        if m:
+            pending_size = int(m.group(1))
+            continue
+        if pending_size is not None:
+            m = _SPLIT_DATA_RE.match(line)
+            if m:
+                res.rows.append(NcclRow(size=pending_size, oop_time_us=float(m.group(1)),
+                                        oop_algbw=float(m.group(2)), run=max(run, 0)))
+                pending_size = None
+
+    if devices:
+        meta.setdefault("devices", devices)
+    meta["runs"] = run + 1 if run >= 0 else (1 if res.rows else 0)
+    return res
+
+
+def read_results(path) -> NcclResults:
+    """Read one nccl-tests output file."""
+    path = str(path)
+    with open(path, 'r', errors='replace') as f:
+        return parse_nccl_lines(f, path=path)
+
+
+def parse_bw_columns(path) -> tuple[list[int], list[float], list[float]]:
+    """(sizes, out-of-place algbw, in-place algbw) for full table rows, in file order."""
+    rows = [r for r in read_results(path).rows if r.ip_algbw == r.ip_algbw]
+    return [r.size for r in rows], [r.oop_algbw for r in rows], [r.ip_algbw for r in rows]
+
+
+def parse_latency_columns(path) -> tuple[list[int], list[float], list[float]]:
+    """(sizes, out-of-place time us, in-place time us) for full table rows, in file order."""
+    rows = [r for r in read_results(path).rows if r.ip_time_us == r.ip_time_us]
+    return [r.size for r in rows], [r.oop_time_us for r in rows], [r.ip_time_us for r in rows]
+
+
+def is_nccl_results(path) -> bool:
+    """Cheap check that a file is nccl-tests output (header line or a data row)."""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            for i, line in enumerate(f):
+                if 'nccl-tests' in line or 'all_reduce_perf' in line:
+                    return True
+                if i > 40:
+                    break
+    except OSError:
+        return False
+    return bool(read_results(path).rows)
+
+
+def load_times(path) -> list[float]:
+    """Phase 3 iteration times: one float (ms) per line; blank/invalid lines skipped.
+
+    Binary iteration traces (see trace.py) are read too.
+    """
+    path = Path(path)
+    if not path.is_file():
+        return []
+    from .trace import is_trace, load_trace_times
+    if is_trace(path):
+        return load_trace_times(path)
+    vals: list[float] = []
+    for line in path.read_text().strip().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            vals.append(float(line))
+        except ValueError:
+            continue
+    return vals
+
+
+def format_size(bytes_val: float) -> str:
+    """Format bytes to a human-readable string."""
+    if bytes_val < 1024:
+        return f"{int(bytes_val)}B"
+    elif bytes_val < 1024 * 1024:
+        return f"{bytes_val/1024:.1f}KB"
+    elif bytes_val < 1024 * 1024 * 1024:
+        return f"{bytes_val/(1024*1024):.1f}MB"
+    else:
+        return f"{bytes_val/(1024*1024*1024):.2f}GB"
+
+
+def parse_size(text: str) -> int:
+    """nccl-tests style size argument ("8", "64K", "128M", "1G") to bytes."""
+    text = text.strip().upper().rstrip("B")
+    mult = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+def short_size_label(s: int) -> str:
+    """Axis-tick label used by the bandwidth plots (integer KB/MB)."""
+    if s < 1024:
+        return f"{s}B"
+    elif s < 1024 * 1024:
+        return f"{s//1024}KB"
+    return f"{s//(1024*1024)}MB"
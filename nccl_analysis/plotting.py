@@ -0,0 +1,205 @@
+"""
+Matplotlib figures for nccl-tests results. Importing this module pulls in matplotlib,
+so only the plotting entry points import it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+
+import matplotlib
+matplotlib.use("Agg")  # non-interactive backend for saving without display
+import matplotlib.pyplot as plt
+
+from .parsing import parse_bw_columns, parse_latency_columns, short_size_label
+
+
+def plot_bandwidth(sizes, oop_bw, ip_bw, title="NCCL All-Reduce Bandwidth"):
+    """Plot bandwidth vs message size."""
+    fig, ax = plt.subplots(figsize=(12, 6))
+    size_labels = [short_size_label(s) for s in sizes]
+    ax.plot(range(len(sizes)), oop_bw, 'o-', label='Out-of-place', linewidth=2, markersize=6)
+    ax.plot(range(len(sizes)), ip_bw, 's-', label='In-place', linewidth=2, markersize=6)
+    ax.set_xlabel('Message Size', fontsize=12)
+    ax.set_ylabel('Bandwidth (GB/s)', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=11)
+    # Show every few points to avoid crowding
+    step = max(1, len(sizes) // 10)
+    ax.set_xticks(range(0, len(sizes), step))
+    ax.set_xticklabels([size_labels[i] for i in range(0, len(sizes), step)], rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def plot_single_bandwidth(sizes, bw, mode, title):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    size_labels = [short_size_label(s) for s in sizes]
+    marker = 'o-' if mode == 'Out-of-place' else 's-'
+    color = 'blue' if mode == 'Out-of-place' else 'green'
+    ax.plot(range(len(sizes)), bw, marker, label=mode, linewidth=2, markersize=6, color=color)
+    ax.set_xlabel('Message Size', fontsize=12)
+    ax.set_ylabel('Bandwidth (GB/s)', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=11)
+    step = max(1, len(sizes) // 10)
+    ax.set_xticks(range(0, len(sizes), step))
+    ax.set_xticklabels([size_labels[i] for i in range(0, len(sizes), step)], rotation=45, ha='right')
+    plt.tight_layout()
+    return fig
+
+
+def plot_latency(sizes, times, title, color='blue'):
+    """Plot latency (us) vs message size on a log x-axis."""
+    fig = plt.figure()
+    plt.plot(sizes, times, color=color)
+    plt.xlabel('Message Size (Bytes)')
+    plt.ylabel('Latency (us)')
+    plt.xscale('log')
+    plt.title(title)
+    plt.grid(True)
+    return fig
+
+
+def _plot_multi(folder_files, parse, ylabel, title_prefix, file_prefix, output_dir, arch_label=""):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    folder_label = '_'.join(folder_files.keys())
+    arch_suffix = f"_{arch_label}" if arch_label else ""
+    for folder, files in folder_files.items():
+        for f in files:
+            sizes, oop, ip = parse(f)
+            if len(sizes) == 0:
+                continue
+            ax.plot(sizes, oop, label=f"{folder} (Out-of-place)", linewidth=2)
+            ax.plot(sizes, ip, label=f"{folder} (In-place)", linewidth=2, linestyle='--')
+    ax.set_xlabel('Message Size (Bytes)', fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    title = f"{title_prefix} [{folder_label}] {arch_label}" if arch_label else f"{title_prefix} [{folder_label}]"
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=11)
+    ax.set_xscale('log')
+    plt.tight_layout()
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{file_prefix}_{folder_label}{arch_suffix}.png")
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return output_file
+
+
+def plot_multi_bandwidth(folder_files, output_dir, arch_label=""):
+    output_file = _plot_multi(folder_files, parse_bw_columns, 'Bandwidth (GB/s)',
+                              "NCCL All-Reduce Bandwidth", "multi_bw_plot", output_dir, arch_label)
+    print(f"Multi-bandwidth plot saved to: {output_file}")
+
+
+def plot_multi_latency(folder_files, output_dir, arch_label=""):
+    output_file = _plot_multi(folder_files, parse_latency_columns, 'Latency (us)',
+                              "NCCL All-Reduce Latency", "multi_latency_plot", output_dir, arch_label)
+    print(f"Multi-latency plot saved to: {output_file}")
+
+
+_COLUMN_LABELS = {"time_us": "Latency (us)", "algbw": "Algorithm bandwidth (GB/s)", "busbw": "Bus bandwidth (GB/s)"}
+
+
+def plot_aggregates(groups, output_file, band="stdev", dpi=150):
+    """One panel per {title: [aggregate.Aggregate]} group (or (title, aggs) pairs, when titles
+    repeat): median line per config with an error band.
+
+    band "stdev" shades mean ± stdev (clipped at min/max), "minmax" the full min-max range.
+    """
+    panels = list(groups.items()) if isinstance(groups, dict) else list(groups)
+    fig, axes = plt.subplots(len(panels), 1, figsize=(12, 4.5 * len(panels)), squeeze=False)
+    for ax, (title, aggs) in zip(axes[:, 0], panels):
+        for agg in aggs:
+            sizes = [s.size for s in agg.stats]
+            line, = ax.plot(sizes, [s.median for s in agg.stats], linewidth=2,
+                            label=f"{agg.label} ({len(agg.runs)} runs)")
+            if band == "minmax":
+                lo, hi = [s.min for s in agg.stats], [s.max for s in agg.stats]
+            else:
+                lo = [max(s.min, s.mean - s.stdev) for s in agg.stats]
+                hi = [min(s.max, s.mean + s.stdev) for s in agg.stats]
+            ax.fill_between(sizes, lo, hi, color=line.get_color(), alpha=0.2, linewidth=0)
+        column = aggs[0].column
+        ax.set_ylabel(_COLUMN_LABELS[column.split("_", 1)[1]], fontsize=11)
+        ax.set_title(f"{title}: median, {'min-max' if band == 'minmax' else '±1 stdev'} band "
+                     f"({'out-of-place' if column.startswith('oop') else 'in-place'})", fontsize=12)
+        ax.set_xscale('log')
+        if column.endswith("time_us"):
+            ax.set_yscale('log')
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize=9)
+    axes[-1, 0].set_xlabel('Message Size (Bytes)', fontsize=11)
+    plt.tight_layout()
+    fig.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return output_file
+
+
+_REPEAT_DIR = re.compile(r"iteration_\d+$")
+
+
+def group_repeats(folder_files):
+    """Merge iteration_<n> folders (repeats of one config) into a single "iteration" entry."""
+    groups = {}
+    for folder, files in folder_files.items():
+        groups.setdefault("iteration" if _REPEAT_DIR.match(folder) else folder, []).extend(files)
+    return groups
+
+
+# (column without the oop_/ip_ prefix, title prefix, file prefix) of the two --aggregate figures
+_AGGREGATE_FIGURES = [
+    ("algbw", "NCCL All-Reduce Bandwidth", "multi_bw_plot"),
+    ("time_us", "NCCL All-Reduce Latency", "multi_latency_plot"),
+]
+
+
+def plot_aggregate_figure(label_files, column, title, output_file, band="stdev", k=3.5, dpi=150):
+    """Out-of-place and in-place panels of {label: [results files]}, each label's files
+    pooled by aggregate.aggregate_results into a median line with an error band.
+    Returns output_file, or None if no file had data."""
+    from .aggregate import aggregate_results
+    from .parsing import read_results
+
+    results = {label: [read_results(f) for f in files] for label, files in label_files.items()}
+    panels = []
+    for placement in ("oop", "ip"):
+        aggs = [aggregate_results(res, f"{placement}_{column}", label, k) for label, res in results.items()]
+        aggs = [a for a in aggs if a.stats]
+        if aggs:
+            panels.append((title, aggs))
+    if not panels:
+        return None
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    return plot_aggregates(panels, output_file, band=band, dpi=dpi)
+
+
+def plot_multi_aggregates(folder_files, output_dir, arch_label="", band="stdev", k=3.5):
+    """plot_multi_bandwidth/plot_multi_latency with each folder's files aggregated into one
+    median ± band curve per placement; iteration_<n> folders are pooled as repeats."""
+    groups = group_repeats(folder_files)
+    folder_label = '_'.join(groups.keys())
+    arch_suffix = f"_{arch_label}" if arch_label else ""
+    for column, title_prefix, file_prefix in _AGGREGATE_FIGURES:
+        title = f"{title_prefix} [{folder_label}] {arch_label}" if arch_label else f"{title_prefix} [{folder_label}]"
+        output_file = os.path.join(output_dir, f"{file_prefix}_{folder_label}{arch_suffix}_aggregate.png")
+        if plot_aggregate_figure(groups, column, title, output_file, band, k):
+            print(f"Aggregated plot saved to: {output_file}")
+
+
+def find_txt_files(folders):
+    """{folder basename: [.txt files directly inside it]} for folders that have any."""
+    folder_files = {}
+    for folder in folders:
+        txt_files = []
+        for f in os.listdir(folder):
+            full_path = os.path.join(folder, f)
+            if os.path.isfile(full_path) and f.endswith('.txt'):
+                txt_files.append(full_path)
+        if txt_files:
+            folder_files[os.path.basename(os.path.normpath(folder))] = txt_files
+    return folder_files
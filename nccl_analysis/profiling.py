@@ -0,0 +1,187 @@
+"""
+Per-kernel breakdown of sampled `iteration_proxy.py --profile-dir` traces.
+
+The proxy wraps each profiled iteration in a `proxy_iter_<i>` record_function and
+exports one Chrome trace per sampled step (or step range). This module reads those
+traces back and, for every iteration, sums three kinds of GPU kernels:
+
+- comm: NCCL kernels (ncclKernel_*, ncclDevKernel_*);
+- gemm: matmul kernels (cuBLAS / CUTLASS gemm, xmma);
+- other: everything else (random init, copies, elementwise).
+
+Times are unions of intervals, so concurrent kernels are not counted twice. The
+overlap fraction is the share of comm time during which a GEMM was also running: 0
+means the two serialized, 1 means communication was fully hidden. Traces from CPU
+(gloo) runs have no kernels; their CPU operators are classified the same way
+(c10d/gloo all-reduce vs aten::mm).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+ITER_MARK = "proxy_iter_"
+_GEMM = ("gemm", "cutlass", "xmma", "aten::mm", "aten::matmul", "aten::addmm", "aten::bmm")
+_COMM = ("nccl", "gloo", "allreduce", "all_reduce")
+
+
+@dataclass
+class Event:
+    name: str
+    ts: float   # us
+    dur: float  # us
+
+    @property
+    def end(self) -> float:
+        return self.ts + self.dur
+
+
+@dataclass
+class StepBreakdown:
+    trace: str
+    iteration: int
+    device: str           # "cuda" (kernels) or "cpu" (operators)
+    span_ms: float
+    comm_ms: float
+    gemm_ms: float
+    other_ms: float
+    overlap_ms: float
+    kernels: dict[str, list[float]] = field(default_factory=dict)  # name -> durations (ms)
+
+    @property
+    def overlap_frac(self) -> float:
+        return self.overlap_ms / self.comm_ms if self.comm_ms else float("nan")
+
+    def row(self) -> dict[str, float | str | int]:
+        return {"trace": self.trace, "iteration": self.iteration, "device": self.device, "span_ms": self.span_ms,
+                "comm_ms": self.comm_ms, "gemm_ms": self.gemm_ms, "other_ms": self.other_ms,
+                "overlap_ms": self.overlap_ms, "overlap_frac": self.overlap_frac}
+
+
+def classify(name: str) -> str:
+    low = name.lower()
+    if any(k in low for k in _COMM):
+        return "comm"
+    if any(k in low for k in _GEMM):
+        return "gemm"
+    return "other"
+
+
+def _union(events: list[Event]) -> list[tuple[float, float]]:
+    merged: list[tuple[float, float]] = []
+    for e in sorted(events, key=lambda e: e.ts):
+        if merged and e.ts <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e.end))
+        else:
+            merged.append((e.ts, e.end))
+    return merged
+
+
+def _length(spans: list[tuple[float, float]]) -> float:
+    return sum(b - a for a, b in spans)
+
+
+def _intersection(a: list[tuple[float, float]], b: list[tuple[float, float]]) -> float:
+    total, i, j = 0.0, 0, 0
+    while i < len(a) and j < len(b):
+        lo, hi = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        total += max(0.0, hi - lo)
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def load_trace(path) -> tuple[list[Event], list[Event], list[Event]]:
+    """(iteration markers, GPU kernels, CPU operators) of one Chrome trace."""
+    with open(path) as f:
+        data = json.load(f)
+    events = data["traceEvents"] if isinstance(data, dict) else data
+    marks, kernels, ops = [], [], []
+    for e in events:
+        if e.get("ph") != "X" or "dur" not in e:
+            continue
+        cat = str(e.get("cat", "")).lower()
+        ev = Event(e.get("name", ""), float(e["ts"]), float(e["dur"]))
+        if cat == "user_annotation" and ev.name.startswith(ITER_MARK):
+            marks.append(ev)
+        elif cat == "kernel":
+            kernels.append(ev)
+        elif cat == "cpu_op":
+            ops.append(ev)
+    return marks, kernels, ops
+
+
+def breakdown(path) -> list[StepBreakdown]:
+    """One StepBreakdown per marked iteration in the trace (the whole trace if unmarked)."""
+    marks, kernels, ops = load_trace(path)
+    device, events = ("cuda", kernels) if kernels else ("cpu", ops)
+    if not marks:
+        m = re.search(r"iter(\d+)", Path(path).stem)
+        lo = min((e.ts for e in events), default=0.0)
+        hi = max((e.end for e in events), default=0.0)
+        marks = [Event(f"{ITER_MARK}{m.group(1) if m else 0}", lo, hi - lo)]
+    out = []
+    for mark in sorted(marks, key=lambda e: e.ts):
+        # Kernels are attributed by start time: the proxy synchronizes at the end of
+        # each phase, so an iteration's kernels start inside its CPU-side marker.
+        inside = [e for e in events if mark.ts <= e.ts < mark.end]
+        groups: dict[str, list[Event]] = {"comm": [], "gemm": [], "other": []}
+        per_kernel: dict[str, list[float]] = {}
+        for e in inside:
+            groups[classify(e.name)].append(e)
+            per_kernel.setdefault(e.name, []).append(e.dur / 1000)
+        comm, gemm = _union(groups["comm"]), _union(groups["gemm"])
+        out.append(StepBreakdown(
+            trace=Path(path).name, iteration=int(mark.name[len(ITER_MARK):] or 0), device=device,
+            span_ms=mark.dur / 1000, comm_ms=_length(comm) / 1000, gemm_ms=_length(gemm) / 1000,
+            other_ms=_length(_union(groups["other"])) / 1000, overlap_ms=_intersection(comm, gemm) / 1000,
+            kernels=per_kernel))
+    return out
+
+
+def load_breakdowns(inputs: list[str]) -> list[StepBreakdown]:
+    """Breakdowns of every trace_*.json under the given files or directories, by iteration."""
+    paths: list[Path] = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            paths.extend(sorted(item.glob("trace_*.json")))
+        elif item.is_file():
+            paths.append(item)
+    steps = [s for p in paths for s in breakdown(p)]
+    return sorted(steps, key=lambda s: (s.trace.split("_iter")[0], s.iteration))
+
+
+def kernel_table(steps: list[StepBreakdown]) -> list[dict[str, float | str | int]]:
+    """Per-kernel totals over all steps, largest total first."""
+    durations: dict[str, list[float]] = {}
+    for s in steps:
+        for name, ds in s.kernels.items():
+            durations.setdefault(name, []).extend(ds)
+    rows = [{"kernel": name, "kind": classify(name), "count": len(ds), "total_ms": sum(ds),
+             "mean_ms": sum(ds) / len(ds), "max_ms": max(ds)} for name, ds in durations.items()]
+    return sorted(rows, key=lambda r: -r["total_ms"])
+
+
+def print_breakdowns(steps: list[StepBreakdown], top: int = 10) -> None:
+    header = (f"{'iter':>6} {'device':<6} {'span':>9} {'comm':>9} {'gemm':>9} {'other':>9} {'overlap':>9} "
+              f"{'overlap%':>8}  trace")
+    print("Per-iteration breakdown (ms; comm/gemm/other are unions of kernel time):")
+    print(header)
+    print("-" * len(header))
+    for s in steps:
+        frac = f"{s.overlap_frac * 100:>7.1f}%" if s.comm_ms else f"{'-':>8}"
+        print(f"{s.iteration:>6} {s.device:<6} {s.span_ms:>9.3f} {s.comm_ms:>9.3f} {s.gemm_ms:>9.3f} "
+              f"{s.other_ms:>9.3f} {s.overlap_ms:>9.3f} {frac}  {s.trace}")
+    rows = kernel_table(steps)[:top]
+    if not rows:
+        return
+    print(f"\nTop {len(rows)} kernels by total time:")
+    print(f"{'kind':<6} {'count':>6} {'total':>9} {'mean':>9} {'max':>9}  kernel")
+    for r in rows:
+        name = r["kernel"] if len(r["kernel"]) <= 80 else r["kernel"][:77] + "..."
+        print(f"{r['kind']:<6} {r['count']:>6} {r['total_ms']:>9.3f} {r['mean_ms']:>9.3f} {r['max_ms']:>9.3f}  {name}")
@@ -0,0 +1,180 @@
+"""
+Adaptive size refinement for nccl-tests sweeps.
+
+The runners sample sizes with `-b 8 -e 128M -f 2`, so a crossover between forced
+configs (or a bend in AUTO's curve) is only known to within a factor of two. This
+module finds those intervals in the data gathered so far and plans extra linear
+`-b <lo> -e <hi> -i <step>` runs inside them. Each round re-detects intervals from all
+accumulated data, so a crossover interval shrinks by roughly (points + 1)x per round
+until it is narrower than the requested relative resolution.
+
+The planning functions are pure; `refine` drives them with a caller-supplied runner
+(see phase1-baseline/scripts/run_adaptive_sweep.py).
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from .catalog import ResultFile, ResultKey, config_env
+from .crossover import curve_samples, fit_segments
+
+COARSE_ARGS = ["-b", "8", "-e", "128M", "-f", "2"]
+
+
+@dataclass
+class Interval:
+    """Size range [lo, hi] (bytes) containing a crossover or a change point."""
+
+    lo: int
+    hi: int
+    configs: tuple[ResultKey, ...]
+    reason: str
+
+    @property
+    def ratio(self) -> float:
+        return self.hi / self.lo - 1.0 if self.lo > 0 else float("inf")
+
+    def converged(self, resolution: float) -> bool:
+        return self.ratio <= resolution
+
+
+@dataclass
+class Probe:
+    """One extra nccl-tests run: sizes begin, begin+step, ..., end for one config."""
+
+    key: ResultKey
+    begin: int
+    end: int
+    step: int
+    reasons: list[str] = field(default_factory=list)
+
+    def args(self) -> list[str]:
+        return ["-b", str(self.begin), "-e", str(self.end), "-i", str(self.step)]
+
+    @property
+    def env(self) -> dict[str, str]:
+        return config_env(self.key)
+
+
+def median_curves(files: list[ResultFile]) -> dict[ResultKey, tuple[np.ndarray, np.ndarray]]:
+    """{key: (sizes in bytes, median log time)} pooling repeated runs of the same key."""
+    by_key: dict[ResultKey, list[ResultFile]] = defaultdict(list)
+    for f in files:
+        by_key[f.key].append(f)
+    curves = {}
+    for key, group in by_key.items():
+        x, y, _ = curve_samples(group)
+        if len(x):
+            curves[key] = (np.rint(2 ** x).astype(np.int64), y)
+    return curves
+
+
+def find_intervals(curves: dict[ResultKey, tuple[np.ndarray, np.ndarray]], min_gap: float = 0.03,
+                   bends: bool = True, max_segments: int = 4) -> list[Interval]:
+    """Crossover intervals between configs of the same group, plus AUTO change-point intervals.
+
+    With d = log(t_a / t_b) on the commonly measured sizes, a crossover lies between
+    two consecutive sizes with |d| >= min_gap and opposite signs; points in between are
+    within noise. The reported interval is the pair of adjacent measured sizes around
+    the root of a line fitted to d over that span, so sign flicker near the crossing
+    does not split it and the flat small-message region is never refined.
+    """
+    keys = sorted(curves, key=lambda k: (k.group, k.config))
+    found: list[Interval] = []
+    for i, a in enumerate(keys):
+        for b in keys[i + 1:]:
+            if a.group != b.group:
+                continue
+            sa, ya = curves[a]
+            sb, yb = curves[b]
+            common, ia, ib = np.intersect1d(sa, sb, return_indices=True)
+            if len(common) < 2:
+                continue
+            d = ya[ia] - yb[ib]
+            x = np.log2(common)
+            sig = np.nonzero(np.abs(d) >= min_gap)[0]
+            for p, q in zip(sig[:-1], sig[1:]):
+                if np.sign(d[p]) == np.sign(d[q]):
+                    continue
+                # Noise can flip the sign several times between two clearly separated
+                # points; a line through d over [p, q] gives one crossing estimate.
+                slope, icpt = np.polyfit(x[p:q + 1], d[p:q + 1], 1)
+                root = -icpt / slope if slope else 0.5 * (x[p] + x[q])
+                j = int(np.clip(np.searchsorted(x, root), p + 1, q))
+                found.append(Interval(int(common[j - 1]), int(common[j]), (a, b),
+                                      f"{a.config} vs {b.config}"))
+    if bends:
+        for key in keys:
+            if key.config != "auto":
+                continue
+            sizes, y = curves[key]
+            if len(sizes) < 6:
+                continue
+            fit = fit_segments(np.log2(sizes), y, max_segments=max_segments)
+            for bp in fit.breakpoints:
+                j = int(np.searchsorted(np.log2(sizes), bp))
+                found.append(Interval(int(sizes[j - 1]), int(sizes[j]), (key,), "auto change point"))
+    return found
+
+
+def plan_probes(intervals: list[Interval], resolution: float = 0.05, points: int = 3,
+                align: int = 256) -> list[Probe]:
+    """Probes splitting each unconverged interval into points + 1 equal parts.
+
+    Sizes are multiples of `align` bytes (nccl-tests rounds sizes to the element count
+    anyway); intervals narrower than that cannot be refined further and are skipped.
+    """
+    probes: dict[tuple[ResultKey, int, int, int], Probe] = {}
+    for iv in intervals:
+        if iv.converged(resolution):
+            continue
+        step = (iv.hi - iv.lo) // (points + 1) // align * align
+        if step < align:
+            continue
+        begin = -(-iv.lo // align) * align + step
+        end = min(begin + (points - 1) * step, iv.hi - 1)
+        if end < begin:
+            continue
+        for key in iv.configs:
+            probe = probes.setdefault((key, begin, end, step), Probe(key, begin, end, step))
+            probe.reasons.append(iv.reason)
+    return list(probes.values())
+
+
+def refine(files: list[ResultFile], run: Callable[[Probe], list[ResultFile]], resolution: float = 0.05,
+           points: int = 3, max_rounds: int = 8, min_gap: float = 0.03, align: int = 256,
+           log: Callable[[str], None] = print) -> tuple[list[Interval], list[ResultFile]]:
+    """Alternate find_intervals / plan_probes / run until every interval is pinned or max_rounds.
+
+    Returns the final intervals and all result files (initial + refinement runs).
+    """
+    files = list(files)
+    intervals: list[Interval] = []
+    for rnd in range(1, max_rounds + 1):
+        intervals = find_intervals(median_curves(files), min_gap=min_gap)
+        probes = plan_probes(intervals, resolution=resolution, points=points, align=align)
+        open_count = sum(not iv.converged(resolution) for iv in intervals)
+        log(f"Round {rnd}: {len(intervals)} intervals ({open_count} open), {len(probes)} runs")
+        if not probes:
+            break
+        for probe in probes:
+            files.extend(run(probe))
+    return intervals, files
+
+
+def print_intervals(intervals: list[Interval], resolution: float) -> None:
+    from .parsing import format_size
+
+    header = f"{'platform':<8} {'gpus':>4} {'contention':<11} {'interval':<34} {'low':>10} {'high':>10} {'width':>7}"
+    print(header)
+    print("-" * len(header))
+    for iv in sorted(intervals, key=lambda v: (v.configs[0].group, v.reason, v.lo)):
+        platform, n_gpus, contention = iv.configs[0].group
+        state = "" if iv.converged(resolution) else "  (open)"
+        print(f"{platform:<8} {n_gpus:>4} {contention:<11} {iv.reason:<34} "
+              f"{format_size(iv.lo):>10} {format_size(iv.hi):>10} {iv.ratio:>6.1%}{state}")
@@ -0,0 +1,150 @@
+"""
+Statistical comparison of iteration-time result sets, usable as a regression gate.
+
+With ~50 iterations per run and occasional warm-up spikes, a few percent between two
+configs can be noise. For each candidate and metric (mean, p50, p90, p95), this
+module reports:
+
+- the relative change against the baseline (candidate / baseline - 1; positive is
+  slower) with a percentile-bootstrap confidence interval;
+- a permutation-test p-value for that metric;
+- a Mann-Whitney rank-sum test over the whole distribution, with Cliff's delta as its
+  effect size.
+
+A candidate regresses on a gated metric when it is slower by more than `threshold`
+and the Holm-adjusted p-value across all gated tests is below `alpha`.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from .parsing import load_times
+from .stats import holm, mann_whitney, permutation_test, ratio_ci
+
+
+def _quantile(q: float):
+    return lambda x, axis=-1: np.percentile(x, q, axis=axis)
+
+
+METRICS = {"mean": np.mean, "p50": np.median, "p90": _quantile(90), "p95": _quantile(95)}
+
+
+@dataclass
+class MetricComparison:
+    metric: str
+    baseline: float
+    candidate: float
+    change: float           # candidate / baseline - 1
+    change_lo: float
+    change_hi: float
+    p: float
+    p_adj: float = math.nan
+    gated: bool = False
+    regressed: bool = False
+
+
+@dataclass
+class Comparison:
+    label: str
+    baseline_label: str
+    n_baseline: int
+    n_candidate: int
+    rank_p: float
+    cliffs_delta: float
+    metrics: list[MetricComparison] = field(default_factory=list)
+
+    @property
+    def regressed(self) -> bool:
+        return any(m.regressed for m in self.metrics)
+
+
+def _label(path: Path) -> str:
+    name = path.stem
+    return name[len("iteration_times_"):] if name.startswith("iteration_times_") else name
+
+
+def resolve_pairs(baseline: str, candidates: list[str]) -> list[tuple[str, str, Path, Path]]:
+    """(baseline label, candidate label, baseline path, candidate path) to compare.
+
+    Files are compared directly. Directories are matched by config: each
+    iteration_times_<cfg>.txt in a candidate directory against the baseline directory's.
+    """
+    base = Path(baseline)
+    pairs = []
+    for cand in map(Path, candidates):
+        if base.is_dir() != cand.is_dir():
+            raise ValueError(f"compare files with files and directories with directories: {base}, {cand}")
+        if not base.is_dir():
+            pairs.append((_label(base), _label(cand), base, cand))
+            continue
+        for path in sorted(cand.glob("iteration_times_*.txt")):
+            ref = base / path.name
+            if ref.is_file():
+                cfg = _label(path)
+                pairs.append((f"{base.name}/{cfg}", f"{cand.name}/{cfg}", ref, path))
+    return pairs
+
+
+def compare(base: list[float], cand: list[float], label: str, baseline_label: str, metrics=tuple(METRICS),
+            level: float = 0.95, n_boot: int = 5000, n_perm: int = 5000, seed: int = 0) -> Comparison:
+    _, rank_p, delta = mann_whitney(base, cand)
+    out = Comparison(label, baseline_label, len(base), len(cand), rank_p, delta)
+    for name in metrics:
+        stat = METRICS[name]
+        ratio, lo, hi = ratio_ci(cand, base, stat=stat, n_boot=n_boot, level=level, seed=seed)
+        out.metrics.append(MetricComparison(
+            name, float(stat(np.asarray(base), axis=-1)), float(stat(np.asarray(cand), axis=-1)),
+            ratio - 1, lo - 1, hi - 1, permutation_test(base, cand, stat=stat, n_perm=n_perm, seed=seed)))
+    return out
+
+
+def gate(comparisons: list[Comparison], gate_metrics=("mean", "p95"), threshold: float = 0.03,
+         alpha: float = 0.05) -> bool:
+    """Mark regressions in place (Holm across every gated test); True if any candidate regressed."""
+    gated = [m for c in comparisons for m in c.metrics if m.metric in gate_metrics]
+    if not gated:
+        return False
+    for m, p_adj in zip(gated, holm([m.p for m in gated])):
+        m.gated, m.p_adj = True, float(p_adj)
+        m.regressed = m.change > threshold and m.p_adj < alpha
+    return any(c.regressed for c in comparisons)
+
+
+def load_comparisons(baseline: str, candidates: list[str], skip: int = 0, **kwargs) -> list[Comparison]:
+    out = []
+    for base_label, cand_label, base_path, cand_path in resolve_pairs(baseline, candidates):
+        base, cand = load_times(base_path)[skip:], load_times(cand_path)[skip:]
+        if len(base) < 2 or len(cand) < 2:
+            print(f"Skipping {cand_label}: fewer than 2 samples after --skip {skip}")
+            continue
+        out.append(compare(base, cand, cand_label, base_label, **kwargs))
+    return out
+
+
+def print_comparisons(comparisons: list[Comparison], threshold: float, alpha: float, level: float = 0.95) -> None:
+    pct = int(round(level * 100))
+    header = (f"{'metric':<6} {'baseline':>9} {'candidate':>9} {'change':>8} {f'{pct}% CI':>18} "
+              f"{'p':>7} {'p (Holm)':>8}  verdict")
+    for c in comparisons:
+        print(f"\n{c.label} vs {c.baseline_label}  (n = {c.n_candidate} vs {c.n_baseline}; "
+              f"rank-sum p = {c.rank_p:.3g}, Cliff's delta = {c.cliffs_delta:+.2f})")
+        print(header)
+        print("-" * len(header))
+        for m in c.metrics:
+            if m.regressed:
+                verdict = "REGRESSION"
+            elif m.gated and m.change < -threshold and m.p_adj < alpha:
+                verdict = "improved"
+            elif m.gated:
+                verdict = "ok"
+            else:
+                verdict = ""
+            p_adj = f"{m.p_adj:>8.3g}" if m.gated else f"{'-':>8}"
+            ci = f"[{m.change_lo * 100:+.1f}%, {m.change_hi * 100:+.1f}%]"
+            print(f"{m.metric:<6} {m.baseline:>9.3f} {m.candidate:>9.3f} {m.change * 100:>+7.1f}% {ci:>18} "
+                  f"{m.p:>7.3g} {p_adj}  {verdict}")
@@ -0,0 +1,305 @@
+"""
+Batch rendering of the per-file bandwidth and latency figures for every nccl-tests
+results file under one or more directory trees. Rendering is fanned out over a
+process pool, and a manifest records a hash of each figure's input file and
+plotting parameters so unchanged figures are skipped. With --aggregate, the files of
+sibling iteration_<n>/ directories (repeats of one config) additionally get one
+bandwidth and one latency figure of their median with a stdev or min-max band.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .parsing import is_nccl_results, parse_bw_columns, parse_latency_columns
+
+# Bump when figure code changes so every manifest entry goes stale.
+RENDER_VERSION = 1
+MANIFEST_NAME = ".render_manifest.json"
+FULL_DPI = 300
+PREVIEW_DPI = 72
+
+# (kind, output subdirectory, filename suffix); matches plot_nccl_bw.py / plot_nccl_latency.py
+FIGURES = [
+    ("bw_combined", "bandwidth_graphs", "_bw_plot.png"),
+    ("bw_out_of_place", "bandwidth_graphs", "_out_of_place_bw.png"),
+    ("bw_in_place", "bandwidth_graphs", "_in_place_bw.png"),
+    ("lat_out_of_place", "latency_graphs", "_out_of_place.png"),
+    ("lat_in_place", "latency_graphs", "_in_place.png"),
+]
+
+# --aggregate figures of one iteration_<n>/ repeat group, named after the group's directory
+REPEAT_FIGURES = [
+    ("agg_bw", "bandwidth_graphs", "_aggregate_bw.png"),
+    ("agg_lat", "latency_graphs", "_aggregate_latency.png"),
+]
+REPEAT_DIR = re.compile(r"iteration_\d+$")
+
+
+RESULT_PATTERNS = "*.txt,*.out"
+
+
+def find_results_files(roots, pattern=RESULT_PATTERNS):
+    """Walk each root and return nccl-tests output files matching one of the comma-separated globs."""
+    patterns = [p.strip() for p in pattern.split(",") if p.strip()]
+    found = []
+    for root in roots:
+        if os.path.isfile(root):
+            found.append(os.path.abspath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for name in sorted(filenames):
+                full_path = os.path.join(dirpath, name)
+                if any(fnmatch.fnmatch(name, p) for p in patterns) and is_nccl_results(full_path):
+                    found.append(os.path.abspath(full_path))
+    return found
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def figure_key(input_digest, kind, dpi, arch_label, band=None):
+    """Hash of everything that determines a figure's pixels."""
+    params = {"v": RENDER_VERSION, "kind": kind, "dpi": dpi, "arch": arch_label}
+    if band is not None:
+        params["band"] = band
+    params = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(f"{input_digest}:{params}".encode()).hexdigest()
+
+
+def output_base(input_file, roots, output_dir):
+    """Figure name stem: the input's own name, or with --output_dir its path from the
+    root it was found under, root name included (phase1-baseline_a100-8gpu_results_results),
+    so per-platform results.txt files never collide. The stem depends only on the file
+    and its root, never on which other inputs are present."""
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    if not output_dir:
+        return name
+    parent = os.path.dirname(input_file)
+    top = next((os.path.abspath(r) for r in roots
+                if os.path.isdir(r) and (parent + os.sep).startswith(os.path.abspath(r) + os.sep)), parent)
+    rel = os.path.relpath(parent, os.path.dirname(top))
+    return f"{rel.replace(os.sep, '_')}_{name}"
+
+
+def output_path(input_file, kind_subdir, suffix, output_dir, preview, base=None):
+    """Figures go next to the input (in bandwidth_graphs/ or latency_graphs/) unless --output_dir is set."""
+    base = base or os.path.splitext(os.path.basename(input_file))[0]
+    parent = output_dir if output_dir else os.path.dirname(input_file)
+    if preview:
+        kind_subdir = os.path.join("preview", kind_subdir)
+    return os.path.join(parent, kind_subdir, f"{base}{suffix}")
+
+
+def load_manifest(path):
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"Warning: ignoring unreadable manifest {path}", file=sys.stderr)
+        return {}
+
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def render_file(input_file, jobs, dpi, arch_label):
+    """Worker: parse one results file once and render the requested figures.
+
+    jobs is a list of (kind, out_path). Returns the list of out_paths written.
+    """
+    import matplotlib.pyplot as plt
+    from .plotting import plot_bandwidth, plot_latency, plot_single_bandwidth
+
+    base = os.path.splitext(os.path.basename(input_file))[0]
+    written = []
+    kinds = {kind for kind, _ in jobs}
+    if kinds & {"bw_combined", "bw_out_of_place", "bw_in_place"}:
+        sizes, oop_bw, ip_bw = parse_bw_columns(input_file)
+    if kinds & {"lat_out_of_place", "lat_in_place"}:
+        lat_sizes, out_times, in_times = parse_latency_columns(input_file)
+    suffix = f" {arch_label}" if arch_label else ""
+
+    for kind, out_path in jobs:
+        if kind == "bw_combined":
+            fig = plot_bandwidth(sizes, oop_bw, ip_bw, title=f"NCCL All-Reduce Bandwidth{suffix}")
+        elif kind == "bw_out_of_place":
+            fig = plot_single_bandwidth(sizes, oop_bw, 'Out-of-place', f"NCCL Out-of-place Bandwidth{suffix} ({base})")
+        elif kind == "bw_in_place":
+            fig = plot_single_bandwidth(sizes, ip_bw, 'In-place', f"NCCL In-place Bandwidth{suffix} ({base})")
+        elif kind == "lat_out_of_place":
+            fig = plot_latency(lat_sizes, out_times, f"NCCL AllReduce Out-of-place Latency vs Message Size{suffix}", color='blue')
+        else:
+            fig = plot_latency(lat_sizes, in_times, f"NCCL AllReduce In-place Latency vs Message Size{suffix}", color='green')
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        fig.savefig(out_path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+        written.append(out_path)
+    return written
+
+
+def plan(files, manifest, manifest_dir, dpi, arch_label, output_dir, preview, force=False, roots=()):
+    """Return {input_file: [(kind, out_path, key), ...]} for figures that are stale or missing.
+
+    Manifest entries are keyed by figure path relative to the manifest's directory.
+    """
+    todo = {}
+    for input_file in files:
+        digest = file_digest(input_file)
+        base = output_base(input_file, roots, output_dir)
+        for kind, subdir, suffix in FIGURES:
+            out_path = output_path(input_file, subdir, suffix, output_dir, preview, base)
+            key = figure_key(digest, kind, dpi, arch_label)
+            rel = os.path.relpath(out_path, manifest_dir)
+            if not force and manifest.get(rel) == key and os.path.isfile(out_path):
+                continue
+            todo.setdefault(input_file, []).append((kind, out_path, key))
+    return todo
+
+
+def repeat_groups(files):
+    """{directory: [files]} for files in two or more of its iteration_<n>/ subdirectories."""
+    groups = {}
+    for f in files:
+        parent = os.path.dirname(f)
+        if REPEAT_DIR.match(os.path.basename(parent)):
+            groups.setdefault(os.path.dirname(parent), []).append(f)
+    return {d: fs for d, fs in groups.items() if len({os.path.dirname(f) for f in fs}) > 1}
+
+
+def render_repeats(group_dir, files, jobs, dpi, arch_label, band):
+    """Worker: pool a repeat group's runs and render its aggregate figures; returns the out_paths written."""
+    from .plotting import plot_aggregate_figure
+
+    label = f"{os.path.basename(group_dir)} iteration_*"
+    suffix = f" {arch_label}" if arch_label else ""
+    written = []
+    for kind, out_path in jobs:
+        if kind == "agg_bw":
+            out = plot_aggregate_figure({label: files}, "algbw", f"NCCL All-Reduce Bandwidth{suffix}", out_path,
+                                        band=band, dpi=dpi)
+        else:
+            out = plot_aggregate_figure({label: files}, "time_us", f"NCCL All-Reduce Latency{suffix}", out_path,
+                                        band=band, dpi=dpi)
+        if out:
+            written.append(out)
+    return written
+
+
+def plan_repeats(files, manifest, manifest_dir, dpi, arch_label, output_dir, preview, band, force=False, roots=()):
+    """Return {group_dir: [(kind, out_path, key), ...]} for stale or missing --aggregate figures.
+
+    A group's key hashes the digests of all its files, so adding a repeat re-renders it.
+    """
+    todo = {}
+    for group_dir, group_files in repeat_groups(files).items():
+        digest = hashlib.sha256(" ".join(sorted(file_digest(f) for f in group_files)).encode()).hexdigest()
+        # A stand-in input file directly in the group directory names the figures after it.
+        stand_in = os.path.join(group_dir, "iteration")
+        base = output_base(stand_in, roots, output_dir)
+        for kind, subdir, suffix in REPEAT_FIGURES:
+            out_path = output_path(stand_in, subdir, suffix, output_dir, preview, base)
+            key = figure_key(digest, kind, dpi, arch_label, band)
+            rel = os.path.relpath(out_path, manifest_dir)
+            if not force and manifest.get(rel) == key and os.path.isfile(out_path):
+                continue
+            todo.setdefault(group_dir, []).append((kind, out_path, key))
+    return todo
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument('roots', nargs='+', help='Directories (searched recursively) or individual results files')
+    parser.add_argument('--pattern', type=str, default=RESULT_PATTERNS,
+                        help=f'Comma-separated filename globs selecting result files (default: {RESULT_PATTERNS}, '
+                             'as catalog.discover)')
+    parser.add_argument('--output_dir', type=str, default='', help='Write all figures here instead of next to each input')
+    parser.add_argument('--arch', type=str, default='', help='GPU architecture label for plot titles')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--preview', action='store_true', help=f'Fast {PREVIEW_DPI}-dpi render into preview/ subdirectories')
+    parser.add_argument('--dpi', type=int, default=0, help=f'Override output dpi (default {FULL_DPI}, or {PREVIEW_DPI} with --preview)')
+    parser.add_argument('--manifest', type=str, default='', help=f'Manifest path (default: <first root>/{MANIFEST_NAME})')
+    parser.add_argument('--force', action='store_true', help='Re-render everything regardless of the manifest')
+    parser.add_argument('--dry-run', action='store_true', help='List figures that would be rendered and exit')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Also pool the files of sibling iteration_<n>/ directories into median figures with an error band '
+                             '(with plot --multi: one banded curve per folder)')
+    parser.add_argument('--band', choices=('stdev', 'minmax'), default='stdev', help='Error band with --aggregate (default: stdev)')
+
+
+def run(args) -> int:
+    """Render stale figures; returns a process exit code."""
+    dpi = args.dpi or (PREVIEW_DPI if args.preview else FULL_DPI)
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else ''
+    first_root = args.roots[0] if os.path.isdir(args.roots[0]) else os.path.dirname(os.path.abspath(args.roots[0]))
+    manifest_path = args.manifest or os.path.join(output_dir or first_root, MANIFEST_NAME)
+
+    files = find_results_files(args.roots, args.pattern)
+    if not files:
+        print("No NCCL results files found under the provided paths.")
+        return 1
+
+    manifest = load_manifest(manifest_path)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    todo = plan(files, manifest, manifest_dir, dpi, args.arch, output_dir, args.preview, force=args.force,
+                roots=args.roots)
+    groups = repeat_groups(files) if args.aggregate else {}
+    group_todo = plan_repeats(files, manifest, manifest_dir, dpi, args.arch, output_dir, args.preview, args.band,
+                              force=args.force, roots=args.roots) if groups else {}
+    n_figs = sum(len(v) for v in todo.values()) + sum(len(v) for v in group_todo.values())
+    n_total = len(files) * len(FIGURES) + len(groups) * len(REPEAT_FIGURES)
+    print(f"{len(files)} results files, {n_total} figures: {n_figs} to render, {n_total - n_figs} up to date (dpi={dpi})")
+
+    if args.dry_run:
+        for jobs in list(todo.values()) + list(group_todo.values()):
+            for kind, out_path, _ in jobs:
+                print(f"  {out_path}")
+        return 0
+    if not todo and not group_todo:
+        return 0
+
+    keys = {out_path: key for jobs in list(todo.values()) + list(group_todo.values()) for _, out_path, key in jobs}
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(render_file, input_file, [(k, p) for k, p, _ in jobs], dpi, args.arch): input_file
+            for input_file, jobs in todo.items()
+        }
+        futures.update({
+            pool.submit(render_repeats, group_dir, groups[group_dir], [(k, p) for k, p, _ in jobs], dpi, args.arch,
+                        args.band): group_dir
+            for group_dir, jobs in group_todo.items()
+        })
+        for fut in as_completed(futures):
+            input_file = futures[fut]
+            try:
+                written = fut.result()
+            except Exception as e:
+                failures += 1
+                print(f"Error rendering {input_file}: {e}", file=sys.stderr)
+                continue
+            for out_path in written:
+                manifest[os.path.relpath(out_path, manifest_dir)] = keys[out_path]
+                print(f"Saved {out_path}")
+            # Persist after every file so an interrupted run keeps its progress.
+            save_manifest(manifest_path, manifest)
+
+    print(f"Manifest: {manifest_path}")
+    return 1 if failures else 0
@@ -0,0 +1,114 @@
+"""
+World-size scaling curves from `iteration_proxy.py --scaling` runs.
+
+One launch at full world size runs the compute + all-reduce step on subgroups of
+ranks 0..k-1 for k = 2, 4, ..., N (`dist.new_group`); the other ranks wait on a CPU
+barrier. Each iteration time is the maximum over the subgroup's ranks. Per rank
+count this module reports iteration time, all-reduce time and the all-reduce's
+algorithmic and bus bandwidth (nccl-tests definitions), so 2-, 4- and 8-rank behavior
+comes from one container instead of one launch each.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .iteration import summarize
+
+
+@dataclass
+class ScalingPoint:
+    ranks: int
+    iter_ms: list[float]
+    comm_ms: list[float]
+
+
+@dataclass
+class ScalingRun:
+    path: str
+    config: str
+    backend: str
+    world_size: int
+    size_bytes: int
+    compute_mul: int
+    points: list[ScalingPoint] = field(default_factory=list)
+
+    def rows(self) -> list[dict[str, float | str | int]]:
+        rows = []
+        base = None
+        for pt in sorted(self.points, key=lambda p: p.ranks):
+            it, comm = summarize(pt.iter_ms), summarize(pt.comm_ms)
+            if not it:
+                continue
+            algbw = self.size_bytes / (comm["p50"] * 1e-3) / 1e9 if comm and comm["p50"] > 0 else float("nan")
+            n = pt.ranks
+            base = base or it["p50"]
+            rows.append({
+                "config": self.config, "backend": self.backend, "size_bytes": self.size_bytes, "ranks": n,
+                "iters": int(it["n"]), "iter_mean_ms": it["mean"], "iter_p50_ms": it["p50"], "iter_p95_ms": it["p95"],
+                "comm_p50_ms": comm["p50"] if comm else float("nan"),
+                "algbw_gbps": algbw, "busbw_gbps": algbw * (2 * (n - 1) / n if n > 1 else 1.0),
+                "iter_vs_smallest": it["p50"] / base,
+            })
+        return rows
+
+
+def load_run(path) -> ScalingRun:
+    rec = json.loads(Path(path).read_text())
+    run = ScalingRun(str(path), rec.get("config", "auto"), rec.get("backend", "nccl"), int(rec["world_size"]),
+                     int(rec["size_bytes"]), int(rec["compute_mul"]))
+    for g in rec["groups"]:
+        run.points.append(ScalingPoint(int(g["ranks"]), g["iter_ms"], g["comm_ms"]))
+    return run
+
+
+def load_runs(inputs: list[str]) -> list[ScalingRun]:
+    """Runs from files, or every scaling_*.json below the given directories."""
+    paths: list[Path] = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            paths.extend(sorted(item.rglob("scaling_*.json")))
+        elif item.is_file():
+            paths.append(item)
+    return [r for r in map(load_run, paths) if r.points]
+
+
+def print_curves(runs: list[ScalingRun]) -> None:
+    header = (f"{'ranks':>5} {'iters':>5} {'iter mean':>9} {'p50':>8} {'p95':>8} {'vs min':>7} "
+              f"{'AR p50':>8} {'algbw':>8} {'busbw':>8}")
+    for run in runs:
+        print(f"\n{run.config} ({run.backend}, {run.size_bytes} B all-reduce, {run.compute_mul}^2 matmul, "
+              f"launched at {run.world_size} ranks)")
+        print(header)
+        print("-" * len(header))
+        for r in run.rows():
+            print(f"{r['ranks']:>5} {r['iters']:>5} {r['iter_mean_ms']:>9.3f} {r['iter_p50_ms']:>8.3f} "
+                  f"{r['iter_p95_ms']:>8.3f} {r['iter_vs_smallest']:>6.2f}x {r['comm_p50_ms']:>8.3f} "
+                  f"{r['algbw_gbps']:>8.2f} {r['busbw_gbps']:>8.2f}")
+
+
+def plot_curves(runs: list[ScalingRun], out: str) -> None:
+    """Iteration time and bus bandwidth against rank count, one line per run."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, (ax_t, ax_bw) = plt.subplots(1, 2, figsize=(10, 4))
+    for run in runs:
+        rows = run.rows()
+        ranks = [r["ranks"] for r in rows]
+        label = f"{run.config} {run.size_bytes} B"
+        ax_t.plot(ranks, [r["iter_p50_ms"] for r in rows], marker="o", label=label)
+        ax_bw.plot(ranks, [r["busbw_gbps"] for r in rows], marker="o", label=label)
+    for ax, ylabel in ((ax_t, "Iteration time p50 (ms)"), (ax_bw, "All-reduce bus bandwidth (GB/s)")):
+        ax.set_xscale("log", base=2)
+        ax.set_xlabel("Ranks")
+        ax.set_ylabel(ylabel)
+        ax.grid(True, alpha=0.3)
+    ax_t.legend(fontsize=8)
+    fig.suptitle("World-size scaling (one launch, process subgroups)")
+    fig.tight_layout()
+    fig.savefig(out, dpi=200)
+    plt.close(fig)
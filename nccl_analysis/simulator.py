@@ -0,0 +1,309 @@
+"""
+Per-step all-reduce cost simulator for ring, tree and split-tree with LL/LL128/Simple.
+
+A `System` is a handful of numbers derived from an NCCL topology/graph dump: GPUs per
+node, nodes, per-GPU intra-node bandwidth (NVLink to the NVSwitch, or the PCIe path when
+there is no NVLink), NIC bandwidth, and the channel count/speed from the graph search.
+Systems that were never measured (16 ranks over 2 nodes, a faster NIC) are the same
+template with different counts.
+
+Each algorithm moves a channel's share of the buffer in protocol-sized chunks over
+`steps` hops; every chunk-step costs hop_latency + chunk_bytes / (channel_bw * efficiency).
+
+- ring: steps = 2(p-1), each carrying 1/p of the channel's data, and a link handles
+  the steps one after another, so steps * chunks chunk-steps. The slowest hop (the
+  NIC once nodes > 1) sets hop latency and bandwidth.
+- tree: NCCL's intra-node chain plus a binary tree across nodes; reduce up and
+  broadcast down are pipelined back to back, so chunks flow through 2 * depth hops in
+  2 * depth + chunks - 1 chunk-steps with the full channel data on each hop.
+- split_tree: reduce and broadcast run concurrently on separate halves of the
+  channels: depth + chunks - 1 chunk-steps, each half carrying twice the data.
+
+Base latency, hop latency (per link class) and bandwidth efficiency per protocol start
+from NCCL's tuning-model constants and can be calibrated against nccl-tests results
+with `calibrate`, which fits them by linear least squares (relative error). Everything
+evaluates on a (systems, algos, protos, sizes) grid with numpy broadcasting.
+
+This is an analytic per-step model, not a discrete-event simulation. Ring and tree
+schedules are regular pipelines, so the event timeline of one channel reduces to the
+chunk-step counts above and every grid point is a closed form. That is what keeps a
+full sweep in milliseconds, but it also means nothing here models two flows competing
+for one link or schedules that are not lock-step pipelines; those would need events.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import asdict, dataclass, field, replace
+
+import numpy as np
+
+from .topology import L_NVL, L_PCI, GPU, NET, TopoGraph, parse_graphs, parse_topology
+
+ALGOS = ("ring", "tree", "split_tree")
+PROTOS = ("LL", "LL128", "Simple")
+LINK_CLASSES = ("intra", "inter")
+
+# Payload fraction of each protocol's wire format (LL: 4 data bytes per 8, LL128: 120 per
+# 128); calibration never lets a protocol's bandwidth efficiency exceed it.
+EFFICIENCY_CAP = {"LL": 0.5, "LL128": 120 / 128, "Simple": 1.0}
+
+# Bytes of payload per pipeline step per channel (NCCL default buffer / NCCL_STEPS).
+CHUNK_BYTES = {"LL": 16 << 10, "LL128": 600 << 10, "Simple": 512 << 10}
+
+
+@dataclass
+class System:
+    name: str
+    gpus_per_node: int
+    nodes: int = 1
+    intra_bw: float = 24.0     # GB/s per GPU within a node
+    nic_bw: float = 12.5       # GB/s per node across nodes
+    nchannels: int = 16
+    channel_bw: float = 40.0   # GB/s cap per channel from the graph search
+    intra_link: str = "PCI"    # "NVL" or "PCI"
+
+    @property
+    def n_ranks(self) -> int:
+        return self.gpus_per_node * self.nodes
+
+    def scaled(self, gpus_per_node: int | None = None, nodes: int | None = None,
+               nic_bw: float | None = None) -> "System":
+        """Same hardware template with a different shape (and optionally NIC)."""
+        g = gpus_per_node or self.gpus_per_node
+        n = nodes or self.nodes
+        return replace(self, gpus_per_node=g, nodes=n, nic_bw=nic_bw or self.nic_bw,
+                       name=f"{self.name.split(':')[0]}:{g}x{n}")
+
+
+def load_system(topo_xml: str, graph_xml: str | None = None, gpus_per_node: int | None = None,
+                nodes: int = 1, nic_bw: float | None = None, name: str | None = None) -> System:
+    """Build a System from NCCL topology (and optional graph) dumps.
+
+    Dumps taken by one process per GPU contain a single GPU; pass gpus_per_node then.
+    """
+    topo = parse_topology(topo_xml)
+    return system_from_graph(topo, parse_graphs(graph_xml) if graph_xml else [],
+                             gpus_per_node=gpus_per_node, nodes=nodes, nic_bw=nic_bw, name=name)
+
+
+def system_from_graph(topo: TopoGraph, graphs: list[dict], gpus_per_node: int | None = None,
+                      nodes: int = 1, nic_bw: float | None = None, name: str | None = None) -> System:
+    gpus = topo.nodes_of(GPU)
+    if not len(gpus):
+        raise ValueError("topology has no GPUs")
+    gpu = gpus[0]
+    out = topo.links_from(gpu)
+    nvl = out[topo.link_type[out] == L_NVL]
+    if len(nvl):
+        intra_bw, intra_link = float(topo.bw[nvl].sum()), "NVL"
+    else:
+        pci = out[topo.link_type[out] == L_PCI]
+        intra_bw, intra_link = float(topo.bw[pci].min()) if len(pci) else 24.0, "PCI"
+    net_links = np.nonzero(topo.node_type[topo.dst] == NET)[0]
+    nic = float(topo.bw[net_links].max()) if len(net_links) else 12.5
+    ring = next((g for g in graphs if g["pattern"] == "ring" and g["nchannels"]), None)
+    return System(
+        name=name or f"{topo.host_hash or 'topo'}",
+        gpus_per_node=gpus_per_node or len(gpus),
+        nodes=nodes,
+        intra_bw=intra_bw,
+        nic_bw=nic_bw if nic_bw is not None else nic,
+        nchannels=ring["nchannels"] if ring else 16,
+        channel_bw=ring["speedintra"] if ring else 40.0,
+        intra_link=intra_link,
+    )
+
+
+@dataclass
+class CostParams:
+    """Per-protocol costs (us, fraction). hop_us is indexed [link class][proto]."""
+
+    base_us: dict[str, float] = field(default_factory=lambda: {"LL": 6.6, "LL128": 14.0, "Simple": 8.4})
+    hop_us: dict[str, dict[str, float]] = field(default_factory=lambda: {
+        # NCCL hwLat for NVLink / network (ring column).
+        "intra": {"LL": 0.6, "LL128": 1.9, "Simple": 3.4},
+        "inter": {"LL": 2.7, "LL128": 4.0, "Simple": 14.0},
+    })
+    efficiency: dict[str, float] = field(default_factory=lambda: dict(EFFICIENCY_CAP))
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+
+    @classmethod
+    def from_json(cls, path: str) -> "CostParams":
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+def _system_arrays(systems: list[System]) -> dict[str, np.ndarray]:
+    def col(fn):
+        return np.array([fn(s) for s in systems], dtype=float)[:, None, None, None]
+    return {
+        "p": col(lambda s: s.n_ranks),
+        "g": col(lambda s: s.gpus_per_node),
+        "nodes": col(lambda s: s.nodes),
+        "nch": col(lambda s: s.nchannels),
+        "intra_ch": col(lambda s: min(s.channel_bw, s.intra_bw / s.nchannels)),
+        "inter_ch": col(lambda s: min(s.channel_bw, s.nic_bw / s.nchannels)),
+    }
+
+
+def _terms(systems: list[System], sizes, params: CostParams):
+    """Broadcast pieces of the cost model over (systems, algos, protos, sizes).
+
+    Returns (steps_total, hop_latency, chunk_transfer_without_efficiency, base) such that
+    time = base + steps_total * (hop + xfer / efficiency).
+    """
+    a = _system_arrays(systems)
+    n = np.asarray(sizes, dtype=float)[None, None, None, :]
+    multi = a["nodes"] > 1
+    depth = (a["g"] - 1) + np.ceil(np.log2(np.maximum(a["nodes"], 1)))
+    depth = np.maximum(depth, 1)
+    ring_steps = np.maximum(2 * (a["p"] - 1), 1)
+
+    # (systems, algos, 1, 1) step counts and per-channel data per step.
+    steps = np.concatenate([ring_steps, 2 * depth, depth], axis=1)
+    nch = a["nch"]
+    data = np.concatenate([n / nch / a["p"], n / nch, 2 * n / nch], axis=1)       # per hop per channel
+    chunk = np.array([CHUNK_BYTES[p] for p in PROTOS], dtype=float)[None, None, :, None]
+    chunks = np.maximum(np.ceil(data / chunk), 1)
+    piece = data / chunks                                                         # bytes per pipeline step
+
+    ch_bw = np.where(multi, np.minimum(a["intra_ch"], a["inter_ch"]), a["intra_ch"]) * 1e3  # bytes/us
+    hop = np.array([[params.hop_us[c][p] for p in PROTOS] for c in LINK_CLASSES])  # (2, protos)
+    hop = np.where(multi, hop[1][None, None, :, None], hop[0][None, None, :, None])
+    base = np.array([params.base_us[p] for p in PROTOS])[None, None, :, None]
+    # Ring links carry every step's slice in turn; tree chunks pipeline through the depth.
+    is_ring = (np.arange(len(ALGOS)) == ALGOS.index("ring"))[None, :, None, None]
+    total_steps = np.where(is_ring, steps * chunks, steps + chunks - 1)
+    return total_steps, hop, piece / ch_bw, base
+
+
+def simulate(systems: list[System], sizes, params: CostParams | None = None) -> np.ndarray:
+    """Predicted all-reduce time (us) with shape (len(systems), len(ALGOS), len(PROTOS), len(sizes))."""
+    params = params or CostParams()
+    total_steps, hop, xfer, base = _terms(systems, sizes, params)
+    eff = np.array([params.efficiency[p] for p in PROTOS])[None, None, :, None]
+    return base + total_steps * (hop + xfer / eff)
+
+
+def best_configs(times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Argmin (algo index, proto index) per (system, size) over a simulate() grid."""
+    s, a, p, n = times.shape
+    flat = times.transpose(0, 3, 1, 2).reshape(s, n, a * p).argmin(axis=2)
+    return flat // p, flat % p
+
+
+def _allowed(algo: str, proto: str) -> tuple[np.ndarray, np.ndarray]:
+    """Masks over ALGOS/PROTOS a forced config may use ("auto" lets NCCL choose)."""
+    algo_mask = np.array([algo in ("auto", a) or (algo == "tree" and a == "split_tree") for a in ALGOS])
+    proto_mask = np.array([proto in ("auto", p) for p in PROTOS])
+    return algo_mask, proto_mask
+
+
+def calibrate(system: System, files, params: CostParams | None = None, iterations: int = 5,
+              prior: float = 1.0, min_points: int = 4) -> tuple[CostParams, dict]:
+    """Fit base/hop/efficiency per protocol to nccl-tests results measured on `system`.
+
+    Configs that leave algo or proto to NCCL are matched to the cheapest allowed
+    (algo, proto) under the current parameters, then the linear model
+    t = base + steps*hop + steps*xfer*(1/eff) is refitted per protocol; a few rounds of
+    this assign/refit converge. `prior` is the weight (in data points) pulling each
+    coefficient toward its starting value. Only the link class the measurements
+    exercised (intra-node for single-node runs) is updated.
+
+    A protocol's efficiency is only refitted when at least `min_points` of its points
+    are in the bandwidth regime (transfer term above base + hop latency); small-message
+    points cannot tell bandwidth apart from latency. It is bounded by EFFICIENCY_CAP.
+    The report has the rms relative error per protocol as well as overall.
+    """
+    from .crossover import curve_samples
+
+    params = params or CostParams()
+    params = CostParams(dict(params.base_us), {k: dict(v) for k, v in params.hop_us.items()}, dict(params.efficiency))
+    link = "inter" if system.nodes > 1 else "intra"
+
+    samples = []  # (algo mask, proto mask, sizes, times)
+    by_key: dict = {}
+    for f in files:
+        by_key.setdefault(f.key, []).append(f)
+    for key, group in by_key.items():
+        x, y, _ = curve_samples(group)
+        if len(x):
+            samples.append((*_allowed(key.algo, key.proto), np.rint(2 ** x), np.exp(y)))
+    if not samples:
+        return params, {"points": 0}
+
+    report = {}
+    for _ in range(iterations):
+        rows = {p: [] for p in PROTOS}
+        for algo_mask, proto_mask, sizes, times in samples:
+            pred = simulate([system], sizes, params)[0]                       # (algos, protos, sizes)
+            pred = np.where(algo_mask[:, None, None] & proto_mask[None, :, None], pred, np.inf)
+            choice = pred.reshape(-1, len(sizes)).argmin(axis=0)
+            steps, hop, xfer, _ = _terms([system], sizes, params)
+            for j, c in enumerate(choice):
+                ai, pi = divmod(int(c), len(PROTOS))
+                st, xf = steps[0, ai, pi, j], xfer[0, ai, pi, j]
+                rows[PROTOS[pi]].append((st, st * xf, times[j]))
+        errs = {}
+        for proto, data in rows.items():
+            if len(data) < min_points:
+                continue
+            st, sx, t = (np.array(v, dtype=float) for v in zip(*data))
+            A = np.column_stack([np.ones_like(st), st, sx]) / t[:, None]
+            # Ridge toward the current values (relative scale) keeps protocols that only
+            # win at a few sizes near NCCL's constants instead of fitting noise.
+            c0 = np.array([params.base_us[proto], params.hop_us[link][proto], 1.0 / params.efficiency[proto]])
+            floor = np.array([0.0, 0.0, 1.0 / EFFICIENCY_CAP[proto]])
+            bandwidth_bound = sx * c0[2] > c0[0] + st * c0[1]
+            coef = _ridge(A, c0, prior) if bandwidth_bound.sum() >= min_points else None
+            if coef is None or coef[2] < floor[2]:
+                # Efficiency not identifiable (or past the payload cap): hold it, refit the rest.
+                c2 = max(c0[2], floor[2])
+                coef = np.append(_ridge(A[:, :2], c0[:2], prior, offset=A[:, 2] * c2), c2)
+            coef = np.maximum(coef, floor)
+            params.base_us[proto] = float(coef[0])
+            params.hop_us[link][proto] = float(coef[1])
+            params.efficiency[proto] = float(1.0 / coef[2])
+            errs[proto] = A @ coef - 1.0
+        if errs:
+            rel = np.concatenate(list(errs.values()))
+            report = {"points": int(len(rel)), "rms_rel_err": float(np.sqrt(np.mean(rel ** 2))),
+                      "per_proto_points": {p: len(v) for p, v in rows.items()},
+                      "per_proto_rms_rel_err": {p: float(np.sqrt(np.mean(e ** 2))) for p, e in errs.items()}}
+    return params, report
+
+
+def _ridge(A: np.ndarray, c0: np.ndarray, prior: float, offset=0.0) -> np.ndarray:
+    """Least squares for A @ coef + offset = 1, pulled toward c0 with `prior` points of weight."""
+    scale = np.maximum(np.abs(c0), 1.0)
+    A_reg = np.vstack([A, np.sqrt(prior) * np.diag(1.0 / scale)])
+    b_reg = np.concatenate([1.0 - offset * np.ones(len(A)), np.sqrt(prior) * c0 / scale])
+    coef, *_ = np.linalg.lstsq(A_reg, b_reg, rcond=None)
+    return coef
+
+
+def print_best(systems: list[System], sizes, times: np.ndarray) -> None:
+    from .parsing import format_size
+
+    algo_idx, proto_idx = best_configs(times)
+    for s, system in enumerate(systems):
+        print(f"\n{system.name}: {system.n_ranks} ranks ({system.gpus_per_node} x {system.nodes} nodes), "
+              f"{system.intra_link} {system.intra_bw:.0f} GB/s/GPU, NIC {system.nic_bw:.2f} GB/s")
+        header = f"{'size':>10} {'best':<18} {'time(us)':>10}  " + " ".join(f"{a[:5] + '/' + p:>13}" for a in ALGOS for p in PROTOS)
+        print(header)
+        print("-" * len(header))
+        for j, size in enumerate(sizes):
+            a, p = algo_idx[s, j], proto_idx[s, j]
+            cells = " ".join(f"{times[s, ai, pi, j]:>13.1f}" for ai in range(len(ALGOS)) for pi in range(len(PROTOS)))
+            print(f"{format_size(size):>10} {ALGOS[a] + '/' + PROTOS[p]:<18} {times[s, a, p, j]:>10.1f}  {cells}")
+
+
+def size_grid(lo: int = 8, hi: int = 128 << 20, per_octave: int = 1) -> np.ndarray:
+    """nccl-tests style geometric size grid (per_octave points per factor of 2)."""
+    k = int(round(math.log2(hi / lo) * per_octave))
+    return np.unique(np.rint(lo * 2.0 ** (np.arange(k + 1) / per_octave)).astype(np.int64))
@@ -0,0 +1,192 @@
+"""
+Contention slowdown across every Phase 2 result tree at once.
+
+catalog.discover labels each nccl-tests file with (platform, GPUs, contention,
+algo/proto) from its header and path, whatever layout it came from
+(a100-8gpu-new/results/, l40s-4gpu/contention_results/<algo>/<algo>_<level>/,
+l40s-2gpu/iteration_<n>/ or a Phase 1 baseline tree). Every contended curve is paired
+with the uncontended curve of the same platform, GPU count and config, so the
+Phase 1 trees supply the baselines when they are passed as roots too.
+
+Repeated files of one key (iteration_<n>/ directories, several runs in a file) are
+pooled into the median out-of-place time per size. All curves are laid out on one
+shared size axis as a dense (curve x size) array, and the slowdowns are a single
+division of the contended rows by their baseline rows:
+
+    ratio[platform, config, level, size] = contended time / uncontended time
+
+so 1.0 means unaffected and 1.5 means 50% slower. Sizes missing from either curve
+are NaN. SlowdownMatrix.summary() reduces the size axis with a geometric mean,
+which is the number that ranks protocols by how well they hold up under load.
+"""
+
+from __future__ import annotations
+
+import re
+import warnings
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+from .catalog import CONTENTION_LEVELS, ResultFile, ResultKey
+
+
+@dataclass
+class SlowdownMatrix:
+    platforms: list[str]   # "A100 8gpu"
+    configs: list[str]     # ResultKey.config: "auto", "ring/auto", "auto/LL128", ...
+    levels: list[str]      # contention levels: low, medium, high, duty-cycle targets, then profiles
+    sizes: np.ndarray      # bytes
+    ratio: np.ndarray      # (platform, config, level, size); NaN where a pair or size is missing
+    base_us: np.ndarray    # (platform, config, size) uncontended median time
+
+    def summary(self) -> np.ndarray:
+        """(platform, config, level) geometric-mean slowdown over the sizes both curves cover."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            logs = np.log(self.ratio)
+        n = np.sum(np.isfinite(logs), axis=-1)
+        total = np.nansum(np.where(np.isfinite(logs), logs, np.nan), axis=-1)
+        with np.errstate(invalid="ignore"):
+            return np.where(n > 0, np.exp(total / np.maximum(n, 1)), np.nan)
+
+    def rows(self):
+        """Long-form cells: dicts with platform, config, contention, size_bytes, baseline_us, slowdown."""
+        p, c, l, s = np.nonzero(np.isfinite(self.ratio))
+        for i, j, k, m in zip(p, c, l, s):
+            yield {"platform": self.platforms[i], "config": self.configs[j], "contention": self.levels[k],
+                   "size_bytes": int(self.sizes[m]), "baseline_us": float(self.base_us[i, j, m]),
+                   "slowdown": float(self.ratio[i, j, k, m])}
+
+    def save(self, path) -> None:
+        np.savez(path, platforms=np.array(self.platforms), configs=np.array(self.configs),
+                 levels=np.array(self.levels), sizes=self.sizes, ratio=self.ratio, base_us=self.base_us)
+
+
+def _level_order(level: str) -> tuple:
+    """Fixed levels first, then duty-cycle targets by utilization, then profiles by name."""
+    if level in CONTENTION_LEVELS:
+        return (CONTENTION_LEVELS.index(level), 0.0, "")
+    m = re.fullmatch(r"duty(\d+(?:p\d+)?)", level)
+    if m:
+        return (len(CONTENTION_LEVELS), float(m.group(1).replace("p", ".")), "")
+    return (len(CONTENTION_LEVELS) + 1, 0.0, level)
+
+
+def median_times(files: list[ResultFile]) -> tuple[list[ResultKey], np.ndarray, np.ndarray]:
+    """(keys, sizes, times): the median out-of-place time per key and size on a shared size axis."""
+    sizes = np.array(sorted({r.size for f in files for r in f.results.rows}), dtype=np.int64)
+    by_key: dict[ResultKey, list[ResultFile]] = defaultdict(list)
+    for f in files:
+        by_key[f.key].append(f)
+    keys = sorted(by_key, key=lambda k: (k.platform, k.n_gpus, k.config, _level_order(k.contention)))
+    times = np.full((len(keys), len(sizes)), np.nan)
+    for i, key in enumerate(keys):
+        rows = [r for f in by_key[key] for r in f.results.rows if r.oop_time_us > 0]
+        if not rows:
+            continue
+        cols = np.searchsorted(sizes, [r.size for r in rows])
+        values = np.array([r.oop_time_us for r in rows])
+        # One row per repeat of a size, then the median down each column.
+        repeat = np.zeros(len(rows), dtype=np.int64)
+        order = np.argsort(cols, kind="stable")
+        c = cols[order]
+        starts = np.r_[True, c[1:] != c[:-1]]
+        idx = np.arange(len(c))
+        repeat[order] = idx - np.maximum.accumulate(np.where(starts, idx, 0))
+        stack = np.full((repeat.max() + 1, len(sizes)), np.nan)
+        stack[repeat, cols] = values
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns: sizes this key lacks
+            times[i] = np.nanmedian(stack, axis=0)
+    return keys, sizes, times
+
+
+def slowdown_matrix(files: list[ResultFile]) -> SlowdownMatrix:
+    """Pair each contended curve with its uncontended one and divide (see the module docstring)."""
+    keys, sizes, times = median_times(files)
+    baseline = {(k.platform, k.n_gpus, k.algo, k.proto): i for i, k in enumerate(keys) if k.contention == "none"}
+    contended = [(i, baseline.get((k.platform, k.n_gpus, k.algo, k.proto))) for i, k in enumerate(keys)
+                 if k.contention != "none"]
+    contended = [(i, b) for i, b in contended if b is not None]
+
+    platforms = sorted({f"{keys[i].platform} {keys[i].n_gpus}gpu" for i, _ in contended},
+                       key=lambda p: (p.split()[0], int(p.split()[1][:-3])))
+    configs = sorted({keys[i].config for i, _ in contended}, key=lambda c: (c != "auto", c))
+    levels = sorted({keys[i].contention for i, _ in contended}, key=_level_order)
+    ratio = np.full((len(platforms), len(configs), len(levels), len(sizes)), np.nan)
+    base_us = np.full((len(platforms), len(configs), len(sizes)), np.nan)
+    if contended:
+        num, den = (np.array(x) for x in zip(*contended))
+        p = np.array([platforms.index(f"{keys[i].platform} {keys[i].n_gpus}gpu") for i in num])
+        c = np.array([configs.index(keys[i].config) for i in num])
+        lv = np.array([levels.index(keys[i].contention) for i in num])
+        ratio[p, c, lv] = times[num] / times[den]
+        base_us[p, c] = times[den]
+    keep = np.isfinite(ratio).any(axis=(0, 1, 2))
+    return SlowdownMatrix(platforms, configs, levels, sizes[keep], ratio[..., keep], base_us[..., keep])
+
+
+def missing_baselines(files: list[ResultFile]) -> list[ResultKey]:
+    """Contended keys with no uncontended run of the same platform, GPU count and config."""
+    have = {(f.key.platform, f.key.n_gpus, f.key.algo, f.key.proto) for f in files if f.key.contention == "none"}
+    return sorted({f.key for f in files if f.key.contention != "none"
+                   and (f.key.platform, f.key.n_gpus, f.key.algo, f.key.proto) not in have},
+                  key=lambda k: (k.platform, k.n_gpus, k.config, _level_order(k.contention)))
+
+
+def print_summary(m: SlowdownMatrix) -> None:
+    from .parsing import format_size
+
+    summary = m.summary()
+    width = max(8, *(len(level) for level in m.levels))
+    for i, platform in enumerate(m.platforms):
+        print(f"\n{platform}: geometric-mean slowdown over sizes (contended / uncontended time)")
+        print(f"  {'config':<14}" + "".join(f"{level:>{width + 2}}" for level in m.levels))
+        for j, config in enumerate(m.configs):
+            if np.isnan(summary[i, j]).all():
+                continue
+            cells = "".join(f"{'-':>{width + 2}}" if np.isnan(v) else f"{v:>{width + 1}.2f}x"
+                            for v in summary[i, j])
+            print(f"  {config:<14}{cells}")
+        for k, level in enumerate(m.levels):
+            col = summary[i, :, k]
+            if np.isfinite(col).sum() > 1:
+                j = int(np.nanargmin(col))
+                worst = m.ratio[i, j, k]
+                s = int(np.nanargmax(worst))
+                print(f"  least degraded at {level}: {m.configs[j]} ({col[j]:.2f}x; "
+                      f"worst {worst[s]:.2f}x at {format_size(int(m.sizes[s]))})")
+
+
+def plot_heatmaps(m: SlowdownMatrix, out) -> None:
+    """One row per platform, one panel per contention level: config x size, log-scaled color."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    from .parsing import format_size
+
+    finite = m.ratio[np.isfinite(m.ratio) & (m.ratio > 0)]
+    span = float(np.max(np.abs(np.log(finite)))) if finite.size else 1.0
+    norm = LogNorm(vmin=np.exp(-span), vmax=np.exp(span))
+    nrows, ncols = len(m.platforms), len(m.levels)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(4.5 * ncols + 1, 0.45 * len(m.configs) * nrows + 1.5 * nrows),
+                             squeeze=False, sharex=True)
+    ticks = np.arange(0, len(m.sizes), max(1, len(m.sizes) // 8))
+    cmap = plt.get_cmap("RdBu_r").copy()
+    cmap.set_bad("0.9")  # no contended run or no baseline for this cell
+    image = None
+    for i, platform in enumerate(m.platforms):
+        for k, level in enumerate(m.levels):
+            ax = axes[i, k]
+            image = ax.imshow(m.ratio[i, :, k], aspect="auto", cmap=cmap, norm=norm, interpolation="nearest")
+            ax.set_title(f"{platform}, {level}", fontsize=9)
+            ax.set_yticks(range(len(m.configs)), m.configs if k == 0 else [""] * len(m.configs), fontsize=8)
+            ax.set_xticks(ticks, [format_size(int(m.sizes[t])) for t in ticks], rotation=45, fontsize=7)
+    if image is not None:
+        fig.colorbar(image, ax=axes, shrink=0.8, label="slowdown (contended / uncontended time)")
+    fig.suptitle("All-reduce slowdown under contention", fontsize=11)
+    fig.savefig(out, dpi=150, bbox_inches="tight")
+    plt.close(fig)
@@ -0,0 +1,384 @@
+"""
+Constant-memory statistics for long (soak) runs of the iteration proxy.
+
+A 50-iteration run cannot show bandit convergence, clock/thermal drift or a stall
+every few thousand steps. A soak run can, if it does not keep every iteration time.
+The monitor here keeps:
+
+- LogSketch: a relative-error quantile sketch (log-spaced buckets, DDSketch style).
+  Memory grows with the log of the value range, not with the number of samples.
+- Windows of `window` iterations, each with count/mean/variance and its own sketch. At
+  most `max_windows` are kept; when full, the oldest half is merged pairwise, so old
+  history gets coarser while memory stays bounded.
+- Drift: a two-sided CUSUM on the log median of each window. The reference level comes
+  from the first windows after the start or after the previous shift. Each detected
+  shift records where it started and the median/p95 before and after.
+- Stalls: iterations slower than `stall_factor` x the running median. Only the last
+  `max_spikes` are kept. If the gaps between stalls cluster around one value (in
+  iterations or in seconds), the stalls are reported as periodic.
+
+Pure Python so it runs inside the proxy's torch-only image; `from_times` replays an
+existing iteration_times file through the same detectors.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+# Shorter runs report no trend: a per-hour slope from a few seconds is meaningless.
+MIN_TREND_S = 300.0
+
+
+class LogSketch:
+    """Quantiles within `rel_err` relative error; buckets are powers of gamma = (1 + a) / (1 - a)."""
+
+    def __init__(self, rel_err: float = 0.002):
+        self.rel_err = rel_err
+        self.gamma = (1 + rel_err) / (1 - rel_err)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: dict[int, int] = {}
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        i = math.ceil(math.log(max(x, 1e-9)) / self._log_gamma)
+        self.bins[i] = self.bins.get(i, 0) + 1
+        self.count += 1
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def merge(self, other: "LogSketch") -> None:
+        for i, c in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + c
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                value = 2 * self.gamma ** i / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"rel_err": self.rel_err, "bins": {str(k): v for k, v in sorted(self.bins.items())},
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LogSketch":
+        s = cls(d["rel_err"])
+        s.bins = {int(k): v for k, v in d["bins"].items()}
+        s.count = sum(s.bins.values())
+        s.min, s.max = d["min"], d["max"]
+        return s
+
+
+@dataclass
+class Window:
+    start_iter: int
+    start_s: float
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    sketch: LogSketch = field(default_factory=LogSketch)
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.sketch.add(x)
+
+    def merge(self, other: "Window") -> None:
+        n = self.count + other.count
+        if n:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / n
+            self.mean += delta * other.count / n
+        self.count = n
+        self.sketch.merge(other.sketch)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count else math.nan
+
+    def to_dict(self) -> dict:
+        q = self.sketch.quantile
+        return {"start_iter": self.start_iter, "start_s": round(self.start_s, 3), "count": self.count,
+                "mean": self.mean, "std": self.std, "p50": q(0.5), "p95": q(0.95), "p99": q(0.99),
+                "max": self.sketch.max}
+
+
+@dataclass
+class Shift:
+    start_iter: int         # first iteration of the window where the CUSUM last left zero
+    start_s: float
+    detected_iter: int
+    before_p50: float
+    before_p95: float
+    after_p50: float = math.nan
+    after_p95: float = math.nan
+
+    @property
+    def change(self) -> float:
+        return self.after_p50 / self.before_p50 - 1
+
+
+class DriftDetector:
+    """Two-sided CUSUM over window log-medians, in units of the reference windows' spread."""
+
+    def __init__(self, ref_windows: int = 5, threshold: float = 8.0, slack: float = 1.0, min_rel_sigma: float = 0.003):
+        self.ref_windows = ref_windows
+        self.threshold = threshold
+        self.slack = slack
+        self.min_rel_sigma = min_rel_sigma
+        self.shifts: list[Shift] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ref: list[Window] = []
+        self._mu = self._sigma = math.nan
+        self._up = self._down = 0.0
+        self._origin: Optional[Window] = None
+
+    def add(self, w: Window) -> Optional[Shift]:
+        x = math.log(w.sketch.quantile(0.5))
+        last = self.shifts[-1] if self.shifts else None
+        if len(self._ref) < self.ref_windows:
+            self._ref.append(w)
+            if last is not None and len(self._ref) == self.ref_windows:
+                last.after_p50, last.after_p95 = self._ref_quantiles()
+            if len(self._ref) == self.ref_windows:
+                logs = sorted(math.log(r.sketch.quantile(0.5)) for r in self._ref)
+                self._mu = logs[len(logs) // 2]
+                mad = sorted(abs(v - self._mu) for v in logs)[len(logs) // 2]
+                self._sigma = max(1.4826 * mad, self.min_rel_sigma)
+            return None
+        z = (x - self._mu) / self._sigma
+        if self._up == 0.0 and self._down == 0.0:
+            self._origin = w
+        self._up = max(0.0, self._up + z - self.slack)
+        self._down = max(0.0, self._down - z - self.slack)
+        if self._up == 0.0 and self._down == 0.0:
+            self._origin = None
+        if max(self._up, self._down) < self.threshold:
+            return None
+        origin = self._origin or w
+        p50, p95 = self._ref_quantiles()
+        shift = Shift(origin.start_iter, origin.start_s, w.start_iter + w.count, p50, p95)
+        self.shifts.append(shift)
+        self._reset()
+        # The window that confirmed the shift is the first of the new reference; the windows
+        # between the change start and it are not kept.
+        self._ref.append(w)
+        return shift
+
+    def _ref_quantiles(self) -> tuple[float, float]:
+        merged = LogSketch(self._ref[0].sketch.rel_err)
+        for r in self._ref:
+            merged.merge(r.sketch)
+        return merged.quantile(0.5), merged.quantile(0.95)
+
+
+class StallDetector:
+    """Spikes above factor x running median; periodic if their gaps cluster around one value."""
+
+    def __init__(self, factor: float = 1.5, max_spikes: int = 512, min_spikes: int = 4, min_fraction: float = 0.6):
+        self.factor = factor
+        self.min_spikes = min_spikes
+        self.min_fraction = min_fraction
+        self.spikes: deque[tuple[int, float, float]] = deque(maxlen=max_spikes)  # (iteration, seconds, worst ms)
+        self.total = 0
+        self._last = -2
+
+    def add(self, i: int, t: float, x: float, median: float) -> bool:
+        if not (median > 0 and x > self.factor * median):
+            return False
+        if i == self._last + 1:
+            # A stall spanning consecutive iterations counts once, at its first iteration.
+            first, start, worst = self.spikes[-1]
+            self.spikes[-1] = (first, start, max(worst, x))
+        else:
+            self.spikes.append((i, t, x))
+            self.total += 1
+        self._last = i
+        return True
+
+    @staticmethod
+    def _period(gaps: list[float], rel_tol: float, abs_tol: float) -> tuple[float, float]:
+        """(period, fraction of gaps within tolerance of it or of 2-3x it, i.e. with missed stalls).
+
+        Candidates are the observed gaps; most matches must be at 1x so that half a
+        period (one stray spike) cannot win by matching everything at 2x.
+        """
+        best = (math.nan, 0.0)
+        for g in sorted(set(gaps)):
+            if g <= 0:
+                continue
+            ones = sum(1 for v in gaps if abs(v - g) <= max(rel_tol * g, abs_tol))
+            hits = sum(1 for v in gaps if any(abs(v - k * g) <= max(rel_tol * k * g, abs_tol) for k in (1, 2, 3)))
+            if ones * 2 < hits:
+                continue
+            frac = hits / len(gaps)
+            if frac > best[1] + 1e-9:
+                best = (g, frac)
+        return best
+
+    def periodicity(self) -> Optional[dict]:
+        if len(self.spikes) < self.min_spikes:
+            return None
+        spikes = list(self.spikes)
+        iter_gaps = [float(b[0] - a[0]) for a, b in zip(spikes, spikes[1:])]
+        time_gaps = [b[1] - a[1] for a, b in zip(spikes, spikes[1:])]
+        period_i, frac_i = self._period(iter_gaps, 0.02, 1.0)
+        period_s, frac_s = self._period(time_gaps, 0.10, 0.0)
+        if max(frac_i, frac_s) < self.min_fraction:
+            return None
+        by_iters = frac_i >= frac_s
+        return {"period_iters": period_i if by_iters else None, "period_s": None if by_iters else period_s,
+                "fraction": frac_i if by_iters else frac_s, "spikes": len(spikes), "first_iter": spikes[0][0],
+                "worst_ms": max(s[2] for s in spikes)}
+
+
+class SoakMonitor:
+    def __init__(self, window: int = 100, max_windows: int = 512, warmup: int = 20, rel_err: float = 0.002,
+                 drift_threshold: float = 8.0, stall_factor: float = 1.5):
+        self.window = window
+        self.max_windows = max_windows
+        self.warmup = warmup
+        self.rel_err = rel_err
+        self.total = Window(0, 0.0, sketch=LogSketch(rel_err))
+        self.windows: list[Window] = []
+        # Window medians move in steps of one sketch bucket, so that is the smallest spread.
+        self.drift = DriftDetector(threshold=drift_threshold, min_rel_sigma=max(0.003, 2 * rel_err))
+        self.stalls = StallDetector(stall_factor)
+        self._current: Optional[Window] = None
+        self.iterations = 0
+        self.elapsed_s = 0.0
+
+    def add(self, x_ms: float, t_s: float) -> Optional[Shift]:
+        """One iteration time at t_s seconds into the run; returns a shift when one is detected."""
+        i = self.iterations
+        self.iterations += 1
+        self.elapsed_s = t_s
+        if self.total.count >= self.warmup:
+            self.stalls.add(i, t_s, x_ms, self.total.sketch.quantile(0.5))
+        self.total.add(x_ms)
+        if self._current is None:
+            self._current = Window(i, t_s, sketch=LogSketch(self.rel_err))
+        self._current.add(x_ms)
+        if self._current.count < self.window:
+            return None
+        done, self._current = self._current, None
+        self._keep(done)
+        return self.drift.add(done)
+
+    def _keep(self, w: Window) -> None:
+        self.windows.append(Window(w.start_iter, w.start_s, w.count, w.mean, w.m2, _copy(w.sketch)))
+        if len(self.windows) > self.max_windows:
+            half = len(self.windows) // 2
+            merged = []
+            for a, b in zip(self.windows[:half:2], self.windows[1:half:2]):
+                a.merge(b)
+                merged.append(a)
+            if half % 2:
+                merged.append(self.windows[half - 1])
+            self.windows = merged + self.windows[half:]
+
+    def status(self) -> str:
+        q = self.total.sketch.quantile
+        recent = self.windows[-1].to_dict() if self.windows else None
+        line = (f"[soak] {self.elapsed_s:8.0f}s iters={self.iterations} p50={q(0.5):.3f} p95={q(0.95):.3f} "
+                f"p99={q(0.99):.3f} max={self.total.sketch.max:.3f}")
+        if recent:
+            line += f" | last window p50={recent['p50']:.3f} p95={recent['p95']:.3f}"
+        return line + f" | shifts={len(self.drift.shifts)} stalls={self.stalls.total}"
+
+    def summary(self) -> dict:
+        q = self.total.sketch.quantile
+        return {
+            "iterations": self.iterations,
+            "elapsed_s": self.elapsed_s,
+            "window": self.window,
+            "overall": {"mean": self.total.mean, "std": self.total.std, "p50": q(0.5), "p90": q(0.9),
+                        "p95": q(0.95), "p99": q(0.99), "min": self.total.sketch.min, "max": self.total.sketch.max},
+            "trend_pct_per_hour": self._trend(),
+            "shifts": [{**s.__dict__, "change": s.change} for s in self.drift.shifts],
+            "stalls": {"count": self.stalls.total, "factor": self.stalls.factor,
+                       "periodic": self.stalls.periodicity()},
+            "windows": [w.to_dict() for w in self.windows],
+        }
+
+    def _trend(self) -> float:
+        """Least-squares slope of window log-medians against time, as % per hour."""
+        pts = [(w.start_s, math.log(w.sketch.quantile(0.5))) for w in self.windows if w.count]
+        if len(pts) < 3 or self.elapsed_s < MIN_TREND_S:
+            return math.nan
+        mt = sum(t for t, _ in pts) / len(pts)
+        my = sum(y for _, y in pts) / len(pts)
+        var = sum((t - mt) ** 2 for t, _ in pts)
+        if var == 0:
+            return math.nan
+        slope = sum((t - mt) * (y - my) for t, y in pts) / var
+        return (math.exp(slope * 3600) - 1) * 100
+
+
+def _copy(s: LogSketch) -> LogSketch:
+    c = LogSketch(s.rel_err)
+    c.merge(s)
+    return c
+
+
+def from_times(times_ms: list[float], **kwargs) -> SoakMonitor:
+    """Replay recorded iteration times (timestamps = cumulative time) through a monitor."""
+    mon = SoakMonitor(**kwargs)
+    t = 0.0
+    for x in times_ms:
+        t += x / 1000.0
+        mon.add(x, t)
+    return mon
+
+
+def print_summary(s: dict, max_windows: int = 20) -> None:
+    o = s["overall"]
+    print(f"Soak: {s['iterations']} iterations over {s['elapsed_s']:.0f}s (windows of {s['window']})")
+    print(f"  overall  mean={o['mean']:.3f} std={o['std']:.3f} p50={o['p50']:.3f} p90={o['p90']:.3f} "
+          f"p95={o['p95']:.3f} p99={o['p99']:.3f} min={o['min']:.3f} max={o['max']:.3f} ms")
+    trend = s["trend_pct_per_hour"]
+    if trend == trend:
+        print(f"  trend    {trend:+.2f}% per hour (window medians)")
+    if s["shifts"]:
+        print("  distribution shifts:")
+        for sh in s["shifts"]:
+            after = (f"p50 {sh['after_p50']:.3f} / p95 {sh['after_p95']:.3f} ms ({sh['change'] * 100:+.1f}%)"
+                     if sh["after_p50"] == sh["after_p50"] else "(run ended before the new level settled)")
+            print(f"    from iter {sh['start_iter']} ({sh['start_s']:.0f}s), detected at {sh['detected_iter']}: "
+                  f"p50 {sh['before_p50']:.3f} / p95 {sh['before_p95']:.3f} ms -> {after}")
+    else:
+        print("  no distribution shifts detected")
+    st = s["stalls"]
+    per = st["periodic"]
+    if per:
+        every = f"every {per['period_iters']:.0f} iterations" if per["period_iters"] else f"every {per['period_s']:.1f}s"
+        print(f"  stalls   {st['count']} above {st['factor']}x median; periodic {every} "
+              f"({per['fraction'] * 100:.0f}% of gaps, from iter {per['first_iter']}, worst {per['worst_ms']:.3f} ms)")
+    else:
+        print(f"  stalls   {st['count']} above {st['factor']}x median; no periodic pattern")
+    windows = s["windows"]
+    if windows and max_windows > 0:
+        step = max(1, math.ceil(len(windows) / max_windows))
+        print(f"\n  {'iter':>9} {'t (s)':>8} {'n':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for w in windows[::step]:
+            print(f"  {w['start_iter']:>9} {w['start_s']:>8.0f} {w['count']:>6} {w['mean']:>8.3f} {w['p50']:>8.3f} "
+                  f"{w['p95']:>8.3f} {w['p99']:>8.3f} {w['max']:>8.3f}")
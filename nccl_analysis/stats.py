@@ -0,0 +1,99 @@
+"""Bootstrap confidence intervals and non-parametric tests shared by the evaluation and comparison reports."""
+
+from __future__ import annotations
+
+from typing import Callable
+
+import numpy as np
+
+Statistic = Callable[..., np.ndarray]  # np.mean / np.median style: stat(x, axis=-1)
+
+
+def bootstrap_ci(samples, stat: Statistic = np.mean, n_boot: int = 2000, level: float = 0.95,
+                 seed: int = 0) -> tuple[float, float, float]:
+    """(estimate, low, high): percentile bootstrap interval of stat over the samples."""
+    x = np.asarray(samples, dtype=float)
+    if len(x) == 0:
+        return np.nan, np.nan, np.nan
+    est = float(stat(x, axis=-1))
+    if len(x) == 1:
+        return est, est, est
+    idx = np.random.default_rng(seed).integers(0, len(x), size=(n_boot, len(x)))
+    boots = stat(x[idx], axis=-1)
+    tail = (1 - level) / 2 * 100
+    lo, hi = np.percentile(boots, [tail, 100 - tail])
+    return est, float(lo), float(hi)
+
+
+def ratio_ci(num, den, stat: Statistic = np.mean, paired: bool = False, n_boot: int = 2000,
+             level: float = 0.95, seed: int = 0) -> tuple[float, float, float]:
+    """(estimate, low, high) of stat(num) / stat(den).
+
+    Paired resampling keeps num[i] and den[i] together, e.g. runs of two configs made
+    back to back in the same repetition, so drift between repetitions cancels out.
+    """
+    a, b = np.asarray(num, dtype=float), np.asarray(den, dtype=float)
+    if len(a) == 0 or len(b) == 0:
+        return np.nan, np.nan, np.nan
+    est = float(stat(a, axis=-1) / stat(b, axis=-1))
+    rng = np.random.default_rng(seed)
+    if paired:
+        if len(a) != len(b):
+            raise ValueError("paired samples need equal lengths")
+        idx = rng.integers(0, len(a), size=(n_boot, len(a)))
+        boots = stat(a[idx], axis=-1) / stat(b[idx], axis=-1)
+    else:
+        boots = (stat(a[rng.integers(0, len(a), size=(n_boot, len(a)))], axis=-1)
+                 / stat(b[rng.integers(0, len(b), size=(n_boot, len(b)))], axis=-1))
+    tail = (1 - level) / 2 * 100
+    lo, hi = np.percentile(boots, [tail, 100 - tail])
+    return est, float(lo), float(hi)
+
+
+def permutation_test(a, b, stat: Statistic = np.mean, n_perm: int = 5000, seed: int = 0) -> float:
+    """Two-sided p-value of stat(b) - stat(a) under random relabelling of the pooled samples."""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    pooled = np.concatenate([a, b])
+    observed = abs(float(stat(b, axis=-1) - stat(a, axis=-1)))
+    rng = np.random.default_rng(seed)
+    perms = np.argsort(rng.random((n_perm, len(pooled))), axis=1)
+    shuffled = pooled[perms]
+    diffs = np.abs(stat(shuffled[:, len(a):], axis=-1) - stat(shuffled[:, :len(a)], axis=-1))
+    # Count the observed labelling as one of the permutations so p is never 0.
+    return float((np.sum(diffs >= observed - 1e-12) + 1) / (n_perm + 1))
+
+
+def mann_whitney(a, b) -> tuple[float, float, float]:
+    """(U of b, two-sided p, Cliff's delta) of the rank-sum test, normal approximation with tie correction.
+
+    Cliff's delta is P(b > a) - P(b < a): +1 when every b exceeds every a.
+    """
+    from math import erf, sqrt
+
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    n1, n2 = len(a), len(b)
+    pooled = np.concatenate([a, b])
+    order = np.argsort(pooled, kind="mergesort")
+    ranks = np.empty(len(pooled))
+    ranks[order] = np.arange(1, len(pooled) + 1)
+    # Average ranks over ties.
+    _, inverse, counts = np.unique(pooled, return_inverse=True, return_counts=True)
+    ranks = (np.bincount(inverse, weights=ranks) / counts)[inverse]
+    u = float(ranks[n1:].sum() - n2 * (n2 + 1) / 2)
+    n = n1 + n2
+    sigma = sqrt(n1 * n2 / 12 * ((n + 1) - float(np.sum(counts ** 3 - counts)) / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0, 0.0
+    z = (u - n1 * n2 / 2) / sigma
+    p = 2 * (1 - 0.5 * (1 + erf(abs(z) / sqrt(2))))
+    return u, min(p, 1.0), 2 * u / (n1 * n2) - 1
+
+
+def holm(pvalues) -> np.ndarray:
+    """Holm-Bonferroni adjusted p-values (family-wise error control, same order as the input)."""
+    p = np.asarray(pvalues, dtype=float)
+    order = np.argsort(p)
+    adjusted = np.minimum(1.0, np.maximum.accumulate(p[order] * (len(p) - np.arange(len(p)))))
+    out = np.empty_like(adjusted)
+    out[order] = adjusted
+    return out
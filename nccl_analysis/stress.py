@@ -0,0 +1,282 @@
+"""
+Duty-cycle stress controller: hold a compute load at a target utilization.
+
+The Phase 2 stress kernel only picks a matrix size and a fixed sleep per level, which
+leaves large gaps between low, medium and high, and the runners sleep 2 s hoping the
+load is warm. Here a controller runs the load in periods of `period_s`: it does
+units of work until a busy budget of duty * period_s is used up, then idles for the
+rest of the period. Achieved utilization is busy time over period length, and an
+integral feedback loop moves the duty cycle by `gain` times the error every period,
+so utilization tracks the target despite work-unit quantization, launch overhead or
+a GPU slowed by other work.
+
+The load counts as stable (ready) once the mean utilization of the last `settle`
+periods is within `tolerance` of the target. Every period is logged with its
+wall-clock end time, so a runner can compute the utilization achieved during its
+own measurement window (window_utilization).
+
+Backends:
+
+- cpu: a pure Python loop on one core, so the controller can be exercised locally;
+- gpu: gpu_stress_benchmark.cu in `serve` mode, the same cuBLAS SGEMM as the
+  Phase 2 levels, asked over a pipe for one batch of SGEMMs per unit of work.
+
+Run one controller per GPU (CUDA_VISIBLE_DEVICES picks the device):
+
+    python -m nccl_analysis.stress --backend cpu --target 60 --duration 10
+    python -m nccl_analysis.stress --backend gpu --stress-bin ./gpu_stress_benchmark --target 70 \\
+        --ready-file gpu3.ready --log gpu3.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+# Target utilization of the named Phase 2 levels (the bandit's nominal UTIL_LEVELS).
+LEVEL_TARGETS = {"none": 0.0, "low": 1 / 3, "medium": 2 / 3, "high": 1.0}
+LOG_FIELDS = ["t", "duty", "busy_s", "span_s", "util", "ready"]
+
+
+class CpuBackend:
+    """Busy loop on the calling thread, in units of about `unit_s` seconds."""
+
+    name = "cpu"
+
+    def __init__(self, unit_s: float = 0.001):
+        self._n = 1000
+        # Calibrate the loop length to unit_s; the controller corrects any error.
+        while True:
+            took = self.step()
+            if took >= unit_s / 4 or self._n > 1 << 30:
+                break
+            self._n *= 4
+        self._n = max(1, int(self._n * unit_s / max(took, 1e-9)))
+
+    def step(self) -> float:
+        start = time.perf_counter()
+        x = 0
+        for i in range(self._n):
+            x += i * i
+        return time.perf_counter() - start
+
+    def close(self) -> None:
+        pass
+
+
+class GpuBackend:
+    """gpu_stress_benchmark `serve` process; a unit of work is `gemms` N x N SGEMMs."""
+
+    name = "gpu"
+
+    def __init__(self, stress_bin: str, size: int = 4096, gemms: int = 1, env=None):
+        self._request = f"{gemms}\n"
+        self._proc = subprocess.Popen([stress_bin, "serve", str(size)], stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, text=True, bufsize=1, env=env)
+        first = self._proc.stdout.readline()
+        if not first.startswith("ready"):
+            self.close()
+            raise RuntimeError(f"{stress_bin} serve did not start (got {first.strip()!r})")
+
+    def step(self) -> float:
+        """Seconds the GPU spent on one unit (measured by the server around a device sync)."""
+        self._proc.stdin.write(self._request)
+        self._proc.stdin.flush()
+        line = self._proc.stdout.readline()
+        if not line:
+            raise RuntimeError("stress server exited")
+        return float(line) / 1000
+
+    def close(self) -> None:
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+@dataclass
+class Period:
+    t: float       # wall-clock end, time.time()
+    duty: float
+    busy_s: float
+    span_s: float
+    ready: bool
+
+    @property
+    def util(self) -> float:
+        return self.busy_s / self.span_s if self.span_s > 0 else 0.0
+
+
+class DutyCycleController:
+    """Feedback control of a backend's duty cycle toward `target` (a fraction, 0 < target <= 1)."""
+
+    def __init__(self, backend, target: float, period_s: float = 0.1, gain: float = 0.3,
+                 tolerance: float = 0.03, settle: int = 10):
+        if not 0 < target <= 1:
+            raise ValueError(f"target utilization must be in (0, 1], got {target}")
+        self.backend = backend
+        self.target = target
+        self.period_s = period_s
+        self.gain = gain
+        self.tolerance = tolerance
+        self.duty = target
+        self._recent: deque[float] = deque(maxlen=settle)
+        self.started = time.time()
+        self.ready_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def recent_util(self) -> float:
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def step(self) -> Period:
+        """Run one period and update the duty cycle from its utilization."""
+        start = time.perf_counter()
+        budget = self.duty * self.period_s
+        busy = 0.0
+        while busy < budget:
+            busy += self.backend.step()
+        idle = self.period_s - (time.perf_counter() - start)
+        if idle > 0:
+            time.sleep(idle)
+        period = Period(time.time(), self.duty, busy, time.perf_counter() - start, self.ready)
+
+        # Utilization follows the duty cycle within one period, so integral action
+        # alone converges without overshoot for 0 < gain < 1.
+        self.duty = min(1.0, max(0.0, self.duty + self.gain * (self.target - period.util)))
+
+        self._recent.append(period.util)
+        if (not self.ready and len(self._recent) == self._recent.maxlen
+                and abs(self.recent_util() - self.target) <= self.tolerance):
+            self.ready_at = period.t
+            period.ready = True
+        return period
+
+    def run(self, duration_s: float = 0.0, on_period: Optional[Callable[[Period], None]] = None,
+            on_ready: Optional[Callable[["DutyCycleController"], None]] = None,
+            stop: Optional[Callable[[], bool]] = None) -> None:
+        """Step until `duration_s` has passed (0: forever) or stop() returns True."""
+        end = time.monotonic() + duration_s if duration_s else float("inf")
+        while time.monotonic() < end and not (stop and stop()):
+            was_ready = self.ready
+            period = self.step()
+            if on_period is not None:
+                on_period(period)
+            if self.ready and not was_ready and on_ready is not None:
+                on_ready(self)
+
+
+def load_log(path) -> list[Period]:
+    with open(path, newline="") as f:
+        return [Period(float(r["t"]), float(r["duty"]), float(r["busy_s"]), float(r["span_s"]), r["ready"] == "1")
+                for r in csv.DictReader(f)]
+
+
+def window_utilization(periods: list[Period], t0: float, t1: float) -> dict[str, float]:
+    """Utilization over the periods that ended inside [t0, t1] (wall clock): busy-weighted mean, min, max."""
+    inside = [p for p in periods if t0 <= p.t <= t1]
+    if not inside:
+        return {"n": 0, "mean": float("nan"), "min": float("nan"), "max": float("nan")}
+    utils = [p.util for p in inside]
+    return {"n": len(inside), "mean": sum(p.busy_s for p in inside) / sum(p.span_s for p in inside),
+            "min": min(utils), "max": max(utils)}
+
+
+def _write_ready(path: Path, ctl: DutyCycleController) -> None:
+    # Written to a temporary name and renamed, so a waiting runner never sees half a file.
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"t": ctl.ready_at, "after_s": ctl.ready_at - ctl.started, "target": ctl.target,
+                               "duty": ctl.duty, "util": ctl.recent_util(), "pid": os.getpid()}))
+    os.replace(tmp, path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hold a CPU or GPU load at a target utilization.")
+    parser.add_argument("--backend", choices=("cpu", "gpu"), default="cpu")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--target", type=float, help="Target utilization in percent (0-100]")
+    target.add_argument("--level", choices=[k for k in LEVEL_TARGETS if k != "none"],
+                        help="Phase 2 level instead of --target (low 33%%, medium 67%%, high 100%%)")
+    parser.add_argument("--period", type=float, default=0.1, help="Control period in seconds (default: 0.1)")
+    parser.add_argument("--tolerance", type=float, default=3.0,
+                        help="Ready once the recent mean is within this many points of the target (default: 3)")
+    parser.add_argument("--settle", type=int, default=10, help="Periods averaged for readiness (default: 10)")
+    parser.add_argument("--stress-bin", default="gpu_stress_benchmark", help="gpu backend: stress binary with serve mode")
+    parser.add_argument("--size", type=int, default=4096, help="gpu backend: SGEMM size N (default: 4096)")
+    parser.add_argument("--gemms", type=int, default=1, help="gpu backend: SGEMMs per unit of work (default: 1)")
+    parser.add_argument("--unit", type=float, default=0.001, help="cpu backend: seconds per unit of work")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (default: until SIGTERM)")
+    parser.add_argument("--ready-file", type=Path, help="Written (JSON) once the load is stable")
+    parser.add_argument("--log", type=Path, help="CSV with one row per period")
+    parser.add_argument("--report-every", type=float, default=0.0, help="Print utilization every N seconds")
+    args = parser.parse_args(argv)
+
+    goal = LEVEL_TARGETS[args.level] if args.level else args.target / 100
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    backend = (GpuBackend(args.stress_bin, args.size, args.gemms) if args.backend == "gpu"
+               else CpuBackend(args.unit))
+    ctl = DutyCycleController(backend, goal, args.period, tolerance=args.tolerance / 100, settle=args.settle)
+
+    log_f = open(args.log, "w", newline="") if args.log else None
+    writer = csv.writer(log_f) if log_f else None
+    if writer:
+        writer.writerow(LOG_FIELDS)
+    since_ready: list[Period] = []
+    last_report = time.monotonic()
+
+    def on_period(p: Period) -> None:
+        nonlocal last_report
+        if writer:
+            writer.writerow([f"{p.t:.6f}", f"{p.duty:.4f}", f"{p.busy_s:.6f}", f"{p.span_s:.6f}", f"{p.util:.4f}",
+                             int(p.ready)])
+        if ctl.ready:
+            since_ready.append(p)
+        if args.report_every and time.monotonic() - last_report >= args.report_every:
+            last_report = time.monotonic()
+            print(f"util {ctl.recent_util() * 100:5.1f}% duty {ctl.duty * 100:5.1f}% "
+                  f"{'ready' if ctl.ready else 'settling'}", flush=True)
+            if log_f:
+                log_f.flush()
+
+    def on_ready(c: DutyCycleController) -> None:
+        if log_f:
+            log_f.flush()
+        if args.ready_file:
+            _write_ready(args.ready_file, c)
+        print(f"READY after {c.ready_at - c.started:.2f}s at {c.recent_util() * 100:.1f}% "
+              f"(target {c.target * 100:.1f}%)", flush=True)
+
+    try:
+        ctl.run(args.duration, on_period=on_period, on_ready=on_ready, stop=lambda: bool(stopping))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+        if log_f:
+            log_f.close()
+    if since_ready:
+        w = window_utilization(since_ready, since_ready[0].t, since_ready[-1].t)
+        print(f"achieved {w['mean'] * 100:.1f}% over {w['n']} periods after ready "
+              f"(min {w['min'] * 100:.1f}%, max {w['max'] * 100:.1f}%)", flush=True)
+    else:
+        print(f"never stable: last {ctl.recent_util() * 100:.1f}% vs target {goal * 100:.1f}%", flush=True)
+    return 0 if ctl.ready else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Text summaries of one nccl-tests run (peak bandwidth, small/large message averages, regions)."""
+
+from __future__ import annotations
+
+from .parsing import format_size
+
+
+def _argmax(vals: list[float]) -> int:
+    return max(range(len(vals)), key=vals.__getitem__)
+
+
+def print_summary(sizes, oop_bw, ip_bw) -> None:
+    """Print peak and small/large message bandwidth (same report as plot_nccl_bw.py)."""
+    sizes = list(sizes)
+    oop_bw = list(oop_bw)
+    ip_bw = list(ip_bw)
+    print("\n" + "="*60)
+    print("NCCL Performance Summary")
+    print("="*60)
+
+    # Find peak bandwidth
+    peak_oop_idx = _argmax(oop_bw)
+    peak_ip_idx = _argmax(ip_bw)
+
+    print(f"\nPeak Out-of-Place Bandwidth: {oop_bw[peak_oop_idx]:.2f} GB/s")
+    print(f"  at message size: {sizes[peak_oop_idx]:,} bytes ({sizes[peak_oop_idx]/(1024**2):.1f} MB)")
+
+    print(f"\nPeak In-Place Bandwidth: {ip_bw[peak_ip_idx]:.2f} GB/s")
+    print(f"  at message size: {sizes[peak_ip_idx]:,} bytes ({sizes[peak_ip_idx]/(1024**2):.1f} MB)")
+
+    # Small message performance
+    small = [bw for s, bw in zip(sizes, oop_bw) if s <= 1024]
+    if small:
+        print(f"\nAverage bandwidth for messages ≤ 1KB: {sum(small)/len(small):.3f} GB/s")
+
+    # Large message performance
+    large = [bw for s, bw in zip(sizes, oop_bw) if s >= 1024 * 1024]
+    if large:
+        print(f"Average bandwidth for messages ≥ 1MB: {sum(large)/len(large):.2f} GB/s")
+
+    print("\n" + "="*60)
+
+
+def performance_regions(data: list[tuple[int, float, float]]) -> list[tuple[str, float, float]]:
+    """(label, avg bw, max bw) for small (<1MB), medium (1-100MB) and large (>=100MB) messages.
+
+    data holds (size, time_us, algbw) tuples.
+    """
+    bounds = [
+        ("Small messages (< 1MB)", 0, 1024 * 1024),
+        ("Medium messages (1MB - 100MB)", 1024 * 1024, 100 * 1024 * 1024),
+        ("Large messages (>= 100MB)", 100 * 1024 * 1024, float("inf")),
+    ]
+    regions = []
+    for label, lo, hi in bounds:
+        bws = [bw for s, _, bw in data if lo <= s < hi]
+        if bws:
+            regions.append((label, sum(bws) / len(bws), max(bws)))
+    return regions
+
+
+def print_regions(data: list[tuple[int, float, float]]) -> None:
+    for label, avg_bw, max_bw in performance_regions(data):
+        print(f"{label}: avg {avg_bw:.2f} GB/s, max {max_bw:.2f} GB/s")
+    if data:
+        peak = max(data, key=lambda x: x[2])
+        print(f"\nPeak bandwidth: {peak[2]:.2f} GB/s at {format_size(peak[0])}")
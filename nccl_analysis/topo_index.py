@@ -0,0 +1,227 @@
+"""
+Precomputed query index over an NCCL topology.
+
+`TopoIndex.build` runs all-pairs widest-path (bottleneck bandwidth) and fewest-hop
+searches once over a TopoGraph and classifies every GPU pair with NCCL's path types
+(NVL, PIX, PXB, PHB, SYS). The result is a handful of flat arrays that serialize to a
+small binary file; loading is np.frombuffer over the file contents, so a query is an
+array lookup.
+
+The fingerprint hashes the structure (node types, PCI tree, link types and
+bandwidths, SM version), not bus ids or host hashes, so identical machines share it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from .topology import CPU, GPU, L_NVL, NODE_TYPES, NVS, PCI, TopoGraph, parse_topology
+
+MAGIC = b"NCTI"
+FORMAT_VERSION = 1
+PATH_TYPES = ("LOC", "NVL", "PIX", "PXB", "PHB", "SYS")
+P_LOC, P_NVL, P_PIX, P_PXB, P_PHB, P_SYS = range(len(PATH_TYPES))
+
+_HEADER = struct.Struct("<4sHIII16s")  # magic, version, n_nodes, n_links, n_gpus, fingerprint
+
+
+def _ancestors(parent: np.ndarray, node: int) -> list[int]:
+    chain = [node]
+    while parent[chain[-1]] >= 0:
+        chain.append(int(parent[chain[-1]]))
+    return chain
+
+
+def widest_paths(n: int, src: np.ndarray, dst: np.ndarray, bw: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """All-pairs (bottleneck bandwidth of the widest path, fewest hops); Floyd-Warshall over numpy rows."""
+    width = np.zeros((n, n), dtype=np.float32)
+    np.maximum.at(width, (src, dst), bw.astype(np.float32))
+    hops = np.full((n, n), np.iinfo(np.int16).max // 2, dtype=np.int16)
+    hops[src, dst] = 1
+    np.fill_diagonal(width, np.inf)
+    np.fill_diagonal(hops, 0)
+    for k in range(n):
+        width = np.maximum(width, np.minimum(width[:, k:k + 1], width[k:k + 1, :]))
+        hops = np.minimum(hops, hops[:, k:k + 1] + hops[k:k + 1, :])
+    return width, hops
+
+
+def fingerprint(topo: TopoGraph) -> str:
+    h = hashlib.sha256()
+    h.update(b"nccl-topo-v1")
+    h.update(topo.node_type.astype(np.int8).tobytes())
+    h.update(topo.parent.astype(np.int32).tobytes())
+    links = sorted(zip(topo.src.tolist(), topo.dst.tolist(), topo.link_type.tolist(),
+                       np.round(topo.bw, 1).tolist()))
+    h.update(repr(links).encode())
+    h.update(str(topo.gpu_sm).encode())
+    return h.hexdigest()[:16]
+
+
+@dataclass
+class TopoIndex:
+    node_type: np.ndarray    # int8 (n,)
+    parent: np.ndarray       # int32 (n,)
+    src: np.ndarray          # int32 (L,)
+    dst: np.ndarray          # int32 (L,)
+    link_type: np.ndarray    # int8 (L,)
+    link_bw: np.ndarray      # float32 (L,)
+    gpu_nodes: np.ndarray    # int32 (g,) node index of GPU i, ordered by CUDA dev
+    gpu_dev: np.ndarray      # int32 (g,)
+    gpu_rank: np.ndarray     # int32 (g,)
+    bw: np.ndarray           # float32 (n, n) bottleneck GB/s
+    hops: np.ndarray         # int16 (n, n)
+    gpu_path: np.ndarray     # int8 (g, g) PATH_TYPES index
+    labels: list[str]
+    fingerprint: str
+
+    @classmethod
+    def build(cls, topo: TopoGraph) -> "TopoIndex":
+        n = topo.n_nodes
+        width, hops = widest_paths(n, topo.src, topo.dst, topo.bw)
+        gpus = sorted(topo.nodes_of(GPU).tolist(), key=lambda i: topo.gpu_dev.get(i, i))
+        nvl = set(zip(topo.src[topo.link_type == L_NVL].tolist(), topo.dst[topo.link_type == L_NVL].tolist()))
+        on_nvs = {a for a, b in nvl if topo.node_type[b] == NVS}
+        g = len(gpus)
+        path = np.full((g, g), P_SYS, dtype=np.int8)
+        for i, a in enumerate(gpus):
+            anc_a = _ancestors(topo.parent, a)
+            for j, b in enumerate(gpus):
+                if i == j:
+                    path[i, j] = P_LOC
+                elif (a, b) in nvl or (a in on_nvs and b in on_nvs):
+                    path[i, j] = P_NVL
+                else:
+                    anc_b = _ancestors(topo.parent, b)
+                    common = next((x for x in anc_a if x in anc_b), -1)
+                    if common < 0:
+                        path[i, j] = P_SYS
+                    elif topo.node_type[common] == CPU:
+                        path[i, j] = P_PHB
+                    else:
+                        # Both one level below the same switch -> PIX, deeper -> PXB.
+                        depth = anc_a.index(common) + anc_b.index(common)
+                        path[i, j] = P_PIX if depth <= 2 else P_PXB
+        return cls(
+            node_type=topo.node_type.astype(np.int8),
+            parent=topo.parent.astype(np.int32),
+            src=topo.src.astype(np.int32),
+            dst=topo.dst.astype(np.int32),
+            link_type=topo.link_type.astype(np.int8),
+            link_bw=topo.bw.astype(np.float32),
+            gpu_nodes=np.array(gpus, dtype=np.int32),
+            gpu_dev=np.array([topo.gpu_dev.get(i, -1) for i in gpus], dtype=np.int32),
+            gpu_rank=np.array([topo.gpu_rank.get(i, -1) for i in gpus], dtype=np.int32),
+            bw=width,
+            hops=hops,
+            gpu_path=path,
+            labels=list(topo.node_label),
+            fingerprint=fingerprint(topo),
+        )
+
+    @classmethod
+    def from_xml(cls, path: str) -> "TopoIndex":
+        return cls.build(parse_topology(path))
+
+    # Queries take GPU positions (0..n_gpus-1, ordered by CUDA device index).
+
+    @property
+    def n_gpus(self) -> int:
+        return len(self.gpu_nodes)
+
+    def bandwidth(self, i: int, j: int) -> float:
+        """Bottleneck bandwidth (GB/s) of the widest path between GPU i and GPU j."""
+        return float(self.bw[self.gpu_nodes[i], self.gpu_nodes[j]])
+
+    def hop_count(self, i: int, j: int) -> int:
+        return int(self.hops[self.gpu_nodes[i], self.gpu_nodes[j]])
+
+    def path_type(self, i: int, j: int) -> str:
+        return PATH_TYPES[self.gpu_path[i, j]]
+
+    def is_nvswitch_mesh(self) -> bool:
+        """True when every GPU pair is connected over NVLink and an NVSwitch is present (needs 2+ GPUs)."""
+        if self.n_gpus < 2:
+            return False
+        off_diag = ~np.eye(self.n_gpus, dtype=bool)
+        return bool(np.any(self.node_type == NVS) and np.all(self.gpu_path[off_diag] == P_NVL))
+
+    def pcie_switch_groups(self) -> list[list[int]]:
+        """GPUs grouped by the PCIe switch directly above them (GPUs hanging off a CPU are alone)."""
+        groups: dict[int, list[int]] = {}
+        for i, node in enumerate(self.gpu_nodes):
+            up = int(self.parent[node])
+            key = up if up >= 0 and self.node_type[up] == PCI else -1 - i
+            groups.setdefault(key, []).append(i)
+        return list(groups.values())
+
+    # Serialization
+
+    def to_bytes(self) -> bytes:
+        n, links, g = len(self.node_type), len(self.src), self.n_gpus
+        parts = [
+            _HEADER.pack(MAGIC, FORMAT_VERSION, n, links, g, self.fingerprint.encode()[:16].ljust(16, b"\0")),
+            self.node_type.astype("<i1").tobytes(), self.parent.astype("<i4").tobytes(),
+            self.src.astype("<i4").tobytes(), self.dst.astype("<i4").tobytes(),
+            self.link_type.astype("<i1").tobytes(), self.link_bw.astype("<f4").tobytes(),
+            self.gpu_nodes.astype("<i4").tobytes(), self.gpu_dev.astype("<i4").tobytes(),
+            self.gpu_rank.astype("<i4").tobytes(),
+            self.bw.astype("<f4").tobytes(), self.hops.astype("<i2").tobytes(),
+            self.gpu_path.astype("<i1").tobytes(),
+        ]
+        label_blob = "\n".join(self.labels).encode()
+        parts.append(struct.pack("<I", len(label_blob)) + label_blob)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TopoIndex":
+        magic, version, n, links, g, fp = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a topology index (magic={magic!r}, version={version})")
+        offset = _HEADER.size
+
+        def take(dtype: str, count: int, shape=None):
+            nonlocal offset
+            arr = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += arr.nbytes
+            return arr.reshape(shape) if shape else arr
+
+        fields = dict(
+            node_type=take("<i1", n), parent=take("<i4", n),
+            src=take("<i4", links), dst=take("<i4", links),
+            link_type=take("<i1", links), link_bw=take("<f4", links),
+            gpu_nodes=take("<i4", g), gpu_dev=take("<i4", g), gpu_rank=take("<i4", g),
+            bw=take("<f4", n * n, (n, n)), hops=take("<i2", n * n, (n, n)),
+            gpu_path=take("<i1", g * g, (g, g)),
+        )
+        (length,) = struct.unpack_from("<I", data, offset)
+        labels = data[offset + 4:offset + 4 + length].decode().split("\n") if length else []
+        return cls(**fields, labels=labels, fingerprint=fp.rstrip(b"\0").decode())
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "TopoIndex":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def print_summary(self) -> None:
+        counts = {NODE_TYPES[t]: int(np.sum(self.node_type == t)) for t in range(len(NODE_TYPES))}
+        print(f"Topology fingerprint: {self.fingerprint}")
+        print("Nodes: " + ", ".join(f"{k}={v}" for k, v in counts.items() if v) + f"; links: {len(self.src) // 2}")
+        print(f"NVSwitch full mesh: {'yes' if self.is_nvswitch_mesh() else 'no'}")
+        groups = [grp for grp in self.pcie_switch_groups() if len(grp) > 1]
+        print("GPUs sharing a PCIe switch: " + ("; ".join(",".join(str(i) for i in grp) for grp in groups) or "none"))
+        if self.n_gpus:
+            print("\nGPU pairs (path type / bottleneck GB/s / hops):")
+            print("      " + "".join(f"{'dev' + str(d):>18}" for d in self.gpu_dev))
+            for i, d in enumerate(self.gpu_dev):
+                cells = "".join(f"{self.path_type(i, j) + ' ' + format(self.bandwidth(i, j), '.0f') + ' ' + str(self.hop_count(i, j)):>18}"
+                                if i != j else f"{'-':>18}" for j in range(self.n_gpus))
+                print(f"dev{d:<3}" + cells)
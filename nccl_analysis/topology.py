@@ -0,0 +1,193 @@
+"""
+NCCL topology / graph XML (NCCL_TOPO_DUMP_FILE, NCCL_GRAPH_DUMP_FILE) as a compact link graph.
+
+Nodes are GPUs, PCIe switches/devices, CPUs (NUMA domains), NVSwitches and network
+ports; links are stored as parallel arrays (src, dst, type, bandwidth) in both directions.
+Bandwidths follow NCCL's own topology model (ncclTopoGetNvbGpus / kvDictPciGen) in GB/s:
+
+- NVLink: per-link bandwidth by SM generation times the link count
+- PCIe: width * generation factor / 80 (Gen4 x16 = 24 GB/s)
+- NIC: speed (Mb/s) / 8000
+- CPU <-> CPU: 16 GB/s (NCCL's AMD/Intel inter-socket default)
+
+All NVLinks whose target has tclass 0x068000 end at a single merged NVSwitch node,
+as NCCL does.
+"""
+
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+import numpy as np
+
+NODE_TYPES = ("GPU", "PCI", "NVS", "CPU", "NIC", "NET")
+LINK_TYPES = ("NVL", "PCI", "SYS", "NET")
+GPU, PCI, NVS, CPU, NIC, NET = range(len(NODE_TYPES))
+L_NVL, L_PCI, L_SYS, L_NET = range(len(LINK_TYPES))
+
+NVSWITCH_CLASS = "0x068000"
+SYS_BW = 16.0
+# Per-link NVLink bandwidth (GB/s) by SM generation, as in NCCL's ncclTopoNVLinkBw.
+NVLINK_BW = {60: 18.0, 70: 20.0, 80: 20.0, 90: 20.6, 100: 40.1}
+# NCCL's kvDictPciGen (x10 GT/s-ish units); bandwidth = width * factor / 80.
+PCI_GEN = {"2.5 GT/s": 15, "5 GT/s": 30, "8.0 GT/s": 60, "16.0 GT/s": 120, "32.0 GT/s": 240, "64.0 GT/s": 480}
+# nccl_graph.xml pattern ids (NCCL_TOPO_PATTERN_*).
+GRAPH_PATTERNS = {1: "balanced_tree", 2: "split_tree", 3: "tree", 4: "ring", 5: "nvls", 6: "collnet_direct"}
+
+
+def nvlink_bw(sm: int) -> float:
+    best = 20.0
+    for gen, bw in sorted(NVLINK_BW.items()):
+        if sm >= gen:
+            best = bw
+    return best
+
+
+def pci_bw(link_speed: str, link_width: str) -> float:
+    speed = next((v for k, v in PCI_GEN.items() if link_speed and link_speed.startswith(k)), 60)
+    return int(link_width or 16) * speed / 80.0
+
+
+@dataclass
+class TopoGraph:
+    """Array-backed link graph: node i has type node_type[i] and label node_label[i]."""
+
+    node_type: np.ndarray            # int8 (n_nodes,)
+    node_label: list[str]            # busid / "cpu<numa>" / net name / "nvswitch"
+    src: np.ndarray                  # int32 (n_links,)
+    dst: np.ndarray                  # int32 (n_links,)
+    link_type: np.ndarray            # int8 (n_links,)
+    bw: np.ndarray                   # float32 (n_links,) GB/s
+    parent: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))  # PCI tree parent, -1 at roots
+    gpu_dev: dict[int, int] = field(default_factory=dict)    # node index -> CUDA dev
+    gpu_rank: dict[int, int] = field(default_factory=dict)   # node index -> NCCL rank
+    gpu_sm: int = 0
+    host_hash: str = ""
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_type)
+
+    def nodes_of(self, kind: int) -> np.ndarray:
+        return np.nonzero(self.node_type == kind)[0]
+
+    def links_from(self, node: int) -> np.ndarray:
+        return np.nonzero(self.src == node)[0]
+
+
+class _Builder:
+    def __init__(self):
+        self.types: list[int] = []
+        self.labels: list[str] = []
+        self.index: dict[str, int] = {}
+        self.links: list[tuple[int, int, int, float]] = []
+        self.parent: list[int] = []
+
+    def node(self, kind: int, label: str, parent: int = -1) -> int:
+        if label not in self.index:
+            self.index[label] = len(self.types)
+            self.types.append(kind)
+            self.labels.append(label)
+            self.parent.append(parent)
+        return self.index[label]
+
+    def link(self, a: int, b: int, kind: int, bw: float) -> None:
+        self.links.append((a, b, kind, bw))
+        self.links.append((b, a, kind, bw))
+
+
+def parse_topology(path: str) -> TopoGraph:
+    """Parse an NCCL topology dump (<system> XML) into a TopoGraph."""
+    root = ET.parse(path).getroot()
+    b = _Builder()
+    gpu_dev: dict[int, int] = {}
+    gpu_rank: dict[int, int] = {}
+    pending_nvlinks: list[tuple[int, str, str, int]] = []
+    gpu_sm = 0
+    host_hash = ""
+
+    def walk_pci(elem, parent: int, parent_bw: float) -> None:
+        nonlocal gpu_sm
+        for child in elem:
+            if child.tag == "pci":
+                busid = child.get("busid", "").lower()
+                gpu = child.find("gpu")
+                kind = GPU if gpu is not None else PCI
+                node = b.node(kind, busid, parent)
+                bw = pci_bw(child.get("link_speed", ""), child.get("link_width", ""))
+                b.link(parent, node, L_PCI, bw)
+                if gpu is not None:
+                    gpu_dev[node] = int(gpu.get("dev", -1))
+                    gpu_rank[node] = int(gpu.get("rank", -1))
+                    gpu_sm = int(gpu.get("sm", 0) or 0)
+                    for nvl in gpu.findall("nvlink"):
+                        pending_nvlinks.append((node, nvl.get("target", "").lower(), nvl.get("tclass", ""),
+                                                int(nvl.get("count", 1))))
+                walk_pci(child, node, bw)
+            elif child.tag == "nic":
+                # A NIC sits on its parent PCI device (or directly on the CPU for virtual ports).
+                nic = b.node(NIC, f"nic@{b.labels[parent]}", parent)
+                b.link(parent, nic, L_PCI, parent_bw)
+                for net in child.findall("net"):
+                    node = b.node(NET, net.get("name", f"net{net.get('dev')}"), nic)
+                    b.link(nic, node, L_NET, float(net.get("speed", 0) or 0) / 8000.0)
+
+    cpus = []
+    for cpu in root.findall("cpu"):
+        host_hash = host_hash or cpu.get("host_hash", "")
+        node = b.node(CPU, f"cpu{cpu.get('numaid', len(cpus))}")
+        cpus.append(node)
+        walk_pci(cpu, node, SYS_BW)
+    for i, a in enumerate(cpus):
+        for c in cpus[i + 1:]:
+            b.link(a, c, L_SYS, SYS_BW)
+
+    nvs = None
+    for gpu, target, tclass, count in pending_nvlinks:
+        bw = nvlink_bw(gpu_sm) * count
+        if tclass == NVSWITCH_CLASS:
+            if nvs is None:
+                nvs = b.node(NVS, "nvswitch")
+            # NCCL folds every NVSwitch port of a GPU into one GPU->NVS link.
+            b.links.append((gpu, nvs, L_NVL, bw))
+            b.links.append((nvs, gpu, L_NVL, bw))
+        elif target in b.index:
+            b.links.append((gpu, b.index[target], L_NVL, bw))
+
+    # Merge parallel links (e.g. six NVSwitch ports) by summing their bandwidth.
+    merged: dict[tuple[int, int, int], float] = {}
+    for a, c, kind, bw in b.links:
+        merged[(a, c, kind)] = merged.get((a, c, kind), 0.0) + bw
+    keys = sorted(merged)
+    return TopoGraph(
+        node_type=np.array(b.types, dtype=np.int8),
+        node_label=b.labels,
+        src=np.array([k[0] for k in keys], dtype=np.int32),
+        dst=np.array([k[1] for k in keys], dtype=np.int32),
+        link_type=np.array([k[2] for k in keys], dtype=np.int8),
+        bw=np.array([merged[k] for k in keys], dtype=np.float32),
+        parent=np.array(b.parent, dtype=np.int32),
+        gpu_dev=gpu_dev,
+        gpu_rank=gpu_rank,
+        gpu_sm=gpu_sm,
+        host_hash=host_hash,
+    )
+
+
+def parse_graphs(path: str) -> list[dict]:
+    """Channel search results from an NCCL graph dump: one dict per <graph>."""
+    graphs = []
+    for g in ET.parse(path).getroot().findall("graph"):
+        pattern = int(g.get("pattern", 0))
+        graphs.append({
+            "id": int(g.get("id", -1)),
+            "pattern": GRAPH_PATTERNS.get(pattern, str(pattern)),
+            "nchannels": int(g.get("nchannels", 0)),
+            "speedintra": float(g.get("speedintra", 0)),
+            "speedinter": float(g.get("speedinter", 0)),
+            "typeintra": g.get("typeintra", ""),
+            "typeinter": g.get("typeinter", ""),
+            "channels": [[int(gpu.get("dev"), 0) for gpu in ch.findall("gpu")] for ch in g.findall("channel")],
+        })
+    return graphs
@@ -0,0 +1,279 @@
+"""
+Append-only binary trace of Phase 3 iterations.
+
+Text iteration_times files are written once, after the loop, and have to be parsed
+in full to be read. A trace is written while the proxy runs and can be read while it
+is still growing:
+
+    magic "NCCLTRC1" | uint32 n | n bytes of JSON metadata, space-padded to 8 bytes | records
+
+Every record has the same size (RECORD, little endian, 32 bytes): iteration, rank,
+config id (an index into metadata["configs"]), seconds since the start of the run,
+and the compute, all-reduce and whole-iteration times in ms. The writer appends
+whole records and flushes every `flush_records` records or `flush_s` seconds. A
+reader maps the file and only looks at complete records, so a torn final record
+from a crash or an in-progress write is never seen. A writer replaces any existing
+trace unless asked to append; appending checks that the existing header describes
+the same run setup and config, cuts a torn record off and continues after the last
+complete one.
+
+Pure Python (struct + mmap) so the proxy can write traces in its torch-only image.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+MAGIC = b"NCCLTRC1"
+_PREFIX = struct.Struct("<8sI")
+RECORD = struct.Struct("<IHHdfff4x")
+
+
+class Record(NamedTuple):
+    iteration: int
+    rank: int
+    config: int
+    t_s: float
+    compute_ms: float
+    comm_ms: float
+    iter_ms: float
+
+
+FIELDS = Record._fields
+
+
+def is_trace(path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _read_header(f) -> tuple[dict, int]:
+    """(metadata, offset of the first record); ValueError if f is not a trace this module can read."""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise ValueError("truncated trace header")
+    magic, n = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError("not an iteration trace")
+    raw = f.read(n)
+    if len(raw) < n:
+        raise ValueError("truncated trace header")
+    meta = json.loads(raw)
+    if meta.get("record") != RECORD.format:
+        raise ValueError(f"unsupported record format {meta.get('record')!r} (expected {RECORD.format!r})")
+    return meta, _PREFIX.size + n
+
+
+def _encode_header(meta: dict) -> bytes:
+    raw = json.dumps(meta, sort_keys=True).encode()
+    raw += b" " * (-(_PREFIX.size + len(raw)) % 8)
+    return _PREFIX.pack(MAGIC, len(raw)) + raw
+
+
+class TraceWriter:
+    """Writes records to a new trace at `path` with `meta` and `configs`.
+
+    With append=True an existing trace is continued instead, provided every `meta`
+    key and every config matches its header (ValueError otherwise). Records are
+    tagged with the first of `configs` unless add() is given another config id.
+    """
+
+    def __init__(self, path, meta: Optional[dict] = None, configs: Optional[list[str]] = None,
+                 flush_records: int = 256, flush_s: float = 2.0, append: bool = False):
+        self.path = Path(path)
+        self.flush_records = flush_records
+        self.flush_s = flush_s
+        configs = list(configs or ["auto"])
+        if append and self.path.is_file() and self.path.stat().st_size:
+            with open(self.path, "rb") as f:
+                self.meta, offset = _read_header(f)
+            differ = sorted(k for k, v in (meta or {}).items() if self.meta.get(k) != v)
+            if differ:
+                raise ValueError(f"cannot append to {self.path}: header differs in {', '.join(differ)}")
+            unknown = [c for c in configs if c not in self.meta["configs"]]
+            if unknown:
+                raise ValueError(f"cannot append to {self.path}: config {unknown[0]!r} is not in the trace "
+                                 f"header {self.meta['configs']}")
+            size = self.path.stat().st_size
+            complete = offset + (size - offset) // RECORD.size * RECORD.size
+            if complete != size:
+                os.truncate(self.path, complete)
+        else:
+            self.meta = {**(meta or {}), "record": RECORD.format, "fields": list(FIELDS),
+                         "configs": configs, "created": time.time()}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(_encode_header(self.meta))
+        self.configs = {name: i for i, name in enumerate(self.meta["configs"])}
+        self.config = self.configs[configs[0]]
+        self._f = open(self.path, "ab")
+        self._buf = bytearray()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def config_id(self, name: str) -> int:
+        try:
+            return self.configs[name]
+        except KeyError:
+            raise ValueError(f"config {name!r} is not in the trace header {list(self.configs)}") from None
+
+    def add(self, iteration: int, rank: int, t_s: float, compute_ms: float, comm_ms: float, iter_ms: float,
+            config: Optional[int] = None) -> None:
+        self._buf += RECORD.pack(iteration, rank, self.config if config is None else config, t_s,
+                                 compute_ms, comm_ms, iter_ms)
+        self._pending += 1
+        if self._pending >= self.flush_records or time.monotonic() - self._last_flush >= self.flush_s:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._f.write(self._buf)
+            self._buf.clear()
+        self._f.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TraceReader:
+    """Memory-mapped view of a trace; refresh() picks up records appended since."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = open(self.path, "rb")
+        self.meta, self.offset = _read_header(self._f)
+        self._map: Optional[mmap.mmap] = None
+        self._size = 0
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Remap if the file grew; returns the number of complete records."""
+        size = os.fstat(self._f.fileno()).st_size
+        if size != self._size:
+            # Views handed out earlier keep the old map alive until they are dropped.
+            self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._size = size
+        return (self._size - self.offset) // RECORD.size
+
+    def __len__(self) -> int:
+        return (self._size - self.offset) // RECORD.size
+
+    @property
+    def configs(self) -> list[str]:
+        return self.meta.get("configs", [])
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Record]:
+        n = len(self)
+        stop = n if stop is None else min(stop, n)
+        if start >= stop:
+            return
+        view = memoryview(self._map)[self.offset + start * RECORD.size:self.offset + stop * RECORD.size]
+        try:
+            for fields in RECORD.iter_unpack(view):
+                yield Record(*fields)
+        finally:
+            view.release()
+
+    def column(self, name: str, start: int = 0, rank: Optional[int] = None) -> list[float]:
+        i = FIELDS.index(name)
+        return [r[i] for r in self.records(start) if rank is None or r.rank == rank]
+
+    def close(self) -> None:
+        self._map = None
+        self._f.close()
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def follow(path, poll_s: float = 1.0, idle_s: float = 0.0, wait_s: float = 60.0) -> Iterator[list[Record]]:
+    """Yield batches of new records as `path` grows.
+
+    Waits up to `wait_s` for the trace to appear. Stops after `idle_s` seconds without
+    new records (0: never, until interrupted).
+    """
+    deadline = time.monotonic() + wait_s
+    while not is_trace(path):
+        if time.monotonic() > deadline:
+            raise FileNotFoundError(f"no trace at {path} after {wait_s:.0f}s")
+        time.sleep(poll_s)
+    with TraceReader(path) as reader:
+        seen = 0
+        last_new = time.monotonic()
+        while True:
+            n = reader.refresh()
+            if n > seen:
+                yield list(reader.records(seen, n))
+                seen = n
+                last_new = time.monotonic()
+            elif idle_s and time.monotonic() - last_new >= idle_s:
+                return
+            time.sleep(poll_s)
+
+
+def watch(path, monitor, on_update=None, every_s: float = 10.0, poll_s: float = 1.0, idle_s: float = 0.0,
+          rank: Optional[int] = None):
+    """Feed a growing trace into a soak.SoakMonitor, calling on_update(monitor) every `every_s`.
+
+    Only one rank's records are used (the first record's by default). Returns the
+    monitor when the trace goes idle for `idle_s` seconds or on Ctrl-C.
+    """
+    last = time.monotonic()
+    shown = -1
+    try:
+        for batch in follow(path, poll_s=poll_s, idle_s=idle_s):
+            if rank is None:
+                rank = batch[0].rank
+            for r in batch:
+                if r.rank == rank:
+                    monitor.add(r.iter_ms, r.t_s)
+            if on_update is not None and time.monotonic() - last >= every_s:
+                on_update(monitor)
+                last, shown = time.monotonic(), monitor.iterations
+    except KeyboardInterrupt:
+        pass
+    if on_update is not None and monitor.iterations != shown:
+        on_update(monitor)
+    return monitor
+
+
+def load_trace_times(path, rank: Optional[int] = None) -> list[float]:
+    """Iteration times (ms) of one rank; by default the first record's (proxy traces hold one rank each)."""
+    with TraceReader(path) as reader:
+        if rank is None:
+            first = next(reader.records(0, 1), None)
+            if first is None:
+                return []
+            rank = first.rank
+        return reader.column("iter_ms", rank=rank)
+
+
+def config_label(env=os.environ) -> str:
+    """Trace config name for a run: forced NCCL_ALGO/NCCL_PROTO, the tuner plugin, or auto."""
+    forced = [env[k].lower() for k in ("NCCL_ALGO", "NCCL_PROTO") if env.get(k)]
+    if forced:
+        return "_".join(forced)
+    return "tuner" if env.get("NCCL_TUNER_PLUGIN") else "auto"
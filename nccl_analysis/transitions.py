@@ -0,0 +1,64 @@
+"""Bandwidth-jump detection between adjacent message sizes (likely algo/proto switches)."""
+
+from __future__ import annotations
+
+from .parsing import format_size, read_results
+from .summary import print_regions
+
+
+def transition_data(path) -> list[tuple[int, float, float]]:
+    """(size, out-of-place time us, out-of-place algbw) tuples in file order."""
+    return [(r.size, r.oop_time_us, r.oop_algbw) for r in read_results(path).rows]
+
+
+def find_transitions(data, threshold_pct=20):
+    """Find significant bandwidth transitions (likely algo/proto switches)."""
+    transitions = []
+    for i in range(1, len(data)):
+        prev_size, prev_time, prev_bw = data[i-1]
+        curr_size, curr_time, curr_bw = data[i]
+
+        if prev_bw > 0:
+            pct_change = abs((curr_bw - prev_bw) / prev_bw) * 100
+            if pct_change > threshold_pct:
+                transitions.append({
+                    'from_size': prev_size,
+                    'to_size': curr_size,
+                    'from_bw': prev_bw,
+                    'to_bw': curr_bw,
+                    'change_pct': pct_change,
+                    'direction': 'up' if curr_bw > prev_bw else 'down'
+                })
+    return transitions
+
+
+def print_report(data, threshold_pct=20) -> None:
+    """Full transitions report (same layout as analyze_transitions.py)."""
+    print(f"\n{'='*80}")
+    print("NCCL All-Reduce Performance Analysis")
+    print(f"{'='*80}\n")
+
+    print(f"Total data points: {len(data)}\n")
+
+    print(f"{'Size':<12} {'Time (us)':<12} {'Bandwidth (GB/s)':<20}")
+    print(f"{'-'*50}")
+    for size, time_us, bw in data:
+        print(f"{format_size(size):<12} {time_us:<12.2f} {bw:<20.2f}")
+
+    print(f"\n{'='*80}")
+    print(f"Significant Bandwidth Transitions (>{threshold_pct:g}% change)")
+    print(f"{'='*80}\n")
+
+    transitions = find_transitions(data, threshold_pct=threshold_pct)
+    if not transitions:
+        print("No significant transitions found")
+    else:
+        for t in transitions:
+            print(f"Transition at {format_size(t['from_size'])} → {format_size(t['to_size'])}")
+            print(f"  Bandwidth: {t['from_bw']:.2f} → {t['to_bw']:.2f} GB/s ({t['direction']}, {t['change_pct']:.1f}% change)")
+            print()
+
+    print(f"{'='*80}")
+    print("Performance Regions")
+    print(f"{'='*80}\n")
+    print_regions(data)
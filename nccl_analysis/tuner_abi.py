@@ -0,0 +1,275 @@
+"""
+NCCL tuner plugin ABI fingerprints, cached by NCCL library version.
+
+The Phase 4 plugin is built against phase4-tuner/tuner.h and exports one
+`ncclTunerPlugin_v<N>` symbol. It only loads if the NCCL it runs under looks that
+symbol up, and the cost table it edits has NCCL_NUM_ALGORITHMS x NCCL_NUM_PROTOCOLS
+entries of that NCCL. fingerprint() collects exactly those facts from an install
+(pip nvidia-nccl-cu12, as pulled in by torch, or a system NCCL):
+
+- locate: a fixed list of candidate directories and file names (libnccl.so*,
+  nccl.h, nccl_tuner.h / tuner.h / plugin/tuner*.h), no recursive search;
+- version: NCCL_MAJOR/MINOR/PATCH from nccl.h, else the library file name;
+- supported tuner versions: the `ncclTunerPlugin_v<N>` names NCCL's plugin loader
+  looks up, read from the library binary (the pip wheel ships no tuner header);
+- from any tuner header found, and from the local tuner.h: each ncclTuner_v<N>_t
+  member with its normalized signature, the plugin symbol and the cost-table sizes.
+
+Fingerprints are cached as <cache_dir>/<nccl version>.json together with the
+library's size and mtime, so a repeated query reads one small file. check() compares
+a header's fingerprint with a runtime's and names every mismatch.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import site
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("NCCL_ABI_CACHE", Path.home() / ".cache" / "nccl-analysis" / "tuner_abi"))
+_CACHE_VERSION = 1
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+_DEFINE_RE = re.compile(r"^\s*#\s*define\s+(\w+)\s+([^\n]+?)\s*$", re.M)
+_STRUCT_RE = re.compile(r"typedef\s+struct\s*\w*\s*\{([^{}]*)\}\s*(ncclTuner_v(\d+)_t)\s*;")
+_FUNC_PTR_RE = re.compile(r"([\w\s\*]+?)\(\s*\*\s*(\w+)\s*\)\s*\(([^)]*)\)\s*;", re.S)
+_PLAIN_FIELD_RE = re.compile(r"([\w\s\*]+?)\b(\w+)\s*;")
+_LIB_SYMBOL_RE = re.compile(rb"ncclTunerPlugin_v(\d+)")
+_LIB_FILE_RE = re.compile(r"libnccl\.so\.(\d+\.\d+\.\d+)")
+_TUNER_HEADERS = ("nccl_tuner.h", "tuner.h", "plugin/tuner.h", "plugin/nccl_tuner.h")
+
+
+@dataclass
+class TunerAbi:
+    nccl_version: str = ""                 # "2.21.5", "" if unknown
+    library: str = ""
+    header: str = ""                       # tuner header the structs came from, "" if none
+    versions: list[int] = field(default_factory=list)        # ncclTunerPlugin_v<N> the runtime looks up
+    members: dict[str, dict[str, str]] = field(default_factory=dict)  # "5" -> {member: signature}
+    plugin_symbol: str = ""                # NCCL_TUNER_PLUGIN_SYMBOL of the header
+    num_algorithms: Optional[int] = None
+    num_protocols: Optional[int] = None
+    algorithms: dict[str, int] = field(default_factory=dict)  # NCCL_ALGO_* -> index
+    protocols: dict[str, int] = field(default_factory=dict)   # NCCL_PROTO_* -> index
+
+    @property
+    def plugin_version(self) -> Optional[int]:
+        m = re.search(r"_v(\d+)$", self.plugin_symbol)
+        return int(m.group(1)) if m else None
+
+
+def _normalize(decl: str) -> str:
+    decl = re.sub(r"\s+", " ", decl).strip()
+    return re.sub(r"\s*([*,()])\s*", r"\1", decl)
+
+
+def _param_types(params: str) -> str:
+    """Parameter list without parameter names: "void**,uint64_t,size_t"."""
+    types = []
+    for p in params.split(","):
+        p = _normalize(p)
+        if p in ("", "void"):
+            continue
+        m = re.match(r"(.*?[\s*])(\w+)$", p)
+        types.append(_normalize(m.group(1)) if m and m.group(1).strip() else p)
+    return ",".join(types)
+
+
+def parse_header(text: str, path: str = "") -> TunerAbi:
+    """Tuner structs, plugin symbol and NCCL_ALGO/PROTO constants declared in one header."""
+    code = _COMMENT_RE.sub("", text)
+    defines = dict(_DEFINE_RE.findall(code))
+    abi = TunerAbi(header=path)
+    for body, _, version in _STRUCT_RE.findall(code):
+        members = {}
+        for ret, name, params in _FUNC_PTR_RE.findall(body):
+            members[name] = f"{_normalize(ret)}({_param_types(params)})"
+        rest = _FUNC_PTR_RE.sub("", body)
+        for ctype, name in _PLAIN_FIELD_RE.findall(rest):
+            members[name] = _normalize(ctype)
+        abi.members[version] = members
+    abi.versions = sorted(int(v) for v in abi.members)
+    symbol = defines.get("NCCL_TUNER_PLUGIN_SYMBOL", "").strip('"')
+    abi.plugin_symbol = symbol
+
+    def number(name: str) -> Optional[int]:
+        try:
+            return int(defines[name].split()[0])
+        except (KeyError, ValueError, IndexError):
+            return None
+
+    abi.num_algorithms = number("NCCL_NUM_ALGORITHMS")
+    abi.num_protocols = number("NCCL_NUM_PROTOCOLS")
+    for name in defines:
+        if name.startswith("NCCL_ALGO_") and name not in ("NCCL_ALGO_UNDEF", "NCCL_ALGO_PROTO_IGNORE"):
+            if (v := number(name)) is not None:
+                abi.algorithms[name[len("NCCL_ALGO_"):]] = v
+        elif name.startswith("NCCL_PROTO_") and name != "NCCL_PROTO_UNDEF":
+            if (v := number(name)) is not None:
+                abi.protocols[name[len("NCCL_PROTO_"):]] = v
+    return abi
+
+
+def candidate_dirs() -> list[Path]:
+    """Install prefixes that may hold NCCL: $NCCL_HOME, pip's nvidia/nccl, then system paths."""
+    dirs = []
+    if os.environ.get("NCCL_HOME"):
+        dirs.append(Path(os.environ["NCCL_HOME"]))
+    try:
+        packages = site.getsitepackages() + [site.getusersitepackages()]
+    except AttributeError:  # virtualenvs without site.getsitepackages
+        packages = []
+    packages += [p for p in sys.path if p.endswith("-packages")]
+    for sp in dict.fromkeys(packages):
+        dirs.append(Path(sp) / "nvidia" / "nccl")
+    dirs += [Path("/usr/local/nccl"), Path("/usr/local"), Path("/usr")]
+    return [d for d in dirs if d.is_dir()]
+
+
+def locate() -> tuple[Optional[Path], Optional[Path], Optional[Path]]:
+    """(libnccl, nccl.h, tuner header) of the first prefix with a library; any may be None."""
+    for prefix in candidate_dirs():
+        libs = []
+        for libdir in ("lib", "lib64", "lib/x86_64-linux-gnu", "lib/aarch64-linux-gnu"):
+            d = prefix / libdir
+            if d.is_dir():
+                libs += sorted(d.glob("libnccl.so*"))
+        if not libs:
+            continue
+        # The fully versioned file (libnccl.so.2.21.5) names the version; any will do for symbols.
+        lib = max(libs, key=lambda p: (bool(_LIB_FILE_RE.search(p.name)), len(p.name)))
+        include = prefix / "include"
+        nccl_h = include / "nccl.h"
+        tuner = next((include / name for name in _TUNER_HEADERS if (include / name).is_file()), None)
+        return lib.resolve(), nccl_h if nccl_h.is_file() else None, tuner
+    return None, None, None
+
+
+def nccl_version(lib: Optional[Path], nccl_h: Optional[Path]) -> str:
+    if nccl_h is not None:
+        defines = dict(_DEFINE_RE.findall(nccl_h.read_text(errors="replace")))
+        try:
+            return ".".join(str(int(defines[k])) for k in ("NCCL_MAJOR", "NCCL_MINOR", "NCCL_PATCH"))
+        except (KeyError, ValueError):
+            pass
+    m = _LIB_FILE_RE.search(lib.name) if lib is not None else None
+    return m.group(1) if m else ""
+
+
+def library_versions(lib: Path) -> list[int]:
+    """ncclTunerPlugin_v<N> symbol names NCCL's plugin loader looks up."""
+    with open(lib, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return sorted({int(m.group(1)) for m in _LIB_SYMBOL_RE.finditer(data)})
+
+
+def _cache_file(cache_dir: Path, version: str) -> Path:
+    return Path(cache_dir) / f"{version or 'unknown'}.json"
+
+
+def load_cached(cache_dir=DEFAULT_CACHE_DIR, version: str = "") -> Optional[TunerAbi]:
+    """The cached fingerprint of `version`, or the most recently written one if version is empty."""
+    cache_dir = Path(cache_dir)
+    if version:
+        path = _cache_file(cache_dir, version)
+    else:
+        files = sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime) if cache_dir.is_dir() else []
+        if not files:
+            return None
+        path = files[-1]
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    return TunerAbi(**data["abi"]) if data.get("cache_version") == _CACHE_VERSION else None
+
+
+def fingerprint(cache_dir=DEFAULT_CACHE_DIR, refresh: bool = False) -> Optional[TunerAbi]:
+    """Fingerprint of the NCCL found by locate(), from the cache while the library is unchanged.
+
+    None if no NCCL library is installed here.
+    """
+    lib, nccl_h, tuner = locate()
+    if lib is None:
+        return None
+    version = nccl_version(lib, nccl_h)
+    st = lib.stat()
+    stamp = [str(lib), st.st_size, st.st_mtime_ns]
+    path = _cache_file(Path(cache_dir), version)
+    if not refresh and path.is_file():
+        try:
+            data = json.loads(path.read_text())
+            if data.get("cache_version") == _CACHE_VERSION and data.get("library") == stamp:
+                return TunerAbi(**data["abi"])
+        except (OSError, ValueError, TypeError):
+            pass
+
+    abi = parse_header(tuner.read_text(errors="replace"), str(tuner)) if tuner else TunerAbi()
+    abi.nccl_version = version
+    abi.library = str(lib)
+    abi.versions = library_versions(lib) or abi.versions
+    try:
+        save_cached(abi, cache_dir, stamp)
+    except OSError:
+        pass  # read-only cache location: fingerprint again next time
+    return abi
+
+
+def save_cached(abi: TunerAbi, cache_dir=DEFAULT_CACHE_DIR, stamp: Optional[list] = None) -> Path:
+    """Write `abi` as <cache_dir>/<version>.json; `stamp` ties it to one library file for fingerprint()."""
+    path = _cache_file(Path(cache_dir), abi.nccl_version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"cache_version": _CACHE_VERSION, "library": stamp or [], "written": time.time(),
+                               "abi": asdict(abi)}, indent=1))
+    os.replace(tmp, path)
+    return path
+
+
+def check(plugin: TunerAbi, runtime: TunerAbi) -> list[str]:
+    """ABI mismatches between a plugin header's fingerprint and a runtime's; empty if compatible."""
+    problems = []
+    version = plugin.plugin_version
+    where = f"NCCL {runtime.nccl_version or '(unknown version)'}"
+    if version is None:
+        problems.append(f"{plugin.header}: no NCCL_TUNER_PLUGIN_SYMBOL, cannot tell which tuner ABI it exports")
+    elif runtime.versions and version not in runtime.versions:
+        problems.append(f"plugin exports {plugin.plugin_symbol} but {where} only loads "
+                        + ", ".join(f"ncclTunerPlugin_v{v}" for v in runtime.versions)
+                        + "; rebuild against a tuner.h for one of those versions")
+    if version is not None and str(version) in runtime.members:
+        ours, theirs = plugin.members.get(str(version), {}), runtime.members[str(version)]
+        for name in sorted(set(ours) | set(theirs)):
+            if ours.get(name) != theirs.get(name):
+                problems.append(f"ncclTuner_v{version}_t.{name}: plugin has {ours.get(name, '(missing)')}, "
+                                f"{where} has {theirs.get(name, '(missing)')}")
+    for what, ours, theirs in (("NCCL_NUM_ALGORITHMS", plugin.num_algorithms, runtime.num_algorithms),
+                               ("NCCL_NUM_PROTOCOLS", plugin.num_protocols, runtime.num_protocols)):
+        if ours is not None and theirs is not None and ours != theirs:
+            problems.append(f"cost table {what}: plugin {ours}, {where} {theirs}")
+    return problems
+
+
+def print_abi(abi: TunerAbi) -> None:
+    print(f"NCCL {abi.nccl_version or '(unknown version)'}" + (f"  {abi.library}" if abi.library else ""))
+    if abi.versions:
+        print("  tuner plugin versions: " + ", ".join(f"v{v}" for v in abi.versions))
+    if abi.plugin_symbol:
+        print(f"  plugin symbol: {abi.plugin_symbol}")
+    if abi.num_algorithms is not None or abi.num_protocols is not None:
+        algos = ", ".join(name.lower() for name, _ in sorted(abi.algorithms.items(), key=lambda kv: kv[1]))
+        protos = ", ".join(name for name, _ in sorted(abi.protocols.items(), key=lambda kv: kv[1]))
+        print(f"  cost table: {abi.num_algorithms} algorithms ({algos}) x {abi.num_protocols} protocols ({protos})")
+    for version, members in sorted(abi.members.items(), key=lambda kv: int(kv[0])):
+        if "getCollInfo" in members:
+            print(f"  ncclTuner_v{version}_t.getCollInfo: {members['getCollInfo']}")
+    if abi.header:
+        print(f"  header: {abi.header}")
+    elif abi.library:
+        print("  (no tuner header installed: structs and cost-table sizes come from the plugin header only)")
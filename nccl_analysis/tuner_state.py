@@ -0,0 +1,181 @@
+"""
+Compact RL tuner reward logs into snapshots of per-key/per-arm sufficient statistics.
+
+The phase4 plugin's reward log (`collType,nBytes,nNodes,nRanks,latency_ms[,algo,proto]`)
+grows by a line per iteration. A snapshot keeps, for each (collType, size band, nNodes,
+nRanks) key and (algo, proto) arm:
+
+- count, mean and variance (merged exactly, Chan et al.);
+- a recency-weighted mean (the plugin's EWMA, alpha = 0.1 over log order);
+- the time of the newest reward.
+
+That is at most MAX_KEYS x MAX_ARMS lines per communicator shape, whatever the
+history behind it. The plugin loads it as a prior (NCCL_TUNER_SNAPSHOT_FILE) and
+rewrites it at finalize, so this module and rl_bandit_tuner_plugin.c read and write
+the same format:
+
+    collType,sizeBand,nNodes,nRanks,algo,proto,count,mean_ms,var_ms2,ewma_ms,updated
+
+Reward lines only count if they name their arm, either in the optional trailing
+fields or for the whole log via `arm=` (e.g. logs of forced NCCL_ALGO/NCCL_PROTO runs).
+Lines without an arm are skipped.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from .bandit import PLUGIN_BANDS
+
+HEADER = "# nccl-tuner-snapshot v1"
+COLUMNS = "collType,sizeBand,nNodes,nRanks,algo,proto,count,mean_ms,var_ms2,ewma_ms,updated"
+EWMA_ALPHA = 0.1
+DEFAULT_HALFLIFE_S = 7 * 24 * 3600.0
+
+# (collType, sizeBand, nNodes, nRanks), (algo, proto)
+StatKey = tuple[str, int, int, int]
+ArmKey = tuple[str, str]
+
+
+def size_band(n_bytes) -> np.ndarray:
+    """The plugin's sizeBandFromBytes: 0 (< 1 KB) .. 5 (>= 8 MB)."""
+    return np.searchsorted(PLUGIN_BANDS, np.asarray(n_bytes), side="right")
+
+
+@dataclass
+class ArmStats:
+    count: float
+    mean_ms: float
+    var_ms2: float      # population variance, m2 / count
+    ewma_ms: float
+    updated: int        # unix time of the newest reward
+
+    @classmethod
+    def from_samples(cls, latencies_ms, updated: int) -> "ArmStats":
+        x = np.asarray(latencies_ms, dtype=float)
+        n = len(x)
+        # EWMA seeded with the first sample: (1-a)^(n-1) x0 + sum_i a (1-a)^(n-1-i) x_i.
+        w = EWMA_ALPHA * (1 - EWMA_ALPHA) ** np.arange(n - 1, -1, -1, dtype=float)
+        w[0] = (1 - EWMA_ALPHA) ** (n - 1)
+        return cls(float(n), float(x.mean()), float(x.var()), float(w @ x), updated)
+
+    def decayed(self, now: float, halflife_s: float) -> "ArmStats":
+        if halflife_s <= 0:
+            return self
+        age = max(now - self.updated, 0.0)
+        return replace(self, count=self.count * 0.5 ** (age / halflife_s))
+
+    def merge(self, other: "ArmStats") -> "ArmStats":
+        """Pooled statistics; the EWMA treats the newer side's rewards as following the older side's."""
+        n = self.count + other.count
+        if n <= 0:
+            return self
+        delta = other.mean_ms - self.mean_ms
+        mean = self.mean_ms + delta * other.count / n
+        m2 = self.var_ms2 * self.count + other.var_ms2 * other.count + delta ** 2 * self.count * other.count / n
+        older, newer = (self, other) if other.updated >= self.updated else (other, self)
+        w = 1.0 - (1.0 - EWMA_ALPHA) ** newer.count
+        ewma = (1.0 - w) * older.ewma_ms + w * newer.ewma_ms
+        return ArmStats(n, mean, m2 / n, ewma, newer.updated)
+
+
+Snapshot = dict[StatKey, dict[ArmKey, ArmStats]]
+
+
+def read_snapshot(path: str) -> Snapshot:
+    snap: Snapshot = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.strip().split(",")
+            if len(parts) != 11:
+                continue
+            coll, band, nodes, ranks, algo, proto = parts[:6]
+            count, mean, var, ewma = (float(v) for v in parts[6:10])
+            snap.setdefault((coll, int(band), int(nodes), int(ranks)), {})[(algo, proto)] = ArmStats(
+                count, mean, var, ewma, int(parts[10]))
+    return snap
+
+
+def write_snapshot(snap: Snapshot, path: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{HEADER}\n# {COLUMNS}\n")
+        for key in sorted(snap):
+            for (algo, proto), s in sorted(snap[key].items()):
+                f.write(f"{key[0]},{key[1]},{key[2]},{key[3]},{algo},{proto},{s.count:.3f},{s.mean_ms:.6f},"
+                        f"{s.var_ms2:.6f},{s.ewma_ms:.6f},{s.updated}\n")
+    os.replace(tmp, path)
+
+
+def read_rewards(path: str, arm: ArmKey | None = None) -> tuple[Snapshot, int]:
+    """Statistics of one reward log (timestamped with its mtime) and the number of unattributed lines."""
+    samples: dict[tuple[StatKey, ArmKey], list[float]] = {}
+    rows: list[tuple[str, int, int, int, float, ArmKey]] = []
+    skipped = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = [p.strip() for p in line.split(",")]
+            if len(parts) < 5:
+                continue
+            line_arm = (parts[5].lower(), parts[6].lower()) if len(parts) >= 7 else arm
+            if line_arm is None:
+                skipped += 1
+                continue
+            try:
+                rows.append((parts[0].lower(), int(parts[1]), int(parts[2]), int(parts[3]), float(parts[4]),
+                             line_arm))
+            except ValueError:
+                continue  # torn or garbled line in a live log; rl_bandit_tuner_plugin.c skips these too
+    if rows:
+        bands = size_band([r[1] for r in rows])
+        for r, band in zip(rows, bands.tolist()):
+            samples.setdefault(((r[0], band, r[2], r[3]), r[5]), []).append(r[4])
+    updated = int(os.path.getmtime(path))
+    snap: Snapshot = {}
+    for (key, arm_key), lat in samples.items():
+        snap.setdefault(key, {})[arm_key] = ArmStats.from_samples(lat, updated)
+    return snap, skipped
+
+
+def merge_snapshots(snaps: list[Snapshot], now: float | None = None,
+                    halflife_s: float = DEFAULT_HALFLIFE_S, min_count: float = 0.0) -> Snapshot:
+    """Decay every input to `now`, pool matching arms, and drop arms whose weight fell below min_count."""
+    now = time.time() if now is None else now
+    out: Snapshot = {}
+    for snap in snaps:
+        for key, arms in snap.items():
+            dest = out.setdefault(key, {})
+            for arm_key, stats in arms.items():
+                stats = stats.decayed(now, halflife_s)
+                # Decayed weight is folded in with the current time so it is not decayed twice.
+                stats = replace(stats, updated=max(stats.updated, int(now)) if halflife_s > 0 else stats.updated)
+                dest[arm_key] = dest[arm_key].merge(stats) if arm_key in dest else stats
+    for key in list(out):
+        out[key] = {a: s for a, s in out[key].items() if s.count >= min_count}
+        if not out[key]:
+            del out[key]
+    return out
+
+
+def print_snapshot(snap: Snapshot) -> None:
+    header = (f"{'coll':<10} {'band':>4} {'nodes':>5} {'ranks':>5} {'arm':<16} {'count':>8} "
+              f"{'mean ms':>9} {'std ms':>8} {'ewma ms':>9} {'age':>8}")
+    print(header)
+    print("-" * len(header))
+    now = time.time()
+    for key in sorted(snap):
+        arms = snap[key]
+        best = min(arms, key=lambda a: arms[a].ewma_ms)
+        for arm_key, s in sorted(arms.items()):
+            age_h = max(now - s.updated, 0) / 3600
+            mark = " *" if arm_key == best else ""
+            print(f"{key[0]:<10} {key[1]:>4} {key[2]:>5} {key[3]:>5} {'/'.join(arm_key):<16} {s.count:>8.1f} "
+                  f"{s.mean_ms:>9.3f} {np.sqrt(s.var_ms2):>8.3f} {s.ewma_ms:>9.3f} {age_h:>7.1f}h{mark}")
@@ -1,41 +1,37 @@
-import re
-import matplotlib
-matplotlib.use("Agg")  # non-interactive backend for saving without display
-import matplotlib.pyplot as plt
 import argparse
 import os
+import sys
 
-def parse_nccl_results(filename):
-    sizes = []
-    out_of_place_times = []
-    in_place_times = []
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith('#') or not line.strip():
-                continue
-            parts = line.split()
-            if len(parts) >= 12:
-                try:
-                    size = int(parts[0])
-                    out_time = float(parts[5])  # out-of-place latency (us)
-                    in_time = float(parts[9])   # in-place latency (us)
-                    sizes.append(size)
-                    out_of_place_times.append(out_time)
-                    in_place_times.append(in_time)
-                except (ValueError, IndexError):
-                    continue
-    return sizes, out_of_place_times, in_place_times
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from nccl_analysis.parsing import parse_latency_columns as parse_nccl_results
+from nccl_analysis.plotting import plot_aggregate_figure, plot_latency
+import matplotlib.pyplot as plt
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Parse NCCL test results and plot latency graphs.')
-    parser.add_argument('input_file', type=str, help='Input NCCL results txt file')
+    parser.add_argument('input_files', nargs='+', help='Input NCCL results txt file (several: repeats of one config)')
     parser.add_argument('--output_dir', type=str, default='latency_graphs', help='Output directory for plots')
     parser.add_argument('--arch', type=str, default='', help='GPU architecture label for plot titles')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Pool the runs of all input files into a median curve with an error band (implied by several files)')
+    parser.add_argument('--band', choices=('stdev', 'minmax'), default='stdev', help='Error band with --aggregate (default: stdev)')
     args = parser.parse_args()
 
-    filename = args.input_file
+    filename = args.input_files[0]
     output_dir = args.output_dir
     arch_label = args.arch
+
+    if args.aggregate or len(args.input_files) > 1:
+        base = os.path.splitext(os.path.basename(filename))[0]
+        title = f'NCCL AllReduce Latency vs Message Size {arch_label}' if arch_label else 'NCCL AllReduce Latency vs Message Size'
+        output_file = os.path.join(output_dir, f"{base}_aggregate_latency.png")
+        if not plot_aggregate_figure({base: args.input_files}, "time_us", title, output_file, band=args.band):
+            print("Error: No data found in input files")
+            sys.exit(1)
+        print(f"Aggregated plot of {len(args.input_files)} files saved to: {output_file}")
+        sys.exit(0)
+
     sizes, out_times, in_times = parse_nccl_results(filename)
     print("Sizes:", sizes)
     print("Out-of-place times:", out_times)
@@ -50,25 +46,13 @@ if __name__ == "__main__":
     in_place_png = f"{base}_in_place.png"
 
     # Plot out-of-place latency vs message size
-    plt.figure()
-    plt.plot(sizes, out_times, color='blue')
-    plt.xlabel('Message Size (Bytes)')
-    plt.ylabel('Latency (us)')
-    plt.xscale('log')
     title_oop = f'NCCL AllReduce Out-of-place Latency vs Message Size {arch_label}' if arch_label else 'NCCL AllReduce Out-of-place Latency vs Message Size'
-    plt.title(title_oop)
-    plt.grid(True)
-    plt.savefig(os.path.join(output_dir, out_of_place_png))
-    plt.close()
+    fig = plot_latency(sizes, out_times, title_oop, color='blue')
+    fig.savefig(os.path.join(output_dir, out_of_place_png))
+    plt.close(fig)
 
     # Plot in-place latency vs message size
-    plt.figure()
-    plt.plot(sizes, in_times, color='green')
-    plt.xlabel('Message Size (Bytes)')
-    plt.ylabel('Latency (us)')
-    plt.xscale('log')
     title_ip = f'NCCL AllReduce In-place Latency vs Message Size {arch_label}' if arch_label else 'NCCL AllReduce In-place Latency vs Message Size'
-    plt.title(title_ip)
-    plt.grid(True)
-    plt.savefig(os.path.join(output_dir, in_place_png))
-    plt.close()
+    fig = plot_latency(sizes, in_times, title_ip, color='green')
+    fig.savefig(os.path.join(output_dir, in_place_png))
+    plt.close(fig)
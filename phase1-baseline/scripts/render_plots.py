@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Batch-render bandwidth and latency plots for every NCCL results file under one or more
+directory trees. Rendering is fanned out over a process pool, and a manifest records a
+hash of each figure's input file and plotting parameters so unchanged figures are skipped.
+
+Example usage:
+python3 render_plots.py ../nvidial40s_2gpu_results ../../phase2-contention --arch "L40S" -j 8
+python3 render_plots.py ../nvidial40s_4gpu_results --preview    # fast 72-dpi preview pass
+"""
+
+import argparse
+import os
+import sys
+
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from nccl_analysis.render import add_arguments, run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch-render NCCL bandwidth/latency plots with incremental re-rendering.')
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
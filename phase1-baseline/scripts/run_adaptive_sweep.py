@@ -0,0 +1,132 @@
+"""
+Adaptive all_reduce_perf sweep: coarse factor-2 scan, then extra -b/-e/-i runs inside the
+size intervals where forced configs cross or AUTO's curve bends, until each is pinned
+to --resolution (relative width). Uses the same environment and result layout as
+run_nccl_farmshare.sh, so the outputs feed the existing plotting/analysis scripts.
+
+Usage (from this directory, inside the nccl-env environment):
+    python run_adaptive_sweep.py --gpus 4 --configs auto ring tree auto_ll auto_ll128 auto_simple
+    python run_adaptive_sweep.py --gpus 4 --dry-run    # existing results only, no GPU needed
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from nccl_analysis.catalog import ResultKey, config_dirname, config_env, discover, parse_config  # noqa: E402
+from nccl_analysis.refine import COARSE_ARGS, Probe, print_intervals, refine  # noqa: E402
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_BINARY = SCRIPT_DIR.parent.parent / "nccl-tests" / "build" / "all_reduce_perf"
+
+
+def gpu_tag() -> str:
+    """Same results-folder tag as run_nccl_farmshare.sh (lower-cased GPU name, no spaces)."""
+    name = subprocess.run(["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
+                          capture_output=True, text=True, check=True).stdout.splitlines()[0]
+    return name.lower().replace(" ", "")
+
+
+def nccl_env(extra: dict[str, str]) -> dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in ("NCCL_ALGO", "NCCL_PROTO")}
+    nccl_home = env.get("NCCL_HOME") or env.get("CONDA_PREFIX", "")
+    if nccl_home:
+        env["NCCL_HOME"] = nccl_home
+        env["LD_LIBRARY_PATH"] = f"{nccl_home}/lib:{env.get('LD_LIBRARY_PATH', '')}".rstrip(":")
+    env.setdefault("NCCL_DEBUG", "WARN")
+    env.update(extra)
+    return env
+
+
+def run_all_reduce(binary: Path, key: ResultKey, size_args: list[str], results_dir: Path, tag: str):
+    out_dir = results_dir / config_dirname(key)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    # Probes of one round finish within a second of each other: name them by size range too.
+    opts = dict(zip(size_args[::2], size_args[1::2]))
+    stem = f"{tag}_{opts.get('-b', '')}-{opts.get('-e', '')}_{timestamp}"
+    out_path = out_dir / f"{stem}.txt"
+    n = 1
+    while out_path.exists():
+        n += 1
+        out_path = out_dir / f"{stem}_{n}.txt"
+    cmd = [str(binary), *size_args, "-g", str(key.n_gpus)]
+    env_str = " ".join(f"{k}={v}" for k, v in config_env(key).items())
+    print(f"  {env_str + ' ' if env_str else ''}{' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True, env=nccl_env(config_env(key)))
+    out_path.write_text(result.stdout)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        print(f"Warning: all_reduce_perf exited {result.returncode}; see {out_path}")
+        return []
+    return discover([str(out_path)])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Coarse-then-bisect all_reduce_perf sweep around crossovers.")
+    parser.add_argument("--gpus", type=int, required=True, help="Number of GPUs (-g)")
+    parser.add_argument("--configs", nargs="+", default=["auto", "ring", "tree", "auto_ll", "auto_ll128", "auto_simple"],
+                        help="Configs in run_nccl_farmshare.sh folder naming (default: auto ring tree auto_ll auto_ll128 auto_simple)")
+    parser.add_argument("--results-dir", type=Path, default=None,
+                        help="Results folder (default: ../<gpu>_<n>gpu_results, as run_nccl_farmshare.sh)")
+    parser.add_argument("--binary", type=Path, default=DEFAULT_BINARY, help="all_reduce_perf binary")
+    parser.add_argument("--resolution", type=float, default=0.05, help="Target interval width / size (default: 0.05)")
+    parser.add_argument("--points", type=int, default=3, help="Sizes per refinement run (default: 3)")
+    parser.add_argument("--max-rounds", type=int, default=6, help="Refinement rounds at most (default: 6)")
+    parser.add_argument("--min-gap", type=float, default=0.03, help="Ignore crossings within this log-latency gap (default: 0.03)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only print intervals found in existing results (no GPU needed)")
+    args = parser.parse_args()
+
+    if args.results_dir:
+        result_dirs = [args.results_dir]
+    elif args.dry_run:
+        # No nvidia-smi for the GPU tag: look at every platform's folder for this GPU count.
+        result_dirs = sorted(SCRIPT_DIR.parent.glob(f"*_{args.gpus}gpu_results"))
+    else:
+        result_dirs = [SCRIPT_DIR.parent / f"{gpu_tag()}_{args.gpus}gpu_results"]
+    wanted = {parse_config(c) for c in args.configs}
+
+    existing = discover([str(d) for d in result_dirs if d.is_dir()])
+    files = [f for f in existing
+             if f.key.n_gpus == args.gpus and f.key.contention == "none" and (f.key.algo, f.key.proto) in wanted]
+    if args.dry_run:
+        from nccl_analysis.refine import find_intervals, median_curves
+
+        print_intervals(find_intervals(median_curves(files), min_gap=args.min_gap), args.resolution)
+        return 0
+
+    if not args.binary.exists():
+        print(f"Error: all_reduce_perf binary '{args.binary}' does not exist.")
+        return 1
+
+    platform = files[0].key.platform if files else gpu_tag().replace("nvidia", "").upper()
+    have = {(f.key.algo, f.key.proto) for f in files}
+    missing = [c for c in wanted if c not in have]
+    if missing:
+        print(f"Coarse scan ({' '.join(COARSE_ARGS)}) for {len(missing)} configs")
+    results_dir = result_dirs[0]
+    for algo, proto in sorted(missing):
+        key = ResultKey(platform, args.gpus, "none", algo, proto)
+        files += run_all_reduce(args.binary, key, COARSE_ARGS, results_dir, "coarse")
+
+    def run(probe: Probe):
+        return run_all_reduce(args.binary, probe.key, probe.args(), results_dir, "refine")
+
+    intervals, files = refine(files, run, resolution=args.resolution, points=args.points,
+                              max_rounds=args.max_rounds, min_gap=args.min_gap)
+    print()
+    print_intervals(intervals, args.resolution)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
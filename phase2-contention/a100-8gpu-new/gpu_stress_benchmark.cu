@@ -80,12 +80,56 @@ void run_stress(const char* mode) {
     cublasDestroy(handle);
 }
 
+// Serve mode for the duty-cycle controller (nccl_analysis/stress.py): prints
+// "ready <N>" once the matrices are allocated, then for every line "<k>" read from
+// stdin runs k SGEMMs of NxN, synchronizes and prints the elapsed ms. Exits on EOF.
+void run_serve(int N) {
+    float *A, *B, *C;
+    cublasHandle_t handle;
+    checkCublas(cublasCreate(&handle), "cublasCreate");
+    checkCuda(cudaMalloc((void**)&A, (size_t)N*N*sizeof(float)), "cudaMalloc A");
+    checkCuda(cudaMalloc((void**)&B, (size_t)N*N*sizeof(float)), "cudaMalloc B");
+    checkCuda(cudaMalloc((void**)&C, (size_t)N*N*sizeof(float)), "cudaMalloc C");
+    float alpha = 1.0f, beta = 0.0f;
+
+    // One untimed SGEMM so cuBLAS setup is not charged to the first request.
+    checkCublas(cublasSgemm(handle, CUBLAS_OP_N, CUBLAS_OP_N,
+        N, N, N, &alpha, A, N, B, N, &beta, C, N), "cublasSgemm");
+    checkCuda(cudaDeviceSynchronize(), "warmup");
+    printf("ready %d\n", N);
+    fflush(stdout);
+
+    char line[64];
+    while (fgets(line, sizeof(line), stdin) != NULL) {
+        int k = atoi(line);
+        if (k < 1) k = 1;
+        auto start = std::chrono::high_resolution_clock::now();
+        for (int j = 0; j < k; ++j) {
+            checkCublas(cublasSgemm(handle, CUBLAS_OP_N, CUBLAS_OP_N,
+                N, N, N, &alpha, A, N, B, N, &beta, C, N), "cublasSgemm");
+        }
+        checkCuda(cudaDeviceSynchronize(), "cudaDeviceSynchronize");
+        auto end = std::chrono::high_resolution_clock::now();
+        printf("%.4f\n", std::chrono::duration<double, std::milli>(end - start).count());
+        fflush(stdout);
+    }
+    cudaFree(A);
+    cudaFree(B);
+    cudaFree(C);
+    cublasDestroy(handle);
+}
+
 int main(int argc, char** argv) {
     // Usage: gpu_stress_benchmark [utilization]
     // Accepts: low, medium, high
+    //        gpu_stress_benchmark serve [N]   (driven over stdin/stdout, see run_serve)
+    if (argc >= 2 && strcmp(argv[1], "serve") == 0) {
+        run_serve(argc >= 3 ? atoi(argv[2]) : 4096);
+        return 0;
+    }
     if (argc < 2) {
         fprintf(stderr, "Error: Utilization argument required.\n");
-        fprintf(stderr, "Usage: %s [low|medium|high]\n", argv[0]);
+        fprintf(stderr, "Usage: %s [low|medium|high] | serve [N]\n", argv[0]);
         return 1;
     }
     const char* mode = NULL;
@@ -3,6 +3,12 @@ Modal app: Phase 2 contention on 8x A100.
 Runs GPU stress (low/medium/high) on all 8 GPUs while running NCCL AllReduce.
 Job name: browser-networking-test.
 Same idea as L40S run_nccl_with_contention.sh but for 8 GPUs on Modal.
+
+Each run takes a per-GPU contention profile (nccl_analysis.contention), e.g.
+"3:high" stresses only GPU 3, and optionally forces NCCL_ALGO, so a single
+contended rank can be compared across ring and tree. The stress is held at each
+level's target utilization by a duty-cycle controller (nccl_analysis.stress), and
+AllReduce starts once every controller reports a stable load.
 """
 
 import os
@@ -37,6 +43,9 @@ VOLUME_PATH = "/results"
 
 app = modal.App("browser-networking-tests")
 
+N_GPUS = 8
+PROFILES = ("low", "medium", "high")
+
 
 def _base_env(cuda_home: str, nccl_home: str) -> dict:
     return {
@@ -58,8 +67,15 @@ def _base_env(cuda_home: str, nccl_home: str) -> dict:
     timeout=3600,
     volumes={VOLUME_PATH: volume},
 )
-def run_contention_all_levels():
-    """Build nccl-tests and gpu_stress_benchmark, then run contention for low, medium, high."""
+def run_contention_all_levels(profiles: list[str] = PROFILES, algos: list[str] = ("auto",),
+                              ready_timeout: float = 60.0):
+    """Build nccl-tests and gpu_stress_benchmark, then run AllReduce under each profile and algo.
+
+    Returns {result file name: text}; every text starts with the profile as comment lines.
+    """
+    sys.path.insert(0, "/repo")
+    from nccl_analysis.contention import StressGroup, parse_profile, profile_header, profile_label, utilization_line
+
     nccl_tests = Path("/repo/nccl-tests")
     phase2_a100 = Path("/repo/phase2-contention/a100-8gpu-new")
     stress_src = phase2_a100 / "gpu_stress_benchmark.cu"
@@ -67,6 +83,8 @@ def run_contention_all_levels():
         raise RuntimeError("nccl-tests not found. Run: git submodule update --init --recursive")
     if not stress_src.is_file():
         raise RuntimeError(f"gpu_stress_benchmark.cu not found at {stress_src}")
+    # Parse every profile before building anything so a typo fails fast.
+    parsed = [(spec, parse_profile(spec, N_GPUS)) for spec in profiles]
 
     cuda_home = "/usr/local/cuda"
     nccl_home = "/usr"
@@ -83,7 +101,7 @@ def run_contention_all_levels():
     if not nccl_binary.exists():
         raise RuntimeError(f"Build failed: {nccl_binary} not found")
 
-    # Build GPU stress benchmark (nvcc + cublas)
+    # Build GPU stress benchmark (nvcc + cublas); the controllers use its serve mode
     stress_bin = Path("/tmp/gpu_stress_benchmark")
     subprocess.run(
         [
@@ -95,59 +113,66 @@ def run_contention_all_levels():
     )
 
     results = {}
-    for level in ("low", "medium", "high"):
-        print(f"--- Contention level: {level} ---")
-        # Start one stress process per GPU (each sees one GPU as device 0)
-        stress_procs = []
-        for gpu_id in range(8):
-            env = {**base_env, "CUDA_VISIBLE_DEVICES": str(gpu_id)}
-            p = subprocess.Popen(
-                [str(stress_bin), level],
-                env=env,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            stress_procs.append(p)
-        time.sleep(2)
-
-        # Run NCCL AllReduce (same flags as L40S, -g 8)
-        result = subprocess.run(
-            [
-                str(nccl_binary),
-                "-b", "8", "-e", "128M", "-f", "2", "-g", "8",
-            ],
-            cwd=nccl_tests,
-            capture_output=True,
-            text=True,
-            env=base_env,
-        )
-        for p in stress_procs:
-            p.terminate()
+    for spec, levels in parsed:
+        label = profile_label(levels)
+        for algo in algos:
+            print(f"--- Contention profile: {spec} ({','.join(levels)}), algo {algo} ---")
+            # One stress controller per contended GPU (each sees one GPU as device 0), all at once
+            stress = StressGroup(levels, stress_bin=str(stress_bin), env=base_env,
+                                 work_dir=Path("/tmp/stress") / f"{label}_{algo}").start()
+
+            # Run NCCL AllReduce (same flags as L40S, -g 8) once the load is stable
+            env = {**base_env, "NCCL_ALGO": algo} if algo != "auto" else base_env
             try:
-                p.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                p.kill()
-
-        if result.returncode != 0:
-            print(result.stderr, file=sys.stderr)
-            raise RuntimeError(f"all_reduce_perf exited {result.returncode} for level {level}")
-        results[level] = result.stdout
-        out_name = f"results_8gpu_allreduce_contended_{level}.txt"
-        (Path(VOLUME_PATH) / out_name).write_text(result.stdout)
-        volume.commit()
-        print(f"Saved {out_name}")
+                ready = stress.wait_ready(timeout=ready_timeout)
+                if ready:
+                    print("Stress stable after " + ", ".join(
+                        f"GPU {g} {r['after_s']:.1f}s" for g, r in sorted(ready.items())))
+                t0 = time.time()
+                result = subprocess.run(
+                    [
+                        str(nccl_binary),
+                        "-b", "8", "-e", "128M", "-f", "2", "-g", str(N_GPUS),
+                    ],
+                    cwd=nccl_tests,
+                    capture_output=True,
+                    text=True,
+                    env=env,
+                )
+                t1 = time.time()
+            finally:
+                stress.stop()
+            util = utilization_line(levels, stress.utilization(t0, t1))
+            print(f"Achieved stress utilization (%): {util}")
+
+            if result.returncode != 0:
+                print(result.stderr, file=sys.stderr)
+                raise RuntimeError(f"all_reduce_perf exited {result.returncode} for profile {spec}, algo {algo}")
+            algo_part = "" if algo == "auto" else f"_{algo}"
+            out_name = f"results_8gpu_allreduce{algo_part}_contended_{label}.txt"
+            text = profile_header(levels, contention_spec=spec, nccl_algo=algo, stress_utilization=util) + result.stdout
+            results[out_name] = text
+            (Path(VOLUME_PATH) / out_name).write_text(text)
+            volume.commit()
+            print(f"Saved {out_name}")
 
     return results
 
 
 @app.local_entrypoint()
-def main():
-    """Run contention for all levels and write result files to results/."""
-    results = run_contention_all_levels.remote()
+def main(profiles: str = "", algos: str = "auto"):
+    """Run contention for each profile and algo and write result files to results/.
+
+    --profiles takes ';'-separated profile specs (default: low;medium;high), e.g.
+    --profiles "3:high;*:low,3:high" --algos ring,tree
+    """
+    profile_list = [p for p in profiles.split(";") if p.strip()] or list(PROFILES)
+    algo_list = [a.strip().lower() for a in algos.split(",") if a.strip()]
+    results = run_contention_all_levels.remote(profile_list, algo_list)
     results_dir = Path(__file__).parent / "results"
     results_dir.mkdir(exist_ok=True)
-    for level, stdout in results.items():
-        out_path = results_dir / f"results_8gpu_allreduce_contended_{level}.txt"
-        out_path.write_text(stdout)
+    for name, text in results.items():
+        out_path = results_dir / name
+        out_path.write_text(text)
         print(f"Wrote {out_path}")
     print("Done.")
@@ -1,54 +1,42 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+"""Plot GPU utilization and memory from check_gpu_utilization.sh (or nvidia-smi) logs, one line per GPU.
 
+Long logs are downsampled per GPU (--points, --method lttb|minmax) and parsed columns
+are cached next to the log as <log>.npz; see nccl_analysis/gpu_util.py.
+"""
+import argparse
 import os
 import sys
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python plot_gpu_utilization.py <csv_file>")
-        sys.exit(1)
-    csv_file = sys.argv[1]
-    df = pd.read_csv(csv_file)
-    # Clean up whitespace in memory_used
-    df['memory_used'] = df['memory_used'].apply(lambda x: int(str(x).strip()))
-
-    # Plot with dual y-axes
-    fig, ax1 = plt.subplots(figsize=(10, 5))
-    color1 = 'tab:blue'
-    ax1.set_xlabel('Timestamp (s)')
-    ax1.set_ylabel('GPU Utilization (%)', color=color1)
-    l1, = ax1.plot(df['timestamp'], df['gpu_utilization'], color=color1, marker='o', label='GPU Utilization (%)')
-    ax1.tick_params(axis='y', labelcolor=color1)
-    ax1.grid(True)
-    # Adjust y-axis if utilization is low
-    max_util = df['gpu_utilization'].max()
-    if max_util < 10:
-        ax1.set_ylim(0, 5)
-
-    ax2 = ax1.twinx()
-    color2 = 'tab:orange'
-    ax2.set_ylabel('Memory Used (MiB)', color=color2)
-    l2, = ax2.plot(df['timestamp'], df['memory_used'], color=color2, marker='x', label='Memory Used (MiB)')
-    ax2.tick_params(axis='y', labelcolor=color2)
-
-    plt.title('GPU Utilization and Memory Usage Over Time')
-    # Combine legends from both axes
-    lines = [l1, l2]
-    labels = [line.get_label() for line in lines]
-    ax1.legend(lines, labels, loc='upper left')
-    plt.tight_layout()
-
-    # Derive output filename from input CSV
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from nccl_analysis.gpu_util import load_log, plot_log
+
+
+def plot_path(csv_file):
     base = os.path.basename(csv_file)
-    if base.startswith('gpu_utilization_log_') and base.endswith('.csv'):
-        suffix = base[len('gpu_utilization_log_'):-len('.csv')]
-        plot_name = f'gpu_utilization_plot_{suffix}.png'
+    if base.startswith("gpu_utilization_log_") and base.endswith(".csv"):
+        plot_name = f"gpu_utilization_plot_{base[len('gpu_utilization_log_'):-len('.csv')]}.png"
     else:
-        plot_name = 'gpu_utilization_plot.png'
-    outdir = os.path.dirname(csv_file)
-    save_path = os.path.join(outdir, plot_name)
-    plt.savefig(save_path)
-    plt.show()
-
-if __name__ == '__main__':
-    main()
\ No newline at end of file
+        plot_name = "gpu_utilization_plot.png"
+    return os.path.join(os.path.dirname(csv_file), plot_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv_file")
+    parser.add_argument("--points", type=int, default=2000, help="Points drawn per GPU (default: 2000)")
+    parser.add_argument("--method", choices=("lttb", "minmax"), default="lttb")
+    args = parser.parse_args()
+
+    log = load_log(args.csv_file)
+    if not len(log.t_s):
+        print(f"No samples in {args.csv_file}", file=sys.stderr)
+        sys.exit(1)
+    save_path = plot_path(args.csv_file)
+    plot_log(log, save_path, points=args.points, method=args.method,
+             title="GPU Utilization and Memory Usage Over Time")
+    print(f"Saved {save_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -95,6 +95,9 @@ for CONTENTION in "${CONTENTION_LEVELS[@]}"; do
         mkdir -p "$OUTDIR"
 
         echo "Starting gpu_stress_benchmark with $CONTENTION contention on $NUM_GPUS GPUs..."
+        # Fixed matrix-size/sleep levels with a fixed warm-up, not the duty-cycle controller
+        # (nccl_analysis/stress.py, needs the serve mode of the A100 benchmark), so these
+        # results keep the plain low/medium/high labels.
         ./gpu_stress_benchmark $CONTENTION $NUM_GPUS &
         BENCH_PID=$!
         sleep 2
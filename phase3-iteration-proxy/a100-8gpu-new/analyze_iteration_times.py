@@ -8,96 +8,77 @@ Reads:
 
 Each file should contain one iteration time in milliseconds per line.
 Prints summary stats per config so you can see which NCCL setting
-minimizes end-to-end iteration time (not just bandwidth).
+minimizes end-to-end iteration time (not just bandwidth), then each forced
+config's change against AUTO with bootstrap CIs and p-values (needs numpy;
+`nccl-analysis iteration-compare` is the same comparison as a regression gate).
+A binary trace (iteration_times_<cfg>.trace) is used instead of the .txt file when present.
+
+--follow TRACE tails a trace that a run is still writing (iteration_proxy.py --trace)
+and prints rolling stats every --interval seconds, then the drift/stall summary.
 """
 
 from __future__ import annotations
 
-import math
+import argparse
+import sys
 from pathlib import Path
 
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from nccl_analysis.iteration import CONFIGS, load_summaries, print_table, times_path
+
 
 RESULTS_DIR = Path(__file__).parent / "results"
-CONFIGS = ["auto", "simple", "ll128"]
-
-
-def load_times(path: Path) -> list[float]:
-    if not path.is_file():
-        return []
-    vals: list[float] = []
-    for line in path.read_text().strip().splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            vals.append(float(line))
-        except ValueError:
-            continue
-    return vals
-
-
-def summarize(times: list[float]) -> dict[str, float]:
-    if not times:
-        return {}
-    times_sorted = sorted(times)
-    n = len(times_sorted)
-
-    def pct(p: float) -> float:
-        if n == 0:
-            return math.nan
-        idx = int(max(0, min(n - 1, round(p * (n - 1)))))
-        return times_sorted[idx]
-
-    mean = sum(times_sorted) / n
-    return {
-        "n": n,
-        "mean": mean,
-        "p50": pct(0.50),
-        "p90": pct(0.90),
-        "p95": pct(0.95),
-        "min": times_sorted[0],
-        "max": times_sorted[-1],
-    }
+
+
+def follow_trace(path: Path, interval: float, idle: float, window: int) -> None:
+    from nccl_analysis.soak import SoakMonitor, print_summary
+    from nccl_analysis.trace import watch
+
+    print(f"Following {path} (Ctrl-C to stop)")
+    monitor = watch(path, SoakMonitor(window=window), on_update=lambda m: print(m.status(), flush=True),
+                    every_s=interval, idle_s=idle)
+    print()
+    print_summary(monitor.summary())
 
 
 def main() -> None:
-    print(f"Reading iteration times from {RESULTS_DIR}")
-    summaries: dict[str, dict[str, float]] = {}
+    parser = argparse.ArgumentParser(description="Phase 3 iteration-time summary per NCCL config.")
+    parser.add_argument("--follow", type=Path, metavar="TRACE", help="Tail a trace that is still being written")
+    parser.add_argument("--interval", type=float, default=10, help="Seconds between status lines (default: 10)")
+    parser.add_argument("--idle", type=float, default=0,
+                        help="Stop after this many seconds without new records (default: 0, until Ctrl-C)")
+    parser.add_argument("--window", type=int, default=100, help="Iterations per rolling window (default: 100)")
+    args = parser.parse_args()
+    if args.follow:
+        follow_trace(args.follow, args.interval, args.idle, args.window)
+        return
 
-    for cfg in CONFIGS:
-        path = RESULTS_DIR / f"iteration_times_{cfg}.txt"
-        times = load_times(path)
-        if not times:
-            print(f"- {cfg}: no data at {path}")
-            continue
-        summaries[cfg] = summarize(times)
+    print(f"Reading iteration times from {RESULTS_DIR}")
+    summaries = load_summaries(RESULTS_DIR, CONFIGS)
 
     if not summaries:
         print("No iteration-time files found; run run_modal.py first.")
         return
 
-    print("\nSummary (ms per iteration):")
-    header = f"{'config':<8} {'n':>4} {'mean':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'min':>8} {'max':>8}"
-    print(header)
-    print("-" * len(header))
-    for cfg in CONFIGS:
-        s = summaries.get(cfg)
-        if not s:
-            continue
-        print(
-            f"{cfg:<8} "
-            f"{int(s['n']):>4} "
-            f"{s['mean']:>8.3f} "
-            f"{s['p50']:>8.3f} "
-            f"{s['p90']:>8.3f} "
-            f"{s['p95']:>8.3f} "
-            f"{s['min']:>8.3f} "
-            f"{s['max']:>8.3f}"
-        )
+    print_table(summaries, CONFIGS)
+
+    try:
+        from nccl_analysis.regression import gate, load_comparisons, print_comparisons
+    except ImportError:
+        print("\n(numpy not installed: skipping confidence intervals)")
+    else:
+        auto = times_path(RESULTS_DIR, "auto")
+        others = [times_path(RESULTS_DIR, cfg) for cfg in CONFIGS if cfg != "auto"]
+        comparisons = load_comparisons(str(auto), [str(p) for p in others if p.is_file()]) if auto.is_file() else []
+        if comparisons:
+            gate(comparisons)
+            print_comparisons(comparisons, threshold=0.03, alpha=0.05)
 
     print(
         "\nInterpretation:\n"
-        "- Lower mean/p95 = better end-to-end iteration time.\n"
+        "- Lower mean/p95 = better end-to-end iteration time; a change whose CI\n"
+        "  spans 0% and p >= 0.05 is within run-to-run noise.\n"
         "- Compare AUTO vs Simple vs LL128: the config with highest communication\n"
         "  bandwidth from Phase 1 may not minimize iteration time here.\n"
         "- This gap is what we want to surface for the workload-aware tuner\n"
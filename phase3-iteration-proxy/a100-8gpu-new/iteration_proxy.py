@@ -2,17 +2,77 @@
 Phase 3 training-step proxy: compute phase → all-reduce phase.
 Measures end-to-end iteration time (not just communication bandwidth).
 Run with: torchrun --nproc_per_node=8 iteration_proxy.py [--iters N] [--size S]
-Output: iteration times (ms) to stdout and to a file (rank 0 only).
+Output: iteration times (ms) to stdout and to a file (rank 0 only); --comm-out also
+writes the all-reduce phase of each iteration. --backend gloo runs on CPU for dry runs.
+
+--interference measures compute-communication interference instead: the same matmul
+runs alone, concurrently with a stream of all-reduces (on a second CUDA stream), and
+the all-reduces run alone. Rank 0 writes per-repetition times as JSON to --out;
+`nccl-analysis interference` turns them into throughput and slowdown ratios. Set
+NCCL_ALGO / NCCL_PROTO to measure one (algo, proto) pair per run.
+
+--duration SECONDS is soak mode: iterate until the wall-clock budget runs out instead
+of --iters. Rank 0 keeps constant-memory statistics (quantile sketches per window of
+--window iterations, see nccl_analysis/soak.py) instead of every time, prints a status
+line every --report-every seconds and reports distribution shifts and periodic stalls.
+--out then receives the summary as JSON; `nccl-analysis soak-report` prints it.
+
+--trace FILE records every timed iteration (rank, compute / all-reduce / iteration
+ms, config) in a binary trace while the run is in progress (nccl_analysis/trace.py),
+flushed every --trace-flush seconds; `nccl-analysis trace FILE --follow` tails it.
+Rank 0 writes FILE; if the path contains "{rank}", every rank writes its own. An
+existing FILE is replaced; --trace-append continues it instead, and refuses if its
+header was written for a different setup or config.
+
+--profile-dir DIR runs torch.profiler around sampled iterations only: every
+--profile-every N-th step, or the --profile-steps A:B range, on --profile-rank.
+Each sample is exported as DIR/trace_rank<r>_iter<a>-<b>.json (Chrome trace, one
+`proxy_iter_<i>` marker per iteration) and summarized per kernel at the end; see
+`nccl-analysis profile-summary`. Unsampled steps run without a profiler. Sampled
+steps include profiler overhead in their iteration times.
+
+--mem-out FILE samples memory after every --mem-every timed iterations (default 1, or
+one sample per --window in soak mode), outside the timed region: PyTorch allocator state and device headroom on CUDA, RSS on both. The
+run ends with a leak check; `nccl-analysis mem-report` repeats it and correlates
+allocator events with iteration time. Same rank rule as --trace.
+
+--gpu-samples FILE runs a background thread that reads NVML counters (SM and memory
+utilization, clocks, power) every --sample-interval ms into a ring buffer of
+--sample-capacity samples, timestamped with the same clock and origin as --trace
+records (nccl_analysis/gpu_sampler.py). Rank 0 samples every GPU; with "{rank}" in the
+path each rank samples its own. `nccl-analysis gpu-samples FILE --trace TRACE` splits
+the counters into compute and all-reduce phases. --sample-replay CSV replays a recorded
+log instead of NVML (dry runs without GPUs).
+
+--scaling sweeps world size inside one launch: the step runs on dist.new_group
+subgroups of ranks 0..k-1 for k = 2, 4, ..., N (or --group-sizes) while the other
+ranks wait on a CPU barrier. Rank 0 writes per-size iteration and all-reduce times
+(max over the subgroup) as JSON to --out; `nccl-analysis scaling` prints and plots
+the curve. Works with --backend gloo.
 """
 
 import argparse
+import contextlib
+import json
+import math
 import os
+import resource
 import sys
 import time
+from pathlib import Path
 
 import torch
 import torch.distributed as dist
 
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from nccl_analysis.soak import SoakMonitor, print_summary  # noqa: E402
+from nccl_analysis.gpu_sampler import GpuSampler, load_samples, open_backend, print_sample_summary  # noqa: E402
+from nccl_analysis.memory import CUDA_FIELDS, FIELDS as MEM_FIELDS, analyze as analyze_memory, print_reports  # noqa: E402
+from nccl_analysis.scaling import ScalingPoint, ScalingRun, print_curves  # noqa: E402
+from nccl_analysis.profiling import ITER_MARK, load_breakdowns, print_breakdowns  # noqa: E402
+from nccl_analysis.trace import TraceWriter, config_label  # noqa: E402
+
 
 def parse_args():
     p = argparse.ArgumentParser(description="Phase 3 iteration proxy")
@@ -20,8 +80,65 @@ def parse_args():
     p.add_argument("--warmup", type=int, default=5, help="Warmup iterations")
     p.add_argument("--size", type=int, default=2**20, help="All-reduce tensor size (elements, float32)")
     p.add_argument("--compute-mul", type=int, default=4096, help="Compute matmul size (NxN)")
-    p.add_argument("--out", type=str, default="", help="Output file for iteration times (rank 0)")
-    return p.parse_args()
+    p.add_argument("--out", type=str, default="",
+                   help="Output file for iteration times, or JSON with --interference / --scaling / --duration (rank 0)")
+    p.add_argument("--comm-out", type=str, default="", help="Output file for the all-reduce phase time of each iteration (rank 0)")
+    p.add_argument("--trace", type=str, default="",
+                   help='Binary iteration trace written during the run (rank 0; every rank if the path has "{rank}")')
+    p.add_argument("--trace-append", action="store_true",
+                   help="Append to an existing --trace of the same setup and config instead of replacing it")
+    p.add_argument("--trace-flush", type=float, default=2.0, help="Seconds between trace flushes (default: 2)")
+    p.add_argument("--profile-dir", type=str, default="", help="Write torch.profiler traces of sampled iterations here")
+    p.add_argument("--profile-every", type=int, default=0, help="Profile every N-th timed iteration (--profile-dir)")
+    p.add_argument("--profile-steps", type=str, default="",
+                   help="Profile timed iterations A..B-1 as one trace, given as A:B (--profile-dir)")
+    p.add_argument("--profile-rank", type=int, default=0, help="Rank that profiles (default: 0)")
+    p.add_argument("--mem-out", type=str, default="",
+                   help='Per-iteration memory CSV (rank 0; every rank if the path has "{rank}")')
+    p.add_argument("--mem-every", type=int, default=0,
+                   help="Timed iterations between memory samples (default: 1, or --window in soak mode)")
+    p.add_argument("--gpu-samples", type=str, default="",
+                   help='CSV of NVML counters sampled during the run (rank 0: all GPUs; "{rank}": own GPU)')
+    p.add_argument("--sample-interval", type=float, default=5.0, help="Milliseconds between samples (default: 5)")
+    p.add_argument("--sample-capacity", type=int, default=1 << 18,
+                   help="Ring buffer size in samples; older samples are overwritten (default: 262144)")
+    p.add_argument("--sample-replay", type=str, default="",
+                   help="Replay this recorded CSV instead of reading NVML (--gpu-samples)")
+    p.add_argument("--backend", choices=("nccl", "gloo"), default="nccl", help="gloo runs on CPU (default: nccl)")
+    p.add_argument("--interference", action="store_true",
+                   help="Measure compute alone / compute + all-reduce stream / all-reduce alone instead")
+    p.add_argument("--matmuls", type=int, default=20, help="Matmuls per compute window (--interference)")
+    p.add_argument("--reps", type=int, default=10, help="Repetitions of the three conditions (--interference)")
+    p.add_argument("--scaling", action="store_true", help="Run the step on subgroups of 2, 4, ..., N ranks in turn")
+    p.add_argument("--group-sizes", type=int, nargs="+", default=[],
+                   help="Subgroup sizes for --scaling (default: powers of two up to the world size, and the world size)")
+    p.add_argument("--duration", type=float, default=0, help="Soak mode: run for this many seconds instead of --iters")
+    p.add_argument("--window", type=int, default=100, help="Iterations per statistics window (--duration)")
+    p.add_argument("--report-every", type=float, default=60, help="Seconds between status lines (--duration)")
+    p.add_argument("--check-every", type=int, default=100,
+                   help="Iterations between the ranks' stop checks (--duration); the check is not timed")
+    args = p.parse_args()
+    if args.interference and args.backend != "nccl":
+        p.error("--interference needs CUDA streams (--backend nccl)")
+    if sum(map(bool, (args.interference, args.duration, args.scaling))) > 1:
+        p.error("--interference, --duration and --scaling are separate modes")
+    if args.profile_dir:
+        if bool(args.profile_every) == bool(args.profile_steps):
+            p.error("--profile-dir needs exactly one of --profile-every and --profile-steps")
+        if args.profile_steps:
+            try:
+                first, stop = (int(v) for v in args.profile_steps.split(":"))
+            except ValueError:
+                p.error(f"--profile-steps wants A:B, got {args.profile_steps!r}")
+            if not 0 <= first < stop:
+                p.error(f"--profile-steps A:B needs 0 <= A < B, got {args.profile_steps!r}")
+            args.profile_steps = (first, stop)
+    return args
+
+
+def synchronize(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize()
 
 
 def compute_phase(device: torch.device, n: int, dtype=torch.float32):
@@ -29,14 +146,412 @@ def compute_phase(device: torch.device, n: int, dtype=torch.float32):
     a = torch.randn(n, n, device=device, dtype=dtype)
     b = torch.randn(n, n, device=device, dtype=dtype)
     c = torch.matmul(a, b)
-    torch.cuda.synchronize()
+    synchronize(device)
     return c
 
 
-def allreduce_phase(tensor: torch.Tensor):
-    """All-reduce the tensor across all ranks."""
-    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
-    torch.cuda.synchronize()
+def allreduce_phase(tensor: torch.Tensor, group=None):
+    """All-reduce the tensor across all ranks (of `group` if given)."""
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM, group=group)
+    synchronize(tensor.device)
+
+
+def timed_iteration(device: torch.device, compute_mul: int, grad: torch.Tensor, group=None) -> tuple[float, float]:
+    """One compute + all-reduce step; returns (iteration ms, all-reduce phase ms)."""
+    synchronize(device)
+    t0 = time.perf_counter()
+    compute_phase(device, compute_mul)
+    t_comm = time.perf_counter()
+    allreduce_phase(grad.clone(), group)
+    synchronize(device)
+    t1 = time.perf_counter()
+    return (t1 - t0) * 1000.0, (t1 - t_comm) * 1000.0
+
+
+def reward_logger(rank: int, size_bytes: int, world_size: int):
+    """Per-iteration reward logging for the RL tuner (NCCL_TUNER_REWARD_FILE, rank 0 only)."""
+    reward_file = os.environ.get("NCCL_TUNER_REWARD_FILE", "")
+    # With both NCCL_ALGO and NCCL_PROTO forced the arm is known, so name it in the
+    # reward line; `nccl-analysis tuner-snapshot` can then turn the log into a prior.
+    forced_arm = ""
+    if os.environ.get("NCCL_ALGO") and os.environ.get("NCCL_PROTO"):
+        forced_arm = f",{os.environ['NCCL_ALGO'].lower()},{os.environ['NCCL_PROTO'].lower()}"
+
+    def log(iter_ms: float) -> None:
+        if not reward_file or rank != 0:
+            return
+        try:
+            with open(reward_file, "a") as f:
+                f.write(f"allreduce,{size_bytes},{1},{world_size},{iter_ms:.3f}{forced_arm}\n")
+        except OSError:
+            # Best-effort: ignore logging errors so experiments still run.
+            pass
+
+    return log
+
+
+def _timed(stream: torch.cuda.Stream, launch, count: int) -> tuple[torch.cuda.Event, list[torch.cuda.Event]]:
+    """Launch `count` ops on `stream`; returns its start event and one end event per op."""
+    start = torch.cuda.Event(enable_timing=True)
+    ends = [torch.cuda.Event(enable_timing=True) for _ in range(count)]
+    with torch.cuda.stream(stream):
+        start.record()
+        for end in ends:
+            launch()
+            end.record()
+    return start, ends
+
+
+def _max_over_ranks(values: list[float], device: torch.device) -> list[float]:
+    t = torch.tensor(values, device=device, dtype=torch.float64)
+    dist.all_reduce(t, op=dist.ReduceOp.MAX)
+    return t.tolist()
+
+
+def run_interference(args, rank: int, world_size: int, device: torch.device) -> None:
+    """Time the compute window alone, overlapped with all-reduces, and the all-reduces alone."""
+    n = args.compute_mul
+    a = torch.randn(n, n, device=device)
+    b = torch.randn(n, n, device=device)
+    c = torch.empty(n, n, device=device)
+    grad = torch.randn(args.size, device=device) / world_size
+    compute_stream = torch.cuda.Stream(device=device)
+    comm_stream = torch.cuda.Stream(device=device)
+
+    def matmul():
+        torch.matmul(a, b, out=c)
+
+    def allreduce():
+        dist.all_reduce(grad, op=dist.ReduceOp.SUM)
+
+    def compute_alone() -> float:
+        start, ends = _timed(compute_stream, matmul, args.matmuls)
+        torch.cuda.synchronize()
+        return start.elapsed_time(ends[-1])
+
+    def comm_alone(count: int) -> float:
+        dist.barrier()
+        start, ends = _timed(comm_stream, allreduce, count)
+        torch.cuda.synchronize()
+        return start.elapsed_time(ends[-1]) / count
+
+    # Warmup, then size the collective stream so that, uncontended, it outlasts the
+    # compute window by 25%; every rank must issue the same number of collectives.
+    for _ in range(args.warmup):
+        compute_alone()
+        comm_alone(1)
+    window_ms, op_ms = _max_over_ranks([compute_alone(), comm_alone(10)], device)
+    n_coll = int(_max_over_ranks([min(max(math.ceil(1.25 * window_ms / op_ms), 10), 100_000)], device)[0])
+
+    reps = {key: [] for key in ("compute_alone_ms", "comm_alone_ms", "overlap_compute_ms", "overlap_comm_ms",
+                                "overlap_comm_ops")}
+    for _ in range(args.reps):
+        alone = compute_alone()
+        comm = comm_alone(n_coll)
+
+        # Both streams start together; only collectives that finish inside the compute
+        # window count towards the overlapped all-reduce time.
+        dist.barrier()
+        torch.cuda.synchronize()
+        c_start, c_ends = _timed(compute_stream, matmul, args.matmuls)
+        r_start, r_ends = _timed(comm_stream, allreduce, n_coll)
+        torch.cuda.synchronize()
+        overlap = c_start.elapsed_time(c_ends[-1])
+        inside = [e for e in r_ends if c_start.elapsed_time(e) <= overlap] or r_ends[:1]
+        overlap_comm = r_start.elapsed_time(inside[-1]) / len(inside)
+
+        alone, comm, overlap, overlap_comm = _max_over_ranks([alone, comm, overlap, overlap_comm], device)
+        reps["compute_alone_ms"].append(alone)
+        reps["comm_alone_ms"].append(comm)
+        reps["overlap_compute_ms"].append(overlap)
+        reps["overlap_comm_ms"].append(overlap_comm)
+        reps["overlap_comm_ops"].append(len(inside))
+
+    if rank == 0:
+        record = {
+            "algo": os.environ.get("NCCL_ALGO", "auto"),
+            "proto": os.environ.get("NCCL_PROTO", "auto"),
+            "world_size": world_size,
+            "size_bytes": args.size * 4,
+            "compute_mul": n,
+            "matmuls": args.matmuls,
+            "collectives": n_coll,
+            **reps,
+        }
+        slowdown = sorted(o / a for o, a in zip(reps["overlap_compute_ms"], reps["compute_alone_ms"]))
+        print(f"algo={record['algo']} proto={record['proto']} size_bytes={record['size_bytes']} "
+              f"collectives={n_coll} compute_slowdown_p50={slowdown[len(slowdown) // 2]:.3f}", flush=True)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(record, f, indent=1)
+            print(f"Wrote {args.out}", flush=True)
+
+
+class StepProfiler:
+    """torch.profiler around sampled iterations; an unsampled step costs one comparison."""
+
+    def __init__(self, args, rank: int, device: torch.device):
+        self.sampling = bool(args.profile_dir)
+        self.dir = Path(args.profile_dir) if self.sampling and rank == args.profile_rank else None
+        self.rank = rank
+        self.every = args.profile_every
+        self.first, self.stop = args.profile_steps or (-1, -1)
+        self.activities = [torch.profiler.ProfilerActivity.CPU]
+        if device.type == "cuda":
+            self.activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.exported: list[Path] = []
+        self._prof = None
+        self._start = self._last = 0
+        if self.dir is not None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _starts(self, i: int) -> bool:
+        return (self.every and (i + 1) % self.every == 0) or i == self.first
+
+    def _ends(self, i: int) -> bool:
+        return (self.every and (i + 1) % self.every == 0) or i == self.stop - 1
+
+    def step(self, i: int):
+        """Context for timed iteration i: profiled if sampled, else a no-op."""
+        if not self.sampling or (self._prof is None and not self._starts(i) and not self._ends(i)):
+            return contextlib.nullcontext()
+        return self._profiled(i)
+
+    @contextlib.contextmanager
+    def _profiled(self, i: int):
+        if self.dir is None:
+            # Another rank profiles; this one only waits for its export below.
+            yield
+        else:
+            if self._prof is None:
+                self._prof = torch.profiler.profile(activities=self.activities)
+                self._prof.__enter__()
+                self._start = i
+            with torch.profiler.record_function(f"{ITER_MARK}{i}"):
+                yield
+            self._last = i
+        if self._ends(i):
+            if self.dir is not None:
+                self._export()
+            # Keep the export out of the other ranks' next iteration.
+            dist.barrier()
+
+    def _export(self) -> None:
+        self._prof.__exit__(None, None, None)
+        path = self.dir / f"trace_rank{self.rank}_iter{self._start}-{self._last}.json"
+        self._prof.export_chrome_trace(str(path))
+        self._prof = None
+        self.exported.append(path)
+
+    def close(self) -> None:
+        """Export a range cut short by the end of the run and print the kernel breakdown."""
+        if self._prof is not None:
+            self._export()
+        if self.exported:
+            print_breakdowns(load_breakdowns([str(p) for p in self.exported]))
+            print(f"Wrote {len(self.exported)} Chrome trace(s) to {self.dir}", flush=True)
+
+
+def scaling_sizes(requested: list[int], world_size: int) -> list[int]:
+    if requested:
+        bad = [k for k in requested if not 1 <= k <= world_size]
+        if bad:
+            raise SystemExit(f"--group-sizes must be between 1 and the world size {world_size}: {bad}")
+        return sorted(set(requested))
+    sizes, k = [], 2
+    while k < world_size:
+        sizes.append(k)
+        k *= 2
+    return sizes + [world_size]
+
+
+def run_scaling(args, rank: int, world_size: int, device: torch.device) -> None:
+    """The step on ranks 0..k-1 for each subgroup size k; rank 0 reports the curve."""
+    sizes = scaling_sizes(args.group_sizes, world_size)
+    # Every rank must create every group, in the same order. Idle ranks wait on a
+    # gloo barrier so they put no kernels on their GPUs or traffic on the links.
+    waiting = dist.new_group(backend="gloo")
+    groups = {k: dist.new_group(ranks=list(range(k))) for k in sizes}
+    grad = torch.randn(args.size, device=device, dtype=torch.float32) / world_size
+    run = ScalingRun(args.out, config_label(), args.backend, world_size, args.size * 4, args.compute_mul)
+    for k in sizes:
+        if rank < k:
+            group = groups[k]
+            for _ in range(args.warmup):
+                compute_phase(device, args.compute_mul)
+                allreduce_phase(grad.clone(), group)
+            times = [timed_iteration(device, args.compute_mul, grad, group) for _ in range(args.iters)]
+            # An iteration is as slow as the subgroup's slowest rank.
+            t = torch.tensor(times, device=device, dtype=torch.float64)
+            dist.all_reduce(t, op=dist.ReduceOp.MAX, group=group)
+            if rank == 0:
+                iter_ms, comm_ms = t[:, 0].tolist(), t[:, 1].tolist()
+                run.points.append(ScalingPoint(k, iter_ms, comm_ms))
+                print(f"ranks={k} iter_p50_ms={sorted(iter_ms)[len(iter_ms) // 2]:.3f} "
+                      f"allreduce_p50_ms={sorted(comm_ms)[len(comm_ms) // 2]:.3f}", flush=True)
+        dist.barrier(group=waiting)
+
+    if rank == 0:
+        print_curves([run])
+        if args.out:
+            record = {"config": run.config, "backend": run.backend, "world_size": world_size,
+                      "size_bytes": run.size_bytes, "compute_mul": run.compute_mul,
+                      "groups": [{"ranks": p.ranks, "iter_ms": p.iter_ms, "comm_ms": p.comm_ms} for p in run.points]}
+            with open(args.out, "w") as f:
+                json.dump(record, f, indent=1)
+            print(f"Wrote {args.out}", flush=True)
+
+
+_MB = 1024 * 1024
+
+
+def _host_rss_mb() -> tuple[float, float]:
+    """(current, peak) resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / _MB, peak
+    except (OSError, ValueError, IndexError):
+        return peak, peak
+
+
+class MemoryTracker:
+    """Memory after sampled timed iterations, one CSV row each (see nccl_analysis/memory.py)."""
+
+    def __init__(self, path: str, device: torch.device, every: int):
+        self.path = path
+        self.cuda = device.type == "cuda"
+        self.every = max(1, every)
+        fields = MEM_FIELDS if self.cuda else [f for f in MEM_FIELDS if f not in CUDA_FIELDS]
+        self._f = open(path, "w")
+        self._f.write(",".join(fields) + "\n")
+        self._prev = self._counters()
+        if self.cuda:
+            torch.cuda.reset_peak_memory_stats()
+
+    def _counters(self) -> list[int]:
+        if not self.cuda:
+            return []
+        stats = torch.cuda.memory_stats()
+        return [stats.get(k, 0) for k in ("allocation.all.allocated", "allocation.all.freed",
+                                          "segment.all.allocated", "num_alloc_retries")]
+
+    def sample(self, i: int) -> None:
+        if (i + 1) % self.every:
+            return
+        row = [str(i)]
+        if self.cuda:
+            reserved = torch.cuda.memory_reserved()
+            counters = self._counters()
+            free, total = torch.cuda.mem_get_info()
+            row += [f"{torch.cuda.memory_allocated() / _MB:.3f}", f"{reserved / _MB:.3f}",
+                    f"{torch.cuda.max_memory_allocated() / _MB:.3f}"]
+            row += [str(c - p) for c, p in zip(counters, self._prev)]
+            row += [f"{free / _MB:.1f}", f"{(total - free - reserved) / _MB:.1f}"]
+            self._prev = counters
+            torch.cuda.reset_peak_memory_stats()
+        row += [f"{v:.1f}" for v in _host_rss_mb()]
+        self._f.write(",".join(row) + "\n")
+
+    def close(self, times_ms=None) -> None:
+        self._f.close()
+        print_reports([analyze_memory(self.path, times_ms)])
+        print(f"Wrote {self.path}", flush=True)
+
+
+def open_memory(args, rank: int, device: torch.device):
+    if not args.mem_out or ("{rank}" not in args.mem_out and rank != 0):
+        return None
+    # A soak runs for hours: one row per statistics window keeps the CSV bounded by --duration / window.
+    every = args.mem_every or (args.window if args.duration else 1)
+    return MemoryTracker(args.mem_out.replace("{rank}", str(rank)), device, every)
+
+
+def open_trace(args, rank: int, world_size: int):
+    """TraceWriter for this rank, or None when --trace is off or another rank writes it."""
+    if not args.trace or ("{rank}" not in args.trace and rank != 0):
+        return None
+    meta = {
+        "world_size": world_size,
+        "size_bytes": args.size * 4,
+        "compute_mul": args.compute_mul,
+        "backend": args.backend,
+        "mode": "soak" if args.duration else "iters",
+        "torch": torch.__version__,
+        "nccl_env": {k: v for k, v in os.environ.items() if k.startswith("NCCL_")},
+    }
+    return TraceWriter(args.trace.replace("{rank}", str(rank)), meta, configs=[config_label()],
+                       flush_s=args.trace_flush, append=args.trace_append)
+
+
+def open_sampler(args, rank: int, local_rank: int):
+    """Started GpuSampler for --gpu-samples, or None (same rank rule as --trace)."""
+    if not args.gpu_samples or ("{rank}" not in args.gpu_samples and rank != 0):
+        return None
+    gpus = None
+    if "{rank}" in args.gpu_samples:
+        # NVML numbers devices physically; map this rank's CUDA device through CUDA_VISIBLE_DEVICES.
+        visible = [v.strip() for v in os.environ.get("CUDA_VISIBLE_DEVICES", "").split(",") if v.strip()]
+        own = visible[local_rank] if local_rank < len(visible) else str(local_rank)
+        gpus = [int(own) if own.isdigit() and not args.sample_replay else local_rank]
+    backend = open_backend(args.sample_replay, gpus)
+    return GpuSampler(backend, args.sample_interval / 1000, args.sample_capacity).start()
+
+
+def close_sampler(sampler, args, rank: int, origin: float) -> None:
+    sampler.stop()
+    path = args.gpu_samples.replace("{rank}", str(rank))
+    n = sampler.write_csv(path, origin)
+    print(f"[rank {rank}] GPU samples: {n} kept, {sampler.dropped} overwritten, {sampler.missed} ticks missed",
+          flush=True)
+    print_sample_summary(load_samples(path))
+    print(f"Wrote {path}", flush=True)
+
+
+def run_soak(args, rank: int, device: torch.device, grad: torch.Tensor, log_reward, trace, profiler,
+             memory, start: float) -> None:
+    """Iterate for args.duration seconds with rolling statistics on rank 0."""
+    monitor = SoakMonitor(window=args.window) if rank == 0 else None
+    stop = torch.zeros(1, device=device)
+    next_report = args.report_every
+    done = 0
+    while True:
+        with profiler.step(done):
+            iter_ms, comm_ms = timed_iteration(device, args.compute_mul, grad)
+        log_reward(iter_ms)
+        now = time.perf_counter() - start
+        if trace is not None:
+            trace.add(done, rank, now, iter_ms - comm_ms, comm_ms, iter_ms)
+        if memory is not None:
+            memory.sample(done)
+        done += 1
+        if monitor is not None:
+            shift = monitor.add(iter_ms, now)
+            if shift is not None:
+                last = monitor.windows[-1].sketch.quantile(0.5)
+                print(f"[soak] shift from iter {shift.start_iter} ({shift.start_s:.0f}s): p50 "
+                      f"{shift.before_p50:.3f} -> {last:.3f} ms", flush=True)
+            if now >= next_report:
+                print(monitor.status(), flush=True)
+                next_report += args.report_every
+        if done % args.check_every == 0:
+            # Rank 0's clock decides; every rank must run the same number of all-reduces.
+            expired = rank == 0 and time.perf_counter() - start >= args.duration
+            stop.fill_(1.0 if expired else 0.0)
+            dist.all_reduce(stop, op=dist.ReduceOp.MAX)
+            if stop.item():
+                break
+
+    if monitor is not None:
+        summary = monitor.summary()
+        summary.update(config=config_label(), size_bytes=args.size * 4,
+                       compute_mul=args.compute_mul, duration_s=args.duration)
+        print_summary(summary)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(summary, f, indent=1)
+            print(f"Wrote {args.out}", flush=True)
 
 
 def main():
@@ -44,10 +559,20 @@ def main():
     rank = int(os.environ.get("RANK", 0))
     world_size = int(os.environ.get("WORLD_SIZE", 1))
     local_rank = int(os.environ.get("LOCAL_RANK", rank))
-    device = torch.device(f"cuda:{local_rank}")
+    device = torch.device(f"cuda:{local_rank}" if args.backend == "nccl" else "cpu")
+
+    dist.init_process_group(backend=args.backend)
+    if device.type == "cuda":
+        torch.cuda.set_device(device)
 
-    dist.init_process_group(backend="nccl")
-    torch.cuda.set_device(device)
+    if args.interference:
+        run_interference(args, rank, world_size, device)
+        dist.destroy_process_group()
+        return
+    if args.scaling:
+        run_scaling(args, rank, world_size, device)
+        dist.destroy_process_group()
+        return
 
     # Per-iteration buffer for all-reduce (same size on all ranks)
     elem = args.size
@@ -58,29 +583,47 @@ def main():
         compute_phase(device, args.compute_mul)
         allreduce_phase(grad.clone())
 
+    # If an RL tuner reward file is configured, log one reward per iteration from
+    # rank 0 so the tuner can learn online.
+    log_reward = reward_logger(rank, elem * 4, world_size)
+    trace = open_trace(args, rank, world_size)
+    profiler = StepProfiler(args, rank, device)
+    memory = open_memory(args, rank, device)
+    sampler = open_sampler(args, rank, local_rank)
+    # Origin of trace t_s and of the GPU samples' timestamps.
+    start = time.perf_counter()
+    if args.duration:
+        run_soak(args, rank, device, grad, log_reward, trace, profiler, memory, start)
+        if sampler is not None:
+            close_sampler(sampler, args, rank, start)
+        if trace is not None:
+            trace.close()
+        if memory is not None:
+            memory.close()
+        profiler.close()
+        dist.destroy_process_group()
+        return
+
     # Timed iterations
     times_ms = []
-    reward_file = os.environ.get("NCCL_TUNER_REWARD_FILE", "")
-    for _ in range(args.iters):
-        torch.cuda.synchronize()
-        t0 = time.perf_counter()
-        compute_phase(device, args.compute_mul)
-        allreduce_phase(grad.clone())
-        torch.cuda.synchronize()
-        t1 = time.perf_counter()
-        iter_ms = (t1 - t0) * 1000.0
+    comm_ms = []
+    for i in range(args.iters):
+        with profiler.step(i):
+            iter_ms, allreduce_ms = timed_iteration(device, args.compute_mul, grad)
         times_ms.append(iter_ms)
-
-        # If an RL tuner reward file is configured, log one reward per iteration
-        # from rank 0 so the tuner can learn online.
-        if reward_file and rank == 0:
-            try:
-                n_bytes = elem * 4  # float32 elements
-                with open(reward_file, "a") as f:
-                    f.write(f"allreduce,{n_bytes},{1},{world_size},{iter_ms:.3f}\n")
-            except OSError:
-                # Best-effort: ignore logging errors so experiments still run.
-                pass
+        comm_ms.append(allreduce_ms)
+        log_reward(iter_ms)
+        if trace is not None:
+            trace.add(i, rank, time.perf_counter() - start, iter_ms - allreduce_ms, allreduce_ms, iter_ms)
+        if memory is not None:
+            memory.sample(i)
+    if sampler is not None:
+        close_sampler(sampler, args, rank, start)
+    if trace is not None:
+        trace.close()
+    if memory is not None:
+        memory.close(times_ms)
+    profiler.close()
 
     if rank == 0:
         out_lines = [f"{t:.3f}" for t in times_ms]
@@ -97,6 +640,10 @@ def main():
             with open(args.out, "w") as f:
                 f.write("\n".join(out_lines) + "\n")
             print(f"Wrote {args.out}", flush=True)
+        if args.comm_out:
+            with open(args.comm_out, "w") as f:
+                f.write("\n".join(f"{t:.3f}" for t in comm_ms) + "\n")
+            print(f"Wrote {args.comm_out}", flush=True)
 
     dist.destroy_process_group()
 
@@ -10,16 +10,27 @@ Produces (in results/):
   - iteration_times_bar_mean.png      # mean + p95 as error bars
   - iteration_times_boxplot.png       # box plots per config
   - iteration_times_cdf.png           # empirical CDF per config
+
+A binary trace (iteration_times_<cfg>.trace) is used instead of the .txt file when present.
+--follow TRACE redraws results/<trace>_live.png (p50 / p95 / max per window of
+iterations) every --interval seconds while a run is still writing the trace.
 """
 
 from __future__ import annotations
 
+import argparse
+import sys
 from pathlib import Path
 
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from nccl_analysis.iteration import times_path
+from nccl_analysis.parsing import load_times
+
 
 RESULTS_DIR = Path(__file__).parent / "results"
 CONFIGS = ["auto", "simple", "ll128"]
@@ -27,21 +38,6 @@ LABELS = {"auto": "AUTO", "simple": "Simple", "ll128": "LL128"}
 COLORS = {"auto": "tab:blue", "simple": "tab:orange", "ll128": "tab:green"}
 
 
-def load_times(path: Path) -> list[float]:
-    vals: list[float] = []
-    if not path.is_file():
-        return vals
-    for line in path.read_text().strip().splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            vals.append(float(line))
-        except ValueError:
-            continue
-    return vals
-
-
 def compute_stats(times: list[float]) -> tuple[float, float]:
     if not times:
         return float("nan"), float("nan")
@@ -117,13 +113,52 @@ def plot_cdf(times_by_cfg: dict[str, list[float]]) -> None:
     plt.close(fig)
 
 
+def plot_live(monitor, trace: Path) -> None:
+    windows = [w.to_dict() for w in monitor.windows]
+    if not windows:
+        return
+    xs = [w["start_iter"] for w in windows]
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(xs, [w["max"] for w in windows], color="tab:red", alpha=0.4, label="max")
+    ax.plot(xs, [w["p95"] for w in windows], color="tab:orange", label="p95")
+    ax.plot(xs, [w["p50"] for w in windows], color="tab:blue", label="p50")
+    for shift in monitor.drift.shifts:
+        ax.axvline(shift.start_iter, color="black", linestyle="--", alpha=0.5)
+    ax.set_xlabel("Iteration")
+    ax.set_ylabel("Iteration time (ms)")
+    ax.set_title(f"{trace.name}: {monitor.iterations} iterations, {monitor.elapsed_s:.0f}s "
+                 f"(dashed = distribution shift)")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    out = RESULTS_DIR / f"{trace.stem}_live.png"
+    fig.savefig(out, dpi=150)
+    plt.close(fig)
+    print(f"{monitor.status()} -> {out.name}", flush=True)
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Plot Phase 3 iteration times per NCCL config.")
+    parser.add_argument("--follow", type=Path, metavar="TRACE", help="Redraw a live plot of a trace that is still being written")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between redraws (default: 30)")
+    parser.add_argument("--idle", type=float, default=0,
+                        help="Stop after this many seconds without new records (default: 0, until Ctrl-C)")
+    parser.add_argument("--window", type=int, default=100, help="Iterations per plotted window (default: 100)")
+    args = parser.parse_args()
     RESULTS_DIR.mkdir(exist_ok=True)
+    if args.follow:
+        from nccl_analysis.soak import SoakMonitor
+        from nccl_analysis.trace import watch
+
+        watch(args.follow, SoakMonitor(window=args.window), on_update=lambda m: plot_live(m, args.follow),
+              every_s=args.interval, idle_s=args.idle)
+        return
+
     times_by_cfg: dict[str, list[float]] = {}
     stats: dict[str, tuple[float, float]] = {}
 
     for cfg in CONFIGS:
-        path = RESULTS_DIR / f"iteration_times_{cfg}.txt"
+        path = times_path(RESULTS_DIR, cfg)
         times = load_times(path)
         if not times:
             print(f"{cfg}: no data at {path}")
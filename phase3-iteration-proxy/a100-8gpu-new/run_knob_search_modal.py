@@ -0,0 +1,77 @@
+"""
+Modal app: NCCL knob search around the Phase 3 iteration proxy on 8x A100.
+Runs search_knobs.py with its history on the results volume, so each invocation
+warm-starts from the previous ones. Job name: browser-networking-test.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import modal
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+search_image = (
+    modal.Image.from_registry(
+        "nvidia/cuda:12.2.0-devel-ubuntu22.04",
+        add_python="3.11",
+    )
+    .apt_install("wget")
+    .run_commands("pip install --upgrade pip")
+    .pip_install("torch", "numpy")
+    .add_local_dir(REPO_ROOT, remote_path="/repo")
+)
+
+volume = modal.Volume.from_name("cs244c-nccl-results", create_if_missing=True)
+VOLUME_PATH = "/results"
+
+app = modal.App("browser-networking-tests")
+
+SEARCH_SCRIPT = "/repo/phase3-iteration-proxy/a100-8gpu-new/search_knobs.py"
+HISTORY = f"{VOLUME_PATH}/knob_search_history.jsonl"
+
+
+@app.function(
+    name="browser-networking-test",
+    image=search_image,
+    gpu="A100:8",
+    timeout=6 * 3600,
+    volumes={VOLUME_PATH: volume},
+)
+def run_knob_search(brackets: int = 3, per_bracket: int = 9, min_iters: int = 10, max_iters: int = 90,
+                    seed: int = 0):
+    """Run the search; returns its report and the full history file."""
+    cmd = [
+        "python", SEARCH_SCRIPT,
+        "--history", HISTORY,
+        "--brackets", str(brackets),
+        "--per-bracket", str(per_bracket),
+        "--min-iters", str(min_iters),
+        "--max-iters", str(max_iters),
+        "--seed", str(seed),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd="/repo")
+    volume.commit()
+    print(result.stdout, flush=True)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise RuntimeError(f"search_knobs exited {result.returncode}")
+    history = Path(HISTORY)
+    return {"report": result.stdout, "history": history.read_text() if history.is_file() else ""}
+
+
+@app.local_entrypoint()
+def main(brackets: int = 3, per_bracket: int = 9, min_iters: int = 10, max_iters: int = 90, seed: int = 0):
+    """Run the knob search and copy its report and history to results/."""
+    out = run_knob_search.remote(brackets=brackets, per_bracket=per_bracket, min_iters=min_iters,
+                                 max_iters=max_iters, seed=seed)
+    results_dir = Path(__file__).parent / "results"
+    results_dir.mkdir(exist_ok=True)
+    report_path = results_dir / "knob_search_report.txt"
+    report_path.write_text(out["report"])
+    history_path = results_dir / "knob_search_history.jsonl"
+    history_path.write_text(out["history"])
+    print(f"Wrote {report_path}")
+    print(f"Wrote {history_path}")
+    print("Done.")
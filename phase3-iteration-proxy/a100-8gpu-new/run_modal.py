@@ -1,7 +1,11 @@
 """
 Modal app: Phase 3 iteration-level proxy on 8x A100.
 Runs the training-step proxy under different NCCL configs (AUTO, Simple, LL128)
-and records iteration times. Job name: browser-networking-test.
+and records iteration times plus a binary trace per config on the results volume.
+--instrument also records a per-iteration memory CSV and 5 ms NVML samples of all
+8 GPUs. Both run inside rank 0, whose iteration times are the ones reported, so the
+baseline runs leave them off to stay comparable with earlier results.
+Job name: browser-networking-test.
 """
 
 import os
@@ -21,7 +25,7 @@ proxy_image = (
     )
     .apt_install("wget")
     .run_commands("pip install --upgrade pip")
-    .pip_install("torch")
+    .pip_install("torch", "nvidia-ml-py")
     .add_local_dir(REPO_ROOT, remote_path="/repo")
 )
 
@@ -45,7 +49,7 @@ CONFIGS = [
     timeout=1800,
     volumes={VOLUME_PATH: volume},
 )
-def run_iteration_proxy_all_configs():
+def run_iteration_proxy_all_configs(instrument: bool = False):
     """Run iteration proxy for AUTO, Simple, and LL128; save iteration times per config."""
     results_dir = Path(VOLUME_PATH)
     results_dir.mkdir(parents=True, exist_ok=True)
@@ -63,7 +67,13 @@ def run_iteration_proxy_all_configs():
             "--iters", "50",
             "--warmup", "5",
             "--out", str(out_file),
+            "--trace", str(results_dir / f"iteration_times_{config_name}.trace"),
         ]
+        if instrument:
+            cmd += [
+                "--mem-out", str(results_dir / f"memory_{config_name}.csv"),
+                "--gpu-samples", str(results_dir / f"gpu_samples_{config_name}.csv"),
+            ]
         result = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd="/repo")
         if result.returncode != 0:
             print(result.stderr, file=sys.stderr)
@@ -77,9 +87,9 @@ def run_iteration_proxy_all_configs():
 
 
 @app.local_entrypoint()
-def main():
+def main(instrument: bool = False):
     """Run proxy for all configs and write iteration time files to results/."""
-    out = run_iteration_proxy_all_configs.remote()
+    out = run_iteration_proxy_all_configs.remote(instrument=instrument)
     results_dir = Path(__file__).parent / "results"
     results_dir.mkdir(exist_ok=True)
     for config_name, lines in out.items():
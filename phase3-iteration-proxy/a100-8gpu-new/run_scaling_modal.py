@@ -0,0 +1,92 @@
+"""
+Modal app: world-size scaling sweep on 8x A100 in one container.
+Runs iteration_proxy.py --scaling once per NCCL config and all-reduce size: one
+torchrun launch at 8 ranks measures subgroups of 2, 4 and 8 ranks in turn.
+Job name: browser-networking-test.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import modal
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+proxy_image = (
+    modal.Image.from_registry(
+        "nvidia/cuda:12.2.0-devel-ubuntu22.04",
+        add_python="3.11",
+    )
+    .apt_install("wget")
+    .run_commands("pip install --upgrade pip")
+    .pip_install("torch")
+    .add_local_dir(REPO_ROOT, remote_path="/repo")
+)
+
+volume = modal.Volume.from_name("cs244c-nccl-results", create_if_missing=True)
+VOLUME_PATH = "/results"
+
+app = modal.App("browser-networking-tests")
+
+PROXY_SCRIPT = "/repo/phase3-iteration-proxy/a100-8gpu-new/iteration_proxy.py"
+CONFIGS = [
+    ("auto", {}),
+    ("simple", {"NCCL_PROTO": "Simple"}),
+    ("ll128", {"NCCL_PROTO": "LL128"}),
+]
+# All-reduce sizes in float32 elements: 256 KB, 4 MB (the Phase 3 proxy), 64 MB.
+SIZES = [2**16, 2**20, 2**24]
+
+
+@app.function(
+    name="browser-networking-test",
+    image=proxy_image,
+    gpu="A100:8",
+    timeout=3600,
+    volumes={VOLUME_PATH: volume},
+)
+def run_scaling_all_configs(sizes: list[int], iters: int = 50):
+    """One --scaling launch per size and config; returns {file name: JSON text}."""
+    results_dir = Path(VOLUME_PATH) / "scaling"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    out = {}
+
+    for size in sizes:
+        for config_name, env_add in CONFIGS:
+            print(f"--- {config_name}, {size * 4} bytes ---", flush=True)
+            out_file = results_dir / f"scaling_{config_name}_{size * 4}B.json"
+            cmd = [
+                "python", "-m", "torch.distributed.run",
+                "--nproc_per_node=8",
+                "--standalone",
+                PROXY_SCRIPT,
+                "--scaling",
+                "--size", str(size),
+                "--iters", str(iters),
+                "--out", str(out_file),
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, env={**os.environ, **env_add}, cwd="/repo")
+            if result.returncode != 0:
+                print(result.stderr, file=sys.stderr)
+                continue
+            print(result.stdout, flush=True)
+            if out_file.is_file():
+                out[out_file.name] = out_file.read_text()
+            volume.commit()
+
+    return out
+
+
+@app.local_entrypoint()
+def main(iters: int = 50):
+    """Run all configs and sizes and write scaling_<config>_<bytes>B.json to results/."""
+    out = run_scaling_all_configs.remote(SIZES, iters=iters)
+    results_dir = Path(__file__).parent / "results"
+    results_dir.mkdir(exist_ok=True)
+    for name, text in out.items():
+        path = results_dir / name
+        path.write_text(text)
+        print(f"Wrote {path}")
+    print("Summarize with: nccl-analysis scaling results/ --plot results/scaling.png")
@@ -0,0 +1,93 @@
+"""
+Modal app: Phase 3 soak run on 8x A100.
+Runs iteration_proxy.py --duration for one NCCL config (optionally with the RL tuner
+plugin) and keeps the soak summary JSON on the results volume: rolling quantiles per
+window, distribution shifts and periodic stalls. Job name: browser-networking-test.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import modal
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+proxy_image = (
+    modal.Image.from_registry(
+        "nvidia/cuda:12.2.0-devel-ubuntu22.04",
+        add_python="3.11",
+    )
+    .apt_install("wget", "build-essential")
+    .run_commands("pip install --upgrade pip")
+    .pip_install("torch")
+    .add_local_dir(REPO_ROOT, remote_path="/repo", copy=True)
+    .run_commands(
+        "cd /repo/phase4-tuner && "
+        "gcc -fPIC -shared -I. "
+        "-o /usr/local/lib/libnccl-tuner-rl-bandit.so "
+        "rl_bandit_tuner_plugin.c -lm",
+    )
+)
+
+volume = modal.Volume.from_name("cs244c-nccl-results", create_if_missing=True)
+VOLUME_PATH = "/results"
+
+app = modal.App("browser-networking-tests")
+
+PROXY_SCRIPT = "/repo/phase3-iteration-proxy/a100-8gpu-new/iteration_proxy.py"
+CONFIGS = {
+    "auto": {},
+    "simple": {"NCCL_PROTO": "Simple"},
+    "ll128": {"NCCL_PROTO": "LL128"},
+    "tuner": {"NCCL_TUNER_PLUGIN": "libnccl-tuner-rl-bandit.so"},
+}
+
+
+@app.function(
+    name="browser-networking-test",
+    image=proxy_image,
+    gpu="A100:8",
+    timeout=24 * 3600,
+    volumes={VOLUME_PATH: volume},
+)
+def run_soak(config: str = "auto", hours: float = 1.0, window: int = 100, report_every: float = 300):
+    """Soak one config for `hours`; returns the summary JSON text."""
+    results_dir = Path(VOLUME_PATH) / "soak"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    out_file = results_dir / f"soak_{config}.json"
+    env = {**os.environ, **CONFIGS[config]}
+    if config == "tuner":
+        env["NCCL_TUNER_REWARD_FILE"] = str(results_dir / "soak_tuner_rewards.log")
+    cmd = [
+        "python", "-m", "torch.distributed.run",
+        "--nproc_per_node=8",
+        "--standalone",
+        PROXY_SCRIPT,
+        "--duration", str(hours * 3600),
+        "--window", str(window),
+        "--report-every", str(report_every),
+        "--out", str(out_file),
+    ]
+    # Stream the status lines instead of capturing hours of output.
+    result = subprocess.run(cmd, env=env, cwd="/repo")
+    volume.commit()
+    if result.returncode != 0:
+        print(f"iteration_proxy exited {result.returncode}", file=sys.stderr)
+        raise RuntimeError(f"soak run failed for config {config}")
+    return out_file.read_text() if out_file.is_file() else ""
+
+
+@app.local_entrypoint()
+def main(config: str = "auto", hours: float = 1.0, window: int = 100, report_every: float = 300):
+    """Run one soak and write results/soak_<config>.json."""
+    if config not in CONFIGS:
+        raise SystemExit(f"config must be one of {', '.join(CONFIGS)}")
+    text = run_soak.remote(config=config, hours=hours, window=window, report_every=report_every)
+    results_dir = Path(__file__).parent / "results"
+    results_dir.mkdir(exist_ok=True)
+    path = results_dir / f"soak_{config}.json"
+    path.write_text(text)
+    print(f"Wrote {path}")
+    print(f"Summarize with: nccl-analysis soak-report {path}")
@@ -0,0 +1,100 @@
+"""
+Search NCCL knobs (ALGO, PROTO, MIN/MAX_NCHANNELS, NTHREADS, BUFFSIZE) for the lowest
+iteration-proxy time. Configs are proposed by a Gaussian process and pruned by
+successive halving: short runs first, only the best third rerun with 3x the
+iterations (see nccl_analysis/knob_search.py).
+
+Every run is appended to --history, so rerunning on the same workload warm-starts from
+earlier searches and skips configs already measured.
+
+Usage (on the GPU node, or via run_knob_search_modal.py):
+    python search_knobs.py --nproc 8 --brackets 3 --per-bracket 9
+    python search_knobs.py --history results/knob_search_history.jsonl --min-iters 10 --max-iters 90
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from nccl_analysis.knob_search import SPACE, History, Trial, config_env, print_result, search  # noqa: E402
+from nccl_analysis.parsing import load_times  # noqa: E402
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROXY_SCRIPT = SCRIPT_DIR / "iteration_proxy.py"
+
+
+def gpu_name() -> str:
+    try:
+        out = subprocess.run(["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
+                             capture_output=True, text=True, check=True).stdout
+        return out.splitlines()[0].strip()
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        return "unknown"
+
+
+def make_runner(args, workload: dict):
+    base_env = {k: v for k, v in os.environ.items() if k not in {knob.name for knob in SPACE}}
+
+    def run(config: dict, iters: int) -> Trial:
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as tmp:
+            out = Path(tmp.name)
+        cmd = [
+            sys.executable, "-m", "torch.distributed.run", f"--nproc_per_node={args.nproc}", "--standalone",
+            str(PROXY_SCRIPT), "--iters", str(iters), "--warmup", str(args.warmup),
+            "--size", str(args.size), "--compute-mul", str(args.compute_mul), "--out", str(out),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout,
+                                    env={**base_env, **config_env(config)})
+            times = load_times(out) if result.returncode == 0 else []
+            last = (result.stderr.strip().splitlines() or [""])[-1]
+            error = "" if times else f"exit {result.returncode}: {last}"
+        except subprocess.TimeoutExpired:
+            times, error = [], f"timeout after {args.timeout}s"
+        finally:
+            out.unlink(missing_ok=True)
+        return Trial(config=config, iters=iters, times_ms=times, workload=workload, error=error)
+
+    return run
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bayesian-optimization / successive-halving NCCL knob search.")
+    parser.add_argument("--history", type=Path, default=SCRIPT_DIR / "results" / "knob_search_history.jsonl",
+                        help="JSONL run history, read for warm start and appended to")
+    parser.add_argument("--nproc", type=int, default=8, help="Ranks (torchrun --nproc_per_node, default: 8)")
+    parser.add_argument("--size", type=int, default=2**20, help="All-reduce tensor size in float32 elements (default: 2^20)")
+    parser.add_argument("--compute-mul", type=int, default=4096, help="Compute matmul size (default: 4096)")
+    parser.add_argument("--warmup", type=int, default=5, help="Warmup iterations per run (default: 5)")
+    parser.add_argument("--brackets", type=int, default=3, help="Successive-halving brackets (default: 3)")
+    parser.add_argument("--per-bracket", type=int, default=9, help="Configs proposed per bracket (default: 9)")
+    parser.add_argument("--min-iters", type=int, default=10, help="Iterations in the first rung (default: 10)")
+    parser.add_argument("--max-iters", type=int, default=90, help="Iterations in the last rung (default: 90)")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta of the configs per rung (default: 3)")
+    parser.add_argument("--timeout", type=int, default=600, help="Seconds before a run counts as failed (default: 600)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = {"gpu": gpu_name(), "n_gpus": args.nproc, "size_elems": args.size, "compute_mul": args.compute_mul}
+    history = History(args.history, workload)
+    print(f"Workload: {workload}")
+    best = search(make_runner(args, workload), history, brackets=args.brackets, per_bracket=args.per_bracket,
+                  min_iters=args.min_iters, max_iters=args.max_iters, eta=args.eta, seed=args.seed)
+    if best is None:
+        print("No config completed the final rung.")
+        return 1
+    print_result(best, history, args.max_iters)
+    print(f"Run log: {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,11 +24,13 @@ rl_image = (
     .pip_install("torch")
     .add_local_dir(REPO_ROOT, remote_path="/repo", copy=True)
     .run_commands(
-        # Build RL bandit tuner plugin shared library using local tuner headers.
+        # Fail the image build if the local tuner.h does not match the installed NCCL's ABI,
+        # then build RL bandit tuner plugin shared library using local tuner headers.
+        "cd /repo && python -m nccl_analysis.cli tuner-abi --check phase4-tuner/tuner.h && "
         "cd /repo/phase4-tuner && "
         "gcc -fPIC -shared -I. "
         "-o /usr/local/lib/libnccl-tuner-rl-bandit.so "
-        "rl_bandit_tuner_plugin.c",
+        "rl_bandit_tuner_plugin.c -lm",
     )
 )
 
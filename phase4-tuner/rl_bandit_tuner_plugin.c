@@ -20,8 +20,19 @@
 //   If unset, defaults to /tmp/nccl_tuner_rewards_<commId>.log
 // - NCCL_TUNER_EPS (optional): epsilon for epsilon-greedy in [0,1].
 //   Default: 0.1
-
-#include "tuner.h"
+// - NCCL_TUNER_SNAPSHOT_FILE (optional): per-key/per-arm statistics loaded as a
+//   prior at init and rewritten at finalize (see "Snapshots" below).
+// - NCCL_TUNER_PRIOR_HALFLIFE_S (optional): age in seconds at which a snapshot
+//   arm's count is halved when loaded; 0 disables decay. Default: 604800 (7 days)
+// - NCCL_TUNER_PRIOR_MAX_COUNT (optional): cap on a loaded arm's effective
+//   count, so new rewards can still move its mean. Default: 20
+// - NCCL_TUNER_WARM_EPS (optional): epsilon for keys whose arms all came
+//   from the snapshot with count >= NCCL_TUNER_WARM_MIN_COUNT (default 3).
+//   Default: epsilon / 10
+//
+// A reward line may carry two extra fields, algo,proto (e.g. "tree,simple"),
+// naming the arm that produced it; such lines are attributed to that arm
+// instead of the last arm selected for the key.
 
 #include <stdio.h>
 #include <stdlib.h>
@@ -29,6 +40,10 @@
 #include <stdint.h>
 #include <time.h>
 #include <limits.h>
+#include <math.h>
+#include <unistd.h>
+
+#include "tuner.h"
 
 #define __hidden __attribute__ ((visibility("hidden")))
 
@@ -41,6 +56,12 @@
 // Bandit configuration limits
 #define MAX_KEYS   64
 #define MAX_ARMS    4
+// Snapshot lines kept for other communicator shapes (nNodes, nRanks).
+#define MAX_FOREIGN (MAX_KEYS * MAX_ARMS)
+
+#define SNAPSHOT_HEADER "# nccl-tuner-snapshot v1"
+// Weight of the newest reward in the recency-weighted mean.
+#define EWMA_ALPHA 0.1
 
 typedef struct {
   ncclFunc_t collType;
@@ -49,11 +70,19 @@ typedef struct {
   int nRanks;
 } BanditKey;
 
+// Sufficient statistics of an arm's latencies. count is a double because
+// snapshot priors are loaded with a decayed, fractional weight.
 typedef struct {
   int algo;
   int proto;
-  int count;
-  double sumLatencyMs;
+  double count;
+  double meanMs;
+  double m2;          // sum of squared deviations from meanMs (Welford)
+  double ewmaMs;      // recency-weighted mean
+  long long updated;  // unix time of the newest reward in these statistics
+  int fresh;          // rewards seen by this job
+  double priorExcess; // decayed snapshot count above the prior cap
+  double savedCount, savedMeanMs, savedVar;  // snapshot line, rewritten as-is if !fresh
 } BanditArm;
 
 typedef struct {
@@ -61,6 +90,7 @@ typedef struct {
   BanditArm arms[MAX_ARMS];
   int numArms;
   int lastArmIdx; // index of arm last selected for this key, or -1 if none yet
+  int warm;       // every arm came from the snapshot with enough weight
 } BanditEntry;
 
 typedef struct {
@@ -70,6 +100,11 @@ typedef struct {
   char rewardFile[PATH_MAX];
   long rewardOffset;
   double epsilon;
+  double warmEpsilon;
+
+  char snapshotFile[PATH_MAX];
+  char foreign[MAX_FOREIGN][MAX_LINE_LENGTH];
+  int numForeign;
 
   size_t nRanks;
   size_t nNodes;
@@ -98,6 +133,21 @@ static const char* collTypeToString(ncclFunc_t collType) {
   }
 }
 
+static const char* algoNames[] = {"tree", "ring", "collnet_direct", "collnet_chain", "nvls", "nvls_tree", "pat"};
+static const char* protoNames[] = {"ll", "ll128", "simple"};
+
+static int parseName(const char* str, const char** names, int n) {
+  char buf[32];
+  size_t len = strcspn(str, " \t\r\n");
+  if (len >= sizeof(buf)) return -1;
+  for (size_t i = 0; i < len; ++i) buf[i] = (char)((str[i] >= 'A' && str[i] <= 'Z') ? str[i] - 'A' + 'a' : str[i]);
+  buf[len] = '\0';
+  for (int i = 0; i < n; ++i) {
+    if (strcmp(buf, names[i]) == 0) return i;
+  }
+  return -1;
+}
+
 // Size banding: bucket nBytes into a small number of bands.
 // This must be replicated by the application if it wants to precompute bands,
 // but for rewards we log raw nBytes and recompute the band here.
@@ -150,31 +200,46 @@ static int getOrAddKey(TunerContext* ctx, const BanditKey* key) {
 static void initDefaultArmsForKey(BanditEntry* entry) {
   if (entry->numArms > 0) return;
 
+  memset(entry->arms, 0, sizeof(entry->arms));
+
   // Arm 0: tree + simple
   entry->arms[0].algo = NCCL_ALGO_TREE;
   entry->arms[0].proto = NCCL_PROTO_SIMPLE;
-  entry->arms[0].count = 0;
-  entry->arms[0].sumLatencyMs = 0.0;
 
   // Arm 1: tree + ll128
   entry->arms[1].algo = NCCL_ALGO_TREE;
   entry->arms[1].proto = NCCL_PROTO_LL128;
-  entry->arms[1].count = 0;
-  entry->arms[1].sumLatencyMs = 0.0;
 
   // Arm 2: ring + simple
   entry->arms[2].algo = NCCL_ALGO_RING;
   entry->arms[2].proto = NCCL_PROTO_SIMPLE;
-  entry->arms[2].count = 0;
-  entry->arms[2].sumLatencyMs = 0.0;
 
   entry->numArms = 3;
 }
 
+static int findArm(const BanditEntry* entry, int algo, int proto) {
+  for (int i = 0; i < entry->numArms; ++i) {
+    if (entry->arms[i].algo == algo && entry->arms[i].proto == proto) return i;
+  }
+  return -1;
+}
+
+// Fold one latency into an arm's statistics (Welford update + EWMA).
+static void armObserve(BanditArm* arm, double latencyMs) {
+  arm->count += 1.0;
+  double delta = latencyMs - arm->meanMs;
+  arm->meanMs += delta / arm->count;
+  arm->m2 += delta * (latencyMs - arm->meanMs);
+  arm->ewmaMs = (arm->count <= 1.0) ? latencyMs : arm->ewmaMs + EWMA_ALPHA * (latencyMs - arm->ewmaMs);
+  arm->updated = (long long)time(NULL);
+  arm->fresh = 1;
+}
+
 // Parse one reward log line:
-//   collType,nBytes,nNodes,nRanks,latency_ms
+//   collType,nBytes,nNodes,nRanks,latency_ms[,algo,proto]
+// algo/proto are set to -1 when the optional fields are absent.
 static int parseRewardLine(const char* line, ncclFunc_t* collType, size_t* nBytes,
-                           int* nNodes, int* nRanks, double* latencyMs) {
+                           int* nNodes, int* nRanks, double* latencyMs, int* algo, int* proto) {
   char buf[MAX_LINE_LENGTH];
   strncpy(buf, line, sizeof(buf));
   buf[sizeof(buf)-1] = '\0';
@@ -200,6 +265,14 @@ static int parseRewardLine(const char* line, ncclFunc_t* collType, size_t* nByte
   if (!token) return 0;
   *latencyMs = strtod(token, NULL);
 
+  *algo = *proto = -1;
+  token = strtok_r(NULL, ",", &saveptr);
+  if (token) {
+    *algo = parseName(token, algoNames, NCCL_NUM_ALGORITHMS);
+    token = strtok_r(NULL, ",", &saveptr);
+    *proto = token ? parseName(token, protoNames, NCCL_NUM_PROTOCOLS) : -1;
+  }
+
   return 1;
 }
 
@@ -231,9 +304,9 @@ static void ingestRewards(TunerContext* ctx) {
 
     ncclFunc_t collType;
     size_t nBytes;
-    int nNodes, nRanks;
+    int nNodes, nRanks, algo, proto;
     double latencyMs;
-    if (!parseRewardLine(line, &collType, &nBytes, &nNodes, &nRanks, &latencyMs)) {
+    if (!parseRewardLine(line, &collType, &nBytes, &nNodes, &nRanks, &latencyMs, &algo, &proto)) {
       continue;
     }
 
@@ -257,18 +330,18 @@ static void ingestRewards(TunerContext* ctx) {
     }
 
     BanditEntry* entry = &ctx->entries[kIdx];
-    if (entry->lastArmIdx < 0 || entry->lastArmIdx >= entry->numArms) {
-      // We don't know which arm was used last; ignore.
+    int armIdx = (algo >= 0 && proto >= 0) ? findArm(entry, algo, proto) : entry->lastArmIdx;
+    if (armIdx < 0 || armIdx >= entry->numArms) {
+      // We don't know which arm produced this reward; ignore.
       continue;
     }
 
-    BanditArm* arm = &entry->arms[entry->lastArmIdx];
-    arm->count += 1;
-    arm->sumLatencyMs += latencyMs;
+    BanditArm* arm = &entry->arms[armIdx];
+    armObserve(arm, latencyMs);
 
     if (ctx->logFunction) {
       ctx->logFunction(NCCL_LOG_TRACE, NCCL_TUNING, __FILE__, __LINE__,
-                       "RL-TUNER: Reward for key(collType=%s,band=%d,nodes=%d,ranks=%d) arm(algo=%d,proto=%d) latency=%.3f ms (N=%d)",
+                       "RL-TUNER: Reward for key(collType=%s,band=%d,nodes=%d,ranks=%d) arm(algo=%d,proto=%d) latency=%.3f ms (N=%.1f)",
                        collTypeToString(key.collType), key.sizeBand, key.nNodes, key.nRanks,
                        arm->algo, arm->proto, latencyMs, arm->count);
     }
@@ -281,15 +354,15 @@ static void ingestRewards(TunerContext* ctx) {
 static int selectArm(TunerContext* ctx, BanditEntry* entry) {
   if (entry->numArms == 0) return -1;
 
-  // Explore any untried arms first.
+  // Explore any untried arms first (a warm-started key has none).
   for (int i = 0; i < entry->numArms; ++i) {
-    if (entry->arms[i].count == 0) {
+    if (entry->arms[i].count <= 0.0) {
       return i;
     }
   }
 
   double r = (double)rand() / (double)RAND_MAX;
-  if (r < ctx->epsilon) {
+  if (r < (entry->warm ? ctx->warmEpsilon : ctx->epsilon)) {
     // Random exploration among all arms
     int idx = rand() % entry->numArms;
     return idx;
@@ -299,7 +372,7 @@ static int selectArm(TunerContext* ctx, BanditEntry* entry) {
   double bestMean = 0.0;
   int bestIdx = 0;
   for (int i = 0; i < entry->numArms; ++i) {
-    double mean = entry->arms[i].sumLatencyMs / (double)entry->arms[i].count;
+    double mean = entry->arms[i].meanMs;
     if (i == 0 || mean < bestMean) {
       bestMean = mean;
       bestIdx = i;
@@ -308,6 +381,139 @@ static int selectArm(TunerContext* ctx, BanditEntry* entry) {
   return bestIdx;
 }
 
+// ---- Snapshots ----
+//
+// A snapshot holds one line per (key, arm) with the arm's sufficient statistics:
+//   collType,sizeBand,nNodes,nRanks,algo,proto,count,mean_ms,var_ms2,ewma_ms,updated
+// It is written by pluginFinalize or by `nccl-analysis tuner-snapshot`, which
+// compacts reward logs. At most MAX_KEYS * MAX_ARMS lines apply to a
+// communicator, so loading costs the same however long the history behind it is.
+//
+// Loading an arm's statistics as a prior:
+// - its count decays by 0.5^(age / halflife) and is capped at the max prior count,
+//   so stale or heavily sampled priors do not drown out this job's rewards;
+// - its mean becomes the recency-weighted mean; its variance is kept.
+// Lines for other (nNodes, nRanks) are kept verbatim and written back.
+
+static void loadSnapshot(TunerContext* ctx, double halflifeS, double maxCount, double warmMinCount) {
+  FILE* f = fopen(ctx->snapshotFile, "r");
+  if (!f) return;
+
+  long long now = (long long)time(NULL);
+  int loaded = 0;
+  char line[MAX_LINE_LENGTH];
+  while (fgets(line, sizeof(line), f)) {
+    if (line[0] == '#' || line[0] == '\n') continue;
+
+    char coll[32], algoName[32], protoName[32];
+    int band, nNodes, nRanks;
+    double count, mean, var, ewma;
+    long long updated;
+    if (sscanf(line, "%31[^,],%d,%d,%d,%31[^,],%31[^,],%lf,%lf,%lf,%lf,%lld",
+               coll, &band, &nNodes, &nRanks, algoName, protoName,
+               &count, &mean, &var, &ewma, &updated) != 11) {
+      continue;
+    }
+    if (nNodes != (int)ctx->nNodes || nRanks != (int)ctx->nRanks) {
+      if (ctx->numForeign < MAX_FOREIGN) {
+        strncpy(ctx->foreign[ctx->numForeign], line, MAX_LINE_LENGTH - 1);
+        ctx->foreign[ctx->numForeign][MAX_LINE_LENGTH - 1] = '\0';
+        ctx->numForeign++;
+      }
+      continue;
+    }
+
+    BanditKey key;
+    key.collType = parseCollType(coll);
+    key.sizeBand = band;
+    key.nNodes = nNodes;
+    key.nRanks = nRanks;
+    int kIdx = getOrAddKey(ctx, &key);
+    if (kIdx < 0) continue;
+    BanditEntry* entry = &ctx->entries[kIdx];
+    initDefaultArmsForKey(entry);
+    int armIdx = findArm(entry, parseName(algoName, algoNames, NCCL_NUM_ALGORITHMS),
+                         parseName(protoName, protoNames, NCCL_NUM_PROTOCOLS));
+    if (armIdx < 0 || count <= 0.0) continue;
+
+    double age = (double)(now > updated ? now - updated : 0);
+    double weight = (halflifeS > 0.0) ? pow(0.5, age / halflifeS) : 1.0;
+    BanditArm* arm = &entry->arms[armIdx];
+    arm->savedCount = count;
+    arm->savedMeanMs = mean;
+    arm->savedVar = var;
+    arm->count = fmin(count * weight, maxCount);
+    arm->priorExcess = count * weight - arm->count;
+    arm->meanMs = ewma > 0.0 ? ewma : mean;
+    arm->m2 = var * arm->count;
+    arm->ewmaMs = arm->meanMs;
+    arm->updated = updated;
+    arm->fresh = 0;
+    loaded++;
+  }
+  fclose(f);
+
+  for (int i = 0; i < ctx->numKeys; ++i) {
+    BanditEntry* entry = &ctx->entries[i];
+    entry->warm = entry->numArms > 0;
+    for (int a = 0; a < entry->numArms; ++a) {
+      if (entry->arms[a].count < warmMinCount) entry->warm = 0;
+    }
+  }
+
+  if (ctx->logFunction) {
+    ctx->logFunction(NCCL_LOG_INFO, NCCL_TUNING, __FILE__, __LINE__,
+                     "RL-TUNER: loaded %d arm priors for %d keys from %s",
+                     loaded, ctx->numKeys, ctx->snapshotFile);
+  }
+}
+
+static void writeArm(FILE* f, const BanditKey* key, const BanditArm* arm) {
+  // Arms untouched by this job are written back exactly as loaded, so their
+  // decay is computed from the original timestamp again next time. Updated
+  // arms carry the decayed prior (including what the cap held back) plus
+  // this job's rewards.
+  double count = arm->fresh ? arm->count + arm->priorExcess : arm->savedCount;
+  double mean = arm->fresh ? arm->meanMs : arm->savedMeanMs;
+  double var = arm->fresh ? (arm->count > 1.0 ? arm->m2 / arm->count : 0.0) : arm->savedVar;
+  if (count <= 0.0) return;
+  fprintf(f, "%s,%d,%d,%d,%s,%s,%.3f,%.6f,%.6f,%.6f,%lld\n",
+          collTypeToString(key->collType), key->sizeBand, key->nNodes, key->nRanks,
+          algoNames[arm->algo], protoNames[arm->proto],
+          count, mean, var, arm->ewmaMs, arm->updated);
+}
+
+static void saveSnapshot(TunerContext* ctx) {
+  char tmp[PATH_MAX + 16];
+  snprintf(tmp, sizeof(tmp), "%s.%d.tmp", ctx->snapshotFile, (int)getpid());
+  FILE* f = fopen(tmp, "w");
+  if (!f) return;
+  fprintf(f, "%s\n", SNAPSHOT_HEADER);
+  fprintf(f, "# collType,sizeBand,nNodes,nRanks,algo,proto,count,mean_ms,var_ms2,ewma_ms,updated\n");
+  for (int i = 0; i < ctx->numForeign; ++i) {
+    fputs(ctx->foreign[i], f);
+  }
+  for (int i = 0; i < ctx->numKeys; ++i) {
+    for (int a = 0; a < ctx->entries[i].numArms; ++a) {
+      writeArm(f, &ctx->entries[i].key, &ctx->entries[i].arms[a]);
+    }
+  }
+  fclose(f);
+  // Every rank finalizes; rename keeps each write atomic, and ranks ingest the
+  // same reward log, so whichever write lands last is as good as any other.
+  if (rename(tmp, ctx->snapshotFile) != 0) {
+    remove(tmp);
+  }
+}
+
+static double envDouble(const char* name, double fallback, double lo, double hi) {
+  const char* str = getenv(name);
+  if (!str || str[0] == '\0') return fallback;
+  char* end = NULL;
+  double val = strtod(str, &end);
+  return (end != str && val >= lo && val <= hi) ? val : fallback;
+}
+
 __hidden ncclResult_t pluginInit(void** context, uint64_t commId, size_t nRanks, size_t nNodes,
                                  ncclDebugLogger_t logFunction,
                                  ncclNvlDomainInfo_v5_t* nvlDomainInfo,
@@ -332,6 +538,7 @@ __hidden ncclResult_t pluginInit(void** context, uint64_t commId, size_t nRanks,
       ctx->epsilon = val;
     }
   }
+  ctx->warmEpsilon = envDouble("NCCL_TUNER_WARM_EPS", ctx->epsilon / 10.0, 0.0, 1.0);
 
   const char* rewardEnv = getenv("NCCL_TUNER_REWARD_FILE");
   if (rewardEnv && rewardEnv[0] != '\0') {
@@ -347,10 +554,21 @@ __hidden ncclResult_t pluginInit(void** context, uint64_t commId, size_t nRanks,
   unsigned int seed = (unsigned int)time(NULL) ^ (unsigned int)(commId & 0xffffffffULL);
   srand(seed);
 
+  const char* snapshotEnv = getenv("NCCL_TUNER_SNAPSHOT_FILE");
+  if (snapshotEnv && snapshotEnv[0] != '\0') {
+    strncpy(ctx->snapshotFile, snapshotEnv, sizeof(ctx->snapshotFile));
+    ctx->snapshotFile[sizeof(ctx->snapshotFile)-1] = '\0';
+    loadSnapshot(ctx,
+                 envDouble("NCCL_TUNER_PRIOR_HALFLIFE_S", 7.0 * 24 * 3600, 0.0, 1e12),
+                 envDouble("NCCL_TUNER_PRIOR_MAX_COUNT", 20.0, 0.0, 1e12),
+                 envDouble("NCCL_TUNER_WARM_MIN_COUNT", 3.0, 0.0, 1e12));
+  }
+
   if (logFunction) {
     logFunction(NCCL_LOG_INFO, NCCL_TUNING, __FILE__, __LINE__,
-                "RL-TUNER: init for %zu nodes, %zu ranks, rewardFile=%s, epsilon=%.3f",
-                nNodes, nRanks, ctx->rewardFile, ctx->epsilon);
+                "RL-TUNER: init for %zu nodes, %zu ranks, rewardFile=%s, epsilon=%.3f, snapshot=%s",
+                nNodes, nRanks, ctx->rewardFile, ctx->epsilon,
+                ctx->snapshotFile[0] ? ctx->snapshotFile : "(none)");
   }
 
   *context = ctx;
@@ -424,9 +642,9 @@ __hidden ncclResult_t pluginGetCollInfo(void* context, ncclFunc_t collType, size
   entry->lastArmIdx = armIdx;
 
   if (ctx->logFunction) {
-    double mean = (arm->count > 0) ? (arm->sumLatencyMs / (double)arm->count) : -1.0;
+    double mean = (arm->count > 0.0) ? arm->meanMs : -1.0;
     ctx->logFunction(NCCL_LOG_INFO, NCCL_TUNING, __FILE__, __LINE__,
-                     "RL-TUNER: Selected arm for collType=%s band=%d nodes=%d ranks=%d -> algo=%d proto=%d (N=%d mean=%.3f ms)",
+                     "RL-TUNER: Selected arm for collType=%s band=%d nodes=%d ranks=%d -> algo=%d proto=%d (N=%.1f mean=%.3f ms)",
                      collTypeToString(key.collType), key.sizeBand, key.nNodes, key.nRanks,
                      arm->algo, arm->proto, arm->count, mean);
   }
@@ -436,6 +654,11 @@ __hidden ncclResult_t pluginGetCollInfo(void* context, ncclFunc_t collType, size
 
 __hidden ncclResult_t pluginFinalize(void* context) {
   if (context) {
+    TunerContext* ctx = (TunerContext*)context;
+    if (ctx->snapshotFile[0] != '\0') {
+      ingestRewards(ctx);
+      saveSnapshot(ctx);
+    }
     free(context);
   }
   return ncclSuccess;
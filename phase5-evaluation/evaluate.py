@@ -0,0 +1,179 @@
+"""
+Phase 5 evaluation harness: NCCL default vs oracle vs the phase4 RL tuner plugin.
+
+Runs the Phase 3 iteration proxy for every (workload cell, arm, repetition), with the
+arms interleaved (see nccl_analysis/evaluation.py), then prints one report of
+iteration time, all-reduce latency and bus bandwidth with bootstrap CIs.
+
+- default: no NCCL_ALGO / NCCL_PROTO.
+- oracle: the best forced config for the cell, derived from the Phase 1-3 results.
+- tuner: NCCL_TUNER_PLUGIN with a reward log and snapshot per cell, so the plugin
+  warm-starts from its earlier repetitions.
+
+Contention levels hold the Phase 2 stress kernel at the level's target utilization on
+every rank's GPU for the duration of the run (`--stress-bin`, built from
+gpu_stress_benchmark.cu, driven by nccl_analysis.stress); the proxy starts once the
+load is stable.
+
+--dry-run runs everything on CPU with the gloo backend: small sizes, the CPU backend
+of the stress controller instead of the stress kernel. NCCL settings have no effect there, so it only checks the
+pipeline end to end.
+
+Usage (on the GPU node, or via run_modal.py):
+    python evaluate.py --sizes 256K 4M 64M --compute-muls 1024 4096 --contention none high --reps 5
+    python evaluate.py --dry-run --sizes 64K 1M --compute-muls 128 --world-sizes 2 --reps 3 --iters 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+# Repo root on sys.path so nccl_analysis imports without `pip install -e .`
+sys.path.insert(0, str(REPO_ROOT))
+
+from nccl_analysis.contention import StressGroup, utilization_line  # noqa: E402
+from nccl_analysis.evaluation import (  # noqa: E402
+    ARMS, Cell, RunLog, RunRecord, derive_oracle, print_report, report_rows, schedule, workload_matrix,
+)
+from nccl_analysis.parsing import load_times, parse_size  # noqa: E402
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROXY_SCRIPT = REPO_ROOT / "phase3-iteration-proxy" / "a100-8gpu-new" / "iteration_proxy.py"
+RESULT_ROOTS = [REPO_ROOT / "phase1-baseline", REPO_ROOT / "phase2-contention", REPO_ROOT / "phase3-iteration-proxy"]
+
+
+def start_contention(level: str, n_gpus: int, work_dir: Path, args) -> StressGroup:
+    """One stress controller per rank's GPU, returned once every load is stable."""
+    if level != "none" and not args.dry_run and not args.stress_bin:
+        raise SystemExit(f"contention level {level!r} needs --stress-bin (built from gpu_stress_benchmark.cu)")
+    group = StressGroup((level,) * n_gpus, backend="cpu" if args.dry_run else "gpu", stress_bin=args.stress_bin,
+                        work_dir=work_dir)
+    group.start()
+    try:
+        group.wait_ready(timeout=args.stress_ready_timeout)
+    except RuntimeError:
+        group.stop()
+        raise
+    return group
+
+
+def arm_env(arm: str, cell: Cell, oracle, args) -> tuple[dict[str, str], str]:
+    """Environment additions for one arm, and a note on where they came from."""
+    if arm == "oracle":
+        choice = oracle.choose(cell, args.platform)
+        if choice is None:
+            return {}, f"no {args.platform} measurements: same as default"
+        return choice.env, f"{choice.config} from {choice.source}"
+    if arm == "tuner":
+        state = args.state_dir / f"{cell.size_bytes}B_mm{cell.compute_mul}_{cell.contention}_x{cell.world_size}"
+        state.mkdir(parents=True, exist_ok=True)
+        return {
+            "NCCL_TUNER_PLUGIN": args.tuner_plugin,
+            "NCCL_TUNER_REWARD_FILE": str(state / "rewards.log"),
+            "NCCL_TUNER_SNAPSHOT_FILE": str(state / "snapshot.csv"),
+        }, "phase4 RL bandit plugin"
+    return {}, ""
+
+
+def run_one(cell: Cell, arm: str, rep: int, env_add: dict[str, str], note: str, args) -> RunRecord:
+    with tempfile.TemporaryDirectory() as tmp:
+        out, comm_out = Path(tmp) / "iter.txt", Path(tmp) / "comm.txt"
+        cmd = [
+            sys.executable, "-m", "torch.distributed.run", f"--nproc_per_node={cell.world_size}", "--standalone",
+            str(PROXY_SCRIPT), "--iters", str(args.iters), "--warmup", str(args.warmup),
+            "--size", str(cell.size_bytes // 4), "--compute-mul", str(cell.compute_mul),
+            "--backend", "gloo" if args.dry_run else "nccl", "--out", str(out), "--comm-out", str(comm_out),
+        ]
+        env = {k: v for k, v in os.environ.items() if k not in ("NCCL_ALGO", "NCCL_PROTO", "NCCL_TUNER_PLUGIN")}
+        if not args.dry_run:
+            env["CUDA_VISIBLE_DEVICES"] = ",".join(str(g) for g in range(cell.world_size))
+        stress = start_contention(cell.contention, cell.world_size, Path(tmp), args)
+        t0 = time.time()
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout,
+                                    env={**env, **env_add})
+            times = load_times(out) if result.returncode == 0 else []
+            last = (result.stderr.strip().splitlines() or [""])[-1]
+            error = "" if times else f"exit {result.returncode}: {last}"
+            comm = load_times(comm_out) if times else []
+        except subprocess.TimeoutExpired:
+            times, comm, error = [], [], f"timeout after {args.timeout}s"
+        finally:
+            t1 = time.time()
+            stress.stop()
+        util = stress.utilization(t0, t1)
+        if util:
+            note = f"{note}; stress {utilization_line(stress.levels, util)} %".lstrip("; ")
+    return RunRecord(cell=cell, arm=arm, rep=rep, env=env_add, times_ms=times, comm_ms=comm, error=error, note=note)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Phase 5: default vs oracle vs workload-aware tuner.")
+    parser.add_argument("--sizes", nargs="+", default=["256K", "4M", "64M"], help="All-reduce sizes (default: 256K 4M 64M)")
+    parser.add_argument("--compute-muls", nargs="+", type=int, default=[1024, 4096], help="Compute matmul sizes (default: 1024 4096)")
+    parser.add_argument("--contention", nargs="+", default=["none", "high"], choices=("none", "low", "medium", "high"),
+                        help="Stress levels (default: none high)")
+    parser.add_argument("--world-sizes", nargs="+", type=int, default=[8], help="Ranks per run (default: 8)")
+    parser.add_argument("--arms", nargs="+", default=list(ARMS), choices=ARMS, help="Arms to run (default: all)")
+    parser.add_argument("--reps", type=int, default=5, help="Interleaved repetitions (default: 5)")
+    parser.add_argument("--iters", type=int, default=50, help="Timed iterations per run (default: 50)")
+    parser.add_argument("--warmup", type=int, default=5, help="Warmup iterations per run (default: 5)")
+    parser.add_argument("--platform", default="A100", help="Platform whose Phase 1-3 results define the oracle (default: A100)")
+    parser.add_argument("--results", nargs="+", type=Path, default=RESULT_ROOTS, help="Result roots for the oracle")
+    parser.add_argument("--log", type=Path, default=SCRIPT_DIR / "results" / "eval_runs.jsonl",
+                        help="JSONL run log, resumed if present")
+    parser.add_argument("--state-dir", type=Path, default=SCRIPT_DIR / "results" / "tuner_state",
+                        help="Per-cell reward logs and snapshots of the tuner arm")
+    parser.add_argument("--tuner-plugin", default="libnccl-tuner-rl-bandit.so", help="NCCL_TUNER_PLUGIN for the tuner arm")
+    parser.add_argument("--stress-bin", default="", help="gpu_stress_benchmark binary for contention levels")
+    parser.add_argument("--stress-ready-timeout", type=float, default=60.0,
+                        help="Seconds to wait for the stress load to stabilize (default: 60)")
+    parser.add_argument("--timeout", type=int, default=900, help="Seconds before a run counts as failed (default: 900)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="CPU/gloo run that exercises the pipeline only")
+    parser.add_argument("--report-csv", type=Path, help="Also write the report rows as CSV")
+    args = parser.parse_args()
+
+    cells = workload_matrix([parse_size(s) for s in args.sizes], args.compute_muls, args.contention, args.world_sizes)
+    oracle = derive_oracle([str(r) for r in args.results])
+    print(f"Oracle data for: {', '.join(oracle.platforms) or 'nothing'}; using {args.platform}")
+    for cell in cells:
+        choice = oracle.choose(cell, args.platform)
+        print(f"  {cell.label:<28} {choice.config + ' from ' + choice.source if choice else '(no data: default)'}")
+    if args.dry_run:
+        print("Dry run: gloo on CPU, NCCL settings are recorded but have no effect.")
+
+    log = RunLog(args.log)
+    plan = schedule(cells, args.arms, args.reps, args.seed)
+    todo = [(rep, cell, arm) for rep, cell, arm in plan if not log.done(rep, cell, arm)]
+    print(f"{len(plan)} runs planned, {len(plan) - len(todo)} already in {args.log}")
+    for i, (rep, cell, arm) in enumerate(todo, 1):
+        env_add, note = arm_env(arm, cell, oracle, args)
+        record = run_one(cell, arm, rep, env_add, note, args)
+        log.add(record)
+        status = f"{sum(record.times_ms) / len(record.times_ms):.2f} ms" if record.ok else f"failed ({record.error})"
+        print(f"[{i}/{len(todo)}] rep {rep} {cell.label:<28} {arm:<8} {status}", flush=True)
+
+    rows = report_rows([r for r in log.records if r.cell in cells and r.arm in args.arms])
+    print()
+    print_report(rows)
+    if args.report_csv:
+        import csv
+        args.report_csv.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report_csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["cell"])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Wrote {args.report_csv}")
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Modal app: Phase 5 evaluation on 8x A100.
+Builds the RL bandit tuner plugin and the Phase 2 stress kernel, then runs
+evaluate.py (default vs oracle vs tuner) with its run log and tuner state on the
+results volume, so an interrupted evaluation resumes. Job name: browser-networking-test.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import modal
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+eval_image = (
+    modal.Image.from_registry(
+        "nvidia/cuda:12.2.0-devel-ubuntu22.04",
+        add_python="3.11",
+    )
+    .apt_install("wget", "build-essential")
+    .run_commands("pip install --upgrade pip")
+    .pip_install("torch", "numpy")
+    .add_local_dir(REPO_ROOT, remote_path="/repo", copy=True)
+    .run_commands(
+        "cd /repo/phase4-tuner && "
+        "gcc -fPIC -shared -I. "
+        "-o /usr/local/lib/libnccl-tuner-rl-bandit.so "
+        "rl_bandit_tuner_plugin.c -lm",
+        "nvcc -lcublas /repo/phase2-contention/a100-8gpu-new/gpu_stress_benchmark.cu -o /usr/local/bin/gpu_stress_benchmark",
+    )
+)
+
+volume = modal.Volume.from_name("cs244c-nccl-results", create_if_missing=True)
+VOLUME_PATH = "/results"
+
+app = modal.App("browser-networking-tests")
+
+EVAL_SCRIPT = "/repo/phase5-evaluation/evaluate.py"
+OUT_DIR = f"{VOLUME_PATH}/phase5"
+
+
+@app.function(
+    name="browser-networking-test",
+    image=eval_image,
+    gpu="A100:8",
+    timeout=12 * 3600,
+    volumes={VOLUME_PATH: volume},
+)
+def run_evaluation(sizes: str = "256K 4M 64M", compute_muls: str = "1024 4096", contention: str = "none high",
+                   world_sizes: str = "8", reps: int = 5, iters: int = 50):
+    """Run evaluate.py; returns its report, the run log and the report CSV."""
+    cmd = [
+        "python", EVAL_SCRIPT,
+        "--sizes", *sizes.split(),
+        "--compute-muls", *compute_muls.split(),
+        "--contention", *contention.split(),
+        "--world-sizes", *world_sizes.split(),
+        "--reps", str(reps),
+        "--iters", str(iters),
+        "--log", f"{OUT_DIR}/eval_runs.jsonl",
+        "--state-dir", f"{OUT_DIR}/tuner_state",
+        "--report-csv", f"{OUT_DIR}/eval_report.csv",
+        "--tuner-plugin", "libnccl-tuner-rl-bandit.so",
+        "--stress-bin", "/usr/local/bin/gpu_stress_benchmark",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd="/repo")
+    volume.commit()
+    print(result.stdout, flush=True)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise RuntimeError(f"evaluate.py exited {result.returncode}")
+    files = {}
+    for name in ("eval_runs.jsonl", "eval_report.csv"):
+        path = Path(OUT_DIR) / name
+        files[name] = path.read_text() if path.is_file() else ""
+    return {"report": result.stdout, **files}
+
+
+@app.local_entrypoint()
+def main(sizes: str = "256K 4M 64M", compute_muls: str = "1024 4096", contention: str = "none high",
+         world_sizes: str = "8", reps: int = 5, iters: int = 50):
+    """Run the evaluation and copy its report, run log and CSV to results/."""
+    out = run_evaluation.remote(sizes=sizes, compute_muls=compute_muls, contention=contention,
+                                world_sizes=world_sizes, reps=reps, iters=iters)
+    results_dir = Path(__file__).parent / "results"
+    results_dir.mkdir(exist_ok=True)
+    for name, text in (("eval_report.txt", out["report"]), ("eval_runs.jsonl", out["eval_runs.jsonl"]),
+                       ("eval_report.csv", out["eval_report.csv"])):
+        path = results_dir / name
+        path.write_text(text)
+        print(f"Wrote {path}")
+    print("Done.")